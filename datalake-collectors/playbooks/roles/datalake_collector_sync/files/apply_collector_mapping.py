@@ -13,6 +13,7 @@ import yaml  # noqa: E402
 
 from collector_core import (  # noqa: E402
     classify_platform_status,
+    compile_device_mappings,
     extract_dc_code,
     extract_device_ip,
     extract_platform_ip,
@@ -65,6 +66,7 @@ def main() -> int:
             zabbix_rows = load_yaml(str(status_path)).get("mappings", []) or []
 
     filt = {x.strip() for x in args.collector_filter.split(",") if x.strip()}
+    device_index = compile_device_mappings(mappings) if args.entity == "devices" else None
 
     targets = []
     skipped: list[dict] = []
@@ -142,7 +144,7 @@ def main() -> int:
                     }
                 )
         else:
-            row = match_device_mapping(item, mappings)
+            row = match_device_mapping(item, device_index)
             if not row:
                 continue
             ctype = row["collector_type"]
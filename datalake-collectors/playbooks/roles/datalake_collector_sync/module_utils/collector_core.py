@@ -307,8 +307,7 @@ def _condition_match(value: Any, expected: Any) -> bool:
     return False
 
 
-def match_device_mapping(device: dict, mappings: list[dict]) -> dict | None:
-    """Match NetBox device dict to collector_type mapping row."""
+def _device_mapping_fields(device: dict) -> tuple[str, str, str]:
     role = ""
     if device.get("device_role"):
         role = device["device_role"].get("name") or device["device_role"].get("slug") or ""
@@ -316,21 +315,65 @@ def match_device_mapping(device: dict, mappings: list[dict]) -> dict | None:
     if device.get("device_type") and device["device_type"].get("manufacturer"):
         mfr = device["device_type"]["manufacturer"].get("name", "")
     model = device.get("device_type", {}).get("model", "") or ""
+    return role, mfr, model
 
-    sorted_rows = sorted(mappings, key=lambda r: int(r.get("priority", 999)))
-    for row in sorted_rows:
-        cond = row.get("conditions") or {}
-        if not _condition_match(role, cond.get("device_role")):
-            continue
-        if not _condition_match(mfr, cond.get("manufacturer")):
-            continue
-        mc = cond.get("model_contains")
-        if mc:
-            model_l = _lower(model)
-            if not any(_lower(k) in model_l for k in _as_list(mc)):
+
+def _lower_set(expected: Any) -> frozenset[str] | None:
+    if expected is None:
+        return None
+    return frozenset(_lower(exp) for exp in _as_list(expected))
+
+
+class DeviceMappingIndex:
+    """
+    Device mapping rows compiled once for match_device_mapping.
+
+    Rows are priority-sorted and lower-cased up front and bucketed by
+    manufacturer, so a device is only checked against the rows that can match
+    its vendor (plus rows without a manufacturer condition).
+    """
+
+    def __init__(self, mappings: list[dict]) -> None:
+        self.rows: list[tuple[dict, frozenset[str] | None, frozenset[str] | None, tuple[str, ...] | None]] = []
+        for row in sorted(mappings, key=lambda r: int(r.get("priority", 999))):
+            cond = row.get("conditions") or {}
+            mc = cond.get("model_contains")
+            self.rows.append((
+                row,
+                _lower_set(cond.get("device_role")),
+                _lower_set(cond.get("manufacturer")),
+                tuple(_lower(k) for k in _as_list(mc)) if mc else None,
+            ))
+        self._any_manufacturer = [r for r in self.rows if r[2] is None]
+        self._by_manufacturer: dict[str, list] = {}
+        for mfr in {m for r in self.rows if r[2] for m in r[2]}:
+            self._by_manufacturer[mfr] = [r for r in self.rows if r[2] is None or mfr in r[2]]
+
+    def match(self, device: dict) -> dict | None:
+        role, mfr, model = _device_mapping_fields(device)
+        role_l = _lower(role)
+        mfr_l = _lower(mfr)
+        model_l = _lower(model)
+        for row, roles, mfrs, model_contains in self._by_manufacturer.get(mfr_l, self._any_manufacturer):
+            if roles is not None and role_l not in roles:
                 continue
-        return row
-    return None
+            if mfrs is not None and mfr_l not in mfrs:
+                continue
+            if model_contains is not None and not any(k in model_l for k in model_contains):
+                continue
+            return row
+        return None
+
+
+def compile_device_mappings(mappings: list[dict]) -> DeviceMappingIndex:
+    return DeviceMappingIndex(mappings)
+
+
+def match_device_mapping(device: dict, mappings: list[dict] | DeviceMappingIndex) -> dict | None:
+    """Match NetBox device dict to collector_type mapping row (pass a compiled index in loops)."""
+    if not isinstance(mappings, DeviceMappingIndex):
+        mappings = DeviceMappingIndex(mappings)
+    return mappings.match(device)
 
 
 def extract_platform_ip(platform: dict) -> str:
@@ -13,7 +13,9 @@ ROLE_UTILS = (
 sys.path.insert(0, str(ROLE_UTILS))
 
 from collector_core import (  # noqa: E402
+    compile_device_mappings,
     format_ip_list,
+    match_device_mapping,
     match_platform_mapping,
     normalize_proxy_assignment,
     parse_ip_list,
@@ -44,6 +46,25 @@ def test_match_platform_mapping_priority():
     assert row["collector_type"] == "Nutanix"
 
 
+def test_compiled_device_mapping_matches_priority_and_buckets():
+    mappings = [
+        {"collector_type": "Generic", "priority": 999, "conditions": {"device_role": "HOST"}},
+        {"collector_type": "Ilo", "priority": 1,
+         "conditions": {"device_role": ["host"], "manufacturer": ["HPE", "HP"], "model_contains": "proliant"}},
+        {"collector_type": "Idrac", "priority": 2, "conditions": {"manufacturer": "Dell"}},
+    ]
+    index = compile_device_mappings(mappings)
+    hpe = {"device_role": {"name": "Host"}, "device_type": {"model": "ProLiant DL380",
+                                                            "manufacturer": {"name": "HPE"}}}
+    lenovo = {"device_role": {"slug": "host"}, "device_type": {"model": "SR650",
+                                                              "manufacturer": {"name": "Lenovo"}}}
+    dell = {"device_type": {"model": "R740", "manufacturer": {"name": "DELL"}}}
+    for device, expected in ((hpe, "Ilo"), (lenovo, "Generic"), (dell, "Idrac")):
+        assert match_device_mapping(device, index)["collector_type"] == expected
+        assert match_device_mapping(device, mappings)["collector_type"] == expected
+    assert match_device_mapping({"device_type": {"manufacturer": {"name": "HPE"}}}, index) is None
+
+
 def test_reconcile_section_add_remove():
     current = {"VMwareIP": "10.0.0.1,10.0.0.2", "VMwarePort": "443"}
     updated, diffs = reconcile_section_ips(
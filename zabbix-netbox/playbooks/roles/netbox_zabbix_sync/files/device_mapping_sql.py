@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Compile mappings/netbox_device_type_mapping.yml into a parameterised SQL WHERE
+clause for the datalake device fetch (fetch_all_devices_datalake.yml).
+
+Each mapping row becomes one AND group, the rows are OR-ed together:
+
+  device_role / manufacturer     -> UPPER(col) IN (%(m0_0)s, ...)
+  model_contains / name_contains -> UPPER(col) LIKE ANY (ARRAY['%V%', ...])
+  model_suffix                   -> UPPER(col) LIKE ANY (ARRAY['%V', ...])
+  tenant / tenants               -> UPPER(BTRIM(col)) IN (...)
+
+Every value is its own scalar parameter (postgresql_query turns list arguments
+into array literals without quoting the elements).
+
+The rows are taken from DeviceTypeMappingIndex, so values are upper-cased by
+Python, tenant allowlists are normalised the same way and rows with unknown
+condition keys are dropped. The clause is a pre-filter: the Python matcher in
+filter_db_devices.py still runs over what the database returns.
+
+Python upper-cases Unicode and strips Unicode whitespace, PostgreSQL's UPPER()
+depends on the collation. The SQL side therefore upper-cases with COLLATE "C"
+(ASCII only, identical to Python for printable ASCII) and lets every value
+containing anything outside printable ASCII through to the Python pass, so the
+database never drops a row Python would keep.
+
+Usage (prints {"where", "params", "rules"} as JSON):
+  python3 device_mapping_sql.py /tmp/netbox_device_type_mapping.json
+"""
+from __future__ import annotations
+
+import json
+import sys
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from device_type_mapping_index import DeviceTypeMappingIndex
+
+# Columns of public.discovery_netbox_inventory_device read by the mapping conditions.
+DATALAKE_DEVICE_COLUMNS = {
+    "role": "d.device_role_name",
+    "manufacturer": "d.manufacturer_name",
+    "model": "d.device_type_name",
+    "name": "d.name",
+    "tenant": "d.tenant_name",
+}
+
+# (column key, operator, values); operators: "eq", "contains", "suffix", "tenant".
+Predicate = Tuple[str, str, Tuple[str, ...]]
+
+
+def rule_predicates(rule: Any) -> Optional[List[Predicate]]:
+    """AND-ed predicates of one compiled rule; None when the rule can never match."""
+    predicates: List[Predicate] = []
+    for key, op, values in (
+        ("role", "eq", rule.roles),
+        ("manufacturer", "eq", rule.manufacturers),
+        ("model", "contains", rule.model_contains),
+        ("model", "suffix", rule.model_suffix),
+        ("name", "contains", rule.name_contains),
+        ("tenant", "tenant", rule.tenants),
+    ):
+        if values is None:
+            continue
+        if not values:
+            return None
+        predicates.append((key, op, tuple(sorted(values))))
+    return predicates
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _not_plain_ascii(column: str) -> str:
+    return f"{column} ~ '[^ -~]'"
+
+
+def render_predicate(predicate: Predicate, column: str, param: str) -> Tuple[str, Dict[str, str]]:
+    """SQL for one predicate and its parameters %(param_0)s, %(param_1)s, ..."""
+    _, op, values = predicate
+    if op == "contains":
+        values = tuple(f"%{_like_escape(v)}%" for v in values)
+    elif op == "suffix":
+        values = tuple(f"%{_like_escape(v)}" for v in values)
+    bound = {f"{param}_{i}": value for i, value in enumerate(values)}
+    placeholders = ", ".join(f"%({name})s" for name in bound)
+    if op == "tenant":
+        expr = f"UPPER(BTRIM({column}) COLLATE \"C\") IN ({placeholders})"
+        return f"({column} IS NOT NULL AND ({expr} OR {_not_plain_ascii(column)}))", bound
+    upper = f"UPPER(COALESCE({column}, '') COLLATE \"C\")"
+    if op == "eq":
+        expr = f"{upper} IN ({placeholders})"
+    else:
+        expr = f"{upper} LIKE ANY (ARRAY[{placeholders}])"
+    return f"({expr} OR {_not_plain_ascii(column)})", bound
+
+
+def compile_where(
+    device_type_mapping: Optional[Dict],
+    columns: Optional[Dict[str, str]] = None,
+    param_prefix: str = "m",
+) -> Tuple[str, Dict[str, str]]:
+    """
+    (where, params) for psycopg2 named-parameter execution.
+
+    where is "TRUE" when a row without conditions accepts every device and "FALSE"
+    when no row can match. Identical predicates share one parameter.
+    """
+    columns = {**DATALAKE_DEVICE_COLUMNS, **(columns or {})}
+    index = DeviceTypeMappingIndex(device_type_mapping)
+    params: Dict[str, str] = {}
+    names: Dict[Predicate, str] = {}
+    rendered: Dict[Predicate, str] = {}
+    groups: List[str] = []
+    for rule in index.rules:
+        predicates = rule_predicates(rule)
+        if predicates is None:
+            continue
+        if not predicates:
+            return "TRUE", {}
+        parts = []
+        for predicate in predicates:
+            if predicate not in rendered:
+                names[predicate] = f"{param_prefix}{len(names)}"
+                rendered[predicate], bound = render_predicate(predicate, columns[predicate[0]], names[predicate])
+                params.update(bound)
+            parts.append(rendered[predicate])
+        group = " AND ".join(parts)
+        if group not in groups:
+            groups.append(group)
+    if not groups:
+        return "FALSE", {}
+    return "(" + "\n OR ".join(f"({g})" for g in groups) + ")", params
+
+
+def main(argv: Sequence[str]) -> int:
+    if len(argv) != 1:
+        print("usage: device_mapping_sql.py MAPPING_JSON", file=sys.stderr)
+        return 2
+    with open(argv[0], encoding="utf-8") as f:
+        device_type_mapping = json.load(f)
+    where, params = compile_where(device_type_mapping)
+    print(json.dumps({"where": where, "params": params, "rules": len(DeviceTypeMappingIndex(device_type_mapping))},
+                     ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Precompiled matcher for mappings/netbox_device_type_mapping.yml.
+
+The mapping rows are compiled once: sorted by priority, condition values
+upper-cased, tenant allowlists normalised, and rules bucketed by
+(manufacturer, role) so a device is only checked against the rules that can
+match it. First-match results are identical to the row-by-row matcher
+(_find_matching_mapping / _find_matching_mapping_safe in parallel_compare_engine.py).
+
+Field accessors are injectable: the compare engine passes its flat-or-nested
+readers, the Loki device fetch filter uses the raw NetBox defaults below.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+CONDITION_KEYS = ("device_role", "manufacturer", "model_contains", "model_suffix", "name_contains")
+
+
+def _nested_name(obj: Any) -> str:
+    if isinstance(obj, dict):
+        return str(obj.get("name") or "")
+    return ""
+
+
+def netbox_role_name(device: Dict) -> str:
+    return _nested_name(device.get("role") or device.get("device_role"))
+
+
+def netbox_manufacturer_name(device: Dict) -> str:
+    dt = device.get("device_type") or {}
+    return _nested_name(dt.get("manufacturer")) if isinstance(dt, dict) else ""
+
+
+def netbox_model(device: Dict) -> str:
+    dt = device.get("device_type") or {}
+    return str(dt.get("model") or "") if isinstance(dt, dict) else ""
+
+
+def device_name(device: Dict) -> str:
+    return device.get("name") or ""
+
+
+def resolve_device_tenant_name(device: Dict) -> str:
+    """Nested tenant.name or flat tenant_name (datalake/Loki); empty dict must not hide the flat field."""
+    tenant_obj = device.get("tenant")
+    if isinstance(tenant_obj, dict):
+        name = (tenant_obj.get("name") or "").strip()
+        if name:
+            return name
+    return (device.get("tenant_name") or "").strip()
+
+
+def mapping_tenant_allowlist(mapping: Dict) -> Optional[List[str]]:
+    """`tenants` list wins when present; otherwise `tenant`; None means the row is not tenant scoped."""
+    if "tenants" in mapping and mapping.get("tenants") is not None:
+        raw = mapping["tenants"]
+        if isinstance(raw, list):
+            names = [str(x).strip() for x in raw if x is not None and str(x).strip()]
+        else:
+            names = [str(raw).strip()] if str(raw).strip() else []
+        return names if names else None
+    t1 = mapping.get("tenant")
+    if t1 is not None and str(t1).strip():
+        return [str(t1).strip()]
+    return None
+
+
+def _upper_set(value: Any) -> FrozenSet[str]:
+    if isinstance(value, list):
+        return frozenset(str(v).upper() for v in value)
+    return frozenset([str(value).upper()])
+
+
+def _upper_tuple(value: Any) -> Tuple[str, ...]:
+    if isinstance(value, list):
+        return tuple(str(v).upper() for v in value)
+    return (str(value).upper(),)
+
+
+class _Rule:
+    __slots__ = (
+        "mapping", "roles", "manufacturers", "model_contains",
+        "model_suffix", "name_contains", "tenants", "never",
+    )
+
+    def __init__(self, mapping: Dict) -> None:
+        self.mapping = mapping
+        conditions = mapping.get("conditions", {}) or {}
+        self.roles = _upper_set(conditions["device_role"]) if "device_role" in conditions else None
+        self.manufacturers = _upper_set(conditions["manufacturer"]) if "manufacturer" in conditions else None
+        self.model_contains = _upper_tuple(conditions["model_contains"]) if "model_contains" in conditions else None
+        self.model_suffix = _upper_tuple(conditions["model_suffix"]) if "model_suffix" in conditions else None
+        self.name_contains = _upper_tuple(conditions["name_contains"]) if "name_contains" in conditions else None
+        allow = mapping_tenant_allowlist(mapping)
+        self.tenants = frozenset(a.upper() for a in allow) if allow else None
+        # Unknown condition keys never match (same as the row-by-row matcher).
+        self.never = any(key not in CONDITION_KEYS for key in conditions)
+
+
+class DeviceTypeMappingIndex:
+    """First-match device_type rule lookup compiled from netbox_device_type_mapping.yml."""
+
+    def __init__(
+        self,
+        device_type_mapping: Optional[Dict],
+        role_of: Callable[[Dict], str] = netbox_role_name,
+        manufacturer_of: Callable[[Dict], str] = netbox_manufacturer_name,
+        model_of: Callable[[Dict], str] = netbox_model,
+        name_of: Callable[[Dict], str] = device_name,
+        tenant_of: Callable[[Dict], str] = resolve_device_tenant_name,
+    ) -> None:
+        mappings = (device_type_mapping or {}).get("mappings", []) or []
+        ordered = sorted(mappings, key=lambda x: x.get("priority", 999))
+        self.rules = [r for r in (_Rule(m) for m in ordered) if not r.never]
+        self._role_of = role_of
+        self._manufacturer_of = manufacturer_of
+        self._model_of = model_of
+        self._name_of = name_of
+        self._tenant_of = tenant_of
+
+        # Manufacturer buckets keep priority order; rules without a manufacturer
+        # condition are in every bucket and form the bucket for unknown vendors.
+        self._any_manufacturer = [r for r in self.rules if r.manufacturers is None]
+        self._by_manufacturer: Dict[str, List[_Rule]] = {}
+        for mfr in {m for r in self.rules if r.manufacturers for m in r.manufacturers}:
+            self._by_manufacturer[mfr] = [
+                r for r in self.rules if r.manufacturers is None or mfr in r.manufacturers
+            ]
+        self._candidates: Dict[Tuple[str, str], List[_Rule]] = {}
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def candidates(self, manufacturer: str, role: str) -> List[_Rule]:
+        """Rules whose manufacturer and role conditions accept (manufacturer, role), in priority order."""
+        key = (manufacturer, role)
+        cached = self._candidates.get(key)
+        if cached is None:
+            bucket = self._by_manufacturer.get(manufacturer, self._any_manufacturer)
+            cached = [r for r in bucket if r.roles is None or role in r.roles]
+            self._candidates[key] = cached
+        return cached
+
+    def _match_rule(self, device: Dict, excluded_tenants: Optional[FrozenSet[str]] = None) -> Optional[_Rule]:
+        role = self._role_of(device).upper()
+        mfr = self._manufacturer_of(device).upper()
+        tenant = ""
+        tenant_read = False
+        model: Optional[str] = None
+        name: Optional[str] = None
+        for rule in self.candidates(mfr, role):
+            if rule.tenants is not None:
+                if excluded_tenants and rule.tenants & excluded_tenants:
+                    continue
+                if not tenant_read:
+                    tenant = self._tenant_of(device).upper()
+                    tenant_read = True
+                if not tenant or tenant not in rule.tenants:
+                    continue
+            if rule.model_contains is not None or rule.model_suffix is not None:
+                if model is None:
+                    model = self._model_of(device).upper()
+                if rule.model_contains is not None and not any(v in model for v in rule.model_contains):
+                    continue
+                if rule.model_suffix is not None and not any(model.endswith(v) for v in rule.model_suffix):
+                    continue
+            if rule.name_contains is not None:
+                if name is None:
+                    name = self._name_of(device).upper()
+                if not any(v in name for v in rule.name_contains):
+                    continue
+            return rule
+        return None
+
+    def match(self, device: Dict) -> Optional[Dict]:
+        """First mapping row (by priority) whose tenant gate and conditions accept the device."""
+        rule = self._match_rule(device)
+        return rule.mapping if rule else None
+
+    def match_safe(self, device: Dict) -> Optional[Dict]:
+        """
+        match(); if a tenant-scoped row matched without tenant proof, retry without
+        rows scoped to that tenant set (HPE HOST must not become HPE IPMI Moneygram).
+        """
+        rule = self._match_rule(device)
+        if rule is None or rule.tenants is None:
+            return rule.mapping if rule else None
+        dev_tenant = self._tenant_of(device).upper()
+        if dev_tenant and dev_tenant in rule.tenants:
+            return rule.mapping
+        retry = self._match_rule(device, excluded_tenants=rule.tenants)
+        return retry.mapping if retry else None
@@ -0,0 +1,620 @@
+#!/usr/bin/env python3
+"""
+Bulk HMDL audit writer for Zabbix-NetBox sync.
+
+Replaces the per-host hmdl_sync_log.yml / hmdl_update_log.yml includes of the
+Phase B apply loops: instead of one temp file, one preparer subprocess and one
+postgresql_query connection per host (and per changed field / tag), all audit
+rows of a run are built from the plan store in one process and loaded over a
+single connection, one transaction per table:
+
+  <schema>.<sync-table>          — one row per host (hmdl_sync_log.yml)
+  <schema>.zabbix_host_update_log — one row per changed host field
+  <schema>.zabbix_tag_update_log  — one row per added / updated tag
+
+Column semantics follow SQL/zabbix-netbox/*.sql and the value preparers in
+bootstrap_hmdl_log.yml / hmdl_update_log.yml ("" / "N/A" -> NULL, empty JSON
+-> NULL, ids cast to BIGINT). Rows are loaded with COPY ... FROM STDIN
+(--method copy, default) or multi-row INSERT via execute_values
+(--method insert).
+
+Per item the writer reads the Phase A plan and the Phase B result; with
+--apply-log (apply_results.jsonl of zabbix_apply_engine.py) the Zabbix
+responses and the hostid of newly created hosts are logged as well.
+
+Usage:
+  HMDL_DB_PASSWORD=... python3 hmdl_bulk_writer.py \\
+      --entity-type device --items-json /tmp/pce_devices.json \\
+      --plans-dir /tmp --plan-store files \\
+      --run-id 20250101120000 --inventory-source datalake \\
+      --db-host db --db-name discovery --db-user hmdl
+
+psycopg2 is only imported when rows are loaded; --no-db with --rows-output
+builds the rows without a database.
+
+Exit codes:
+  0 — success
+  1 — database error or psycopg2 not installed
+  2 — invalid arguments
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import re
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from plan_store import ENTITY_TYPES, PLAN_STORE_BACKENDS, open_plan_store
+
+HOST_UPDATE_LOG_TABLE = "zabbix_host_update_log"
+TAG_UPDATE_LOG_TABLE = "zabbix_tag_update_log"
+
+SYNC_LOG_COLUMNS = (
+    "run_id", "awx_job_id", "playbook_name",
+    "source_device_id", "source_device_name", "source_table",
+    "host_entity_type", "inventory_source",
+    "zabbix_hostid", "zabbix_hostname", "zabbix_host_ip", "last_visible_name",
+    "device_type", "device_role", "manufacturer_name",
+    "site_name", "location_name", "location_parent_name",
+    "root_location_name", "last_location", "tenant_name", "cluster_name",
+    "operation", "status", "reason", "dry_run",
+    "expected_proxy_group_id", "last_proxy_group_id", "zabbix_proxy_group_id",
+    "proxy_location_change", "proxy_manual_change_detected",
+    "field_merge_actions", "last_managed_groups",
+    "request_payload", "response_payload", "error_payload", "extra_data",
+)
+
+_CHANGE_COMMON_COLUMNS = (
+    "run_id", "awx_job_id", "source_device_id", "source_device_name",
+    "host_entity_type", "inventory_source", "zabbix_hostid", "zabbix_hostname",
+)
+_CHANGE_TAIL_COLUMNS = (
+    "old_value", "new_value", "action", "merge_result", "status", "reason", "dry_run",
+)
+HOST_UPDATE_LOG_COLUMNS = _CHANGE_COMMON_COLUMNS + ("field_name",) + _CHANGE_TAIL_COLUMNS
+TAG_UPDATE_LOG_COLUMNS = _CHANGE_COMMON_COLUMNS + ("object_type", "key_name") + _CHANGE_TAIL_COLUMNS
+
+JSONB_COLUMNS = frozenset((
+    "field_merge_actions", "last_managed_groups",
+    "request_payload", "response_payload", "error_payload", "extra_data",
+))
+
+HOST_ENTITY_TYPE = {"device": "device", "platform": "platform", "vfw": "virtual_fw"}
+
+SOURCE_TABLE = {"platform": "netbox_api_dcim_platform", "vfw": "netbox_custom_virtual_fw"}
+
+RESULT_KEY = {
+    "device": "current_device_result",
+    "platform": "current_platform_result",
+    "vfw": "current_vfw_result",
+}
+
+SKIPPED_DEVICE_REASON = "İzlenmeyecek (DB izlenmeli=Hayır filtresi)"
+
+METHODS = ("copy", "insert")
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+# ---------------------------------------------------------------------------
+# Value preparation (same rules as the hmdl_prepare_*.py helpers)
+# ---------------------------------------------------------------------------
+
+def nullify(v: Any) -> Any:
+    if v is None or v == "" or v == "N/A":
+        return None
+    return v
+
+
+def nullify_text(v: Any) -> Optional[str]:
+    """Update-log variant: everything is stored as text, 'None' / 'null' count as empty."""
+    if v is None or str(v).strip() in ("", "None", "N/A", "null"):
+        return None
+    return str(v)
+
+
+def to_int_or_none(v: Any) -> Optional[int]:
+    if v is None or v == "" or v == "N/A":
+        return None
+    try:
+        return int(v)
+    except (ValueError, TypeError):
+        return None
+
+
+def to_jsonb_str(v: Any) -> Optional[str]:
+    """JSON text for JSONB columns, or None for empty / null values."""
+    if v is None or v == "" or v == {} or v == []:
+        return None
+    if isinstance(v, (dict, list)):
+        return json.dumps(v, default=str)
+    if isinstance(v, str):
+        try:
+            parsed = json.loads(v)
+        except (ValueError, TypeError):
+            return None
+        if parsed == {} or parsed == []:
+            return None
+        return json.dumps(parsed, default=str)
+    return None
+
+
+def prepare_sync_row(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """One zabbix_sync_log row from a raw hmdl_log_entry dict."""
+    row: Dict[str, Any] = {}
+    for column in SYNC_LOG_COLUMNS:
+        value = entry.get(column)
+        if column in JSONB_COLUMNS:
+            row[column] = to_jsonb_str(value)
+        elif column == "source_device_id":
+            row[column] = to_int_or_none(value)
+        elif column in ("dry_run", "proxy_location_change", "proxy_manual_change_detected"):
+            row[column] = bool(value or False)
+        elif column == "status":
+            row[column] = value or "eklenemedi"
+        else:
+            row[column] = nullify(value)
+    return row
+
+
+def prepare_change_rows(entries: Iterable[Dict[str, Any]], kind: str, meta: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Host-update-log (kind='host') or tag-update-log (kind='tag') rows for one host."""
+    status = meta.get("status") or "unknown"
+    rows: List[Dict[str, Any]] = []
+    for entry in entries:
+        row = {
+            "run_id": nullify_text(meta.get("run_id")),
+            "awx_job_id": nullify_text(meta.get("awx_job_id")),
+            "source_device_id": to_int_or_none(meta.get("source_device_id")),
+            "source_device_name": nullify_text(meta.get("source_device_name")),
+            "host_entity_type": nullify_text(meta.get("host_entity_type")),
+            "inventory_source": nullify_text(meta.get("inventory_source")),
+            "zabbix_hostid": nullify_text(meta.get("zabbix_hostid")),
+            "zabbix_hostname": nullify_text(meta.get("zabbix_hostname")),
+            "old_value": nullify_text(entry.get("old_value")),
+            "new_value": nullify_text(entry.get("new_value")),
+            "action": entry.get("action", "updated"),
+            "merge_result": nullify_text(entry.get("merge_result", entry.get("action", "updated"))),
+            "status": status,
+            "reason": nullify_text(entry.get("reason")),
+            "dry_run": status == "dry_run",
+        }
+        if kind == "host":
+            row["field_name"] = entry.get("field_name", "unknown")
+        else:
+            row["key_name"] = entry.get("key_name", "unknown")
+            row["object_type"] = entry.get("object_type", "tag")
+        rows.append(row)
+    return rows
+
+
+# ---------------------------------------------------------------------------
+# Log entries from plan / result (mirror of the process_*_apply.yml set_facts)
+# ---------------------------------------------------------------------------
+
+def _get(mapping: Optional[Dict], key: str, default: Any = "") -> Any:
+    """Jinja default() semantics: the default only replaces a missing key."""
+    if not isinstance(mapping, dict) or key not in mapping:
+        return default
+    return mapping[key]
+
+
+def _request_payload(plan: Dict) -> Any:
+    update_payload = plan.get("update_payload") or {}
+    return update_payload if update_payload else (plan.get("create_payload") or {})
+
+
+def _proxy_group_id(plan: Dict) -> Any:
+    update_payload = plan.get("update_payload") or {}
+    create_payload = plan.get("create_payload") or {}
+    return _get(update_payload, "proxy_groupid", _get(plan, "expected_proxy_group_id",
+                _get(create_payload, "proxy_groupid", "")))
+
+
+def _managed_groups(rec: Dict) -> List[str]:
+    return [g.strip() for g in str(_get(rec, "HOST_GROUPS", "") or "").split(",") if g.strip()]
+
+
+def sync_log_entry(
+    entity_type: str,
+    item: Dict,
+    plan: Dict,
+    result: Dict,
+    meta: Dict[str, Any],
+    apply_record: Optional[Dict] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Raw hmdl_log_entry for one item, or None when the apply tasks would not log it
+    (no result; device results with status 'atlandı').
+    """
+    if not result:
+        return None
+    if entity_type == "device" and result.get("status", "") == "atlandı":
+        return None
+    rec = plan.get("zbx_record") or {}
+    existing = plan.get("zbx_existing_host") or {}
+    response = (apply_record or {}).get("response_payload") or {}
+    hostid = (apply_record or {}).get("zabbix_hostid") or _get(existing, "hostid", "")
+    entry: Dict[str, Any] = {
+        "run_id": meta.get("run_id", ""),
+        "awx_job_id": meta.get("awx_job_id", ""),
+        "playbook_name": meta.get("playbook_name", ""),
+        "source_device_id": item.get("id"),
+        "host_entity_type": HOST_ENTITY_TYPE[entity_type],
+        "inventory_source": meta.get("inventory_source", ""),
+        "zabbix_hostid": hostid,
+        "zabbix_host_ip": _get(result, "ip", ""),
+        "device_type": _get(rec, "DEVICE_TYPE", ""),
+        "operation": _get(plan, "zbx_scenario", "none"),
+        "status": _get(result, "status", "eklenemedi"),
+        "reason": _get(result, "reason", ""),
+        "dry_run": bool(meta.get("dry_run")),
+        "proxy_location_change": False,
+        "extra_data": {},
+        "request_payload": (apply_record or {}).get("request_payload") or _request_payload(plan),
+        "response_payload": response,
+        "error_payload": response.get("error") if isinstance(response, dict) else {},
+    }
+    if entity_type == "device":
+        source = str(meta.get("inventory_source") or "datalake").lower()
+        proxy_group_id = _proxy_group_id(plan)
+        entry.update({
+            "source_device_name": item.get("name", ""),
+            "source_table": (
+                "discovery_netbox_inventory_device" if source == "datalake" else "netbox_api_dcim_device"
+            ),
+            "zabbix_hostname": _get(result, "hostname", item.get("name", "")),
+            "device_role": _get(result, "device_role", ""),
+            "manufacturer_name": item.get("manufacturer_name", ""),
+            "site_name": _get(result, "site", item.get("site_name", "")),
+            "location_name": item.get("location_name", ""),
+            "location_parent_name": item.get("location_parent_name", ""),
+            "root_location_name": item.get("root_location_name", ""),
+            "tenant_name": _get(result, "tenant", item.get("tenant_name", "")),
+            "cluster_name": item.get("cluster_name", ""),
+            "last_visible_name": _get(rec, "HOST_VISIBLE_NAME", _get(rec, "HOSTNAME", "")),
+            "last_location": item.get("root_location_name", ""),
+            "expected_proxy_group_id": proxy_group_id,
+            "last_proxy_group_id": proxy_group_id,
+            "zabbix_proxy_group_id": _get(existing, "proxy_groupid", ""),
+            "proxy_manual_change_detected": bool(plan.get("proxy_manual_change_detected")),
+            "field_merge_actions": {"update_reasons": plan.get("update_reasons") or []},
+            "last_managed_groups": _managed_groups(rec),
+        })
+        return entry
+    entry.update({
+        "source_device_name": (
+            (item.get("name") or item.get("display") or "") if entity_type == "platform"
+            else item.get("hostname", "")
+        ),
+        "source_table": SOURCE_TABLE[entity_type],
+        "zabbix_hostname": _get(result, "hostname", ""),
+        "device_role": "PLATFORM" if entity_type == "platform" else "VIRTUAL_FW",
+        "manufacturer_name": _get(result, "manufacturer", "") if entity_type == "platform" else "",
+        "site_name": _get(result, "site", ""),
+        "location_name": _get(result, "location", ""),
+        "last_visible_name": _get(rec, "HOST_VISIBLE_NAME", ""),
+        "last_location": _get(rec, "DC_ID", ""),
+        "proxy_manual_change_detected": False,
+        "field_merge_actions": (plan.get("field_merge_actions") or {}) if entity_type == "vfw" else {},
+        "last_managed_groups": [],
+    })
+    return entry
+
+
+def skipped_device_entry(device: Dict, meta: Dict[str, Any]) -> Dict[str, Any]:
+    """hmdl_log_entry for a device filtered out by izlenmeli=Hayır (main.yml skip log)."""
+    return {
+        "run_id": meta.get("run_id", ""),
+        "awx_job_id": meta.get("awx_job_id", ""),
+        "playbook_name": meta.get("playbook_name", ""),
+        "source_device_id": device.get("id"),
+        "source_device_name": device.get("name", ""),
+        "zabbix_hostname": device.get("name", ""),
+        "zabbix_host_ip": device.get("primary_ip_address", ""),
+        "device_type": device.get("device_model", ""),
+        "device_role": device.get("device_role_name", ""),
+        "manufacturer_name": device.get("manufacturer_name", ""),
+        "site_name": device.get("site_name", ""),
+        "location_name": device.get("location_name", ""),
+        "location_parent_name": device.get("location_parent_name", ""),
+        "root_location_name": device.get("root_location_name", ""),
+        "tenant_name": device.get("tenant_name", ""),
+        "cluster_name": device.get("cluster_name", ""),
+        "operation": "skip",
+        "status": "atlandı",
+        "reason": SKIPPED_DEVICE_REASON,
+    }
+
+
+def change_log_status(result: Dict, dry_run: bool, apply_record: Optional[Dict] = None) -> str:
+    """Update-log status: dry_run | updated | failed | unknown (hmdl_update_log.yml rules)."""
+    if dry_run:
+        return "dry_run"
+    response = (apply_record or {}).get("response_payload") or {}
+    if isinstance(response, dict) and response:
+        if "error" in response:
+            return "failed"
+        if "result" in response:
+            return "updated"
+    status = (result or {}).get("status", "")
+    if status == "güncellendi":
+        return "updated"
+    if status == "eklenemedi":
+        return "failed"
+    return "unknown"
+
+
+# ---------------------------------------------------------------------------
+# Row collection
+# ---------------------------------------------------------------------------
+
+def load_apply_log(path: Optional[str]) -> Dict[Tuple[str, str], Dict]:
+    """apply_results.jsonl records keyed by (entity type, id); the newest line wins."""
+    records: Dict[Tuple[str, str], Dict] = {}
+    if not path or not os.path.exists(path):
+        return records
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and record.get("type") in ENTITY_TYPES:
+                records[(record["type"], str(record.get("id")))] = record
+    return records
+
+
+def collect_rows(
+    entity_type: str,
+    items: Iterable[Dict],
+    plan_store: Any,
+    meta: Dict[str, Any],
+    apply_log: Optional[Dict[Tuple[str, str], Dict]] = None,
+    skipped_devices: Optional[Iterable[Dict]] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    All audit rows for one entity type:
+    {"sync": [...], "host_update": [...], "tag_update": [...]}.
+    """
+    apply_log = apply_log or {}
+    rows: Dict[str, List[Dict[str, Any]]] = {"sync": [], "host_update": [], "tag_update": []}
+    for item in items:
+        if not isinstance(item, dict) or item.get("id") is None:
+            continue
+        item_id = item["id"]
+        plan = plan_store.get_plan(entity_type, item_id)
+        if plan is None:
+            continue
+        result = plan_store.get_result(entity_type, item_id)
+        if result is None and plan.get("action", "skip") == "skip":
+            # Skip plans carry their own result; the apply loop writes it unchanged.
+            result = plan.get(RESULT_KEY[entity_type]) or {}
+        apply_record = apply_log.get((entity_type, str(item_id)))
+        entry = sync_log_entry(entity_type, item, plan, result or {}, meta, apply_record)
+        if entry is not None:
+            rows["sync"].append(prepare_sync_row(entry))
+
+        if plan.get("zbx_scenario") != "update" or not result:
+            continue
+        change_meta = {
+            "run_id": meta.get("run_id"),
+            "awx_job_id": meta.get("awx_job_id"),
+            "source_device_id": item_id,
+            "source_device_name": item.get("name") or item.get("hostname") or item.get("display"),
+            "host_entity_type": HOST_ENTITY_TYPE[entity_type],
+            "inventory_source": meta.get("inventory_source"),
+            "zabbix_hostid": _get(plan.get("zbx_existing_host"), "hostid", ""),
+            "zabbix_hostname": result.get("hostname", ""),
+            "status": change_log_status(result, bool(meta.get("dry_run")), apply_record),
+        }
+        rows["host_update"].extend(prepare_change_rows(plan.get("host_field_changes") or [], "host", change_meta))
+        rows["tag_update"].extend(prepare_change_rows(plan.get("tag_changes") or [], "tag", change_meta))
+
+    for device in skipped_devices or []:
+        if isinstance(device, dict):
+            rows["sync"].append(prepare_sync_row(skipped_device_entry(device, meta)))
+    return rows
+
+
+# ---------------------------------------------------------------------------
+# Loading (COPY / execute_values)
+# ---------------------------------------------------------------------------
+
+def _copy_value(value: Any) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    text = str(value)
+    return (
+        text.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def copy_text(rows: Iterable[Dict[str, Any]], columns: Tuple[str, ...]) -> str:
+    """Rows in PostgreSQL COPY text format (tab separated, \\N for NULL)."""
+    return "".join(
+        "\t".join(_copy_value(row.get(c)) for c in columns) + "\n" for row in rows
+    )
+
+
+def _insert_template(columns: Tuple[str, ...]) -> str:
+    return "(" + ", ".join("%s::jsonb" if c in JSONB_COLUMNS else "%s" for c in columns) + ")"
+
+
+def write_rows(
+    conn: Any,
+    tables: List[Tuple[str, Tuple[str, ...], List[Dict[str, Any]]]],
+    method: str = "copy",
+    page_size: int = 500,
+) -> Dict[str, int]:
+    """
+    Load each (qualified table, columns, rows) in its own transaction.
+    Returns rows written per table; a failing table is rolled back and re-raised.
+    """
+    written: Dict[str, int] = {}
+    for table, columns, rows in tables:
+        if not rows:
+            written[table] = 0
+            continue
+        column_list = ", ".join(columns)
+        try:
+            with conn.cursor() as cur:
+                if method == "copy":
+                    cur.copy_expert(
+                        f"COPY {table} ({column_list}) FROM STDIN",
+                        io.StringIO(copy_text(rows, columns)),
+                    )
+                else:
+                    from psycopg2.extras import execute_values
+
+                    execute_values(
+                        cur,
+                        f"INSERT INTO {table} ({column_list}) VALUES %s",
+                        [tuple(row.get(c) for c in columns) for row in rows],
+                        template=_insert_template(columns),
+                        page_size=page_size,
+                    )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        written[table] = len(rows)
+    return written
+
+
+def connect(args: argparse.Namespace) -> Any:
+    import psycopg2
+
+    return psycopg2.connect(
+        host=args.db_host,
+        port=args.db_port,
+        dbname=args.db_name,
+        user=args.db_user,
+        password=os.environ.get("HMDL_DB_PASSWORD", ""),
+        connect_timeout=args.connect_timeout,
+    )
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _load_json_file(path: Optional[str], default: Any = None) -> Any:
+    if not path or not os.path.exists(path):
+        return default
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk HMDL audit writer for Zabbix-NetBox sync")
+    parser.add_argument("--entity-type", choices=ENTITY_TYPES, required=True)
+    parser.add_argument("--items-json", required=True, help="Phase A input array for the entity type (pce_*.json)")
+    parser.add_argument("--skipped-devices-json", help="Devices filtered out by izlenmeli=Hayır (logged as atlandı)")
+    parser.add_argument("--plans-dir", default="/tmp", help="Directory holding plans / results (default: /tmp)")
+    parser.add_argument("--plan-store", choices=PLAN_STORE_BACKENDS, default="files")
+    parser.add_argument("--plan-store-path", help="jsonl plan store file (default: <plans-dir>/plan_store.jsonl)")
+    parser.add_argument("--apply-log", help="apply_results.jsonl from zabbix_apply_engine.py (Zabbix responses)")
+    parser.add_argument("--run-id", default="")
+    parser.add_argument("--awx-job-id", default=os.environ.get("AWX_JOB_ID", ""))
+    parser.add_argument("--playbook-name", default="db_to_zabbix_sync")
+    parser.add_argument("--inventory-source", default="", help="loki | datalake")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--db-host")
+    parser.add_argument("--db-port", type=int, default=5432)
+    parser.add_argument("--db-name")
+    parser.add_argument("--db-user")
+    parser.add_argument("--connect-timeout", type=int, default=30)
+    parser.add_argument("--schema", default="hmdl")
+    parser.add_argument("--sync-table", default="zabbix_sync_log")
+    parser.add_argument("--method", choices=METHODS, default="copy")
+    parser.add_argument("--page-size", type=int, default=500, help="Rows per INSERT statement with --method insert")
+    parser.add_argument("--rows-output", help="Also write the prepared rows to this JSON file")
+    parser.add_argument("--no-db", action="store_true", help="Build rows only; do not connect to the database")
+    args = parser.parse_args()
+
+    for name in (args.schema, args.sync_table):
+        if not _IDENTIFIER.match(name):
+            parser.error(f"invalid SQL identifier: {name!r}")
+    if not args.no_db and not (args.db_host and args.db_name and args.db_user):
+        parser.error("--db-host, --db-name and --db-user are required unless --no-db")
+
+    started = time.perf_counter()
+    meta = {
+        "run_id": args.run_id,
+        "awx_job_id": args.awx_job_id,
+        "playbook_name": args.playbook_name,
+        "inventory_source": args.inventory_source,
+        "dry_run": args.dry_run,
+    }
+    plan_store = open_plan_store(
+        args.plan_store,
+        (args.plan_store_path or os.path.join(args.plans_dir, "plan_store.jsonl"))
+        if args.plan_store == "jsonl" else args.plans_dir,
+    )
+    try:
+        rows = collect_rows(
+            args.entity_type,
+            _load_json_file(args.items_json, []) or [],
+            plan_store,
+            meta,
+            apply_log=load_apply_log(args.apply_log),
+            skipped_devices=_load_json_file(args.skipped_devices_json, []) or [],
+        )
+    finally:
+        plan_store.close()
+
+    if args.rows_output:
+        with open(args.rows_output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, default=str)
+
+    tables = [
+        (f"{args.schema}.{args.sync_table}", SYNC_LOG_COLUMNS, rows["sync"]),
+        (f"{args.schema}.{HOST_UPDATE_LOG_TABLE}", HOST_UPDATE_LOG_COLUMNS, rows["host_update"]),
+        (f"{args.schema}.{TAG_UPDATE_LOG_TABLE}", TAG_UPDATE_LOG_COLUMNS, rows["tag_update"]),
+    ]
+    summary: Dict[str, Any] = {
+        "type": "summary",
+        "entity_type": args.entity_type,
+        "method": args.method,
+        "rows": {table: len(table_rows) for table, _, table_rows in tables},
+    }
+    if args.no_db:
+        summary["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+        print(json.dumps(summary, ensure_ascii=False), flush=True)
+        sys.exit(0)
+
+    try:
+        conn = connect(args)
+    except ImportError:
+        print(json.dumps({"type": "error", "error": "psycopg2 is not installed"}), flush=True)
+        sys.exit(1)
+    except Exception as e:
+        print(json.dumps({"type": "error", "error": f"{e.__class__.__name__}: {e}"}, ensure_ascii=False), flush=True)
+        sys.exit(1)
+    try:
+        summary["written"] = write_rows(conn, tables, method=args.method, page_size=args.page_size)
+    except Exception as e:
+        print(json.dumps({"type": "error", "error": f"{e.__class__.__name__}: {e}"}, ensure_ascii=False), flush=True)
+        sys.exit(1)
+    finally:
+        conn.close()
+    summary["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    print(json.dumps(summary, ensure_ascii=False), flush=True)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
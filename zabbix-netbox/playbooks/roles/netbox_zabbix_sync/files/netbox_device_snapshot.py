@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""
+Incremental NetBox (Loki) device fetch backed by a local snapshot.
+
+fetch_all_devices_loki.yml downloads every active device on every run. With a
+snapshot this tool keeps the raw (sanitised) active devices on disk together with
+a high-water mark and, on later runs, only requests
+
+  /api/dcim/devices/?last_updated__gte=<mark - overlap>
+
+Deleted devices, and devices whose nested objects changed without touching the
+device row (location / tenant / role / device type / manufacturer / site / rack /
+platform / IP address edits), are found through the change log
+(/api/core/object-changes/, /api/extras/object-changes/ on NetBox < 4.1) and
+re-fetched by id. A full resync (status=active listing) runs when there is no
+usable snapshot, the NetBox URL changed, the last full resync is older than
+--full-resync-hours, or the change log cannot be read.
+
+The location tree is re-read whenever the locations changed (netbox_location_index.py;
+a rename or re-parent changes root_location_name without touching any device), and every record goes through
+normalize_device_record() exactly like the full fetch script, so each device is
+byte-identical to the full fetch output. Devices are emitted in id order.
+
+Usage:
+  NETBOX_TOKEN=... python3 netbox_device_snapshot.py \\
+      --netbox-url https://netbox.example.com \\
+      --mapping-file /tmp/netbox_device_type_mapping.json \\
+      --snapshot /var/tmp/netbox_zabbix_sync/netbox_device_snapshot.json \\
+      --mode monitor [--location-filter DC14] [--no-refresh]
+
+stdout: {"devices": [...], "count": N, "mode": ..., "unmapped_pairs": [...]}
+(same document as /tmp/fetch_all_netbox_devices.py). Progress goes to stderr.
+
+Exit codes: 0 = ok, 1 = NetBox API error, 2 = bad arguments / input files.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from device_type_mapping_index import DeviceTypeMappingIndex  # noqa: E402
+from netbox_device_normalize import normalize_device_record  # noqa: E402
+from netbox_location_index import load_location_index  # noqa: E402
+from netbox_paginator import DEVICE_FIELDS, NetBoxApiError, NetBoxPaginator  # noqa: E402
+
+SNAPSHOT_FORMAT_VERSION = 1
+IZLENMELI_SKIP = "Hayır"
+
+# Change-log object types whose edits show up nested in a device payload, and where.
+RELATED_REFERENCES: Dict[str, Tuple[Tuple[str, ...], ...]] = {
+    "dcim.devicerole": (("role",), ("device_role",)),
+    "dcim.devicetype": (("device_type",),),
+    "dcim.manufacturer": (("device_type", "manufacturer"),),
+    "dcim.location": (("location",), ("location", "parent")),
+    "dcim.site": (("site",),),
+    "dcim.rack": (("rack",),),
+    "dcim.platform": (("platform",),),
+    "tenancy.tenant": (("tenant",),),
+    "ipam.ipaddress": (("primary_ip4",), ("primary_ip6",), ("primary_ip",), ("oob_ip",)),
+}
+CHANGELOG_PATHS = ("/api/core/object-changes/", "/api/extras/object-changes/")
+
+
+# ---------------------------------------------------------------------------
+# Output helpers (same as the full fetch script)
+# ---------------------------------------------------------------------------
+
+def sanitize_text(value: Any) -> Any:
+    if not isinstance(value, str):
+        return value
+    return value.encode("utf-8", errors="surrogatepass").decode("utf-8", errors="replace")
+
+
+def sanitize_json(value: Any) -> Any:
+    if isinstance(value, str):
+        return sanitize_text(value)
+    if isinstance(value, dict):
+        return {sanitize_json(k): sanitize_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [sanitize_json(item) for item in value]
+    return value
+
+
+def _role_name(device: Dict[str, Any]) -> str:
+    role_obj = device.get("role") or device.get("device_role")
+    return role_obj.get("name", "") if role_obj and isinstance(role_obj, dict) else ""
+
+
+def unmapped_entry(device: Dict[str, Any]) -> Dict[str, str]:
+    device_type = device.get("device_type") or {}
+    manufacturer_obj = device_type.get("manufacturer") or {}
+    location_obj = device.get("location")
+    if isinstance(location_obj, dict):
+        dc_name = location_obj.get("name", "N/A")
+    else:
+        dc_name = (device.get("site") or {}).get("name", "N/A")
+    return {
+        "role": _role_name(device) or "N/A",
+        "manufacturer": manufacturer_obj.get("name", "N/A") or "N/A",
+        "dc": dc_name or "N/A",
+    }
+
+
+# ---------------------------------------------------------------------------
+# Snapshot
+# ---------------------------------------------------------------------------
+
+def _parse_time(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _newest(*values: Any) -> Optional[str]:
+    parsed = [p for p in (_parse_time(v) for v in values) if p is not None]
+    return max(parsed).isoformat() if parsed else None
+
+
+def load_snapshot(path: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Snapshot written by save_snapshot(), or None when missing / unreadable / other version."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        return None
+    if not isinstance(snapshot.get("devices"), dict):
+        return None
+    return snapshot
+
+
+def save_snapshot(path: str, snapshot: Dict[str, Any]) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def snapshot_matches(snapshot: Optional[Dict[str, Any]], url: str, fields: Optional[Sequence[str]]) -> bool:
+    """True when the snapshot was taken from url with the same ?fields= projection."""
+    return (
+        snapshot is not None
+        and snapshot.get("netbox_url") == url
+        and list(snapshot.get("fields") or []) == list(fields or [])
+    )
+
+
+def _device_key(device_id: Any) -> str:
+    return str(device_id)
+
+
+def _is_active(device: Dict[str, Any]) -> bool:
+    status = device.get("status")
+    value = status.get("value") if isinstance(status, dict) else status
+    return value == "active"
+
+
+def _ref_id(device: Dict[str, Any], path: Tuple[str, ...]) -> Optional[str]:
+    obj: Any = device
+    for key in path:
+        obj = obj.get(key) if isinstance(obj, dict) else None
+    if isinstance(obj, dict):
+        obj = obj.get("id")
+    return None if obj is None or isinstance(obj, (dict, list)) else str(obj)
+
+
+def devices_referencing(devices: Dict[str, Dict[str, Any]], changed: Dict[str, Set[str]]) -> Set[str]:
+    """Snapshot device ids whose nested objects are in changed {object type: {ids}}."""
+    hits: Set[str] = set()
+    for key, device in devices.items():
+        for object_type, ids in changed.items():
+            if any(_ref_id(device, path) in ids for path in RELATED_REFERENCES.get(object_type, ())):
+                hits.add(key)
+                break
+    return hits
+
+
+def fetch_changelog(
+    client: NetBoxPaginator, time_after: Optional[str], object_types: Iterable[str]
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """(endpoint path, object-change records) after time_after; NetBoxApiError if no endpoint answers."""
+    params: List[Tuple[str, Any]] = [("ordering", "time")]
+    params += [("changed_object_type", t) for t in object_types]
+    if time_after:
+        params.append(("time_after", time_after))
+    for path in CHANGELOG_PATHS:
+        try:
+            return path, client.list(path, params)
+        except NetBoxApiError as exc:
+            if exc.status != 404:
+                raise
+    raise NetBoxApiError("object-changes endpoint not found")
+
+
+def _change_action(record: Dict[str, Any]) -> str:
+    action = record.get("action")
+    return str(action.get("value") if isinstance(action, dict) else action or "")
+
+
+def fetch_devices_by_ids(
+    client: NetBoxPaginator, ids: Iterable[str], fields: Optional[Sequence[str]] = None, batch_size: int = 100
+) -> List[Dict[str, Any]]:
+    ordered = sorted(set(ids), key=_id_sort_key)
+    devices: List[Dict[str, Any]] = []
+    for start in range(0, len(ordered), batch_size):
+        params = [("id", i) for i in ordered[start:start + batch_size]]
+        devices.extend(client.list("/api/dcim/devices/", params, fields=fields))
+    return devices
+
+
+def _id_sort_key(value: str) -> Tuple[int, Any]:
+    text = str(value)
+    return (0, int(text)) if text.isdigit() else (1, text)
+
+
+def _full_snapshot(client: NetBoxPaginator, fields: Optional[Sequence[str]], now: int) -> Dict[str, Any]:
+    # Change-log watermark first: a change made during the listing is replayed next run.
+    try:
+        _, newest_change = _newest_change(client)
+        changelog_ok = True
+    except NetBoxApiError:
+        newest_change, changelog_ok = None, False
+    devices = client.list("/api/dcim/devices/", [("status", "active"), ("ordering", "id")], fields=fields)
+    stored = {_device_key(d.get("id")): sanitize_json(d) for d in devices if d.get("id") is not None}
+    return {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "netbox_url": client.url,
+        "mark": _newest(newest_change, *(d.get("last_updated") for d in stored.values())),
+        "changelog": changelog_ok,
+        "fields": list(fields or []),
+        "full_sync_at": now,
+        "devices": stored,
+    }
+
+
+def _newest_change(client: NetBoxPaginator) -> Tuple[str, Optional[str]]:
+    for path in CHANGELOG_PATHS:
+        try:
+            data = client.get(path, [("limit", 1), ("ordering", "-time")])
+        except NetBoxApiError as exc:
+            if exc.status == 404:
+                continue
+            raise
+        results = data.get("results", [])
+        return path, (results[0].get("time") if results else None)
+    raise NetBoxApiError("object-changes endpoint not found")
+
+
+def refresh_snapshot(
+    client: NetBoxPaginator,
+    snapshot: Optional[Dict[str, Any]],
+    fields: Optional[Sequence[str]] = None,
+    overlap_seconds: int = 300,
+    max_age_seconds: int = 86400,
+    now: Optional[int] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Bring a snapshot (load_snapshot()) up to date; returns (snapshot, stats).
+
+    stats: {"mode": "full" | "incremental", "reason", "changed", "deleted", "related", "devices"}.
+    NetBox device API errors raise NetBoxApiError; change-log errors fall back to a full resync.
+    """
+    now = int(time.time()) if now is None else int(now)
+
+    def full(reason: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        fresh = _full_snapshot(client, fields, now)
+        return fresh, {"mode": "full", "reason": reason, "changed": len(fresh["devices"]), "deleted": 0,
+                       "related": 0, "devices": len(fresh["devices"])}
+
+    if snapshot is None:
+        return full("no_snapshot")
+    if snapshot.get("netbox_url") != client.url:
+        return full("netbox_url_changed")
+    if list(snapshot.get("fields") or []) != list(fields or []):
+        return full("fields_changed")
+    if max_age_seconds and now - int(snapshot.get("full_sync_at") or 0) > max_age_seconds:
+        return full("max_age")
+    mark = _parse_time(snapshot.get("mark"))
+    if not snapshot.get("changelog") or mark is None:
+        return full("changelog_unavailable")
+    since = (mark - timedelta(seconds=max(int(overlap_seconds), 0))).isoformat()
+
+    try:
+        _, changes = fetch_changelog(client, since, ["dcim.device", *RELATED_REFERENCES])
+    except NetBoxApiError:
+        return full("changelog_unavailable")
+
+    devices = dict(snapshot["devices"])
+    deleted: Set[str] = set()
+    related: Dict[str, Set[str]] = {}
+    for record in changes:
+        object_type = str(record.get("changed_object_type") or "")
+        object_id = record.get("changed_object_id")
+        if object_id is None:
+            continue
+        if object_type == "dcim.device":
+            if _change_action(record) == "delete":
+                deleted.add(_device_key(object_id))
+        elif object_type in RELATED_REFERENCES:
+            related.setdefault(object_type, set()).add(str(object_id))
+
+    updated = client.list(
+        "/api/dcim/devices/", [("last_updated__gte", since), ("ordering", "id")], fields=fields
+    )
+    fetched = {_device_key(d.get("id")): d for d in updated if d.get("id") is not None}
+    refetch = devices_referencing(devices, related) - set(fetched) - deleted
+    if refetch:
+        for device in fetch_devices_by_ids(client, refetch, fields=fields):
+            fetched[_device_key(device.get("id"))] = device
+        # Referenced devices that no longer come back were deleted.
+        deleted |= refetch - set(fetched)
+
+    for key in deleted:
+        devices.pop(key, None)
+    for key, device in fetched.items():
+        if key in deleted:
+            continue
+        if _is_active(device):
+            devices[key] = sanitize_json(device)
+        else:
+            devices.pop(key, None)
+
+    refreshed = dict(snapshot)
+    refreshed["devices"] = {k: devices[k] for k in sorted(devices, key=_id_sort_key)}
+    refreshed["mark"] = _newest(
+        snapshot.get("mark"),
+        *(r.get("time") for r in changes),
+        *(d.get("last_updated") for d in fetched.values()),
+    )
+    return refreshed, {"mode": "incremental", "reason": "", "changed": len(fetched), "deleted": len(deleted),
+                       "related": len(refetch), "devices": len(refreshed["devices"])}
+
+
+# ---------------------------------------------------------------------------
+# Filtering (mirrors fetch_all_netbox_devices.py)
+# ---------------------------------------------------------------------------
+
+def _izlenmeli_matches(device: Dict[str, Any], mode: str) -> bool:
+    value = (device.get("custom_fields") or {}).get("izlenmeli")
+    if mode == "monitor":
+        return value is None or value == "Evet"
+    if mode == "skip":
+        return value == IZLENMELI_SKIP
+    return True
+
+
+def build_result(
+    devices: Iterable[Dict[str, Any]],
+    mapping_index: DeviceTypeMappingIndex,
+    mode: str,
+    location_filter: str = "",
+    location_ids: Optional[List[Any]] = None,
+    location_root_map: Optional[Dict[int, str]] = None,
+) -> Dict[str, Any]:
+    """The fetch script's {"devices", "count", "mode", "unmapped_pairs"} document for one izlenmeli mode."""
+    allowed_locations = set(location_ids or [])
+    matched: List[Dict[str, Any]] = []
+    unmatched: List[Dict[str, str]] = []
+    for device in devices:
+        if not _izlenmeli_matches(device, mode):
+            continue
+        if allowed_locations:
+            location = device.get("location")
+            location_id = location.get("id") if isinstance(location, dict) else location
+            if location_id not in allowed_locations:
+                continue
+        if mapping_index.match(device) is not None:
+            matched.append(normalize_device_record(device, location_filter, location_root_map=location_root_map))
+        else:
+            unmatched.append(unmapped_entry(device))
+    pair_counts = Counter((u["role"], u["manufacturer"], u["dc"]) for u in unmatched)
+    return {
+        "devices": matched,
+        "count": len(matched),
+        "mode": mode,
+        "unmapped_pairs": [
+            {"role": role, "manufacturer": manufacturer, "dc": dc, "count": count}
+            for (role, manufacturer, dc), count in sorted(pair_counts.items())
+        ],
+    }
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _log(message: str) -> None:
+    print(f"DEBUG: {message}", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Incremental NetBox device fetch with a local snapshot")
+    parser.add_argument("--netbox-url", required=True)
+    parser.add_argument("--mapping-file", required=True, help="Device type mapping JSON")
+    parser.add_argument("--snapshot", required=True, help="Snapshot path (must survive between runs)")
+    parser.add_argument("--mode", choices=("monitor", "skip"), default="monitor", help="izlenmeli filter")
+    parser.add_argument("--location-filter", default="")
+    parser.add_argument("--location-cache", default="",
+                        help="Location tree cache path (reused while locations are unchanged)")
+    parser.add_argument("--verify-ssl", action="store_true")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent page requests (default: 4)")
+    parser.add_argument("--fields", action="store_true",
+                        help="Request only the device attributes the sync reads (?fields=, NetBox >= 4.0)")
+    parser.add_argument("--overlap-seconds", type=int, default=300,
+                        help="Re-read window before the high-water mark (default: 300)")
+    parser.add_argument("--full-resync-hours", type=float, default=24,
+                        help="Full resync when the last one is older than this (0 = never; default: 24)")
+    parser.add_argument("--force-full", action="store_true", help="Ignore the snapshot and resync")
+    parser.add_argument("--no-refresh", action="store_true",
+                        help="Use the snapshot as is when it exists for the same URL and --fields "
+                             "(second mode of the same run)")
+    args = parser.parse_args(argv)
+
+    token = os.environ.get("NETBOX_TOKEN", "")
+    try:
+        with open(args.mapping_file, encoding="utf-8") as f:
+            mapping_index = DeviceTypeMappingIndex(json.load(f))
+    except (OSError, ValueError) as exc:
+        print(f"ERROR: cannot read mapping file: {exc}", file=sys.stderr)
+        sys.exit(2)
+
+    client = NetBoxPaginator(args.netbox_url, token, verify=args.verify_ssl, timeout=args.timeout,
+                             page_size=args.page_size, concurrency=args.concurrency)
+    fields = DEVICE_FIELDS if args.fields else None
+    try:
+        snapshot = None if args.force_full else load_snapshot(args.snapshot)
+        if args.no_refresh and snapshot_matches(snapshot, client.url, fields):
+            stats: Dict[str, Any] = {"mode": "reused", "devices": len(snapshot["devices"])}
+        else:
+            snapshot, stats = refresh_snapshot(
+                client, snapshot,
+                fields=fields,
+                overlap_seconds=args.overlap_seconds,
+                max_age_seconds=int(args.full_resync_hours * 3600),
+            )
+            save_snapshot(args.snapshot, snapshot)
+        _log(f"Device snapshot: {json.dumps(stats, sort_keys=True)}")
+
+        location_root_map: Dict[int, str] = {}
+        location_ids: List[Any] = []
+        try:
+            location_index, location_source = load_location_index(client, args.location_cache or None)
+            location_root_map = location_index.root_map()
+            root_id = location_index.find(args.location_filter) if args.location_filter else None
+            location_ids = location_index.descendants(root_id) if root_id is not None else []
+            _log(f"Built location root map for {len(location_root_map)} locations (source: {location_source})")
+            if args.location_filter and not location_ids:
+                print(f"WARNING: Location '{args.location_filter}' not found in Netbox. Will fetch all devices.",
+                      file=sys.stderr)
+        except NetBoxApiError as exc:
+            print(f"WARNING: Could not build location root map: {exc}", file=sys.stderr)
+    except NetBoxApiError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        client.close()
+
+    result = build_result(
+        snapshot["devices"].values(), mapping_index, args.mode,
+        location_filter=args.location_filter, location_ids=location_ids, location_root_map=location_root_map,
+    )
+    _log(f"Total devices after mapping filters (mode={args.mode}): {result['count']}")
+    print(json.dumps(sanitize_json(result), ensure_ascii=False, default=str))
+
+
+if __name__ == "__main__":
+    main()
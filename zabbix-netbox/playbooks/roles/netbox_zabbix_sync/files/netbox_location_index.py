@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+NetBox DCIM location tree index for the Loki device fetch.
+
+Built once from the full /api/dcim/locations/ list (one parallel paginated fetch)
+instead of a parent_id= query per parent plus a second full walk for the root map:
+
+  index.find("DC14")        -> id of the location named DC14 (exact, first listed)
+  index.descendants(id)     -> [id, *all descendants]        (pre-order span, O(1) lookup)
+  index.contains(id, other) -> other is id or below it       (O(1))
+  index.root_name(id)       -> root location name            (O(1))
+  index.root_map()          -> build_location_root_map() of the same list
+
+load_location_index() keeps the (id, name, parent) rows on disk and reuses them
+while the location count and newest last_updated are unchanged; checking that
+costs one limit=1 request.
+"""
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from netbox_device_normalize import build_location_root_map
+
+LOCATION_INDEX_FORMAT_VERSION = 1
+LOCATION_FIELDS = ("id", "name", "parent", "last_updated")
+
+
+def _parent_id(loc: Dict[str, Any]) -> Optional[Any]:
+    parent = loc.get("parent")
+    if isinstance(parent, dict):
+        return parent.get("id")
+    if isinstance(parent, int):
+        return parent
+    return None
+
+
+class LocationTreeIndex:
+    def __init__(self, locations: List[Dict[str, Any]]) -> None:
+        self.locations = [
+            {"id": loc["id"], "name": loc.get("name"), "parent": _parent_id(loc)}
+            for loc in locations
+            if loc.get("id") is not None
+        ]
+        self._root_map = build_location_root_map(self.locations)
+        self._by_name: Dict[str, Any] = {}
+        children: Dict[Any, List[Any]] = {}
+        known = {loc["id"] for loc in self.locations}
+        for loc in self.locations:
+            self._by_name.setdefault(str(loc.get("name") or ""), loc["id"])
+            pid = loc["parent"]
+            if pid is not None and pid in known and pid != loc["id"]:
+                children.setdefault(pid, []).append(loc["id"])
+        self._children = children
+
+        # Pre-order walk from the roots: every subtree is a contiguous span of _order.
+        self._order: List[Any] = []
+        self._span: Dict[Any, Tuple[int, int]] = {}
+        roots = [loc["id"] for loc in self.locations if loc["parent"] is None or loc["parent"] not in known]
+        for root in roots:
+            stack: List[Tuple[Any, bool]] = [(root, False)]
+            while stack:
+                lid, done = stack.pop()
+                if done:
+                    self._span[lid] = (self._span[lid][0], len(self._order))
+                    continue
+                if lid in self._span:
+                    continue
+                self._span[lid] = (len(self._order), -1)
+                self._order.append(lid)
+                stack.append((lid, True))
+                stack.extend((cid, False) for cid in reversed(children.get(lid, [])))
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def find(self, name: str) -> Optional[Any]:
+        return self._by_name.get(name)
+
+    def descendants(self, location_id: Any) -> List[Any]:
+        """location_id followed by all its descendants; [] for an unknown id."""
+        span = self._span.get(location_id)
+        if span is not None:
+            return self._order[span[0]:span[1]]
+        if location_id not in self._root_map:
+            return []
+        # Member of a parent cycle (unreachable from any root): plain walk.
+        result, stack = [location_id], [location_id]
+        seen = {location_id}
+        while stack:
+            for cid in self._children.get(stack.pop(), []):
+                if cid not in seen:
+                    seen.add(cid)
+                    result.append(cid)
+                    stack.append(cid)
+        return result
+
+    def contains(self, location_id: Any, other_id: Any) -> bool:
+        outer, inner = self._span.get(location_id), self._span.get(other_id)
+        if outer is None or inner is None:
+            return location_id == other_id or other_id in self.descendants(location_id)
+        return outer[0] <= inner[0] < outer[1]
+
+    def root_name(self, location_id: Any) -> str:
+        return self._root_map.get(location_id, "")
+
+    def root_map(self) -> Dict[Any, str]:
+        return dict(self._root_map)
+
+
+def _cache_key(paginator: Any) -> str:
+    probe = paginator.get(
+        "/api/dcim/locations/",
+        [("ordering", "-last_updated"), ("limit", 1), ("fields", "id,last_updated")],
+    )
+    newest = (probe.get("results") or [{}])[0].get("last_updated") or ""
+    return f"{probe.get('count')}|{newest}"
+
+
+def load_location_index(paginator: Any, cache_path: Optional[str] = None) -> Tuple[LocationTreeIndex, str]:
+    """
+    (index, source) with source "cache" or "api".
+
+    Without cache_path the locations are always listed. A cache that cannot be written
+    is not an error.
+    """
+    if not cache_path:
+        return LocationTreeIndex(paginator.list("/api/dcim/locations/", fields=LOCATION_FIELDS)), "api"
+    key = _cache_key(paginator)
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            cached = json.load(f)
+        if (
+            cached.get("format_version") == LOCATION_INDEX_FORMAT_VERSION
+            and cached.get("netbox_url") == paginator.url
+            and cached.get("key") == key
+        ):
+            return LocationTreeIndex(cached["locations"]), "cache"
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        pass
+    index = LocationTreeIndex(paginator.list("/api/dcim/locations/", fields=LOCATION_FIELDS))
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        tmp = f"{cache_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"format_version": LOCATION_INDEX_FORMAT_VERSION, "netbox_url": paginator.url,
+                       "key": key, "locations": index.locations}, f, ensure_ascii=False)
+        os.replace(tmp, cache_path)
+    except OSError:
+        pass
+    return index, "api"
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Parallel, field-projected paginator for NetBox list endpoints.
+
+The first page is requested with limit/offset=0 and its `count` gives the number of
+remaining pages; those are requested concurrently (bounded thread pool) over one
+pooled requests.Session and reassembled in offset order, so the result is the same
+list a serial walk of the `next` links returns. Endpoints without `count` fall back
+to following `next`. When the server caps `limit` (NetBox MAX_PAGE_SIZE) the offsets
+follow the page size it actually returned.
+
+fields= (NetBox >= 4.0 dynamic fields) / brief=true cut the payload down to the
+attributes the caller reads; see DEVICE_FIELDS for the device fetch.
+
+Offsets can shift while the pages are fetched, so an object may be returned twice:
+list() drops repeats by id; callers iterating pages() use dedupe_pages().
+
+Used by the Loki fetch scripts (copied next to them under /tmp):
+
+  from netbox_paginator import NetBoxPaginator
+  paginator = NetBoxPaginator(url, token, verify=False, concurrency=4)
+  devices = paginator.list("/api/dcim/devices/", {"status": "active"}, fields=DEVICE_FIELDS)
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlsplit, urlunsplit
+
+# Device attributes read by normalize_device_record, the mapping / izlenmeli / location
+# filters of the fetch, the incremental snapshot and the compare engine (custom_fields).
+DEVICE_FIELDS = (
+    "id",
+    "name",
+    "display",
+    "status",
+    "role",
+    "device_role",
+    "device_type",
+    "platform",
+    "primary_ip",
+    "primary_ip4",
+    "primary_ip6",
+    "location",
+    "site",
+    "tenant",
+    "rack",
+    "custom_fields",
+    "last_updated",
+)
+
+Params = List[Tuple[str, Any]]
+
+
+class NetBoxApiError(RuntimeError):
+    def __init__(self, message: str, status: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def _as_params(params: Any) -> Params:
+    if params is None:
+        return []
+    if isinstance(params, dict):
+        out: Params = []
+        for key, value in params.items():
+            if isinstance(value, (list, tuple)):
+                out.extend((key, v) for v in value)
+            else:
+                out.append((key, value))
+        return out
+    return list(params)
+
+
+class NetBoxPaginator:
+    def __init__(
+        self,
+        url: str,
+        token: str,
+        verify: bool = False,
+        timeout: float = 30,
+        page_size: int = 1000,
+        concurrency: int = 4,
+    ) -> None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.exceptions import InsecureRequestWarning
+
+        requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.page_size = max(int(page_size), 1)
+        self.concurrency = max(int(concurrency), 1)
+        self.session = requests.Session()
+        self.session.verify = verify
+        self.session.headers.update({"Authorization": f"Token {token}", "Accept": "application/json"})
+        # One keep-alive connection per worker; more would only sit idle.
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _split(self, path_or_url: str, params: Any) -> Tuple[str, Params]:
+        url = path_or_url if "://" in path_or_url else f"{self.url}{path_or_url}"
+        parts = urlsplit(url)
+        query = parse_qsl(parts.query, keep_blank_values=True)
+        return urlunsplit((parts.scheme, parts.netloc, parts.path, "", "")), query + _as_params(params)
+
+    def get(self, path_or_url: str, params: Any = None) -> Dict[str, Any]:
+        """One GET; NetBoxApiError (with .status for HTTP errors) on failure."""
+        url, query = self._split(path_or_url, params)
+        try:
+            resp = self.session.get(url, params=query, timeout=self.timeout)
+        except Exception as exc:
+            raise NetBoxApiError(f"GET {url}: {exc}") from exc
+        if resp.status_code >= 400:
+            raise NetBoxApiError(f"GET {url}: HTTP {resp.status_code}", status=resp.status_code)
+        try:
+            return resp.json()
+        except ValueError as exc:
+            raise NetBoxApiError(f"GET {url}: invalid JSON") from exc
+
+    def pages(
+        self,
+        path_or_url: str,
+        params: Any = None,
+        fields: Optional[Sequence[str]] = None,
+        brief: bool = False,
+    ) -> List[List[Dict[str, Any]]]:
+        """Every page of a list endpoint, in offset order."""
+        url, query = self._split(path_or_url, params)
+        query = [(k, v) for k, v in query if k not in ("limit", "offset", "fields", "brief")]
+        if fields:
+            query.append(("fields", ",".join(fields)))
+        if brief:
+            query.append(("brief", "true"))
+
+        first = self.get(url, query + [("limit", self.page_size), ("offset", 0)])
+        pages = [list(first.get("results", []))]
+        count = first.get("count")
+        if not first.get("next"):
+            return pages
+        step = len(pages[0])
+        if not isinstance(count, int) or step == 0:
+            return pages + self._follow(first.get("next"))
+
+        def fetch(offset: int) -> Dict[str, Any]:
+            return self.get(url, query + [("limit", step), ("offset", offset)])
+
+        offsets = list(range(step, count, step))
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, max(len(offsets), 1))) as pool:
+            rest = list(pool.map(fetch, offsets))
+        pages.extend(list(data.get("results", [])) for data in rest)
+        # Rows added while fanning out: pick them up serially.
+        if rest and rest[-1].get("next"):
+            pages.extend(self._follow(rest[-1]["next"]))
+        return pages
+
+    def _follow(self, next_url: Optional[str]) -> List[List[Dict[str, Any]]]:
+        pages = []
+        while next_url:
+            data = self.get(next_url)
+            pages.append(list(data.get("results", [])))
+            next_url = data.get("next")
+        return pages
+
+    def list(
+        self,
+        path_or_url: str,
+        params: Any = None,
+        fields: Optional[Sequence[str]] = None,
+        brief: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """pages() flattened; an object seen twice (shifted by a concurrent insert) is kept once."""
+        return dedupe_by_id(item for page in self.pages(path_or_url, params, fields, brief) for item in page)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def _dedupe(items: Iterable[Dict[str, Any]], seen: set) -> List[Dict[str, Any]]:
+    out = []
+    for item in items:
+        key = item.get("id") if isinstance(item, dict) else None
+        if key is not None:
+            if key in seen:
+                continue
+            seen.add(key)
+        out.append(item)
+    return out
+
+
+def dedupe_by_id(items: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return _dedupe(items, set())
+
+
+def dedupe_pages(pages: Iterable[List[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+    """pages() with every object already seen on an earlier page dropped (same rule as list())."""
+    seen: set = set()
+    return [_dedupe(page, seen) for page in pages]
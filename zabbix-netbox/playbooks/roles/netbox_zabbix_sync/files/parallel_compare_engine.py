@@ -3,7 +3,15 @@
 Parallel Compare Engine for Zabbix-NetBox sync.
 
 Performs Phase A (compare + payload build, no Zabbix writes) in parallel for
-devices, platforms, and virtual firewalls using ThreadPoolExecutor.
+devices, platforms, and virtual firewalls using ThreadPoolExecutor, or
+ProcessPoolExecutor with --executor process for multi-core CPU-bound runs.
+
+The input arrays are streamed element by element (iter_json_array) and only a
+bounded window of items is in flight (--max-in-flight), so plans and items do
+not accumulate. Two per-entity structures still grow with the inventory: the
+collision claims (names / hostid of every create and update plan) and, in
+incremental mode, the previous run's fingerprints; this run's fingerprint
+entries are spooled to a temporary file.
 
 Outputs one JSON-line per item to stdout (AWX-visible stream) and writes
 plan files to --output-dir:
@@ -11,9 +19,29 @@ plan files to --output-dir:
   platform_plan_<id>.json     — consumed by process_platform_apply.yml
   vfw_plan_<id>.json          — consumed by process_virtual_fw_apply.yml
 
+With --plan-store jsonl all plans go to one append-only file
+(--plan-store-path, default <output-dir>/plan_store.jsonl) with an offset
+index instead; see plan_store.py.
+
 Each plan includes ready host.create / host.update params for Phase B.
 
+With --fingerprints PATH (incremental mode) each update plan gets a content
+fingerprint of its NetBox record, resolved Zabbix host, HMDL baseline row and
+mapping/cache config. Entities that were up to date ("güncel") last run and
+whose fingerprint is unchanged reuse the stored enrich output instead of
+running enrich_plan; PATH is rewritten with this run's up-to-date entities.
+
+Before the summary, create plans whose technical / visible name already
+exists in Zabbix or is planned by another entity in the same run are turned
+into updates of the existing host or deterministic skips (collision analysis;
+--no-collision-check disables it).
+
 A final compare_summary.json and missing_groups_aggregate.json are written.
+compare_summary.json carries "stage_timings": per entity type and stage
+(mapping, extraction, resolution, enrich, serialise, plus "item" for the
+whole item) the count, total and p50/p95/p99 in milliseconds. With
+--stage-timings-jsonl every item's timings are also written, one line per
+item, to <output-dir>/compare_stage_timings.jsonl.
 
 Exit codes:
   0 — all items compared successfully (some may have action=skip)
@@ -22,20 +50,37 @@ Exit codes:
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
+import math
+import multiprocessing
 import os
 import re
 import sys
+import tempfile
+import time
 import traceback
-import unicodedata
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Any, Dict, List, Optional, Set, Tuple
-
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+
+from device_type_mapping_index import (
+    DeviceTypeMappingIndex,
+    mapping_tenant_allowlist as _mapping_tenant_allowlist,
+    resolve_device_tenant_name as _resolve_device_tenant_name,
+)
 from zabbix_payload_builder import (
     ZabbixPayloadBuilder,
     build_proxy_group_config,
+    re_enrich_plan,
     _is_discovered_host,
 )
+from plan_store import PLAN_STORE_BACKENDS, FilePlanStore, open_plan_store
+# module_utils is on sys.path once zabbix_payload_builder is imported.
+from zabbix_hostname_core import (  # noqa: E402
+    zabbix_platform_technical_hostname,
+    zabbix_vfw_technical_hostname,
+)
 
 NETWORK_DISCOVERY_SKIP_REASON = "Network Discovery, no action taken"
 
@@ -43,86 +88,6 @@ NETWORK_DISCOVERY_SKIP_REASON = "Network Discovery, no action taken"
 # Hostname / filter helpers (from filter_plugins/zabbix_hostname.py)
 # ---------------------------------------------------------------------------
 
-_MAX_HOST_LEN = 128
-_TR_MAP = str.maketrans(
-    {
-        "ı": "i", "İ": "I", "ş": "s", "Ş": "S",
-        "ğ": "g", "Ğ": "G", "ü": "u", "Ü": "U",
-        "ö": "o", "Ö": "O", "ç": "c", "Ç": "C",
-    }
-)
-
-
-def _truncate_and_sanitize(s: str) -> str:
-    if not s:
-        return ""
-    s = s[:_MAX_HOST_LEN]
-    s = re.sub(r"_+", "_", s).strip("._-")
-    return s
-
-
-def zabbix_technical_hostname(text: Any, fallback_id: str = "") -> str:
-    raw = str(text or "").strip()
-    if not raw:
-        fb = str(fallback_id).strip() if fallback_id else ""
-        if fb:
-            low = fb.lower()
-            if low.startswith("host-") or low.startswith("p"):
-                return _truncate_and_sanitize(fb)
-            return _truncate_and_sanitize(f"host-{fb}")
-        return "host"
-    step1 = raw.translate(_TR_MAP)
-    nfkd = unicodedata.normalize("NFKD", step1)
-    ascii_buf = [ch for ch in nfkd if unicodedata.category(ch) != "Mn"]
-    merged = "".join(ascii_buf)
-    safe = []
-    for ch in merged:
-        if ch.isalnum() or ch in "._-":
-            safe.append(ch)
-        else:
-            safe.append("_")
-    slug = re.sub(r"_+", "_", "".join(safe)).strip("._-")
-    slug = _truncate_and_sanitize(slug)
-    if not slug:
-        fb = str(fallback_id).strip() if fallback_id else ""
-        slug = _truncate_and_sanitize(f"host-{fb}") if fb else "host"
-    return slug
-
-
-def zabbix_platform_technical_hostname(text: Any, platform_id: str = "") -> str:
-    sid = str(platform_id).strip() if platform_id else ""
-    suffix = f"_P_{sid}" if sid else ""
-    base = zabbix_technical_hostname(text, "")
-    if not suffix:
-        return base or "host"
-    if not base:
-        return zabbix_technical_hostname("", f"P_{sid}")
-    if base.lower().endswith(suffix.lower()):
-        return _truncate_and_sanitize(base)[:_MAX_HOST_LEN]
-    max_base = _MAX_HOST_LEN - len(suffix)
-    truncated = base[:max(max_base, 1)].rstrip("._-")
-    if not truncated:
-        return zabbix_technical_hostname("", f"P_{sid}")
-    return _truncate_and_sanitize(truncated + suffix)[:_MAX_HOST_LEN]
-
-
-def zabbix_vfw_technical_hostname(text: Any, vfw_id: str = "") -> str:
-    sid = str(vfw_id).strip() if vfw_id else ""
-    suffix = f"_VFW_{sid}" if sid else ""
-    base = zabbix_technical_hostname(text, "")
-    if not suffix:
-        return base or "host"
-    if not base:
-        return zabbix_technical_hostname("", f"VFW_{sid}")
-    if base.lower().endswith(suffix.lower()):
-        return _truncate_and_sanitize(base)[:_MAX_HOST_LEN]
-    max_base = _MAX_HOST_LEN - len(suffix)
-    truncated = base[:max(max_base, 1)].rstrip("._-")
-    if not truncated:
-        return zabbix_technical_hostname("", f"VFW_{sid}")
-    return _truncate_and_sanitize(truncated + suffix)[:_MAX_HOST_LEN]
-
-
 def zabbix_vfw_display_name(hostname_raw: Any) -> str:
     raw = str(hostname_raw or "").strip()
     if not raw:
@@ -305,33 +270,6 @@ def _check_condition(device: Dict, key: str, value: Any) -> bool:
     return False
 
 
-def _resolve_device_tenant_name(device: Dict) -> str:
-    """
-    Resolve NetBox tenant label from nested tenant object or flat tenant_name (datalake/Loki).
-    Empty tenant dict must not hide a valid flat tenant_name field.
-    """
-    tenant_obj = device.get("tenant")
-    if isinstance(tenant_obj, dict):
-        name = (tenant_obj.get("name") or "").strip()
-        if name:
-            return name
-    return (device.get("tenant_name") or "").strip()
-
-
-def _mapping_tenant_allowlist(mapping: Dict) -> Optional[List[str]]:
-    if "tenants" in mapping and mapping.get("tenants") is not None:
-        raw = mapping["tenants"]
-        if isinstance(raw, list):
-            names = [str(x).strip() for x in raw if x is not None and str(x).strip()]
-        else:
-            names = [str(raw).strip()] if str(raw).strip() else []
-        return names if names else None
-    t1 = mapping.get("tenant")
-    if t1 is not None and str(t1).strip():
-        return [str(t1).strip()]
-    return None
-
-
 def _mapping_applies_for_tenant(device: Dict, mapping: Dict) -> bool:
     allow = _mapping_tenant_allowlist(mapping)
     if not allow:
@@ -361,6 +299,7 @@ def _device_type_mapping_without_tenant_scope(
 
 
 def _find_matching_mapping(device: Dict, device_type_mapping: Dict) -> Optional[Dict]:
+    """Row-by-row reference matcher; the engine uses compile_device_type_mapping()."""
     mappings = device_type_mapping.get("mappings", [])
     for mapping in sorted(mappings, key=lambda x: x.get("priority", 999)):
         if not _mapping_applies_for_tenant(device, mapping):
@@ -387,61 +326,172 @@ def _find_matching_mapping_safe(device: Dict, device_type_mapping: Dict) -> Opti
     return _find_matching_mapping(device, stripped)
 
 
+def compile_device_type_mapping(device_type_mapping: Optional[Dict]) -> DeviceTypeMappingIndex:
+    """Compile netbox_device_type_mapping.yml once with the engine's flat-or-nested field readers."""
+    return DeviceTypeMappingIndex(
+        device_type_mapping,
+        role_of=_device_role_name,
+        manufacturer_of=_manufacturer_name,
+        model_of=_device_model,
+        tenant_of=_resolve_device_tenant_name,
+    )
+
+
+def _device_type_index(ctx: Dict) -> DeviceTypeMappingIndex:
+    index = ctx.get("device_type_index")
+    if index is None:
+        index = compile_device_type_mapping(ctx.get("device_type_mapping"))
+        ctx["device_type_index"] = index
+    return index
+
+
+def _extraction_plans(ctx: Dict) -> Tuple["HostGroupsPlan", "TagsPlan"]:
+    if ctx.get("host_groups_plan") is None:
+        ctx["host_groups_plan"] = HostGroupsPlan(ctx.get("host_groups_config"))
+    if ctx.get("tags_plan") is None:
+        ctx["tags_plan"] = TagsPlan(ctx.get("tags_config"))
+    return ctx["host_groups_plan"], ctx["tags_plan"]
+
+
+# ---------------------------------------------------------------------------
+# Compiled extraction plans (host_groups_config.yml / tags_config.yml)
+# ---------------------------------------------------------------------------
+# Each config is compiled once into a list of specialised extractor callables:
+# sources pre-sorted, disabled entries dropped, dotted paths pre-split and
+# settings baked in. Results are identical to interpreting the YAML per device.
+
+Extractor = Callable[[Dict, Optional[str], List[Dict]], Any]
+
+
+def _compile_path(path: str) -> Callable[[Any], Any]:
+    """_extract_by_path with the dotted path split once."""
+    keys = tuple(path.split(".")) if path else ()
+
+    def get(obj: Any) -> Any:
+        if not obj or not keys:
+            return None
+        current = obj
+        for key in keys:
+            if current is None:
+                return None
+            if isinstance(current, dict):
+                current = current.get(key)
+            else:
+                return None
+        return current
+
+    return get
+
+
+def _compile_path_with_fallback(path: str, fallback: Any) -> Callable[[Any], Any]:
+    """_extract_by_path_with_fallback with primary and fallback paths pre-split."""
+    getters = [_compile_path(path)]
+    if fallback:
+        getters.extend(_compile_path(fp) for fp in ([fallback] if isinstance(fallback, str) else fallback))
+
+    def get(obj: Any) -> Any:
+        for getter in getters:
+            value = getter(obj)
+            if value is not None and value != "":
+                return value
+        return None
+
+    return get
+
+
+def _template_attribute_values(templates: List[Dict], attr: str) -> List[Any]:
+    values: List[Any] = []
+    for t in templates:
+        if attr in t:
+            values.extend(t.get(attr, []))
+    return values
+
+
+def _legacy_host_groups(device: Dict, device_type: Optional[str]) -> str:
+    groups: List[str] = []
+    if device_type:
+        groups.append(device_type)
+    loc = _get_location_name(device)
+    if loc:
+        groups.append(loc)
+    sahiplik = device.get("sahiplik") or (device.get("custom_fields") or {}).get("Sahiplik", "")
+    if sahiplik:
+        groups.append(str(sahiplik).strip())
+    return ",".join(g for g in groups if g)
+
+
+def _compile_host_group_source(source: Dict, trim: bool) -> Optional[Extractor]:
+    """One host group source -> callable returning the list of group names it adds."""
+    stype = source.get("type")
+
+    def scalar(read: Callable[[Dict, Optional[str]], Any]) -> Extractor:
+        def extract(device: Dict, device_type: Optional[str], templates: List[Dict]) -> List[str]:
+            value = read(device, device_type)
+            if value and str(value) != "":
+                if trim and isinstance(value, str):
+                    value = value.strip()
+                return [str(value)]
+            return []
+        return extract
+
+    if stype == "mapping_result":
+        return scalar(lambda device, device_type: device_type)
+    if stype == "netbox_attribute":
+        get = _compile_path_with_fallback(source.get("path", ""), source.get("fallback"))
+        return scalar(lambda device, device_type: get(device))
+    if stype == "custom_field":
+        field_name = source.get("field_name")
+        return scalar(lambda device, device_type: (device.get("custom_fields") or {}).get(field_name))
+    if stype == "computed" and source.get("compute_function") == "get_location_name":
+        return scalar(lambda device, device_type: _get_location_name(device))
+    if stype == "template_mapping":
+        attr = source.get("attribute", "host_groups")
+        return lambda device, device_type, templates: _template_attribute_values(templates, attr)
+    return None
+
+
+class HostGroupsPlan:
+    """host_groups_config.yml compiled into extractor callables; call(device, device_type, templates) -> str."""
+
+    def __init__(self, config: Optional[Dict]) -> None:
+        self.config = config
+        self.legacy = config is None
+        hg = (config or {}).get("host_groups", {})
+        settings = hg.get("settings", {})
+        trim = settings.get("trim", True)
+        self.unique = settings.get("unique", True)
+        self.skip_empty = settings.get("skip_empty", True)
+        self.separator = settings.get("separator", ",")
+        self.extractors: List[Extractor] = []
+        for source in sorted(hg.get("sources", []), key=lambda x: x.get("priority", 999)):
+            if not source.get("enabled", True):
+                continue
+            extractor = _compile_host_group_source(source, trim)
+            if extractor is not None:
+                self.extractors.append(extractor)
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # Extractors are closures; recompile from the YAML in spawned workers.
+        return HostGroupsPlan, (self.config,)
+
+    def __call__(self, device: Dict, device_type: Optional[str], templates: List[Dict]) -> str:
+        if self.legacy:
+            return _legacy_host_groups(device, device_type)
+        groups: List[str] = []
+        for extract in self.extractors:
+            groups.extend(extract(device, device_type, templates))
+        if self.unique:
+            groups = list(dict.fromkeys(groups))
+        if self.skip_empty:
+            groups = [g for g in groups if g]
+        return self.separator.join(groups)
+
+
 def _extract_host_groups_from_config(
     device: Dict, config: Optional[Dict], device_type: Optional[str], templates: List[Dict]
 ) -> str:
-    groups: List[str] = []
-    if config is None:
-        if device_type:
-            groups.append(device_type)
-        loc = _get_location_name(device)
-        if loc:
-            groups.append(loc)
-        sahiplik = device.get("sahiplik") or (device.get("custom_fields") or {}).get("Sahiplik", "")
-        if sahiplik:
-            groups.append(str(sahiplik).strip())
-        return ",".join(g for g in groups if g)
-
-    sources = config.get("host_groups", {}).get("sources", [])
-    settings = config.get("host_groups", {}).get("settings", {})
-    for source in sorted(sources, key=lambda x: x.get("priority", 999)):
-        if not source.get("enabled", True):
-            continue
-        stype = source.get("type")
-        value = None
-        if stype == "mapping_result":
-            value = device_type
-        elif stype == "netbox_attribute":
-            value = _extract_by_path_with_fallback(device, source.get("path", ""), source.get("fallback"))
-        elif stype == "custom_field":
-            value = (device.get("custom_fields") or {}).get(source.get("field_name"))
-        elif stype == "computed" and source.get("compute_function") == "get_location_name":
-            value = _get_location_name(device)
-        elif stype == "template_mapping":
-            attr = source.get("attribute", "host_groups")
-            tg = []
-            for t in templates:
-                if attr in t:
-                    tg.extend(t.get(attr, []))
-            if tg:
-                groups.extend(tg)
-                continue
-        if value and str(value) != "":
-            if settings.get("trim", True) and isinstance(value, str):
-                value = value.strip()
-            groups.append(str(value))
-
-    if settings.get("unique", True):
-        seen: set = set()
-        unique_groups: List[str] = []
-        for g in groups:
-            if g not in seen:
-                seen.add(g)
-                unique_groups.append(g)
-        groups = unique_groups
-    if settings.get("skip_empty", True):
-        groups = [g for g in groups if g]
-    return settings.get("separator", ",").join(groups)
+    """One-off helper; hot paths compile HostGroupsPlan once and reuse it."""
+    return HostGroupsPlan(config)(device, device_type, templates)
 
 
 def _extract_tags_original(device: Dict) -> Tuple[Dict, List]:
@@ -488,73 +538,128 @@ def _extract_tags_original(device: Dict) -> Tuple[Dict, List]:
     return {k: v for k, v in tags.items() if v is not None and v != ""}, loki_tags
 
 
-def _extract_tags_from_config(
-    device: Dict, config: Optional[Dict], device_type: Optional[str] = None, templates: Optional[List] = None
-) -> Tuple[Dict, List]:
-    if config is None:
-        return _extract_tags_original(device)
-    tags: Dict = {}
-    loki_tags: List = []
-    definitions = config.get("tags", {}).get("definitions", [])
-    settings = config.get("tags", {}).get("settings", {})
-    for tag_def in definitions:
-        if not tag_def.get("enabled", True):
-            continue
-        tag_name = tag_def.get("tag_name")
-        stype = tag_def.get("source_type")
-        value = None
-        if stype == "netbox_attribute":
-            value = _extract_by_path_with_fallback(device, tag_def.get("path", ""), tag_def.get("fallback"))
-            if tag_def.get("transform") == "to_string" and value is not None:
-                value = str(value)
-        elif stype == "custom_field":
-            value = (device.get("custom_fields") or {}).get(tag_def.get("field_name"))
-        elif stype == "computed":
-            compute_func = tag_def.get("compute_function")
-            if compute_func == "extract_hall":
-                value = device.get("location_description") or device.get("location_name") or None
-            elif compute_func == "get_location_name":
-                value = _get_location_name(device)
-        elif stype == "mapping_result":
-            value = device_type
-        elif stype == "template_mapping" and templates:
-            attr = tag_def.get("attribute", "host_groups")
-            tg = []
-            for t in templates:
-                if attr in t:
-                    tg.extend(t.get(attr, []))
-            if tg:
-                sep = tag_def.get("separator", ",")
-                value = sep.join(str(x) for x in tg)
-        elif stype == "array_expansion":
-            path = tag_def.get("path")
-            prefix = tag_def.get("prefix", "")
+def _compile_tag_definition(tag_def: Dict) -> Optional[Callable[..., Any]]:
+    """
+    One tag definition -> callable(device, device_type, templates, loki_tags).
+
+    Scalar definitions return the raw value (None when absent); array_expansion
+    appends to loki_tags and returns a dict of tags to merge.
+    """
+    stype = tag_def.get("source_type")
+    if stype == "netbox_attribute":
+        get = _compile_path_with_fallback(tag_def.get("path", ""), tag_def.get("fallback"))
+        if tag_def.get("transform") == "to_string":
+            def to_string(device, device_type, templates, loki_tags):
+                value = get(device)
+                return str(value) if value is not None else None
+            return to_string
+        return lambda device, device_type, templates, loki_tags: get(device)
+    if stype == "custom_field":
+        field_name = tag_def.get("field_name")
+        return lambda device, device_type, templates, loki_tags: (device.get("custom_fields") or {}).get(field_name)
+    if stype == "computed":
+        compute_func = tag_def.get("compute_function")
+        if compute_func == "extract_hall":
+            return lambda device, device_type, templates, loki_tags: (
+                device.get("location_description") or device.get("location_name") or None
+            )
+        if compute_func == "get_location_name":
+            return lambda device, device_type, templates, loki_tags: _get_location_name(device)
+        return None
+    if stype == "mapping_result":
+        return lambda device, device_type, templates, loki_tags: device_type
+    if stype == "template_mapping":
+        attr = tag_def.get("attribute", "host_groups")
+        sep = tag_def.get("separator", ",")
+
+        def from_templates(device, device_type, templates, loki_tags):
+            if not templates:
+                return None
+            tg = _template_attribute_values(templates, attr)
+            return sep.join(str(x) for x in tg) if tg else None
+        return from_templates
+    if stype == "array_expansion":
+        path = tag_def.get("path")
+        prefix = tag_def.get("prefix", "")
+        get_raw = _compile_path(path or "")
+
+        def expand(device, device_type, templates, loki_tags):
             if path == "tags":
                 tag_values = [device.get(f"tags{i}_name") for i in range(1, 6) if device.get(f"tags{i}_name")]
             else:
-                raw = _extract_by_path(device, path or "")
+                raw = get_raw(device)
                 tag_values = []
                 if raw and isinstance(raw, list):
                     for item in raw:
                         n = item.get("name") if isinstance(item, dict) else (item if isinstance(item, str) else None)
                         if n:
                             tag_values.append(n)
+            expanded: Dict[str, str] = {}
             for item_name in tag_values:
                 item_name = str(item_name)
                 loki_tags.append(item_name)
-                tags[f"{prefix}{item_name}"] = item_name
-            continue
-        if value is not None and value != "":
-            if settings.get("trim", True) and isinstance(value, str):
-                value = value.strip()
-            if settings.get("treat_empty_as_none", True) and value == "":
+                expanded[f"{prefix}{item_name}"] = item_name
+            return expanded
+        return expand
+    return None
+
+
+class TagsPlan:
+    """tags_config.yml compiled into extractor callables; call(device, device_type, templates) -> (tags, loki_tags)."""
+
+    def __init__(self, config: Optional[Dict]) -> None:
+        self.config = config
+        self.legacy = config is None
+        tags_cfg = (config or {}).get("tags", {})
+        settings = tags_cfg.get("settings", {})
+        self.trim = settings.get("trim", True)
+        self.treat_empty_as_none = settings.get("treat_empty_as_none", True)
+        self.skip_none = settings.get("skip_none", True)
+        self.skip_empty = settings.get("skip_empty", True)
+        # (tag_name, extractor, expands) in definition order
+        self.extractors: List[Tuple[Any, Callable[..., Any], bool]] = []
+        for tag_def in tags_cfg.get("definitions", []):
+            if not tag_def.get("enabled", True):
+                continue
+            extractor = _compile_tag_definition(tag_def)
+            if extractor is not None:
+                self.extractors.append(
+                    (tag_def.get("tag_name"), extractor, tag_def.get("source_type") == "array_expansion")
+                )
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return TagsPlan, (self.config,)
+
+    def __call__(
+        self, device: Dict, device_type: Optional[str] = None, templates: Optional[List] = None
+    ) -> Tuple[Dict, List]:
+        if self.legacy:
+            return _extract_tags_original(device)
+        tags: Dict = {}
+        loki_tags: List = []
+        for tag_name, extract, expands in self.extractors:
+            value = extract(device, device_type, templates, loki_tags)
+            if expands:
+                tags.update(value)
                 continue
-            tags[tag_name] = value
-    if settings.get("skip_none", True):
-        tags = {k: v for k, v in tags.items() if v is not None}
-    if settings.get("skip_empty", True):
-        tags = {k: v for k, v in tags.items() if v != ""}
-    return tags, loki_tags
+            if value is not None and value != "":
+                if self.trim and isinstance(value, str):
+                    value = value.strip()
+                if self.treat_empty_as_none and value == "":
+                    continue
+                tags[tag_name] = value
+        if self.skip_none:
+            tags = {k: v for k, v in tags.items() if v is not None}
+        if self.skip_empty:
+            tags = {k: v for k, v in tags.items() if v != ""}
+        return tags, loki_tags
+
+
+def _extract_tags_from_config(
+    device: Dict, config: Optional[Dict], device_type: Optional[str] = None, templates: Optional[List] = None
+) -> Tuple[Dict, List]:
+    """One-off helper; hot paths compile TagsPlan once and reuse it."""
+    return TagsPlan(config)(device, device_type, templates)
 
 
 def _sanitize_hostname(name: str) -> str:
@@ -575,13 +680,28 @@ def _normalize_netbox_choice(value: Any) -> str:
 
 def process_device_info(
     device: Dict,
-    device_type_mapping: Dict,
-    host_groups_config: Optional[Dict],
-    tags_config: Optional[Dict],
+    device_type_mapping: Any,
+    host_groups_config: Any,
+    tags_config: Any,
     templates_map: Optional[Dict],
+    timer: Optional["StageTimer"] = None,
 ) -> Dict:
-    """Run the device processing logic (equivalent to netbox_device_processor.py)."""
-    matching_mapping = _find_matching_mapping_safe(device, device_type_mapping)
+    """
+    Run the device processing logic (equivalent to netbox_device_processor.py).
+
+    Each config is either the YAML dict or its compiled form
+    (DeviceTypeMappingIndex, HostGroupsPlan, TagsPlan); compile once for bulk runs.
+    """
+    timer = timer or NULL_STAGE_TIMER
+    if not isinstance(device_type_mapping, DeviceTypeMappingIndex):
+        device_type_mapping = compile_device_type_mapping(device_type_mapping)
+    host_groups_plan = (
+        host_groups_config if isinstance(host_groups_config, HostGroupsPlan) else HostGroupsPlan(host_groups_config)
+    )
+    tags_plan = tags_config if isinstance(tags_config, TagsPlan) else TagsPlan(tags_config)
+    timer.start()
+    matching_mapping = device_type_mapping.match_safe(device)
+    timer.lap("mapping")
     device_type = matching_mapping.get("device_type") if matching_mapping else None
     hostname_prefix = (matching_mapping.get("hostname_prefix") or "") if matching_mapping else ""
     hostname_suffix = (matching_mapping.get("hostname_suffix") or "") if matching_mapping else ""
@@ -593,13 +713,14 @@ def process_device_info(
     location_name = _get_location_name(device)
     site_name = (device.get("site_name") or "").strip()
 
-    host_groups_str = _extract_host_groups_from_config(device, host_groups_config, device_type, templates)
-    tags_dict, loki_tags_list = _extract_tags_from_config(device, tags_config, device_type, templates)
+    host_groups_str = host_groups_plan(device, device_type, templates)
+    tags_dict, loki_tags_list = tags_plan(device, device_type, templates)
 
-    if tags_config is None:
+    if tags_plan.legacy:
         for loki_tag in loki_tags_list:
             if loki_tag:
                 tags_dict[f"Loki_Tag_{loki_tag}"] = loki_tag
+    timer.lap("extraction")
 
     device_role = device.get("device_role_name") or _device_role_name(device) or ""
     tenant_name = (device.get("tenant_name") or "").strip()
@@ -633,11 +754,17 @@ def _resolve_existing_host(
     loki_key: str,
     technical_hostname: str,
     visible_name: Optional[str],
-    by_loki: Dict,
-    by_hostname: Dict,
-    by_visible: Dict,
+    by_loki: Mapping,
+    by_hostname: Mapping,
+    by_visible: Mapping,
 ) -> Dict:
-    """Resolve existing Zabbix host via Loki_ID → hostname → visible name."""
+    """
+    Resolve existing Zabbix host via Loki_ID → hostname → visible name.
+
+    The maps are plain dicts or lazy SqliteHostMap views (zabbix_host_index.py);
+    only membership tests and item lookups are used, so a disk-backed index is
+    queried per key instead of being loaded up front.
+    """
     if loki_key and loki_key in by_loki:
         h = by_loki[loki_key]
         if isinstance(h, dict) and h.get("hostid"):
@@ -703,6 +830,87 @@ def _resolve_vfw_existing_host(
     return resolved if isinstance(resolved, dict) else {}
 
 
+# ---------------------------------------------------------------------------
+# Stage timings
+# ---------------------------------------------------------------------------
+
+# Per-item stages, in pipeline order. "item" in the summary is their sum.
+STAGES = ("mapping", "extraction", "resolution", "enrich", "serialise")
+
+STAGE_TIMINGS_FILENAME = "compare_stage_timings.jsonl"
+
+# Private plan key carrying the item's stage timings from the worker to run_parallel_compare.
+_STAGE_TIMINGS = "_stage_timings"
+
+
+class StageTimer:
+    """
+    Wall-clock seconds per stage for one item.
+
+    start() sets the mark, lap(stage) adds the time since the mark to stage and
+    moves the mark, so consecutive stages are timed with one clock read each.
+    """
+
+    __slots__ = ("seconds", "_mark")
+
+    def __init__(self) -> None:
+        self.seconds: Dict[str, float] = {}
+        self._mark = time.perf_counter()
+
+    def start(self) -> None:
+        self._mark = time.perf_counter()
+
+    def lap(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + (now - self._mark)
+        self._mark = now
+
+
+class _NullStageTimer:
+    """Timer used when the caller passes none (direct compare_one_* calls)."""
+
+    __slots__ = ()
+
+    def start(self) -> None:
+        pass
+
+    def lap(self, stage: str) -> None:
+        pass
+
+
+NULL_STAGE_TIMER = _NullStageTimer()
+
+
+def _percentile_ms(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile (the ceil(q * n)-th smallest) of sorted seconds, in milliseconds."""
+    rank = max(1, math.ceil(q * len(ordered) - 1e-9))
+    return round(ordered[min(len(ordered), rank) - 1] * 1000.0, 3)
+
+
+def summarize_stage_timings(samples: Dict[str, Dict[str, List[float]]]) -> Dict[str, Dict[str, Dict]]:
+    """
+    {entity_type: {stage: [seconds, ...]}} -> {entity_type: {stage: {count,
+    total_ms, p50_ms, p95_ms, p99_ms}}}. Stages no item reached are omitted.
+    """
+    out: Dict[str, Dict[str, Dict]] = {}
+    for entity_type, stages in samples.items():
+        per_stage: Dict[str, Dict] = {}
+        for stage in STAGES + ("item",):
+            values = stages.get(stage)
+            if not values:
+                continue
+            ordered = sorted(values)
+            per_stage[stage] = {
+                "count": len(ordered),
+                "total_ms": round(sum(ordered) * 1000.0, 3),
+                "p50_ms": _percentile_ms(ordered, 0.50),
+                "p95_ms": _percentile_ms(ordered, 0.95),
+                "p99_ms": _percentile_ms(ordered, 0.99),
+            }
+        out[entity_type] = per_stage
+    return out
+
+
 # ---------------------------------------------------------------------------
 # Per-item compare functions
 # ---------------------------------------------------------------------------
@@ -710,21 +918,25 @@ def _resolve_vfw_existing_host(
 def compare_one_device(
     device: Dict,
     ctx: Dict,
+    timer: Optional["StageTimer"] = None,
 ) -> Dict:
     """
     Compare a single NetBox device against Zabbix. Returns a plan dict
     compatible with process_device_apply.yml.
     """
+    timer = timer or NULL_STAGE_TIMER
     device_id = device.get("id", "unknown")
     device_name = _sanitize_hostname(str(device.get("name") or ""))
 
     # Device info (mapping + tags + host groups)
+    host_groups_plan, tags_plan = _extraction_plans(ctx)
     device_info = process_device_info(
         device,
-        ctx["device_type_mapping"],
-        ctx.get("host_groups_config"),
-        ctx.get("tags_config"),
+        _device_type_index(ctx),
+        host_groups_plan,
+        tags_plan,
         ctx.get("templates_map"),
+        timer,
     )
 
     # Skip checks
@@ -799,6 +1011,7 @@ def compare_one_device(
     }
 
     # Resolve existing host
+    timer.start()
     loki_key = str(device_info.get("tags", {}).get("Loki_ID", ""))
     zbx_existing = _resolve_existing_host(
         loki_key,
@@ -808,6 +1021,7 @@ def compare_one_device(
         ctx.get("by_hostname", {}),
         ctx.get("by_visible", {}),
     )
+    timer.lap("resolution")
 
     if zbx_existing.get("hostid") and _is_discovered_host(zbx_existing):
         skip_result = {
@@ -852,11 +1066,13 @@ def compare_one_device(
 def compare_one_platform(
     platform: Dict,
     ctx: Dict,
+    timer: Optional["StageTimer"] = None,
 ) -> Dict:
     """
     Compare a single NetBox platform against Zabbix. Returns a plan dict
     compatible with process_platform_apply.yml.
     """
+    timer = timer or NULL_STAGE_TIMER
     platform_id = str(platform.get("id", "unknown"))
     platform_name = str(platform.get("name") or platform.get("display") or "Unknown Platform")
     custom_fields = platform.get("custom_fields") or {}
@@ -929,6 +1145,7 @@ def compare_one_platform(
         return _skip_result("IP address is missing on platform")
 
     # Find mapping
+    timer.start()
     platform_mapping = ctx.get("platform_mapping", {})
     mapping_entry = None
     candidates = [
@@ -948,6 +1165,7 @@ def compare_one_platform(
             mapping_entry = m
             break
 
+    timer.lap("mapping")
     if not mapping_entry:
         return _skip_result(f"No platform mapping found for manufacturer {manufacturer_name}")
 
@@ -977,6 +1195,7 @@ def compare_one_platform(
         "Loki_ID": f"P_{platform_id}",
     }
 
+    timer.lap("extraction")
     technical_hostname = zabbix_platform_technical_hostname(platform_name, platform_id)
     zbx_record = {
         "DEVICE_TYPE": device_type,
@@ -996,6 +1215,7 @@ def compare_one_platform(
     }
 
     # Resolve existing host: P_<id> Loki_ID → canonical technical hostname
+    timer.start()
     loki_key = f"P_{platform_id}"
     zbx_existing = _resolve_existing_host(
         loki_key,
@@ -1011,6 +1231,7 @@ def compare_one_platform(
         canonical = ctx.get("by_hostname", {}).get(technical_hostname)
         if isinstance(canonical, dict) and canonical.get("hostid"):
             zbx_existing = canonical
+    timer.lap("resolution")
 
     zbx_scenario = "update" if zbx_existing.get("hostid") else "create"
 
@@ -1027,11 +1248,13 @@ def compare_one_platform(
 def compare_one_vfw(
     vfw: Dict,
     ctx: Dict,
+    timer: Optional["StageTimer"] = None,
 ) -> Dict:
     """
     Compare a single virtual firewall against Zabbix. Returns a plan dict
     compatible with process_virtual_fw_apply.yml.
     """
+    timer = timer or NULL_STAGE_TIMER
     vfw_id = str(vfw.get("id", "unknown"))
     hostname_raw = str(vfw.get("hostname") or "").strip()
     ip_port_raw = str(vfw.get("ip_port") or "").strip()
@@ -1088,8 +1311,10 @@ def compare_one_vfw(
         return _skip_result("Location (lokasyon) is missing on virtual firewall record")
 
     # Find mapping
+    timer.start()
     vfw_mapping = ctx.get("vfw_mapping") or {}
     mapping_entry = virtual_fw_mapping_match(vfw_mapping.get("mappings", []), vendor_name, model_name)
+    timer.lap("mapping")
     if not mapping_entry or not mapping_entry.get("device_type"):
         return _skip_result(f"No virtual_fw_mapping.yml entry for vendor={vendor_name} model={model_name}")
 
@@ -1120,6 +1345,7 @@ def compare_one_vfw(
         "Last_Updated": str(vfw.get("last_updated") or ""),
     }
 
+    timer.lap("extraction")
     technical_hostname = zabbix_vfw_technical_hostname(hostname_raw, vfw_id)
     zbx_record = {
         "DEVICE_TYPE": vfw_device_type,
@@ -1138,6 +1364,7 @@ def compare_one_vfw(
         "REPORT_OWNERSHIP": "",
     }
 
+    timer.start()
     loki_key = f"VFW_{vfw_id}"
     zbx_existing = _resolve_vfw_existing_host(
         vfw_id,
@@ -1147,6 +1374,7 @@ def compare_one_vfw(
         host_ip,
         ctx,
     )
+    timer.lap("resolution")
 
     zbx_scenario = "update" if zbx_existing.get("hostid") else "create"
 
@@ -1189,51 +1417,622 @@ def _progress(
     print(json.dumps(record, ensure_ascii=False), flush=True)
 
 
+_COMPARE_FUNCS = {
+    "device": compare_one_device,
+    "platform": compare_one_platform,
+    "vfw": compare_one_vfw,
+}
+
+EXECUTOR_MODES = ("thread", "process")
+
+# Per-process state for the process executor. Populated by _init_compare_worker
+# (or inherited through fork) so the large read-only ctx is built once per worker.
+_WORKER_CTX: Optional[Dict] = None
+_WORKER_BUILDER: Optional[ZabbixPayloadBuilder] = None
+
+
+def _item_meta(entity_type: str, item: Dict) -> Tuple[str, Any, Any]:
+    if entity_type == "device":
+        return entity_type, item.get("id", "unknown"), item.get("name", "unknown")
+    if entity_type == "platform":
+        return entity_type, item.get("id", "unknown"), item.get("name") or item.get("display", "unknown")
+    return entity_type, item.get("id", "unknown"), item.get("hostname", "unknown")
+
+
+# ---------------------------------------------------------------------------
+# Incremental compare (content fingerprints)
+# ---------------------------------------------------------------------------
+
+# Bump when compare / enrich logic changes so stored fingerprints are invalidated.
+FINGERPRINT_VERSION = 1
+
+# ctx entries that change what compare + enrich produce for an unchanged record.
+CONFIG_FINGERPRINT_KEYS = (
+    "device_type_mapping",
+    "host_groups_config",
+    "tags_config",
+    "templates_map",
+    "platform_mapping",
+    "vfw_mapping",
+    "template_type_map",
+    "template_id_cache",
+    "group_id_cache",
+    "proxy_group_config",
+    "platform_managed_tag_keys",
+    "vfw_managed_tag_keys",
+    "create_devices_disabled",
+    "create_platforms_disabled",
+    "create_virtual_fws_disabled",
+    "minimal_update_payload",
+)
+
+# Private plan key carrying the fingerprint entry from the worker to run_parallel_compare.
+_FINGERPRINT_ENTRY = "_fingerprint_entry"
+
+
+def _digest(value: Any) -> str:
+    encoded = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def config_fingerprint(ctx: Dict) -> str:
+    """Version of the mapping configs and Zabbix id caches a run compares against."""
+    return _digest([FINGERPRINT_VERSION, [ctx.get(key) for key in CONFIG_FINGERPRINT_KEYS]])
+
+
+def entity_fingerprint(
+    entity_type: str,
+    item: Dict,
+    compared_plan: Dict,
+    hmdl_row: Dict,
+    config_version: str,
+) -> str:
+    """
+    Stable fingerprint of everything enrich_plan reads for one entity: the
+    normalised NetBox record, the compare output (zbx_record and the resolved
+    Zabbix host with its tags, groups, interfaces and proxy group), the HMDL
+    baseline row and the config version.
+    """
+    return _digest([config_version, entity_type, item, compared_plan, hmdl_row])
+
+
+def _fingerprint_key(entity_type: str, item_id: Any) -> str:
+    return f"{entity_type}:{item_id}"
+
+
+def load_fingerprints(path: Optional[str]) -> Dict[str, Dict]:
+    """Fingerprints of the last run ({} when missing, unreadable or from another FINGERPRINT_VERSION)."""
+    try:
+        data = _load_json_file(path, {}) if path else {}
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("fingerprint_version") != FINGERPRINT_VERSION:
+        return {}
+    entities = data.get("entities")
+    return entities if isinstance(entities, dict) else {}
+
+
+def save_fingerprints(path: str, entities: Any) -> int:
+    """
+    Write {"fingerprint_version", "entities"} from a dict or an iterable of
+    (key, entry) pairs, one entry at a time; returns the number of entries.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    pairs = entities.items() if isinstance(entities, Mapping) else entities
+    count = 0
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(f'{{"fingerprint_version": {json.dumps(FINGERPRINT_VERSION)}, "entities": {{')
+        for key, entry in pairs:
+            f.write(", " if count else "")
+            f.write(f"{json.dumps(key, ensure_ascii=False)}: {json.dumps(entry, ensure_ascii=False)}")
+            count += 1
+        f.write("}}")
+    os.replace(tmp_path, path)
+    return count
+
+
+def _iter_spooled_fingerprints(spool: Any) -> Iterator[Tuple[str, Dict]]:
+    spool.seek(0)
+    for line in spool:
+        key, entry = json.loads(line)
+        yield key, entry
+
+
+def _is_up_to_date(plan: Dict) -> bool:
+    return (
+        plan.get("action") == "update"
+        and not plan.get("needs_update")
+        and not plan.get("validation_errors")
+    )
+
+
+def _compare_item(
+    entity_type: str,
+    item: Dict,
+    ctx: Dict,
+    payload_builder: Optional[ZabbixPayloadBuilder],
+) -> Dict:
+    """
+    Compare one entity and, when enabled, enrich the plan with API payloads.
+
+    With ctx["fingerprints"] set (incremental mode), an update plan whose
+    fingerprint matches the last run's up-to-date entry reuses that entry's
+    enrich output instead of running enrich_plan.
+
+    The item's stage timings travel back in plan[_STAGE_TIMINGS].
+    """
+    timer = StageTimer()
+    plan = _COMPARE_FUNCS[entity_type](item, ctx, timer)
+    if payload_builder is not None:
+        timer.start()
+        plan = _enrich_or_reuse(entity_type, item, plan, ctx, payload_builder)
+        timer.lap("enrich")
+    plan[_STAGE_TIMINGS] = timer.seconds
+    return plan
+
+
+def _enrich_or_reuse(
+    entity_type: str,
+    item: Dict,
+    plan: Dict,
+    ctx: Dict,
+    payload_builder: ZabbixPayloadBuilder,
+) -> Dict:
+    state = ctx.get("fingerprints")
+    if state is None or plan.get("action") != "update":
+        return payload_builder.enrich_plan(plan)
+
+    fingerprint = entity_fingerprint(
+        entity_type, item, plan, payload_builder._hmdl_row_for_record(plan.get("zbx_record") or {}), state["config"]
+    )
+    previous = state["previous"].get(_fingerprint_key(entity_type, item.get("id", "unknown")))
+    if previous and previous.get("fingerprint") == fingerprint:
+        plan.update(previous.get("enriched") or {})
+        plan["fingerprint"] = fingerprint
+        plan["fingerprint_reused"] = True
+        plan[_FINGERPRINT_ENTRY] = previous
+        return plan
+
+    compared = dict(plan)
+    plan = payload_builder.enrich_plan(plan)
+    plan["fingerprint"] = fingerprint
+    if _is_up_to_date(plan):
+        plan[_FINGERPRINT_ENTRY] = {
+            "fingerprint": fingerprint,
+            "enriched": {
+                k: v for k, v in plan.items()
+                if k != "fingerprint" and (k not in compared or compared[k] != v)
+            },
+        }
+    return plan
+
+
+def _init_compare_worker(ctx: Optional[Dict] = None) -> None:
+    """Process-pool initializer: keep ctx + payload builder as worker globals."""
+    global _WORKER_CTX, _WORKER_BUILDER
+    if ctx is not None:
+        _WORKER_CTX = ctx
+    worker_ctx = _WORKER_CTX or {}
+    _WORKER_BUILDER = (
+        ZabbixPayloadBuilder(worker_ctx) if worker_ctx.get("payload_build_enabled", True) else None
+    )
+
+
+def _compare_chunk(chunk: List[Tuple[str, Dict]]) -> List[Tuple[Optional[Dict], Optional[str], Optional[str]]]:
+    """
+    Process-pool task: compare a chunk of (entity_type, item) pairs.
+
+    Exceptions are captured per item so one bad record does not fail the chunk.
+    Returns (plan, error_msg, traceback) per item, in input order.
+    """
+    ctx = _WORKER_CTX or {}
+    out: List[Tuple[Optional[Dict], Optional[str], Optional[str]]] = []
+    for entity_type, item in chunk:
+        try:
+            out.append((_compare_item(entity_type, item, ctx, _WORKER_BUILDER), None, None))
+        except Exception as exc:
+            out.append((None, f"{exc.__class__.__name__}: {exc}", traceback.format_exc()))
+    return out
+
+
+# Chunk size for process-pool tasks when the input length is unknown (streamed).
+STREAM_CHUNK_SIZE = 32
+
+
+def _default_chunk_size(total: Optional[int], workers: int) -> int:
+    if total is None:
+        return STREAM_CHUNK_SIZE
+    return max(1, min(64, total // (max(workers, 1) * 4)))
+
+
+def _iter_bounded(
+    executor: Any,
+    jobs: Iterator[Tuple[Any, Tuple]],
+    fn: Callable[..., Any],
+    max_in_flight: int,
+) -> Iterator[Tuple[Any, Future]]:
+    """
+    Submit fn(*args) for each (key, args) job, keeping at most max_in_flight
+    futures pending, and yield (key, future) as they finish. Jobs are pulled
+    from the iterator only when a slot frees up, and a finished future is
+    dropped once yielded, so memory stays proportional to the window.
+    """
+    pending: Dict[Future, Any] = {}
+    exhausted = False
+    while True:
+        while not exhausted and len(pending) < max_in_flight:
+            job = next(jobs, None)
+            if job is None:
+                exhausted = True
+                break
+            key, args = job
+            pending[executor.submit(fn, *args)] = key
+        if not pending:
+            return
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield pending.pop(future), future
+
+
+def _iter_process_outcomes(
+    work: Iterator[Tuple[str, Dict]],
+    ctx: Dict,
+    workers: int,
+    chunk_size: int,
+    max_in_flight: int,
+):
+    """Yield (entity_type, item, plan, error_msg, traceback) using a process pool over chunks."""
+    global _WORKER_CTX
+    methods = multiprocessing.get_all_start_methods()
+    if "fork" in methods:
+        # Children inherit ctx copy-on-write; nothing is pickled per worker.
+        _WORKER_CTX = ctx
+        mp_ctx = multiprocessing.get_context("fork")
+        initargs: Tuple = (None,)
+    else:
+        mp_ctx = multiprocessing.get_context()
+        initargs = (ctx,)
+
+    chunks = iter(lambda: list(islice(work, chunk_size)), [])
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp_ctx,
+            initializer=_init_compare_worker,
+            initargs=initargs,
+        ) as executor:
+            jobs = ((chunk, (chunk,)) for chunk in chunks)
+            for chunk, future in _iter_bounded(executor, jobs, _compare_chunk, max_in_flight):
+                try:
+                    results = future.result()
+                except Exception as exc:
+                    # Worker crashed (e.g. BrokenProcessPool): report every item in the chunk.
+                    error_msg = f"{exc.__class__.__name__}: {exc}"
+                    tb = traceback.format_exc()
+                    results = [(None, error_msg, tb)] * len(chunk)
+                for (entity_type, item), (plan, error_msg, tb) in zip(chunk, results):
+                    yield entity_type, item, plan, error_msg, tb
+    finally:
+        _WORKER_CTX = None
+
+
+def _iter_thread_outcomes(
+    work: Iterator[Tuple[str, Dict]],
+    ctx: Dict,
+    workers: int,
+    payload_builder: Optional[ZabbixPayloadBuilder],
+    max_in_flight: int,
+):
+    """Yield (entity_type, item, plan, error_msg, traceback) using a thread pool, one future per item."""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        jobs = (((entity_type, item), (entity_type, item, ctx, payload_builder)) for entity_type, item in work)
+        for (entity_type, item), future in _iter_bounded(executor, jobs, _compare_item, max_in_flight):
+            try:
+                yield entity_type, item, future.result(), None, None
+            except Exception as exc:
+                yield entity_type, item, None, f"{exc.__class__.__name__}: {exc}", traceback.format_exc()
+
+
+def _iter_work(
+    summary: Dict,
+    devices: Iterable[Dict],
+    platforms: Iterable[Dict],
+    vfws: Iterable[Dict],
+) -> Iterator[Tuple[str, Dict]]:
+    """(entity_type, item) pairs in input order, counting totals as items are pulled."""
+    for entity_type, items in (("device", devices), ("platform", platforms), ("vfw", vfws)):
+        counts = summary[f"{entity_type}s"]
+        for item in items or ():
+            counts["total"] += 1
+            yield entity_type, item
+
+
+# ---------------------------------------------------------------------------
+# Collision analysis (before Phase B)
+# ---------------------------------------------------------------------------
+
+_RESULT_KEY = {
+    "device": "current_device_result",
+    "platform": "current_platform_result",
+    "vfw": "current_vfw_result",
+}
+
+_ENTITY_ORDER = {"device": 0, "platform": 1, "vfw": 2}
+
+COLLISION_SKIP_PREFIX = "Host adı çakışması"
+
+
+def _plan_claim(entity_type: str, item_id: Any, item_name: Any, plan: Dict) -> Optional[Dict]:
+    """Names (and host) a create / update plan will own in Zabbix once Phase B runs."""
+    action = plan.get("action")
+    if action not in ("create", "update"):
+        return None
+    record = plan.get("zbx_record") or {}
+    host, name = record.get("HOSTNAME") or "", record.get("HOST_VISIBLE_NAME") or ""
+    payload = plan.get("update_payload") if action == "update" else None
+    if isinstance(payload, dict):
+        # Only what host.update actually sets; the current names are in the Zabbix maps.
+        host, name = payload.get("host") or "", payload.get("name") or ""
+    try:
+        loki_id = str(json.loads(record.get("MACROS") or "{}").get("Loki_ID") or "")
+    except (TypeError, ValueError):
+        loki_id = ""
+    return {
+        "type": entity_type,
+        "id": str(item_id),
+        "name": str(item_name),
+        "action": action,
+        "hostid": str((plan.get("zbx_existing_host") or {}).get("hostid") or ""),
+        "names": [(ns, value) for ns, value in (("host", host), ("name", name)) if value],
+        "loki_id": loki_id,
+    }
+
+
+def _claim_order(claim: Dict) -> Tuple:
+    item_id = claim["id"]
+    return (
+        claim["action"] != "update",
+        _ENTITY_ORDER.get(claim["type"], 9),
+        (0, int(item_id), "") if item_id.isdigit() else (1, 0, item_id),
+    )
+
+
+def _host_loki_id(host: Dict) -> str:
+    for tag in host.get("tags") or []:
+        if isinstance(tag, dict) and tag.get("tag") == "Loki_ID":
+            return str(tag.get("value") or "")
+    return ""
+
+
+def _existing_name_owner(claim: Dict, by_hostname: Mapping, by_visible: Mapping) -> Dict:
+    for ns, value in claim["names"]:
+        host = (by_hostname if ns == "host" else by_visible).get(value)
+        if isinstance(host, dict) and host.get("hostid"):
+            return host
+    return {}
+
+
+def _collision_skip_plan(entity_type: str, plan: Dict, reason: str) -> Dict:
+    record = plan.get("zbx_record") or {}
+    skipped = dict(plan)
+    skipped["action"] = "skip"
+    skipped["zbx_scenario"] = "skip"
+    skipped[_RESULT_KEY[entity_type]] = {
+        "hostname": record.get("HOSTNAME") or "N/A",
+        "device_role": record.get("DEVICE_ROLE") or entity_type.upper(),
+        "status": "eklenemedi",
+        "reason": f"{COLLISION_SKIP_PREFIX}: {reason}",
+        "ip": record.get("HOST_IP") or "N/A",
+        "location": record.get("REPORT_LOCATION") or "N/A",
+        "site": record.get("REPORT_SITE") or "N/A",
+        "tenant": record.get("REPORT_TENANT") or "N/A",
+        "ownership": record.get("REPORT_OWNERSHIP") or "N/A",
+    }
+    for key in ("create_payload", "update_payload", "needs_update"):
+        skipped.pop(key, None)
+    return skipped
+
+
+def resolve_plan_collisions(
+    claims: List[Dict],
+    ctx: Dict,
+    plan_store: Any,
+    payload_builder: Optional[ZabbixPayloadBuilder],
+) -> List[Dict]:
+    """
+    Settle create plans that would fail host.create with a duplicate name.
+
+    Update plans claim their host and target names first, then create plans
+    in (entity type, id) order. A create plan whose technical or visible name
+    already belongs to a Zabbix host is switched to an update of that host
+    (re_enrich_plan, as the Phase B duplicate recovery would do) unless that
+    host is network-discovered, carries another entity's Loki_ID or is already
+    claimed by another plan; those, and create plans reusing a name claimed
+    earlier in this run, are rewritten as deterministic skips.
+
+    Returns one {"type", "id", "name", "resolution", ...} record per changed plan.
+    """
+    by_hostname = ctx.get("by_hostname", {}) or {}
+    by_visible = ctx.get("by_visible", {}) or {}
+    host_owner: Dict[str, str] = {}
+    name_owner: Dict[Tuple[str, str], str] = {}
+    changes: List[Dict] = []
+
+    for claim in sorted(claims, key=_claim_order):
+        label = f"{claim['type']}:{claim['id']}"
+        if claim["action"] == "update":
+            if claim["hostid"]:
+                host_owner.setdefault(claim["hostid"], label)
+            for key in claim["names"]:
+                name_owner.setdefault(key, label)
+            continue
+
+        existing = _existing_name_owner(claim, by_hostname, by_visible)
+        hostid = str(existing.get("hostid") or "")
+        conflict = ""
+        if existing:
+            host_loki = _host_loki_id(existing)
+            if hostid in host_owner:
+                conflict = f"Zabbix host {existing.get('host', '')} ({hostid}) already planned for {host_owner[hostid]}"
+            elif _is_discovered_host(existing):
+                conflict = f"Zabbix host {existing.get('host', '')} ({hostid}) is network-discovered"
+            elif host_loki and host_loki != claim["loki_id"]:
+                conflict = f"Zabbix host {existing.get('host', '')} ({hostid}) belongs to Loki_ID {host_loki}"
+        if not conflict:
+            for ns, value in claim["names"]:
+                owner = name_owner.get((ns, value))
+                if owner:
+                    conflict = f"{'technical' if ns == 'host' else 'visible'} name {value!r} also planned by {owner}"
+                    break
+
+        plan = plan_store.get_plan(claim["type"], claim["id"])
+        if plan is None:
+            continue
+        if conflict:
+            plan_store.put_plan(claim["type"], claim["id"], _collision_skip_plan(claim["type"], plan, conflict))
+            changes.append({**{k: claim[k] for k in ("type", "id", "name")}, "resolution": "skip", "reason": conflict})
+            continue
+
+        if existing:
+            if payload_builder is not None:
+                plan = re_enrich_plan(plan, ctx, existing, payload_builder)
+            else:
+                plan.update({"action": "update", "zbx_scenario": "update", "zbx_existing_host": existing})
+            plan["collision_resolved"] = "existing_host"
+            plan_store.put_plan(claim["type"], claim["id"], plan)
+            host_owner[hostid] = label
+            changes.append({**{k: claim[k] for k in ("type", "id", "name")}, "resolution": "update", "hostid": hostid})
+        for key in claim["names"]:
+            name_owner[key] = label
+    return changes
+
+
+def _record_stage_timings(
+    samples: Dict[str, Dict[str, List[float]]],
+    timings_file: Optional[Any],
+    entity_type: str,
+    item_id: Any,
+    action: str,
+    stage_seconds: Dict[str, float],
+) -> None:
+    stage_seconds["item"] = sum(stage_seconds.values())
+    per_stage = samples.setdefault(entity_type, {})
+    for stage, seconds in stage_seconds.items():
+        per_stage.setdefault(stage, []).append(seconds)
+    if timings_file is not None:
+        timings_file.write(json.dumps({
+            "type": entity_type,
+            "id": str(item_id),
+            "action": action,
+            **{f"{stage}_ms": round(seconds * 1000.0, 3) for stage, seconds in stage_seconds.items()},
+        }, ensure_ascii=False) + "\n")
+
+
 def run_parallel_compare(
-    devices: List[Dict],
-    platforms: List[Dict],
-    vfws: List[Dict],
+    devices: Iterable[Dict],
+    platforms: Iterable[Dict],
+    vfws: Iterable[Dict],
     ctx: Dict,
     output_dir: str,
     workers: int = 20,
+    executor: str = "thread",
+    chunk_size: Optional[int] = None,
+    plan_store: Optional[Any] = None,
+    fingerprints_path: Optional[str] = None,
+    stage_timings_path: Optional[str] = None,
+    collision_check: bool = True,
+    max_in_flight: Optional[int] = None,
 ) -> Dict:
     """
-    Run compare for all entities in parallel. Write plan files.
-    Returns aggregate summary.
+    Run compare for all entities in parallel. Write plans to plan_store
+    (default: per-item plan files in output_dir). Returns aggregate summary.
+
+    devices / platforms / vfws may be lists or any iterables (e.g.
+    iter_json_array streams). Items are pulled only while fewer than
+    max_in_flight items (thread) or chunks (process) are pending — default
+    4 x workers / 2 x workers — and each plan is released once written.
+    Not bounded by the window (O(inventory)): the collision claims, one small
+    record per create / update plan kept for resolve_plan_collisions, and the
+    previous fingerprints loaded in incremental mode. This run's fingerprint
+    entries (with their enrich output) go to a temporary spool file and are
+    streamed into fingerprints_path.
+
+    summary["stage_timings"] aggregates each item's mapping / extraction /
+    resolution / enrich / serialise time per entity type (see
+    summarize_stage_timings); stage_timings_path additionally gets one JSON
+    line per item with its raw timings in milliseconds.
+
+    collision_check runs resolve_plan_collisions once all plans are written,
+    so Phase B does not meet duplicate-name host.create failures; the changed
+    plans are listed in summary["collisions"].
+
+    fingerprints_path enables incremental mode: entities whose fingerprint is
+    unchanged since the last up-to-date result skip enrich_plan, and the
+    fingerprints of this run's up-to-date entities replace the file.
+
+    executor="thread" (default) runs items on a ThreadPoolExecutor sharing ctx.
+    executor="process" runs chunks of items on a ProcessPoolExecutor; ctx is
+    inherited via fork (or pickled once per worker by the initializer) so the
+    CPU-bound compare + enrich work is spread across cores. Both modes write
+    identical plan files.
     """
+    if executor not in EXECUTOR_MODES:
+        raise ValueError(f"Unknown executor {executor!r}; expected one of {EXECUTOR_MODES}")
     os.makedirs(output_dir, exist_ok=True)
+    if plan_store is None:
+        plan_store = FilePlanStore(output_dir)
 
     summary = {
-        "devices": {"total": len(devices), "create": 0, "update": 0, "skip": 0, "error": 0},
-        "platforms": {"total": len(platforms), "create": 0, "update": 0, "skip": 0, "error": 0},
-        "vfws": {"total": len(vfws), "create": 0, "update": 0, "skip": 0, "error": 0},
+        "devices": {"total": 0, "create": 0, "update": 0, "skip": 0, "error": 0},
+        "platforms": {"total": 0, "create": 0, "update": 0, "skip": 0, "error": 0},
+        "vfws": {"total": 0, "create": 0, "update": 0, "skip": 0, "error": 0},
         "errors": [],
         "missing_groups": [],
     }
 
-    payload_builder = ZabbixPayloadBuilder(ctx) if ctx.get("payload_build_enabled", True) else None
     all_missing_groups: Set[str] = set()
+    fingerprint_spool: Optional[Any] = None
+    if fingerprints_path:
+        fingerprint_spool = tempfile.TemporaryFile("w+", encoding="utf-8", dir=output_dir)
+        ctx = dict(ctx)
+        ctx["fingerprints"] = {"config": config_fingerprint(ctx), "previous": load_fingerprints(fingerprints_path)}
+        summary["fingerprints"] = {"reused": 0, "stored": 0}
+
+    started = time.perf_counter()
+    timing_samples: Dict[str, Dict[str, List[float]]] = {}
+    timings_file = open(stage_timings_path, "w", encoding="utf-8") if stage_timings_path else None
+
+    work = _iter_work(summary, devices, platforms, vfws)
+    try:
+        known_total: Optional[int] = sum(len(items) for items in (devices, platforms, vfws))  # type: ignore[arg-type]
+    except TypeError:
+        known_total = None
+
+    payload_builder: Optional[ZabbixPayloadBuilder] = None
+    claims: List[Dict] = []
+    if executor == "process":
+        outcomes = _iter_process_outcomes(
+            work, ctx, workers, chunk_size or _default_chunk_size(known_total, workers),
+            max_in_flight or max(workers, 1) * 2,
+        )
+    else:
+        payload_builder = ZabbixPayloadBuilder(ctx) if ctx.get("payload_build_enabled", True) else None
+        outcomes = _iter_thread_outcomes(work, ctx, workers, payload_builder, max_in_flight or max(workers, 1) * 4)
 
-    futures = {}
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        for device in devices:
-            f = executor.submit(compare_one_device, device, ctx)
-            futures[f] = ("device", device.get("id", "unknown"), device.get("name", "unknown"))
-
-        for platform in platforms:
-            f = executor.submit(compare_one_platform, platform, ctx)
-            futures[f] = ("platform", platform.get("id", "unknown"), platform.get("name") or platform.get("display", "unknown"))
-
-        for vfw in vfws:
-            f = executor.submit(compare_one_vfw, vfw, ctx)
-            futures[f] = ("vfw", vfw.get("id", "unknown"), vfw.get("hostname", "unknown"))
-
-        for future in as_completed(futures):
-            entity_type, item_id, item_name = futures[future]
+    for entity_type, item, plan, error_msg, tb in outcomes:
+        _, item_id, item_name = _item_meta(entity_type, item)
+        if error_msg is None:
             try:
-                plan = future.result()
-                if payload_builder is not None:
-                    plan = payload_builder.enrich_plan(plan)
+                stage_seconds = plan.pop(_STAGE_TIMINGS, None) or {}
+                entry = plan.pop(_FINGERPRINT_ENTRY, None)
+                if entry is not None:
+                    fingerprint_spool.write(
+                        json.dumps([_fingerprint_key(entity_type, item_id), entry], ensure_ascii=False) + "\n"
+                    )
+                    if plan.get("fingerprint_reused"):
+                        summary["fingerprints"]["reused"] += 1
                 for grp in plan.get("missing_groups") or []:
                     if grp:
                         all_missing_groups.add(str(grp))
@@ -1248,60 +2047,79 @@ def run_parallel_compare(
                 )
                 summary[f"{entity_type}s"][action if action in ("create", "update", "skip") else "skip"] += 1
 
-                # Write plan file
-                if entity_type == "device":
-                    plan_path = os.path.join(output_dir, f"device_plan_{item_id}.json")
-                elif entity_type == "platform":
-                    plan_path = os.path.join(output_dir, f"platform_plan_{item_id}.json")
-                else:
-                    plan_path = os.path.join(output_dir, f"vfw_plan_{item_id}.json")
-                with open(plan_path, "w", encoding="utf-8") as f_out:
-                    json.dump(plan, f_out, ensure_ascii=False)
+                claim = _plan_claim(entity_type, item_id, item_name, plan) if collision_check else None
+                if claim is not None:
+                    claims.append(claim)
 
+                serialise_start = time.perf_counter()
+                plan_store.put_plan(entity_type, item_id, plan)
+                stage_seconds["serialise"] = time.perf_counter() - serialise_start
+                _record_stage_timings(timing_samples, timings_file, entity_type, item_id, action, stage_seconds)
+                continue
             except Exception as exc:
                 tb = traceback.format_exc()
                 error_msg = f"{exc.__class__.__name__}: {exc}"
-                _progress(entity_type, item_id, item_name, "error", error=error_msg)
-                summary[f"{entity_type}s"]["error"] += 1
-                summary["errors"].append({
-                    "type": entity_type,
-                    "id": str(item_id),
-                    "name": item_name,
-                    "error": error_msg,
-                    "traceback": tb,
-                })
-                # Write error plan so apply phase can skip gracefully
-                error_plan = {
-                    "action": "skip",
-                    f"{entity_type}_id": str(item_id),
-                    "zbx_record": {},
-                    "zbx_existing_host": {},
-                    "zbx_scenario": "skip",
-                    "current_result": {
-                        "hostname": str(item_name),
-                        "device_role": entity_type.upper(),
-                        "status": "eklenemedi",
-                        "reason": f"Compare error: {error_msg}",
-                        "ip": "N/A",
-                        "location": "N/A",
-                        "site": "N/A",
-                        "tenant": "N/A",
-                        "ownership": "N/A",
-                    },
-                }
-                try:
-                    if entity_type == "device":
-                        plan_path = os.path.join(output_dir, f"device_plan_{item_id}.json")
-                    elif entity_type == "platform":
-                        plan_path = os.path.join(output_dir, f"platform_plan_{item_id}.json")
-                    else:
-                        plan_path = os.path.join(output_dir, f"vfw_plan_{item_id}.json")
-                    with open(plan_path, "w", encoding="utf-8") as f_out:
-                        json.dump(error_plan, f_out, ensure_ascii=False)
-                except Exception:
-                    pass
+
+        _progress(entity_type, item_id, item_name, "error", error=error_msg)
+        summary[f"{entity_type}s"]["error"] += 1
+        summary["errors"].append({
+            "type": entity_type,
+            "id": str(item_id),
+            "name": item_name,
+            "error": error_msg,
+            "traceback": tb,
+        })
+        # Write error plan so apply phase can skip gracefully
+        error_plan = {
+            "action": "skip",
+            f"{entity_type}_id": str(item_id),
+            "zbx_record": {},
+            "zbx_existing_host": {},
+            "zbx_scenario": "skip",
+            "current_result": {
+                "hostname": str(item_name),
+                "device_role": entity_type.upper(),
+                "status": "eklenemedi",
+                "reason": f"Compare error: {error_msg}",
+                "ip": "N/A",
+                "location": "N/A",
+                "site": "N/A",
+                "tenant": "N/A",
+                "ownership": "N/A",
+            },
+        }
+        try:
+            plan_store.put_plan(entity_type, item_id, error_plan)
+        except Exception:
+            pass
+    if timings_file is not None:
+        timings_file.close()
+
+    if collision_check:
+        if payload_builder is None and ctx.get("payload_build_enabled", True):
+            payload_builder = ZabbixPayloadBuilder(ctx)
+        changes = resolve_plan_collisions(claims, ctx, plan_store, payload_builder)
+        for change in changes:
+            counts = summary[f"{change['type']}s"]
+            counts["create"] -= 1
+            counts[change["resolution"]] += 1
+            _progress(change["type"], change["id"], change["name"], change["resolution"])
+        summary["collisions"] = {
+            "adopted": sum(1 for c in changes if c["resolution"] == "update"),
+            "skipped": sum(1 for c in changes if c["resolution"] == "skip"),
+            "changes": changes,
+        }
+    plan_store.flush()
+
+    if fingerprint_spool is not None:
+        with fingerprint_spool:
+            summary["fingerprints"]["stored"] = save_fingerprints(
+                fingerprints_path, _iter_spooled_fingerprints(fingerprint_spool)
+            )
 
     summary["missing_groups"] = sorted(all_missing_groups)
+    summary["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    summary["stage_timings"] = summarize_stage_timings(timing_samples)
     summary_path = os.path.join(output_dir, "compare_summary.json")
     with open(summary_path, "w", encoding="utf-8") as f_sum:
         json.dump(summary, f_sum, ensure_ascii=False, indent=2)
@@ -1324,6 +2142,73 @@ def _load_json_file(path: Optional[str], default: Any = None) -> Any:
         return json.load(f)
 
 
+_JSON_WS = " \t\n\r"
+
+
+def iter_json_array(path: Optional[str], block_size: int = 1 << 16) -> Iterator[Any]:
+    """
+    Yield the elements of a top-level JSON array file one at a time.
+
+    Only one read block plus the element being decoded are held in memory. A
+    missing path, an empty file or a JSON null yields nothing, like
+    _load_json_file(path, []) would return [].
+    """
+    if not path or not os.path.exists(path):
+        return
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as f:
+        buf, pos, eof = "", 0, False
+
+        def read_more() -> None:
+            nonlocal buf, pos, eof
+            block = f.read(block_size)
+            buf, pos, eof = buf[pos:] + block, 0, not block
+
+        def peek() -> str:
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in _JSON_WS:
+                    pos += 1
+                if pos < len(buf):
+                    return buf[pos]
+                if eof:
+                    return ""
+                read_more()
+
+        first = peek()
+        if first in ("", "n"):
+            return
+        if first != "[":
+            raise ValueError(f"{path}: expected a JSON array")
+        pos += 1
+        if peek() == "]":
+            return
+        while True:
+            peek()
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                    # Objects, arrays and strings end on their closing character; a
+                    # number is only complete once a delimiter follows it.
+                    if eof or isinstance(value, (dict, list, str)) or (
+                        end < len(buf) and buf[end] in _JSON_WS + ",]"
+                    ):
+                        break
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                read_more()
+            pos = end
+            yield value
+            sep = peek()
+            if sep == ",":
+                pos += 1
+            elif sep == "]":
+                return
+            else:
+                raise ValueError(f"{path}: expected ',' or ']' after array element, got {sep or 'EOF'!r}")
+
+
 def _load_yaml_file(path: Optional[str], default: Any = None) -> Any:
     if not path or not os.path.exists(path):
         return default
@@ -1340,6 +2225,47 @@ def _load_yaml_file(path: Optional[str], default: Any = None) -> Any:
             return default
 
 
+def load_mapping_ctx(mappings_dir: str) -> Dict:
+    """
+    The mappings/ part of the compare ctx: YAML configs plus their compiled
+    forms (device type index, host group / tag extraction plans). Zabbix caches,
+    host maps and run flags are added by the caller.
+    """
+    device_type_mapping = _load_yaml_file(
+        os.path.join(mappings_dir, "netbox_device_type_mapping.yml"), {}
+    )
+    host_groups_config = _load_yaml_file(os.path.join(mappings_dir, "host_groups_config.yml"))
+    tags_config = _load_yaml_file(os.path.join(mappings_dir, "tags_config.yml"))
+    platform_tags_config = _load_yaml_file(
+        os.path.join(mappings_dir, "platform_tags_config.yml"), {}
+    )
+    vfw_tags_config = _load_yaml_file(
+        os.path.join(mappings_dir, "virtual_fw_tags_config.yml"), {}
+    )
+    return {
+        "device_type_mapping": device_type_mapping,
+        "device_type_index": compile_device_type_mapping(device_type_mapping),
+        "host_groups_config": host_groups_config,
+        "host_groups_plan": HostGroupsPlan(host_groups_config),
+        "tags_config": tags_config,
+        "tags_plan": TagsPlan(tags_config),
+        "templates_map": _load_yaml_file(os.path.join(mappings_dir, "templates.yml"), {}),
+        "platform_mapping": _load_yaml_file(os.path.join(mappings_dir, "netbox_platform_mapping.yml"), {}),
+        "vfw_mapping": _load_yaml_file(os.path.join(mappings_dir, "virtual_fw_mapping.yml"), {}),
+        "template_type_map": _load_yaml_file(os.path.join(mappings_dir, "template_types.yml"), {}),
+        "platform_managed_tag_keys": (
+            platform_tags_config.get("platform_tags", {}).get("managed_keys", [])
+            if isinstance(platform_tags_config, dict)
+            else []
+        ),
+        "vfw_managed_tag_keys": (
+            vfw_tags_config.get("virtual_fw_tags", {}).get("managed_keys", [])
+            if isinstance(vfw_tags_config, dict)
+            else []
+        ),
+    }
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Parallel compare engine for Zabbix-NetBox sync Phase A"
@@ -1358,38 +2284,63 @@ def main():
     parser.add_argument("--zbx-hosts-hostname-map", help="Path to Zabbix hosts by hostname JSON")
     parser.add_argument("--zbx-hosts-visible-map", help="Path to Zabbix hosts by visible_name JSON")
     parser.add_argument("--zbx-hosts-ip-map", help="Path to Zabbix hosts by primary interface IP JSON")
+    parser.add_argument(
+        "--zbx-host-index",
+        help="Zabbix host index from zabbix_host_index.py (replaces the four --zbx-hosts-*-map files)",
+    )
     parser.add_argument("--hmdl-baseline-map", help="Path to HMDL baseline map JSON")
     parser.add_argument("--output-dir", default="/tmp", help="Directory to write plan files (default: /tmp)")
+    parser.add_argument(
+        "--plan-store",
+        choices=PLAN_STORE_BACKENDS,
+        default="files",
+        help="files: one <entity>_plan_<id>.json per item; jsonl: one indexed append-only file (default: files)",
+    )
+    parser.add_argument("--plan-store-path", help="jsonl plan store file (default: <output-dir>/plan_store.jsonl)")
+    parser.add_argument(
+        "--fingerprints",
+        help="Incremental mode: fingerprint file of the last run; unchanged up-to-date entities skip enrich",
+    )
     parser.add_argument("--workers", type=int, default=20, help="Max parallel compare workers (default: 20)")
-    parser.add_argument("--create-devices-disabled", action="store_true")
-    parser.add_argument("--create-platforms-disabled", action="store_true")
-    parser.add_argument("--create-vfws-disabled", action="store_true")
-    args = parser.parse_args()
-
-    mappings_dir = args.mappings_dir
-
-    # Load mapping configs
-    device_type_mapping = _load_yaml_file(
-        os.path.join(mappings_dir, "netbox_device_type_mapping.yml"), {}
+    parser.add_argument(
+        "--executor",
+        choices=EXECUTOR_MODES,
+        default="thread",
+        help="thread: shared-memory ThreadPoolExecutor; process: multi-core ProcessPoolExecutor (default: thread)",
     )
-    host_groups_config = _load_yaml_file(os.path.join(mappings_dir, "host_groups_config.yml"))
-    tags_config = _load_yaml_file(os.path.join(mappings_dir, "tags_config.yml"))
-    templates_map = _load_yaml_file(os.path.join(mappings_dir, "templates.yml"), {})
-    platform_mapping = _load_yaml_file(
-        os.path.join(mappings_dir, "netbox_platform_mapping.yml"), {}
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=0,
+        help="Items per process-pool task (default: auto)",
     )
-    vfw_mapping = _load_yaml_file(
-        os.path.join(mappings_dir, "virtual_fw_mapping.yml"), {}
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=0,
+        help="Max pending items (thread) / chunks (process) (default: 4 x / 2 x workers)",
     )
-    template_type_map = _load_yaml_file(
-        os.path.join(mappings_dir, "template_types.yml"), {}
+    parser.add_argument("--create-devices-disabled", action="store_true")
+    parser.add_argument("--create-platforms-disabled", action="store_true")
+    parser.add_argument("--create-vfws-disabled", action="store_true")
+    parser.add_argument(
+        "--minimal-update-payload",
+        action="store_true",
+        help="Leave components that already match the Zabbix host out of update_payload",
     )
-    platform_tags_config = _load_yaml_file(
-        os.path.join(mappings_dir, "platform_tags_config.yml"), {}
+    parser.add_argument(
+        "--no-collision-check",
+        action="store_true",
+        help="Leave duplicate-name create plans to Phase B duplicate recovery",
     )
-    vfw_tags_config = _load_yaml_file(
-        os.path.join(mappings_dir, "virtual_fw_tags_config.yml"), {}
+    parser.add_argument(
+        "--stage-timings-jsonl",
+        action="store_true",
+        help=f"Also write per-item stage timings to <output-dir>/{STAGE_TIMINGS_FILENAME}",
     )
+    args = parser.parse_args()
+
+    mapping_ctx = load_mapping_ctx(args.mappings_dir)
 
     template_id_cache = _load_json_file(args.zbx_templates_cache, {}) or {}
     group_id_cache = _load_json_file(args.zbx_groups_cache, {}) or {}
@@ -1401,18 +2352,21 @@ def main():
     hmdl_baseline_map = _load_json_file(args.hmdl_baseline_map, {}) or {}
 
     # Load Zabbix host maps
-    by_loki = _load_json_file(args.zbx_hosts_loki_map, {})
-    by_hostname = _load_json_file(args.zbx_hosts_hostname_map, {})
-    by_visible = _load_json_file(args.zbx_hosts_visible_map, {})
-    by_ip = _load_json_file(args.zbx_hosts_ip_map, {})
+    if args.zbx_host_index:
+        # Only the prefetch task (zabbix_host_prefetch_python) ships zabbix_host_index.py.
+        from zabbix_host_index import load_host_maps
+
+        host_maps = load_host_maps(args.zbx_host_index)
+        by_loki, by_hostname = host_maps["by_loki"], host_maps["by_hostname"]
+        by_visible, by_ip = host_maps["by_visible"], host_maps["by_ip"]
+    else:
+        by_loki = _load_json_file(args.zbx_hosts_loki_map, {})
+        by_hostname = _load_json_file(args.zbx_hosts_hostname_map, {})
+        by_visible = _load_json_file(args.zbx_hosts_visible_map, {})
+        by_ip = _load_json_file(args.zbx_hosts_ip_map, {})
 
     ctx: Dict = {
-        "device_type_mapping": device_type_mapping,
-        "host_groups_config": host_groups_config,
-        "tags_config": tags_config,
-        "templates_map": templates_map,
-        "platform_mapping": platform_mapping,
-        "vfw_mapping": vfw_mapping,
+        **mapping_ctx,
         "by_loki": by_loki or {},
         "by_hostname": by_hostname or {},
         "by_visible": by_visible or {},
@@ -1420,46 +2374,50 @@ def main():
         "create_devices_disabled": args.create_devices_disabled,
         "create_platforms_disabled": args.create_platforms_disabled,
         "create_virtual_fws_disabled": args.create_vfws_disabled,
-        "template_type_map": template_type_map,
         "template_id_cache": template_id_cache,
         "group_id_cache": group_id_cache,
         "proxy_group_config": proxy_group_config,
         "hmdl_baseline_map": hmdl_baseline_map,
-        "platform_managed_tag_keys": (
-            platform_tags_config.get("platform_tags", {}).get("managed_keys", [])
-            if isinstance(platform_tags_config, dict)
-            else []
-        ),
-        "vfw_managed_tag_keys": (
-            vfw_tags_config.get("virtual_fw_tags", {}).get("managed_keys", [])
-            if isinstance(vfw_tags_config, dict)
-            else []
-        ),
         "payload_build_enabled": True,
+        "minimal_update_payload": args.minimal_update_payload,
     }
 
-    devices = _load_json_file(args.devices_json, []) or []
-    platforms = _load_json_file(args.platforms_json, []) or []
-    vfws = _load_json_file(args.vfws_json, []) or []
+    # Streamed: item counts are only known at the end (summary line).
+    devices = iter_json_array(args.devices_json)
+    platforms = iter_json_array(args.platforms_json)
+    vfws = iter_json_array(args.vfws_json)
 
-    total = len(devices) + len(platforms) + len(vfws)
     print(json.dumps({
         "type": "start",
-        "devices": len(devices),
-        "platforms": len(platforms),
-        "vfws": len(vfws),
         "workers": args.workers,
-        "total": total,
+        "executor": args.executor,
+        "max_in_flight": args.max_in_flight or None,
+        "plan_store": args.plan_store,
+        "incremental": bool(args.fingerprints),
     }, ensure_ascii=False), flush=True)
 
-    summary = run_parallel_compare(
-        devices=devices,
-        platforms=platforms,
-        vfws=vfws,
-        ctx=ctx,
-        output_dir=args.output_dir,
-        workers=args.workers,
+    store_location = (
+        args.output_dir if args.plan_store == "files"
+        else args.plan_store_path or os.path.join(args.output_dir, "plan_store.jsonl")
     )
+    with open_plan_store(args.plan_store, store_location, truncate=True) as plan_store:
+        summary = run_parallel_compare(
+            devices=devices,
+            platforms=platforms,
+            vfws=vfws,
+            ctx=ctx,
+            output_dir=args.output_dir,
+            workers=args.workers,
+            executor=args.executor,
+            chunk_size=args.chunk_size or None,
+            plan_store=plan_store,
+            fingerprints_path=args.fingerprints,
+            stage_timings_path=(
+                os.path.join(args.output_dir, STAGE_TIMINGS_FILENAME) if args.stage_timings_jsonl else None
+            ),
+            collision_check=not args.no_collision_check,
+            max_in_flight=args.max_in_flight or None,
+        )
 
     print(json.dumps({"type": "summary", **summary}, ensure_ascii=False), flush=True)
 
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Plan store for the Phase A / Phase B hand-off of Zabbix-NetBox sync.
+
+Phase A (parallel_compare_engine.py) writes one plan per entity, Phase B
+(zabbix_apply_engine.py) reads it back and writes one result per entity, and
+main.yml aggregates the results. Two interchangeable backends:
+
+  files — compatibility layout, one JSON file per plan / result:
+            <dir>/<entity>_plan_<id>.json
+            <dir>/zabbix_host_operation_result_<id>.json (platform / vfw prefixes alike)
+  jsonl — one append-only JSON-lines file plus an offset index
+          (<path>.idx). A rewritten plan or result is appended again and the
+          index points at the newest copy. The index is rebuilt from the data
+          file when it is missing or stale (e.g. after a crash).
+
+Both backends expose the same put_plan / get_plan / put_result / get_result /
+iter_results methods, so callers never see the layout.
+
+CLI (result aggregation for main.yml):
+  python3 plan_store.py --backend jsonl --location /tmp/plan_store.jsonl \\
+      results --entity-type device --output /tmp/device_results_all.json
+
+Exit codes:
+  0 — success
+  2 — invalid arguments
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+PLAN_STORE_BACKENDS = ("files", "jsonl")
+
+ENTITY_TYPES = ("device", "platform", "vfw")
+
+RESULT_FILE_PREFIX = {
+    "device": "zabbix_host_operation_result_",
+    "platform": "zabbix_platform_operation_result_",
+    "vfw": "zabbix_vfw_operation_result_",
+}
+
+PLAN = "plan"
+RESULT = "result"
+
+
+def _check_entity_type(entity_type: str) -> None:
+    if entity_type not in ENTITY_TYPES:
+        raise ValueError(f"Unknown entity type {entity_type!r}; expected one of {ENTITY_TYPES}")
+
+
+# ---------------------------------------------------------------------------
+# files backend (compatibility layout)
+# ---------------------------------------------------------------------------
+
+class FilePlanStore:
+    """One JSON file per plan and per result, as written before the store existed."""
+
+    backend = "files"
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def plan_path(self, entity_type: str, item_id: Any) -> str:
+        return os.path.join(self.directory, f"{entity_type}_plan_{item_id}.json")
+
+    def result_path(self, entity_type: str, item_id: Any) -> str:
+        return os.path.join(self.directory, f"{RESULT_FILE_PREFIX[entity_type]}{item_id}.json")
+
+    def plan_location(self, entity_type: str, item_id: Any) -> str:
+        return self.plan_path(entity_type, item_id)
+
+    @staticmethod
+    def _write(path: str, data: Dict) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    @staticmethod
+    def _read(path: str) -> Optional[Dict]:
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def put_plan(self, entity_type: str, item_id: Any, plan: Dict) -> None:
+        _check_entity_type(entity_type)
+        self._write(self.plan_path(entity_type, item_id), plan)
+
+    def get_plan(self, entity_type: str, item_id: Any) -> Optional[Dict]:
+        _check_entity_type(entity_type)
+        return self._read(self.plan_path(entity_type, item_id))
+
+    def put_result(self, entity_type: str, item_id: Any, result: Dict) -> None:
+        _check_entity_type(entity_type)
+        self._write(self.result_path(entity_type, item_id), result)
+
+    def get_result(self, entity_type: str, item_id: Any) -> Optional[Dict]:
+        _check_entity_type(entity_type)
+        return self._read(self.result_path(entity_type, item_id))
+
+    def iter_results(self, entity_type: str) -> Iterator[Tuple[str, Dict]]:
+        _check_entity_type(entity_type)
+        prefix = RESULT_FILE_PREFIX[entity_type]
+        for path in sorted(glob.glob(os.path.join(self.directory, f"{prefix}*.json"))):
+            item_id = os.path.basename(path)[len(prefix):-len(".json")]
+            data = self._read(path)
+            if data is not None:
+                yield item_id, data
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "FilePlanStore":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+# ---------------------------------------------------------------------------
+# jsonl backend (single append-only file + offset index)
+# ---------------------------------------------------------------------------
+
+class JsonlPlanStore:
+    """
+    Append-only JSON-lines store with an in-memory offset index.
+
+    Each line is {"kind": "plan"|"result", "type": <entity>, "id": <str>, "data": {...}}.
+    Lookups seek straight to the newest line for (kind, type, id); the index is
+    persisted to <path>.idx on flush()/close() together with the data size it
+    covers, so a reader opening the store later skips the rescan.
+    Thread-safe within one process; one writer process at a time.
+    """
+
+    backend = "jsonl"
+
+    def __init__(self, path: str, truncate: bool = False) -> None:
+        self.path = path
+        self.index_path = f"{path}.idx"
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        if truncate:
+            for stale in (path, self.index_path):
+                if os.path.exists(stale):
+                    os.remove(stale)
+        self._fh = open(path, "a+b")
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._index: Dict[Tuple[str, str, str], Tuple[int, int]] = {}
+        self._load_index()
+
+    # -- index ---------------------------------------------------------------
+
+    def _load_index(self) -> None:
+        size = os.path.getsize(self.path)
+        if size == 0:
+            return
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("size") == size:
+                self._index = {
+                    (kind, entity_type, item_id): (offset, length)
+                    for kind, entity_type, item_id, offset, length in saved.get("entries") or []
+                }
+                return
+        except (OSError, ValueError, TypeError):
+            pass
+        self._rebuild_index()
+
+    def _rebuild_index(self) -> None:
+        self._index = {}
+        offset = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                length = len(line)
+                if line.endswith(b"\n"):
+                    try:
+                        rec = json.loads(line)
+                        self._index[(rec["kind"], rec["type"], str(rec["id"]))] = (offset, length)
+                    except (ValueError, KeyError, TypeError):
+                        pass
+                offset += length
+
+    def _save_index(self) -> None:
+        entries = [[k[0], k[1], k[2], off, length] for k, (off, length) in self._index.items()]
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"size": os.path.getsize(self.path), "entries": entries}, f)
+        os.replace(tmp_path, self.index_path)
+
+    # -- raw access ------------------------------------------------------------
+
+    def _append(self, kind: str, entity_type: str, item_id: Any, data: Dict) -> None:
+        _check_entity_type(entity_type)
+        key = (kind, entity_type, str(item_id))
+        line = (json.dumps(
+            {"kind": kind, "type": entity_type, "id": key[2], "data": data}, ensure_ascii=False
+        ) + "\n").encode("utf-8")
+        with self._lock:
+            self._fh.seek(0, os.SEEK_END)
+            offset = self._fh.tell()
+            self._fh.write(line)
+            self._dirty = True
+            self._index[key] = (offset, len(line))
+
+    def _get(self, kind: str, entity_type: str, item_id: Any) -> Optional[Dict]:
+        _check_entity_type(entity_type)
+        with self._lock:
+            loc = self._index.get((kind, entity_type, str(item_id)))
+            if loc is None:
+                return None
+            if self._dirty:
+                self._fh.flush()
+                self._dirty = False
+            self._fh.seek(loc[0])
+            line = self._fh.read(loc[1])
+        return json.loads(line)["data"]
+
+    def _ids(self, kind: str, entity_type: str) -> List[str]:
+        with self._lock:
+            keyed = [(loc[0], key[2]) for key, loc in self._index.items() if key[0] == kind and key[1] == entity_type]
+        return [item_id for _, item_id in sorted(keyed)]
+
+    # -- public API ------------------------------------------------------------
+
+    def plan_location(self, entity_type: str, item_id: Any) -> str:
+        return f"{self.path}#{entity_type}/{item_id}"
+
+    def put_plan(self, entity_type: str, item_id: Any, plan: Dict) -> None:
+        self._append(PLAN, entity_type, item_id, plan)
+
+    def get_plan(self, entity_type: str, item_id: Any) -> Optional[Dict]:
+        return self._get(PLAN, entity_type, item_id)
+
+    def put_result(self, entity_type: str, item_id: Any, result: Dict) -> None:
+        self._append(RESULT, entity_type, item_id, result)
+
+    def get_result(self, entity_type: str, item_id: Any) -> Optional[Dict]:
+        return self._get(RESULT, entity_type, item_id)
+
+    def plan_ids(self, entity_type: str) -> List[str]:
+        """Ids with a plan, in the order their newest plan was written."""
+        return self._ids(PLAN, entity_type)
+
+    def iter_results(self, entity_type: str) -> Iterator[Tuple[str, Dict]]:
+        _check_entity_type(entity_type)
+        for item_id in self._ids(RESULT, entity_type):
+            data = self._get(RESULT, entity_type, item_id)
+            if data is not None:
+                yield item_id, data
+
+    def flush(self) -> None:
+        with self._lock:
+            self._fh.flush()
+            self._dirty = False
+            self._save_index()
+
+    def close(self) -> None:
+        if self._fh.closed:
+            return
+        self.flush()
+        self._fh.close()
+
+    def __enter__(self) -> "JsonlPlanStore":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def open_plan_store(backend: str, location: str, truncate: bool = False) -> Any:
+    """
+    Open a plan store.
+
+    backend="files": location is the directory holding the per-item JSON files.
+    backend="jsonl": location is the data file path (index kept at <location>.idx);
+    truncate=True starts a fresh store (Phase A), False appends to it (Phase B).
+    """
+    if backend == "files":
+        return FilePlanStore(location)
+    if backend == "jsonl":
+        return JsonlPlanStore(location, truncate=truncate)
+    raise ValueError(f"Unknown plan store backend {backend!r}; expected one of {PLAN_STORE_BACKENDS}")
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Read Zabbix-NetBox sync plans / results from a plan store")
+    parser.add_argument("--backend", choices=PLAN_STORE_BACKENDS, default="files")
+    parser.add_argument("--location", required=True, help="Plan directory (files) or data file path (jsonl)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_results = sub.add_parser("results", help="Write all results of one entity type as a JSON array")
+    p_results.add_argument("--entity-type", choices=ENTITY_TYPES, required=True)
+    p_results.add_argument("--output", required=True)
+
+    p_plan = sub.add_parser("plan", help="Print one plan as JSON ({} when missing)")
+    p_plan.add_argument("--entity-type", choices=ENTITY_TYPES, required=True)
+    p_plan.add_argument("--id", required=True)
+    args = parser.parse_args()
+
+    with open_plan_store(args.backend, args.location) as store:
+        if args.command == "results":
+            results = [result for _, result in store.iter_results(args.entity_type) if result]
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False)
+            print(json.dumps({"type": "results", "entity_type": args.entity_type, "count": len(results)}), flush=True)
+        else:
+            print(json.dumps(store.get_plan(args.entity_type, args.id) or {}, ensure_ascii=False), flush=True)
+
+
+if __name__ == "__main__":
+    main()
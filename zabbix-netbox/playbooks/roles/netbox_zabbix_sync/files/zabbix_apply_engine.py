@@ -0,0 +1,832 @@
+#!/usr/bin/env python3
+"""
+Phase B apply engine for Zabbix-NetBox sync.
+
+Python replacement for the sequential Ansible apply loops
+(process_device_apply.yml / process_platform_apply.yml / process_virtual_fw_apply.yml).
+Reads the plans written by parallel_compare_engine.py and POSTs the ready
+host.create / host.update payloads over one pooled HTTP session with a bounded
+number of in-flight requests.
+
+Per item it writes the same result record the Ansible tasks write today:
+  zabbix_host_operation_result_<id>.json      — devices
+  zabbix_platform_operation_result_<id>.json  — platforms
+  zabbix_vfw_operation_result_<id>.json       — virtual firewalls
+
+With --plan-store jsonl, plans are read from and results appended to the
+single indexed plan store file instead (see plan_store.py).
+
+VFW duplicate host.create recovery (re-resolve from the prefetch host maps,
+re_enrich_plan as update, host.update) runs in-process with the payload builder
+context loaded once.
+
+With --batch-size N the pending writes are packed N per JSON-RPC 2.0 batch
+request; responses are mapped back to their plan by id and a failed element
+only fails its own host.
+
+With --coalesce-updates, group additions and proxy switches shared by several
+update plans are sent once as host.massadd / host.massupdate; deltas unique to
+one host (tags, interfaces, names) stay on per-host host.update.
+
+Additionally writes apply_results.jsonl (one record per item with request,
+response and plan metadata) and apply_summary.json (status counts).
+
+The Zabbix auth token is read from the ZABBIX_AUTH environment variable.
+
+Exit codes:
+  0 — all items processed (some may have failed at the Zabbix API level)
+  1 — one or more items raised an unhandled exception
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from plan_store import PLAN_STORE_BACKENDS, FilePlanStore, open_plan_store
+from zabbix_jsonrpc import ZabbixJsonRpcClient
+from zabbix_payload_builder import ZabbixPayloadBuilder, _load_builder_ctx_from_args, re_enrich_plan
+
+ENTITY_TYPES = ("device", "platform", "vfw")
+
+RESULT_KEY = {
+    "device": "current_device_result",
+    "platform": "current_platform_result",
+    "vfw": "current_vfw_result",
+}
+
+DEVICE_ROLE = {"platform": "PLATFORM", "vfw": "VIRTUAL_FW"}
+
+DUPLICATE_MARKER = "already exists"
+
+
+# ---------------------------------------------------------------------------
+# Result record helpers (mirror the set_fact blocks of process_*_apply.yml)
+# ---------------------------------------------------------------------------
+
+def _get(mapping: Dict, key: str, default: Any, if_falsy: bool = False) -> Any:
+    """Jinja default() semantics: default(x) for missing keys, default(x, true) also for falsy."""
+    if key not in mapping:
+        return default
+    value = mapping[key]
+    if if_falsy and not value:
+        return default
+    return value
+
+
+def _item_name(entity_type: str, item: Dict) -> str:
+    if entity_type == "device":
+        return str(item.get("name") or "")
+    if entity_type == "platform":
+        return str(item.get("name") or item.get("display") or "")
+    return str(item.get("hostname") or item.get("name") or "")
+
+
+def _base_result(entity_type: str, plan: Dict, item: Dict, status: str, reason: str, operation: str) -> Dict:
+    rec = plan.get("zbx_record") or {}
+    if entity_type == "device":
+        return {
+            "hostname": _get(rec, "HOSTNAME", item.get("name", "")),
+            "device_role": _get(rec, "DEVICE_ROLE", "N/A"),
+            "status": status,
+            "reason": reason,
+            "ip": _get(rec, "HOST_IP", "N/A"),
+            "location": _get(rec, "REPORT_LOCATION", "N/A", True),
+            "site": _get(rec, "REPORT_SITE", "N/A", True),
+            "tenant": _get(rec, "REPORT_TENANT", "N/A", True),
+            "ownership": _get(rec, "REPORT_OWNERSHIP", "N/A", True),
+            "planned_operation": operation,
+        }
+    return {
+        "hostname": _get(rec, "HOSTNAME", ""),
+        "device_role": DEVICE_ROLE[entity_type],
+        "status": status,
+        "reason": reason,
+        "ip": _get(rec, "HOST_IP", "N/A"),
+        "location": _get(rec, "REPORT_LOCATION", "N/A"),
+        "site": _get(rec, "REPORT_SITE", "N/A"),
+        "tenant": "N/A",
+        "ownership": "N/A",
+        "planned_operation": operation,
+    }
+
+
+def _error_data(error: Dict) -> str:
+    data = error.get("data", "")
+    return str(data if data is not None else "").strip()
+
+
+def _failure_reason(entity_type: str, error: Dict, method: str) -> str:
+    message = error.get("message") or f"{method} failed"
+    data = _error_data(error)
+    if entity_type == "vfw":
+        if method == "host.create" and "data" in error and str(error.get("data")):
+            return f"{message} — {error.get('data')}"
+        return message
+    return data if data else message
+
+
+def _failure_result(entity_type: str, plan: Dict, item: Dict, error: Dict, method: str, operation: str) -> Dict:
+    result = _base_result(
+        entity_type, plan, item, "eklenemedi", _failure_reason(entity_type, error, method), operation
+    )
+    if entity_type != "vfw":
+        result["error_data"] = _error_data(error)
+        result["update_reasons"] = plan.get("update_reasons") or []
+    return result
+
+
+def _missing_plan_result(entity_type: str, item: Dict, plan_path: str) -> Dict:
+    return {
+        "hostname": _item_name(entity_type, item) or "Unknown",
+        "device_role": DEVICE_ROLE.get(entity_type, "N/A"),
+        "status": "eklenemedi",
+        "reason": (
+            f"Phase A plan missing at {plan_path}. "
+            "Ensure fetch runs before Phase A (main.yml task order)."
+        ),
+        "ip": "N/A",
+        "location": "N/A",
+        "site": "N/A",
+        "tenant": "N/A",
+        "ownership": "N/A",
+    }
+
+
+# ---------------------------------------------------------------------------
+# Duplicate host recovery (VFW)
+# ---------------------------------------------------------------------------
+
+def _is_duplicate_error(error: Dict) -> bool:
+    return DUPLICATE_MARKER in str(error.get("message") or "") or DUPLICATE_MARKER in str(error.get("data") or "")
+
+
+def _resolve_duplicate_host(plan: Dict, host_maps: Dict[str, Dict]) -> Dict:
+    """Loki_ID → hostname → visible name → IP, same order as process_virtual_fw_apply.yml."""
+    rec = plan.get("zbx_record") or {}
+    loki = ""
+    for tag in (plan.get("create_payload") or {}).get("tags") or []:
+        if isinstance(tag, dict) and tag.get("tag") == "Loki_ID":
+            loki = str(tag.get("value") or "")
+            break
+    candidates = [
+        (host_maps.get("by_loki") or {}, loki),
+        (host_maps.get("by_hostname") or {}, rec.get("HOSTNAME", "")),
+        (host_maps.get("by_visible") or {}, rec.get("HOST_VISIBLE_NAME", "")),
+        (host_maps.get("by_ip") or {}, rec.get("HOST_IP", "")),
+    ]
+    for index, key in candidates:
+        if not key:
+            continue
+        host = index.get(key)
+        if isinstance(host, dict) and host.get("hostid"):
+            return host
+    return {}
+
+
+# ---------------------------------------------------------------------------
+# Update coalescing (host.massadd / host.massupdate)
+# ---------------------------------------------------------------------------
+
+def _group_ids(groups: Any) -> List[str]:
+    return [str(g.get("groupid")) for g in groups or [] if isinstance(g, dict) and g.get("groupid")]
+
+
+def split_update_payload(plan: Dict) -> Tuple[Optional[Tuple], Optional[Tuple], Dict[str, Any]]:
+    """
+    Split an update_payload into shareable deltas and the per-host rest.
+
+    Returns (added_group_ids, (monitored_by, proxy_groupid), residual payload).
+    A shared component is None when it does not change anything on the host.
+    Groups are only shared when host.update would purely add groups (every
+    existing group is kept), so host.massadd is equivalent.
+    """
+    payload = plan.get("update_payload") or {}
+    existing = plan.get("zbx_existing_host") or {}
+    residual: Dict[str, Any] = {"hostid": payload.get("hostid")}
+    for key in ("interfaces", "tags", "name"):
+        if key in payload:
+            residual[key] = payload[key]
+    if "host" in payload and payload["host"] != existing.get("host", ""):
+        residual["host"] = payload["host"]
+
+    added_groups: Optional[Tuple] = None
+    if "groups" in payload:
+        new_ids = _group_ids(payload["groups"])
+        existing_ids = set(_group_ids(existing.get("groups")))
+        if existing_ids.issubset(new_ids):
+            added = tuple(sorted(g for g in set(new_ids) if g not in existing_ids))
+            added_groups = added or None
+        else:
+            residual["groups"] = payload["groups"]
+
+    proxy: Optional[Tuple] = None
+    if "monitored_by" in payload or "proxy_groupid" in payload:
+        wanted = (int(payload.get("monitored_by", 0) or 0), int(payload.get("proxy_groupid", 0) or 0))
+        current = (int(existing.get("monitored_by", 0) or 0), int(existing.get("proxy_groupid", 0) or 0))
+        if wanted != current:
+            proxy = wanted
+    return added_groups, proxy, residual
+
+
+def coalesce_updates(
+    plans: List[Dict],
+    min_group_size: int = 2,
+    max_hosts_per_call: int = 500,
+) -> Tuple[List[Tuple[str, Dict, List[int]]], List[Optional[Dict]]]:
+    """
+    Group update plans by identical group-add / proxy deltas.
+
+    Returns (mass calls, residual payloads). Each mass call is
+    (method, params, indexes of the plans it covers). A residual payload is the
+    per-host host.update still needed (None when the mass calls cover everything).
+    Deltas shared by fewer than min_group_size hosts stay on host.update.
+    """
+    splits = [split_update_payload(plan) for plan in plans]
+    group_members: Dict[Tuple, List[int]] = {}
+    proxy_members: Dict[Tuple, List[int]] = {}
+    for index, (added_groups, proxy, _) in enumerate(splits):
+        if added_groups is not None:
+            group_members.setdefault(added_groups, []).append(index)
+        if proxy is not None:
+            proxy_members.setdefault(proxy, []).append(index)
+
+    calls: List[Tuple[str, Dict, List[int]]] = []
+    residuals: List[Dict[str, Any]] = [residual for _, _, residual in splits]
+    for added_groups, members in group_members.items():
+        if len(members) < min_group_size:
+            for index in members:
+                residuals[index]["groups"] = (plans[index].get("update_payload") or {}).get("groups")
+            continue
+        for start in range(0, len(members), max_hosts_per_call):
+            chunk = members[start:start + max_hosts_per_call]
+            calls.append(("host.massadd", {
+                "hosts": [{"hostid": residuals[i]["hostid"]} for i in chunk],
+                "groups": [{"groupid": g} for g in added_groups],
+            }, chunk))
+    for (monitored_by, proxy_groupid), members in proxy_members.items():
+        if len(members) < min_group_size:
+            for index in members:
+                residuals[index]["monitored_by"] = monitored_by
+                residuals[index]["proxy_groupid"] = proxy_groupid
+            continue
+        for start in range(0, len(members), max_hosts_per_call):
+            chunk = members[start:start + max_hosts_per_call]
+            calls.append(("host.massupdate", {
+                "hosts": [{"hostid": residuals[i]["hostid"]} for i in chunk],
+                "monitored_by": monitored_by,
+                "proxy_groupid": proxy_groupid,
+            }, chunk))
+    return calls, [residual if len(residual) > 1 else None for residual in residuals]
+
+
+# ---------------------------------------------------------------------------
+# Apply engine
+# ---------------------------------------------------------------------------
+
+class ApplyEngine:
+    """Apply compare plans to Zabbix with bounded concurrency over one pooled session."""
+
+    def __init__(
+        self,
+        client: Optional[ZabbixJsonRpcClient],
+        builder_ctx: Dict[str, Any],
+        host_maps: Dict[str, Dict],
+        plans_dir: str,
+        results_dir: str,
+        dry_run: bool = False,
+        plan_loader: Optional[Callable[[str, Any], Optional[Dict]]] = None,
+        plan_writer: Optional[Callable[[str, Any, Dict], None]] = None,
+        plan_store: Optional[Any] = None,
+    ) -> None:
+        """
+        plan_store (plan_store.FilePlanStore / JsonlPlanStore) holds both plans
+        and results; without it plans are read from plans_dir and results written
+        to results_dir in the per-file layout.
+        """
+        self.client = client
+        self.builder_ctx = builder_ctx
+        # One builder for every duplicate recovery: device type resolution is memoised.
+        self.payload_builder = ZabbixPayloadBuilder(builder_ctx)
+        self.host_maps = host_maps
+        self.plans_dir = plans_dir
+        self.results_dir = results_dir
+        self.dry_run = dry_run
+        self.plan_store = plan_store if plan_store is not None else FilePlanStore(plans_dir)
+        self.result_store = plan_store if plan_store is not None else FilePlanStore(results_dir)
+        self._plan_loader = plan_loader or self.plan_store.get_plan
+        self._plan_writer = plan_writer or self.plan_store.put_plan
+        self._log_lock = threading.Lock()
+
+    def plan_path(self, entity_type: str, item_id: Any) -> str:
+        return self.plan_store.plan_location(entity_type, item_id)
+
+    def _call(self, method: str, params: Dict, request_id: int) -> Dict:
+        return self.client.call(method, params, request_id)
+
+    def prepare_item(self, entity_type: str, item: Dict) -> Tuple[Dict[str, Any], Optional[Tuple[str, Dict, int]]]:
+        """
+        Load the plan and decide what to do without touching Zabbix.
+
+        Returns (apply record, pending write). The pending write is
+        (method, params, request_id) or None when the result is already final
+        (skip, up to date, dry-run, missing plan).
+        """
+        item_id = item.get("id", "unknown")
+        record: Dict[str, Any] = {
+            "type": entity_type,
+            "id": str(item_id),
+            "result": {},
+            "operation": "none",
+            "zabbix_hostid": "",
+            "request_payload": {},
+            "response_payload": {},
+        }
+        plan = self._plan_loader(entity_type, item_id)
+        if plan is None:
+            record["result"] = _missing_plan_result(entity_type, item, self.plan_path(entity_type, item_id))
+            return record, None
+
+        record["plan"] = plan
+        record["operation"] = plan.get("zbx_scenario", "none")
+        record["zabbix_hostid"] = str((plan.get("zbx_existing_host") or {}).get("hostid", "") or "")
+        action = plan.get("action", "skip")
+
+        if action == "create":
+            payload = plan.get("create_payload")
+            if self.dry_run:
+                record["request_payload"] = payload or {}
+                record["result"] = _base_result(
+                    entity_type, plan, item, "dry_run",
+                    "Dry-run: host.create çağrısı yapılmadı — eklenecekti", "create",
+                )
+                return record, None
+            if not payload or self.client is None:
+                return record, None
+            record["request_payload"] = payload
+            return record, ("host.create", payload, 1)
+
+        if action == "update":
+            if not plan.get("needs_update"):
+                record["result"] = plan.get(RESULT_KEY[entity_type]) or {}
+                return record, None
+            payload = plan.get("update_payload")
+            if self.dry_run:
+                record["request_payload"] = payload or {}
+                reason = "Dry-run: host.update çağrısı yapılmadı — güncellenecekti"
+                if entity_type == "device":
+                    reason += f" ({'; '.join(plan.get('update_reasons') or [])})"
+                record["result"] = _base_result(entity_type, plan, item, "dry_run", reason, "update")
+                return record, None
+            if not payload or self.client is None:
+                return record, None
+            record["request_payload"] = payload
+            return record, ("host.update", payload, 2)
+
+        if action == "skip":
+            record["result"] = plan.get(RESULT_KEY[entity_type]) or {}
+        return record, None
+
+    def complete_item(self, entity_type: str, item: Dict, record: Dict[str, Any], method: str, resp: Dict) -> None:
+        """Turn the Zabbix response for a pending write into the result record."""
+        plan = record.get("plan") or {}
+        record["response_payload"] = resp
+        result = resp.get("result")
+        error = resp.get("error")
+        if method == "host.create":
+            if isinstance(result, dict) and (entity_type != "device" or "hostids" in result):
+                hostids = result.get("hostids") or []
+                if hostids:
+                    record["zabbix_hostid"] = str(hostids[0])
+                record["result"] = _base_result(entity_type, plan, item, "eklendi", "", "create")
+                if entity_type == "platform":
+                    record["result"]["manufacturer"] = (plan.get("zbx_record") or {}).get("MACROS", "{}")
+                return
+            if not isinstance(error, dict):
+                return
+            record["result"] = _failure_result(entity_type, plan, item, error, "host.create", "create")
+            if entity_type == "vfw" and _is_duplicate_error(error):
+                self._recover_duplicate(entity_type, item, plan, record)
+            return
+
+        if isinstance(result, dict) and (entity_type != "device" or "hostids" in result):
+            if entity_type == "device":
+                reasons = plan.get("update_reasons") or []
+                record["result"] = _base_result(entity_type, plan, item, "güncellendi", "; ".join(reasons), "update")
+                record["result"]["update_reasons"] = reasons
+                record["result"]["error_data"] = ""
+            else:
+                record["result"] = _base_result(entity_type, plan, item, "güncellendi", "", "update")
+            return
+        if isinstance(error, dict):
+            record["result"] = _failure_result(entity_type, plan, item, error, "host.update", "update")
+
+    def apply_item(self, entity_type: str, item: Dict) -> Dict[str, Any]:
+        """
+        Apply one plan. Returns an apply record:
+        {type, id, result, operation, zabbix_hostid, request_payload, response_payload, plan}.
+        `result` is {} when the Ansible tasks would not have written a result file.
+        """
+        record, pending = self.prepare_item(entity_type, item)
+        if pending is not None:
+            method, params, request_id = pending
+            self.complete_item(entity_type, item, record, method, self._call(method, params, request_id))
+        return record
+
+    def apply_batch(
+        self, batch: List[Tuple[str, Dict, Dict[str, Any], Tuple[str, Dict, int]]]
+    ) -> List[Tuple[Any, Optional[str]]]:
+        """
+        Send the pending writes of several items as one JSON-RPC batch request.
+
+        Returns (apply record, None) or (exception, traceback) per element, in order.
+        Duplicate-create recovery still runs per item with its own host.update call.
+        """
+        responses = self.client.call_batch([(pending[0], pending[1]) for _, _, _, pending in batch])
+        return [self._complete_safely(entry, resp) for entry, resp in zip(batch, responses)]
+
+    def apply_pending(self, entry: Tuple[str, Dict, Dict[str, Any], Tuple[str, Dict, int]]) -> Tuple[Any, Optional[str]]:
+        """Send one prepared write and complete its record."""
+        method, params, request_id = entry[3]
+        return self._complete_safely(entry, self._call(method, params, request_id))
+
+    def _complete_safely(
+        self, entry: Tuple[str, Dict, Dict[str, Any], Tuple[str, Dict, int]], resp: Dict
+    ) -> Tuple[Any, Optional[str]]:
+        entity_type, item, record, pending = entry
+        try:
+            self.complete_item(entity_type, item, record, pending[0], resp)
+            return record, None
+        except Exception as exc:
+            return exc, traceback.format_exc()
+
+    def _recover_duplicate(self, entity_type: str, item: Dict, plan: Dict, record: Dict) -> None:
+        existing = _resolve_duplicate_host(plan, self.host_maps)
+        if not existing.get("hostid"):
+            return
+        enriched = re_enrich_plan(plan, self.builder_ctx, existing, self.payload_builder)
+        self._plan_writer(entity_type, item.get("id", "unknown"), enriched)
+        record["plan"] = enriched
+        record["operation"] = enriched.get("zbx_scenario", "update")
+        record["zabbix_hostid"] = str(existing.get("hostid"))
+        if enriched.get("action") != "update":
+            return
+        if not enriched.get("needs_update"):
+            record["result"] = _base_result(
+                entity_type, enriched, item, "güncel", "Duplicate create recovered; no update delta", "update"
+            )
+            return
+        payload = enriched.get("update_payload")
+        if not payload:
+            return
+        record["request_payload"] = payload
+        resp = self._call("host.update", payload, 3)
+        record["response_payload"] = resp
+        if "result" in resp:
+            record["result"] = _base_result(
+                entity_type, enriched, item, "güncellendi", "Duplicate create recovered via host.update", "update"
+            )
+        elif isinstance(resp.get("error"), dict):
+            record["result"] = _base_result(
+                entity_type, enriched, item, "eklenemedi",
+                resp["error"].get("message") or "host.update failed after duplicate recovery", "update",
+            )
+
+    def write_result(self, entity_type: str, item_id: Any, result: Dict) -> bool:
+        """Store the per-host result consumed by main.yml result aggregation."""
+        if not result or "hostname" not in result:
+            return False
+        self.result_store.put_result(entity_type, item_id, result)
+        return True
+
+    def _record_outcome(
+        self,
+        entity_type: str,
+        item: Dict,
+        outcome: Any,
+        summary: Dict[str, Any],
+        log_file: Any,
+        tb: Optional[str] = None,
+    ) -> None:
+        item_id = item.get("id", "unknown")
+        bucket = summary[f"{entity_type}s"]
+        if isinstance(outcome, Exception):
+            error_msg = f"{outcome.__class__.__name__}: {outcome}"
+            bucket["error"] = bucket.get("error", 0) + 1
+            summary["errors"].append({
+                "type": entity_type,
+                "id": str(item_id),
+                "name": _item_name(entity_type, item),
+                "error": error_msg,
+                "traceback": tb or "",
+            })
+            _progress(entity_type, item_id, _item_name(entity_type, item), "error", error=error_msg)
+            return
+        record = outcome
+        result = record.get("result") or {}
+        self.write_result(entity_type, item_id, result)
+        status = result.get("status") or "none"
+        bucket[status] = bucket.get(status, 0) + 1
+        _progress(entity_type, item_id, _item_name(entity_type, item), status, reason=result.get("reason"))
+        if log_file is not None:
+            entry = {k: v for k, v in record.items() if k != "plan"}
+            plan = record.get("plan") or {}
+            entry["zbx_record"] = plan.get("zbx_record") or {}
+            entry["zbx_existing_host_hostid"] = str(
+                (plan.get("zbx_existing_host") or {}).get("hostid", "") or ""
+            )
+            entry["update_reasons"] = plan.get("update_reasons") or []
+            entry["field_merge_actions"] = plan.get("field_merge_actions") or {}
+            entry["proxy_manual_change_detected"] = bool(plan.get("proxy_manual_change_detected"))
+            with self._log_lock:
+                log_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def run(
+        self,
+        items: List[Tuple[str, Dict]],
+        concurrency: int = 10,
+        log_path: Optional[str] = None,
+        batch_size: int = 1,
+        coalesce: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Apply all (entity_type, item) pairs with at most `concurrency` requests in flight.
+
+        batch_size > 1 packs that many host.create / host.update calls into one
+        JSON-RPC batch request; each element is still mapped back to its own plan.
+        coalesce=True first sends group additions and proxy switches shared by
+        several hosts as host.massadd / host.massupdate, leaving only per-host
+        deltas (tags, interfaces, names) on host.update.
+        """
+        os.makedirs(self.results_dir, exist_ok=True)
+        summary: Dict[str, Any] = {f"{t}s": {"total": 0} for t in ENTITY_TYPES}
+        summary["errors"] = []
+        for entity_type, _ in items:
+            summary[f"{entity_type}s"]["total"] += 1
+
+        log_file = open(log_path, "w", encoding="utf-8") if log_path else None
+        try:
+            with ThreadPoolExecutor(max_workers=max(int(concurrency), 1)) as executor:
+                if (batch_size > 1 or coalesce) and self.client is not None:
+                    self._run_prepared(items, executor, batch_size, coalesce, summary, log_file)
+                else:
+                    futures = {
+                        executor.submit(self.apply_item, entity_type, item): (entity_type, item)
+                        for entity_type, item in items
+                    }
+                    for future in as_completed(futures):
+                        entity_type, item = futures[future]
+                        try:
+                            outcome = future.result()
+                            tb = None
+                        except Exception as exc:
+                            outcome, tb = exc, traceback.format_exc()
+                        self._record_outcome(entity_type, item, outcome, summary, log_file, tb)
+        finally:
+            if log_file is not None:
+                log_file.close()
+            self.result_store.flush()
+        return summary
+
+    def _run_prepared(
+        self,
+        items: List[Tuple[str, Dict]],
+        executor: ThreadPoolExecutor,
+        batch_size: int,
+        coalesce: bool,
+        summary: Dict[str, Any],
+        log_file: Any,
+    ) -> None:
+        pending_writes: List[Tuple[str, Dict, Dict[str, Any], Tuple[str, Dict, int]]] = []
+        for entity_type, item in items:
+            try:
+                record, pending = self.prepare_item(entity_type, item)
+            except Exception as exc:
+                self._record_outcome(entity_type, item, exc, summary, log_file, traceback.format_exc())
+                continue
+            if pending is None:
+                self._record_outcome(entity_type, item, record, summary, log_file)
+            else:
+                pending_writes.append((entity_type, item, record, pending))
+
+        if coalesce:
+            pending_writes = self._apply_coalesced(pending_writes, executor, summary, log_file)
+
+        futures = {}
+        if batch_size > 1:
+            for start in range(0, len(pending_writes), batch_size):
+                batch = pending_writes[start:start + batch_size]
+                futures[executor.submit(self.apply_batch, batch)] = batch
+        else:
+            for entry in pending_writes:
+                futures[executor.submit(lambda e=entry: [self.apply_pending(e)])] = [entry]
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                outcomes = future.result()
+            except Exception as exc:
+                tb = traceback.format_exc()
+                for entity_type, item, _, _ in batch:
+                    self._record_outcome(entity_type, item, exc, summary, log_file, tb)
+                continue
+            for (entity_type, item, _, _), (outcome, tb) in zip(batch, outcomes):
+                self._record_outcome(entity_type, item, outcome, summary, log_file, tb)
+
+    def _apply_coalesced(
+        self,
+        pending_writes: List[Tuple[str, Dict, Dict[str, Any], Tuple[str, Dict, int]]],
+        executor: ThreadPoolExecutor,
+        summary: Dict[str, Any],
+        log_file: Any,
+    ) -> List[Tuple[str, Dict, Dict[str, Any], Tuple[str, Dict, int]]]:
+        """
+        Send shared update deltas as mass calls; return the writes still to send.
+
+        A host whose mass call fails is completed with that error and gets no
+        host.update; a host fully covered by mass calls is completed as updated.
+        """
+        updates = [entry for entry in pending_writes if entry[3][0] == "host.update"]
+        remaining = [entry for entry in pending_writes if entry[3][0] != "host.update"]
+        mass_calls, residuals = coalesce_updates([entry[2].get("plan") or {} for entry in updates])
+
+        futures = {executor.submit(self._call, method, params, 4): (method, members)
+                   for method, params, members in mass_calls}
+        write_calls: List[List[str]] = [[] for _ in updates]
+        failures: Dict[int, Dict] = {}
+        for future in as_completed(futures):
+            method, members = futures[future]
+            resp = future.result()
+            for index in members:
+                write_calls[index].append(method)
+                if "result" not in resp:
+                    failures.setdefault(index, resp)
+
+        for index, entry in enumerate(updates):
+            entity_type, item, record, _ = entry
+            if not write_calls[index]:
+                remaining.append(entry)
+                continue
+            record["write_calls"] = write_calls[index]
+            if index in failures:
+                outcome, tb = self._complete_safely(entry, failures[index])
+            elif residuals[index] is None:
+                ok = {"jsonrpc": "2.0", "result": {"hostids": [record["request_payload"].get("hostid")]}}
+                outcome, tb = self._complete_safely(entry, ok)
+            else:
+                record["write_calls"].append("host.update")
+                remaining.append((entity_type, item, record, ("host.update", residuals[index], 2)))
+                continue
+            self._record_outcome(entity_type, item, outcome, summary, log_file, tb)
+        return remaining
+
+
+def _progress(entity_type: str, item_id: Any, name: str, status: str, error: Optional[str] = None,
+              reason: Optional[str] = None) -> None:
+    """Emit one JSON-line to stdout (AWX streams this line-by-line)."""
+    record = {"type": entity_type, "id": str(item_id), "name": name, "status": status}
+    if error:
+        record["error"] = error
+    if reason:
+        record["reason"] = reason
+    print(json.dumps(record, ensure_ascii=False), flush=True)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _load_json_file(path: Optional[str], default: Any = None) -> Any:
+    if not path or not os.path.exists(path):
+        return default
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Phase B apply engine for Zabbix-NetBox sync")
+    parser.add_argument("--devices-json", help="Path to devices JSON array file (Phase A input)")
+    parser.add_argument("--platforms-json", help="Path to platforms JSON array file (Phase A input)")
+    parser.add_argument("--vfws-json", help="Path to virtual firewalls JSON array file (Phase A input)")
+    parser.add_argument("--plans-dir", default="/tmp", help="Directory holding *_plan_<id>.json (default: /tmp)")
+    parser.add_argument("--results-dir", default="/tmp", help="Directory for per-host result files (default: /tmp)")
+    parser.add_argument(
+        "--plan-store",
+        choices=PLAN_STORE_BACKENDS,
+        default="files",
+        help="files: per-item plan / result files; jsonl: one indexed plan store file (default: files)",
+    )
+    parser.add_argument("--plan-store-path", help="jsonl plan store file (default: <plans-dir>/plan_store.jsonl)")
+    parser.add_argument("--zabbix-url", required=True, help="Zabbix api_jsonrpc.php URL")
+    parser.add_argument("--timeout", type=float, default=300, help="Per-request timeout in seconds (default: 300)")
+    parser.add_argument("--validate-certs", action="store_true")
+    parser.add_argument("--concurrency", type=int, default=10, help="Max in-flight Zabbix writes (default: 10)")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="host.create/host.update calls per JSON-RPC batch request (default: 1 = no batching)",
+    )
+    parser.add_argument(
+        "--coalesce-updates",
+        action="store_true",
+        help="Send group additions / proxy switches shared by several hosts as host.massadd / host.massupdate",
+    )
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--mappings-dir", help="Path to mappings/ directory (duplicate recovery re-enrich)")
+    parser.add_argument("--zbx-templates-cache")
+    parser.add_argument("--zbx-groups-cache")
+    parser.add_argument("--zbx-proxy-groups-cache")
+    parser.add_argument("--hmdl-baseline-map")
+    parser.add_argument(
+        "--minimal-update-payload",
+        action="store_true",
+        help="Re-enrich duplicate recoveries with minimal-delta host.update payloads",
+    )
+    parser.add_argument("--zbx-hosts-loki-map", help="Path to Zabbix hosts by Loki_ID JSON")
+    parser.add_argument("--zbx-hosts-hostname-map", help="Path to Zabbix hosts by hostname JSON")
+    parser.add_argument("--zbx-hosts-visible-map", help="Path to Zabbix hosts by visible_name JSON")
+    parser.add_argument("--zbx-hosts-ip-map", help="Path to Zabbix hosts by primary interface IP JSON")
+    parser.add_argument("--zbx-host-index", help="Zabbix host index from zabbix_host_index.py (replaces the four maps)")
+    parser.add_argument("--apply-log", help="Path to write apply_results.jsonl (default: <results-dir>/apply_results.jsonl)")
+    args = parser.parse_args()
+
+    auth = os.environ.get("ZABBIX_AUTH", "")
+    if not auth and not args.dry_run:
+        parser.error("ZABBIX_AUTH environment variable is required unless --dry-run")
+
+    items: List[Tuple[str, Dict]] = []
+    for entity_type, path in (("device", args.devices_json), ("platform", args.platforms_json), ("vfw", args.vfws_json)):
+        for item in _load_json_file(path, []) or []:
+            if isinstance(item, dict) and item.get("id") is not None:
+                items.append((entity_type, item))
+
+    builder_ctx = _load_builder_ctx_from_args(args) if args.mappings_dir else {}
+    if args.zbx_host_index:
+        # Only the prefetch task (zabbix_host_prefetch_python) ships zabbix_host_index.py.
+        from zabbix_host_index import load_host_maps
+
+        host_maps = load_host_maps(args.zbx_host_index)
+    else:
+        host_maps = {
+            "by_loki": _load_json_file(args.zbx_hosts_loki_map, {}) or {},
+            "by_hostname": _load_json_file(args.zbx_hosts_hostname_map, {}) or {},
+            "by_visible": _load_json_file(args.zbx_hosts_visible_map, {}) or {},
+            "by_ip": _load_json_file(args.zbx_hosts_ip_map, {}) or {},
+        }
+    client = ZabbixJsonRpcClient(
+        args.zabbix_url,
+        auth=auth,
+        timeout=args.timeout,
+        verify=args.validate_certs,
+        pool_size=args.concurrency,
+    )
+    plan_store = None
+    if args.plan_store == "jsonl":
+        plan_store = open_plan_store(
+            "jsonl", args.plan_store_path or os.path.join(args.plans_dir, "plan_store.jsonl")
+        )
+    engine = ApplyEngine(
+        client,
+        builder_ctx,
+        host_maps,
+        plans_dir=args.plans_dir,
+        results_dir=args.results_dir,
+        dry_run=args.dry_run,
+        plan_store=plan_store,
+    )
+    print(json.dumps({
+        "type": "start",
+        "total": len(items),
+        "concurrency": args.concurrency,
+        "batch_size": args.batch_size,
+        "coalesce_updates": args.coalesce_updates,
+        "plan_store": args.plan_store,
+        "dry_run": args.dry_run,
+    }, ensure_ascii=False), flush=True)
+
+    try:
+        summary = engine.run(
+            items,
+            concurrency=args.concurrency,
+            log_path=args.apply_log or os.path.join(args.results_dir, "apply_results.jsonl"),
+            batch_size=args.batch_size,
+            coalesce=args.coalesce_updates,
+        )
+    finally:
+        client.close()
+        if plan_store is not None:
+            plan_store.close()
+
+    with open(os.path.join(args.results_dir, "apply_summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(json.dumps({"type": "summary", **summary}, ensure_ascii=False), flush=True)
+    sys.exit(1 if summary.get("errors") else 0)
+
+
+if __name__ == "__main__":
+    main()
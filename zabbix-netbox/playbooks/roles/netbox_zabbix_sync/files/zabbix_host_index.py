@@ -0,0 +1,713 @@
+#!/usr/bin/env python3
+"""
+Zabbix host prefetch + lookup index for the compare / apply engines.
+
+Replaces the single unpaginated host.get and the four Jinja map-building loops
+of fetch_all_zabbix_hosts.yml:
+
+  1. host.get output=["hostid"] lists every host id (cheap).
+  2. The sorted ids are split into hostid ranges of --page-size and fetched
+     concurrently, projecting only the fields the compare engine and payload
+     builder read (no macros, no extended interface / tag columns).
+  3. One index file is written where each host is stored once under
+     "hosts" and the lookup maps only hold host ids:
+
+       {"format_version": 1,
+        "hosts":       {"<hostid>": {...}},
+        "by_loki":     {"<Loki_ID tag value>": "<hostid>"},
+        "by_hostname": {"<host>": "<hostid>"},
+        "by_visible":  {"<name>": "<hostid>"},
+        "by_ip":       {"<first interface ip>": "<hostid>"}}
+
+Lookup keys follow the Jinja loops exactly: first Loki_ID tag, every technical
+host name, visible names that are non-blank, first interface IP (trimmed);
+later hosts win on duplicate keys.
+
+load_host_maps() turns the file back into the by_loki / by_hostname /
+by_visible / by_ip dicts the engines expect, all sharing one host object.
+
+With --format sqlite the same index is written as an SQLite file instead
+(hosts table keyed by hostid, one covering (map, key) -> hostid lookup table).
+load_host_maps() then returns lazy read-only mappings that query the file per
+lookup, so engine startup and memory no longer grow with the Zabbix inventory.
+
+With --cache PATH the index is also kept between runs (JSON index plus the
+audit watermark). The next run reads auditlog.get from that watermark and
+re-fetches only hosts that were added or updated since, drops deleted ones and
+rebuilds the lookup maps from the cached hosts. Host group and template records
+(a rename or delete changes no host record) re-fetch the hosts in those groups /
+linked to those templates. It falls back to the full
+fetch above when the cache is missing, the audit log was truncated past the
+watermark, auditlog.get is not permitted (Super admin only), or the last full
+fetch is older than --full-refresh-hours.
+
+Usage:
+  ZABBIX_AUTH=... python3 zabbix_host_index.py --zabbix-url URL --output /tmp/pce_zbx_host_index.json
+  ZABBIX_AUTH=... python3 zabbix_host_index.py --zabbix-url URL --format sqlite --output /tmp/pce_zbx_host_index.sqlite
+  ZABBIX_AUTH=... python3 zabbix_host_index.py --zabbix-url URL --output /tmp/pce_zbx_host_index.json \\
+      --cache /var/tmp/netbox_zabbix_sync/zabbix_host_cache.json
+
+Exit codes:
+  0 — index written
+  1 — a Zabbix API call failed (no index written)
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+INDEX_FORMAT_VERSION = 1
+
+INDEX_FORMATS = ("json", "sqlite")
+
+_SQLITE_MAGIC = b"SQLite format 3\x00"
+
+LOOKUP_MAPS = ("by_loki", "by_hostname", "by_visible", "by_ip")
+
+# Fields read from zbx_existing_host by parallel_compare_engine.py / zabbix_payload_builder.py.
+HOST_OUTPUT = ["hostid", "host", "name", "status", "monitored_by", "proxy_groupid", "flags"]
+INTERFACE_OUTPUT = ["interfaceid", "ip", "dns", "port", "type", "main", "useip"]
+TAG_OUTPUT = ["tag", "value"]
+GROUP_OUTPUT = ["groupid", "name"]
+
+
+class ZabbixApiError(RuntimeError):
+    """host.get returned a JSON-RPC error."""
+
+
+def host_get_params(hostids: List[str]) -> Dict[str, Any]:
+    return {
+        "output": HOST_OUTPUT,
+        "hostids": hostids,
+        "selectInterfaces": INTERFACE_OUTPUT,
+        "selectTags": TAG_OUTPUT,
+        "selectGroups": GROUP_OUTPUT,
+        "sortfield": "hostid",
+    }
+
+
+def _result(resp: Dict[str, Any], what: str) -> Any:
+    if "error" in resp:
+        err = resp.get("error") or {}
+        raise ZabbixApiError(f"{what} failed: {err.get('message', '')} {err.get('data', '')}".strip())
+    return resp.get("result") or []
+
+
+def _hostid_key(hostid: Any) -> Any:
+    text = str(hostid)
+    return (0, int(text), "") if text.isdigit() else (1, 0, text)
+
+
+def hostid_ranges(hostids: Iterable[Any], page_size: int) -> List[List[str]]:
+    """Sorted host ids split into contiguous pages of at most page_size."""
+    ordered = sorted({str(h) for h in hostids}, key=_hostid_key)
+    size = max(int(page_size), 1)
+    return [ordered[i:i + size] for i in range(0, len(ordered), size)]
+
+
+def fetch_hosts(client: Any, page_size: int = 1000, concurrency: int = 4) -> List[Dict[str, Any]]:
+    """
+    Page through host.get by hostid ranges with up to `concurrency` pages in flight.
+
+    Returns the projected hosts in hostid order. Raises ZabbixApiError when any call fails.
+    """
+    ids = [h.get("hostid") for h in _result(client.call("host.get", {"output": ["hostid"]}), "host.get (ids)")]
+    return fetch_hosts_by_ids(client, [h for h in ids if h], page_size=page_size, concurrency=concurrency)
+
+
+def fetch_hosts_by_ids(
+    client: Any, hostids: Iterable[Any], page_size: int = 1000, concurrency: int = 4
+) -> List[Dict[str, Any]]:
+    """Projected hosts for the given ids (paged by hostid range); ids Zabbix no longer knows are absent."""
+    pages = hostid_ranges(hostids, page_size)
+    if not pages:
+        return []
+    with ThreadPoolExecutor(max_workers=max(int(concurrency), 1)) as executor:
+        responses = list(executor.map(lambda page: client.call("host.get", host_get_params(page)), pages))
+    hosts: List[Dict[str, Any]] = []
+    for page, resp in zip(pages, responses):
+        hosts.extend(_result(resp, f"host.get (hostids {page[0]}..{page[-1]})"))
+    hosts.sort(key=lambda h: _hostid_key(h.get("hostid", "")))
+    return hosts
+
+
+def host_lookup_keys(host: Dict[str, Any]) -> Dict[str, str]:
+    """Lookup keys of one host, same rules as the former Jinja loops."""
+    keys: Dict[str, str] = {}
+    for tag in host.get("tags") or []:
+        if isinstance(tag, dict) and tag.get("tag") == "Loki_ID":
+            keys["by_loki"] = str(tag.get("value", ""))
+            break
+    if host.get("host") is not None:
+        keys["by_hostname"] = host["host"]
+    name = host.get("name")
+    if name is not None and str(name).strip() != "":
+        keys["by_visible"] = name
+    ifaces = host.get("interfaces") or []
+    if ifaces:
+        ip = str(ifaces[0].get("ip", "") or "").strip()
+        if ip:
+            keys["by_ip"] = ip
+    return keys
+
+
+def build_host_index(hosts: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    index: Dict[str, Any] = {"format_version": INDEX_FORMAT_VERSION, "hosts": {}}
+    for name in LOOKUP_MAPS:
+        index[name] = {}
+    for host in hosts:
+        hostid = str(host.get("hostid", ""))
+        if not hostid:
+            continue
+        index["hosts"][hostid] = host
+        for map_name, key in host_lookup_keys(host).items():
+            index[map_name][key] = hostid
+    return index
+
+
+def write_host_index(index: Dict[str, Any], path: str) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def host_maps_from_index(index: Dict[str, Any]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    hosts = index.get("hosts") or {}
+    return {
+        name: {key: hosts[hostid] for key, hostid in (index.get(name) or {}).items() if hostid in hosts}
+        for name in LOOKUP_MAPS
+    }
+
+
+def _is_sqlite_file(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(_SQLITE_MAGIC)) == _SQLITE_MAGIC
+
+
+def load_host_maps(path: str) -> Dict[str, Mapping]:
+    """
+    {"by_loki": ..., "by_hostname": ..., "by_visible": ..., "by_ip": ...} from an index file.
+
+    JSON index: plain dicts. SQLite index: lazy SqliteHostMap views over the file.
+    """
+    if _is_sqlite_file(path):
+        return open_sqlite_host_maps(path)
+    with open(path, encoding="utf-8") as f:
+        index = json.load(f)
+    if index.get("format_version") != INDEX_FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported host index format {index.get('format_version')!r}")
+    return host_maps_from_index(index)
+
+
+def index_stats(index: Dict[str, Any]) -> Dict[str, int]:
+    stats = {"hosts": len(index.get("hosts") or {})}
+    for name in LOOKUP_MAPS:
+        stats[name] = len(index.get(name) or {})
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# Incremental host cache (auditlog.get)
+# ---------------------------------------------------------------------------
+
+# auditlog resourcetype / action codes (Zabbix 5.4+, unchanged in 6.x / 7.x).
+AUDIT_RESOURCE_HOST = 4
+AUDIT_RESOURCE_HOST_GROUP = 14
+AUDIT_RESOURCE_TEMPLATE = 30
+AUDIT_ACTION_ADD = 0
+AUDIT_ACTION_UPDATE = 1
+AUDIT_ACTION_DELETE = 2
+
+_CACHE_KEYS = ("audit_clock", "full_fetch_at", "zabbix_url")
+
+
+def load_host_cache(path: Optional[str]) -> Optional[Dict[str, Any]]:
+    """A JSON index written by refresh_host_cache(), or None when missing / unreadable / other version."""
+    if not path or not os.path.exists(path) or _is_sqlite_file(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cache, dict) or cache.get("format_version") != INDEX_FORMAT_VERSION:
+        return None
+    if not isinstance(cache.get("hosts"), dict) or "audit_clock" not in cache:
+        return None
+    return cache
+
+
+def _audit_clock(client: Any, sortorder: str) -> Optional[int]:
+    """Clock of the oldest (ASC) / newest (DESC) host audit record, None for an empty audit log."""
+    records = _result(
+        client.call("auditlog.get", {
+            "output": ["clock"],
+            "filter": {"resourcetype": AUDIT_RESOURCE_HOST},
+            "sortfield": "clock",
+            "sortorder": sortorder,
+            "limit": 1,
+        }),
+        "auditlog.get (bounds)",
+    )
+    return int(records[0]["clock"]) if records else None
+
+
+def _audit_records(
+    client: Any, resourcetypes: List[int], time_from: int, page_size: int
+) -> Iterator[Dict[str, Any]]:
+    """
+    Audit records of the given resource types with clock >= time_from, oldest first.
+
+    Pages advance by clock; records of the boundary second are read twice and
+    de-duplicated by auditid. Raises ZabbixApiError when one second holds more
+    than page_size records (the window cannot advance).
+    """
+    seen: Set[str] = set()
+    clock_from = int(time_from)
+    size = max(int(page_size), 1)
+    resourcetype: Any = resourcetypes[0] if len(resourcetypes) == 1 else list(resourcetypes)
+    while True:
+        records = _result(
+            client.call("auditlog.get", {
+                "output": ["auditid", "clock", "action", "resourcetype", "resourceid"],
+                "filter": {"resourcetype": resourcetype},
+                "time_from": clock_from,
+                "sortfield": "clock",
+                "sortorder": "ASC",
+                "limit": size,
+            }),
+            "auditlog.get",
+        )
+        for record in records:
+            auditid = str(record.get("auditid", ""))
+            if auditid in seen:
+                continue
+            seen.add(auditid)
+            yield record
+        if len(records) < size:
+            return
+        last_clock = int(records[-1].get("clock", 0) or 0)
+        if last_clock <= clock_from:
+            raise ZabbixApiError(f"auditlog.get: more than {size} records at clock {clock_from}")
+        clock_from = last_clock
+
+
+def fetch_audit_changes(
+    client: Any, time_from: int, page_size: int = 1000
+) -> Tuple[Set[str], Set[str], Optional[int], int]:
+    """
+    Host audit records with clock >= time_from (_audit_records()).
+
+    Returns (changed host ids, deleted host ids, newest clock seen, record count).
+    A host deleted after its last add / update is only in the deleted set.
+    """
+    changed: Set[str] = set()
+    deleted: Set[str] = set()
+    newest: Optional[int] = None
+    count = 0
+    for record in _audit_records(client, [AUDIT_RESOURCE_HOST], time_from, page_size):
+        count += 1
+        hostid = str(record.get("resourceid", "") or "")
+        clock = int(record.get("clock", 0) or 0)
+        newest = clock if newest is None else max(newest, clock)
+        if not hostid:
+            continue
+        action = int(record.get("action", -1))
+        if action == AUDIT_ACTION_DELETE:
+            changed.discard(hostid)
+            deleted.add(hostid)
+        elif action in (AUDIT_ACTION_ADD, AUDIT_ACTION_UPDATE):
+            deleted.discard(hostid)
+            changed.add(hostid)
+    return changed, deleted, newest, count
+
+
+def fetch_group_template_changes(
+    client: Any, time_from: int, page_size: int = 1000
+) -> Tuple[Set[str], Set[str], Optional[int], int]:
+    """
+    Host group / template audit records with clock >= time_from (_audit_records()).
+
+    Returns (host group ids, template ids, newest clock seen, record count) for every
+    add / update / delete; renames and deletes change cached hosts without a host record.
+    """
+    groups: Set[str] = set()
+    templates: Set[str] = set()
+    newest: Optional[int] = None
+    count = 0
+    for record in _audit_records(
+        client, [AUDIT_RESOURCE_HOST_GROUP, AUDIT_RESOURCE_TEMPLATE], time_from, page_size
+    ):
+        count += 1
+        clock = int(record.get("clock", 0) or 0)
+        newest = clock if newest is None else max(newest, clock)
+        resourceid = str(record.get("resourceid", "") or "")
+        if not resourceid:
+            continue
+        resourcetype = int(record.get("resourcetype", -1))
+        if resourcetype == AUDIT_RESOURCE_HOST_GROUP:
+            groups.add(resourceid)
+        elif resourcetype == AUDIT_RESOURCE_TEMPLATE:
+            templates.add(resourceid)
+    return groups, templates, newest, count
+
+
+def hosts_in_groups_or_templates(
+    client: Any, hosts: Dict[str, Dict[str, Any]], groupids: Set[str], templateids: Set[str]
+) -> Set[str]:
+    """Host ids in the given groups / linked to the given templates, in the cache or in Zabbix now."""
+    affected = {
+        hostid for hostid, host in hosts.items()
+        if any(str(g.get("groupid")) in groupids for g in host.get("groups") or [])
+    }
+    for key, ids in (("groupids", groupids), ("templateids", templateids)):
+        if ids:
+            members = _result(
+                client.call("host.get", {"output": ["hostid"], key: sorted(ids, key=_hostid_key)}),
+                f"host.get ({key})",
+            )
+            affected.update(str(h.get("hostid")) for h in members if h.get("hostid"))
+    return affected
+
+
+def _full_cache(client: Any, zabbix_url: str, page_size: int, concurrency: int, now: int) -> Dict[str, Any]:
+    # The watermark is read before the hosts: a change made during the fetch is replayed next run.
+    # Without auditlog.get access the watermark stays None and every run is a full fetch.
+    try:
+        newest = _audit_clock(client, "DESC")
+        watermark: Optional[int] = newest if newest is not None else now
+    except ZabbixApiError:
+        watermark = None
+    cache = build_host_index(fetch_hosts(client, page_size=page_size, concurrency=concurrency))
+    cache.update({
+        "audit_clock": watermark,
+        "full_fetch_at": now,
+        "zabbix_url": zabbix_url,
+    })
+    return cache
+
+
+def refresh_host_cache(
+    client: Any,
+    cache: Optional[Dict[str, Any]],
+    zabbix_url: str = "",
+    page_size: int = 1000,
+    concurrency: int = 4,
+    audit_page_size: int = 1000,
+    overlap_seconds: int = 60,
+    max_age_seconds: int = 86400,
+    now: Optional[int] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Bring a host cache (load_host_cache()) up to date.
+
+    Incremental: hosts added / updated in auditlog.get since audit_clock - overlap_seconds,
+    and hosts in host groups / linked to templates changed in that window, are re-fetched by
+    id, deleted hosts are dropped, and the lookup maps are rebuilt from the cached hosts, so
+    the result equals a full build_host_index(). Falls back to a full fetch
+    when there is no usable cache, the URL changed, the last full fetch is older than
+    max_age_seconds (0 = never), the audit log was truncated past the watermark, or
+    auditlog.get is not permitted / fails.
+
+    Returns (cache, stats) with stats {"mode": "full" | "incremental", "reason", ...}.
+    Host API errors (host.get) raise ZabbixApiError.
+    """
+    now = int(time.time()) if now is None else int(now)
+
+    def full(reason: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        fresh = _full_cache(client, zabbix_url, page_size, concurrency, now)
+        return fresh, {"mode": "full", "reason": reason, "changed": len(fresh["hosts"]), "deleted": 0,
+                       "related": 0, "audit_records": 0}
+
+    if cache is None:
+        return full("no_cache")
+    if zabbix_url and cache.get("zabbix_url") not in ("", None, zabbix_url):
+        return full("zabbix_url_changed")
+    if max_age_seconds and now - int(cache.get("full_fetch_at") or 0) > max_age_seconds:
+        return full("max_age")
+    if cache.get("audit_clock") is None:
+        return full("audit_unavailable")
+    watermark = int(cache["audit_clock"])
+    try:
+        oldest = _audit_clock(client, "ASC")
+        if oldest is not None and oldest > watermark:
+            return full("audit_truncated")
+        since = max(watermark - max(int(overlap_seconds), 0), 0)
+        changed, deleted, newest, records = fetch_audit_changes(client, since, page_size=audit_page_size)
+        groupids, templateids, related_newest, related_records = fetch_group_template_changes(
+            client, since, page_size=audit_page_size
+        )
+    except ZabbixApiError:
+        return full("audit_unavailable")
+
+    hosts = dict(cache["hosts"])
+    related = hosts_in_groups_or_templates(client, hosts, groupids, templateids) - changed - deleted
+    changed |= related
+    records += related_records
+    if related_newest is not None:
+        newest = related_newest if newest is None else max(newest, related_newest)
+    for hostid in deleted:
+        hosts.pop(hostid, None)
+    if changed:
+        fetched = {
+            str(h.get("hostid")): h
+            for h in fetch_hosts_by_ids(client, changed, page_size=page_size, concurrency=concurrency)
+        }
+        for hostid in changed:
+            if hostid in fetched:
+                hosts[hostid] = fetched[hostid]
+            else:
+                # Deleted (or no longer visible) after the audit window was read.
+                hosts.pop(hostid, None)
+    refreshed = build_host_index(hosts[hostid] for hostid in sorted(hosts, key=_hostid_key))
+    for key in _CACHE_KEYS:
+        refreshed[key] = cache.get(key)
+    refreshed["audit_clock"] = max(watermark, newest) if newest is not None else watermark
+    refreshed["zabbix_url"] = zabbix_url or cache.get("zabbix_url", "")
+    return refreshed, {"mode": "incremental", "reason": "", "changed": len(changed), "deleted": len(deleted),
+                       "related": len(related), "audit_records": records}
+
+
+def index_without_cache_keys(index: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in index.items() if k not in _CACHE_KEYS}
+
+
+# ---------------------------------------------------------------------------
+# SQLite backend (lazy lookups)
+# ---------------------------------------------------------------------------
+
+_SQLITE_SCHEMA = (
+    "CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID",
+    "CREATE TABLE hosts (hostid TEXT PRIMARY KEY, data TEXT NOT NULL) WITHOUT ROWID",
+    # (map, key) primary key carries hostid, so a lookup is one covering index seek.
+    "CREATE TABLE lookup (map TEXT NOT NULL, key TEXT NOT NULL, hostid TEXT NOT NULL,"
+    " PRIMARY KEY (map, key)) WITHOUT ROWID",
+)
+
+
+def write_sqlite_host_index(index: Dict[str, Any], path: str) -> None:
+    """Write build_host_index() output as an SQLite index file (replaced atomically)."""
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        with conn:
+            for stmt in _SQLITE_SCHEMA:
+                conn.execute(stmt)
+            conn.execute("INSERT INTO meta VALUES ('format_version', ?)", (str(INDEX_FORMAT_VERSION),))
+            conn.executemany(
+                "INSERT INTO hosts VALUES (?, ?)",
+                ((hostid, json.dumps(host, ensure_ascii=False)) for hostid, host in index["hosts"].items()),
+            )
+            for name in LOOKUP_MAPS:
+                conn.executemany(
+                    "INSERT INTO lookup VALUES (?, ?, ?)",
+                    ((name, str(key), hostid) for key, hostid in index[name].items()),
+                )
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+
+
+class _SqliteHostIndex:
+    """Read-only connection to an SQLite host index shared by the four map views.
+
+    Connections are per process and per thread, so the views can be used from
+    thread pools and survive fork / pickling into process-pool workers.
+    Resolved keys and decoded hosts are cached (the file is read-only), and a
+    host is decoded once so every map returns the same object.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._hosts: Dict[str, Dict[str, Any]] = {}
+        self._keys: Dict[tuple, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"path": self.path}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state["path"])
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            # Forked child: drop the parent's connections and cache.
+            self.__init__(self.path)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def check_version(self) -> None:
+        row = self._conn().execute("SELECT value FROM meta WHERE name = 'format_version'").fetchone()
+        if not row or row[0] != str(INDEX_FORMAT_VERSION):
+            raise ValueError(f"{self.path}: unsupported host index format {row[0] if row else None!r}")
+
+    def hostid(self, map_name: str, key: Any) -> Optional[str]:
+        if not isinstance(key, str):
+            # JSON object keys are always strings; mirror dict semantics.
+            return None
+        cache_key = (map_name, key)
+        if cache_key in self._keys:
+            return self._keys[cache_key]
+        row = self._conn().execute(
+            "SELECT hostid FROM lookup WHERE map = ? AND key = ?", (map_name, key)
+        ).fetchone()
+        hostid = row[0] if row else None
+        self._keys[cache_key] = hostid
+        return hostid
+
+    def host(self, hostid: str) -> Optional[Dict[str, Any]]:
+        cached = self._hosts.get(hostid)
+        if cached is not None:
+            return cached
+        row = self._conn().execute("SELECT data FROM hosts WHERE hostid = ?", (hostid,)).fetchone()
+        if row is None:
+            return None
+        with self._lock:
+            return self._hosts.setdefault(hostid, json.loads(row[0]))
+
+    def has_any(self, map_name: str) -> bool:
+        return self._conn().execute("SELECT 1 FROM lookup WHERE map = ? LIMIT 1", (map_name,)).fetchone() is not None
+
+    def count(self, map_name: str) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM lookup WHERE map = ?", (map_name,)).fetchone()[0]
+
+    def keys(self, map_name: str) -> List[str]:
+        return [r[0] for r in self._conn().execute("SELECT key FROM lookup WHERE map = ? ORDER BY key", (map_name,))]
+
+
+class SqliteHostMap(Mapping):
+    """Lazy read-only {key: host} view of one lookup map of an SQLite host index."""
+
+    def __init__(self, index: _SqliteHostIndex, map_name: str) -> None:
+        self._index = index
+        self.map_name = map_name
+
+    def __getitem__(self, key: Any) -> Dict[str, Any]:
+        hostid = self._index.hostid(self.map_name, key)
+        host = self._index.host(hostid) if hostid is not None else None
+        if host is None:
+            raise KeyError(key)
+        return host
+
+    def __contains__(self, key: Any) -> bool:
+        return self._index.hostid(self.map_name, key) is not None
+
+    def __bool__(self) -> bool:
+        # Engines write `maps.get(name) or {}` per item; avoid a COUNT(*) each time.
+        return self._index.has_any(self.map_name)
+
+    def __len__(self) -> int:
+        return self._index.count(self.map_name)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index.keys(self.map_name))
+
+
+def open_sqlite_host_maps(path: str) -> Dict[str, Mapping]:
+    index = _SqliteHostIndex(path)
+    index.check_version()
+    return {name: SqliteHostMap(index, name) for name in LOOKUP_MAPS}
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def main(argv: Optional[List[str]] = None) -> None:
+    # Engines only load index files; the HTTP client is needed for fetching.
+    from zabbix_jsonrpc import ZabbixJsonRpcClient
+
+    parser = argparse.ArgumentParser(description="Prefetch Zabbix hosts into one lookup index file")
+    parser.add_argument("--zabbix-url", required=True, help="Zabbix api_jsonrpc.php URL")
+    parser.add_argument("--output", required=True, help="Index file to write")
+    parser.add_argument(
+        "--format",
+        choices=INDEX_FORMATS,
+        default="json",
+        help="json: one JSON document; sqlite: disk-backed index queried lazily by the engines (default: json)",
+    )
+    parser.add_argument("--timeout", type=float, default=300, help="Per-request timeout in seconds (default: 300)")
+    parser.add_argument("--validate-certs", action="store_true")
+    parser.add_argument("--page-size", type=int, default=1000, help="Host ids per host.get page (default: 1000)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent host.get pages (default: 4)")
+    parser.add_argument("--cache", help="Persistent host cache refreshed from auditlog.get (JSON)")
+    parser.add_argument(
+        "--audit-overlap",
+        type=int,
+        default=60,
+        help="Seconds re-read before the audit watermark (default: 60)",
+    )
+    parser.add_argument("--audit-page-size", type=int, default=1000, help="auditlog.get records per call (default: 1000)")
+    parser.add_argument(
+        "--full-refresh-hours",
+        type=float,
+        default=24,
+        help="Full host fetch when the cache's last full fetch is older (default: 24; 0 = only on fallback)",
+    )
+    parser.add_argument("--force-full", action="store_true", help="Ignore the cache content and fetch all hosts")
+    args = parser.parse_args(argv)
+
+    auth = os.environ.get("ZABBIX_AUTH", "")
+    if not auth:
+        parser.error("ZABBIX_AUTH environment variable is required")
+
+    client = ZabbixJsonRpcClient(
+        args.zabbix_url,
+        auth=auth,
+        timeout=args.timeout,
+        verify=args.validate_certs,
+        pool_size=args.concurrency,
+    )
+    cache_stats: Optional[Dict[str, Any]] = None
+    try:
+        if args.cache:
+            index, cache_stats = refresh_host_cache(
+                client,
+                None if args.force_full else load_host_cache(args.cache),
+                zabbix_url=args.zabbix_url,
+                page_size=args.page_size,
+                concurrency=args.concurrency,
+                audit_page_size=args.audit_page_size,
+                overlap_seconds=args.audit_overlap,
+                max_age_seconds=int(args.full_refresh_hours * 3600),
+            )
+        else:
+            index = build_host_index(fetch_hosts(client, page_size=args.page_size, concurrency=args.concurrency))
+    except ZabbixApiError as exc:
+        print(str(exc), file=sys.stderr)
+        sys.exit(1)
+    finally:
+        client.close()
+
+    if args.cache:
+        os.makedirs(os.path.dirname(os.path.abspath(args.cache)), exist_ok=True)
+        write_host_index(index, args.cache)
+        index = index_without_cache_keys(index)
+    if args.format == "sqlite":
+        write_sqlite_host_index(index, args.output)
+    else:
+        write_host_index(index, args.output)
+    summary = {"type": "summary", "output": args.output, "format": args.format, **index_stats(index)}
+    if cache_stats is not None:
+        summary["cache"] = cache_stats
+    print(json.dumps(summary), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Pooled Zabbix JSON-RPC client shared by the Phase B apply engine and prefetch tools.
+
+Mirrors the role's Ansible `uri` calls (auth in request body, failed_when: false):
+call() always returns the decoded JSON-RPC response dict. Transport failures are
+returned as a JSON-RPC style {"error": {...}} body instead of raising, so a single
+unreachable request never aborts a run.
+
+call_batch() packs several calls into one JSON-RPC 2.0 batch array (one HTTP
+round trip, one PHP bootstrap) and maps each response element back by id, so an
+error on one element never affects the others.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+TRANSPORT_ERROR_CODE = -32000
+
+
+def transport_error(message: str, data: Any = "") -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "error": {"code": TRANSPORT_ERROR_CODE, "message": message, "data": data}}
+
+
+class ZabbixJsonRpcClient:
+    """Thread-safe JSON-RPC client over one requests.Session with a bounded connection pool."""
+
+    def __init__(
+        self,
+        url: str,
+        auth: str = "",
+        timeout: float = 300,
+        verify: bool = False,
+        pool_size: int = 10,
+        session: Optional[requests.Session] = None,
+    ) -> None:
+        self.url = url
+        self.auth = auth
+        self.timeout = timeout
+        self.verify = verify
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(int(pool_size), 1))
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        session.headers.update({"Content-Type": "application/json-rpc"})
+        self.session = session
+        self._id_lock = threading.Lock()
+        self._next_id = 0
+
+    def next_id(self) -> int:
+        with self._id_lock:
+            self._next_id += 1
+            return self._next_id
+
+    def request_body(self, method: str, params: Any, request_id: Optional[int] = None) -> Dict[str, Any]:
+        body: Dict[str, Any] = {
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params,
+            "id": request_id if request_id is not None else self.next_id(),
+        }
+        if self.auth:
+            body["auth"] = self.auth
+        return body
+
+    def post(self, body: Any) -> Any:
+        """POST a raw JSON-RPC body (object or batch array); return decoded JSON or a transport error."""
+        try:
+            resp = self.session.post(self.url, json=body, timeout=self.timeout, verify=self.verify)
+        except requests.RequestException as exc:
+            return transport_error(f"{exc.__class__.__name__}: {exc}")
+        try:
+            return resp.json()
+        except ValueError:
+            return transport_error(f"HTTP {resp.status_code}: non-JSON response", resp.text[:500])
+
+    def call(self, method: str, params: Any, request_id: Optional[int] = None) -> Dict[str, Any]:
+        decoded = self.post(self.request_body(method, params, request_id))
+        if not isinstance(decoded, dict):
+            return transport_error("Unexpected JSON-RPC response shape", decoded)
+        return decoded
+
+    def call_batch(self, calls: List[Tuple[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Send [(method, params), ...] as one batch request.
+
+        Returns one response dict per call, in input order. Elements missing from the
+        server reply (or a failed transport) yield a JSON-RPC style error for that call.
+        """
+        if not calls:
+            return []
+        bodies = [self.request_body(method, params) for method, params in calls]
+        decoded = self.post(bodies)
+        if isinstance(decoded, dict):
+            # Transport failure or a server that rejected the whole batch.
+            return [decoded for _ in bodies]
+        if not isinstance(decoded, list):
+            return [transport_error("Unexpected JSON-RPC batch response shape", decoded) for _ in bodies]
+        by_id: Dict[Any, Dict[str, Any]] = {}
+        for element in decoded:
+            if isinstance(element, dict) and "id" in element:
+                by_id[element["id"]] = element
+        return [
+            by_id.get(body["id"]) or transport_error(f"No response for batch element id {body['id']}")
+            for body in bodies
+        ]
+
+    def close(self) -> None:
+        self.session.close()
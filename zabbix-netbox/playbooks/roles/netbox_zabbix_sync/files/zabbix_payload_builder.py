@@ -3,13 +3,30 @@
 Build Zabbix host.create / host.update API params from compare plans (Phase A).
 
 Used by parallel_compare_engine.py so Phase B only POSTs ready payloads.
+
+CLI (duplicate host.create recovery, create plan -> update plan):
+  single:   --re-enrich-plan PLAN --existing-host-json HOST [--output-plan OUT]
+  manifest: --batch-manifest FILE   JSON array of {"plan", "existing_host", "output"?}
+  dir:      --batch-dir DIR         every <entity>_dup_host_<id>.json with its
+                                    <entity>_plan_<id>.json in the same directory
+Batch modes load mappings and caches once and re-enrich on up to --workers
+processes (each builds its payload builder once), printing one JSON line per
+plan plus a summary line. Plans are rewritten in
+place unless an output path is given.
+
+Exit codes:
+  0 — all plans re-enriched
+  1 — one or more batch items failed (missing / unreadable plan or host JSON)
+  2 — invalid arguments
 """
 from __future__ import annotations
 
 import json
+import multiprocessing
 import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from copy import deepcopy
 from typing import Any, Dict, List, Optional, Tuple
 
@@ -29,6 +46,7 @@ for _candidate in _MODULE_UTILS_CANDIDATES:
 
 from zabbix_merge_helpers import (  # noqa: E402
     load_managed_tag_keys,
+    managed_key_set,
     merge_host_groups,
     merge_tags,
     resolve_proxy_group_update,
@@ -92,6 +110,21 @@ def _macros_to_tags(macros: Dict[str, str]) -> List[Dict[str, str]]:
     return [{"tag": k, "value": v} for k, v in macros.items()]
 
 
+def _tag_multiset(tags: Any) -> List[Tuple[str, str]]:
+    return sorted(
+        (str(t.get("tag", "")), str(t.get("value", "")))
+        for t in tags or []
+        if isinstance(t, dict) and t.get("tag")
+    )
+
+
+def _int_or_zero(value: Any) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
 def _effective_managed_keys(ctx: Dict, device_role: str) -> List[str]:
     keys = list(load_managed_tag_keys(ctx.get("tags_config")))
     role = (device_role or "").upper()
@@ -102,8 +135,84 @@ def _effective_managed_keys(ctx: Dict, device_role: str) -> List[str]:
     return list(dict.fromkeys(keys))
 
 
+def _host_field_changes(
+    zbx_record: Dict,
+    zbx_existing: Dict,
+    existing_iface: Dict,
+    monitored_by: str,
+    proxy_group_id: str,
+    proxy_decision: Dict,
+    proxy_apply: bool,
+    groups_needs_update: bool,
+    required_groups: List[str],
+    field_merge_actions: Dict[str, Any],
+    iface_locked: bool,
+    iface_spec: Optional[Dict],
+) -> List[Dict[str, Any]]:
+    """HMDL host-update-log entries (mirror of zabbix_host_operations.yml _host_field_changes)."""
+    entries: List[Dict[str, Any]] = []
+    hostname = zbx_record.get("HOSTNAME", "")
+    if zbx_existing.get("host", "") != hostname:
+        entries.append({"field_name": "hostname", "old_value": zbx_existing.get("host", ""),
+                        "new_value": hostname, "action": "updated"})
+    current_visible = str(zbx_existing.get("name") or "").strip()
+    new_visible = str(zbx_record.get("HOST_VISIBLE_NAME") or hostname).strip()
+    if current_visible != new_visible:
+        visible_action = field_merge_actions.get("visible_name")
+        if visible_action == "corrected":
+            entries.append({"field_name": "visible_name", "old_value": current_visible,
+                            "new_value": new_visible, "action": "updated", "merge_result": "corrected"})
+        elif visible_action == "preserved_manual":
+            entries.append({"field_name": "visible_name", "old_value": current_visible,
+                            "new_value": new_visible, "action": "skipped", "merge_result": "preserved_manual",
+                            "reason": field_merge_actions.get("visible_name_reason", "")})
+        else:
+            entries.append({"field_name": "visible_name", "old_value": current_visible,
+                            "new_value": new_visible, "action": "skipped", "merge_result": "preserved_existing",
+                            "reason": "Visible name is never updated on existing hosts"})
+    existing_ip = existing_iface.get("ip") or ""
+    if existing_ip != zbx_record.get("HOST_IP", ""):
+        entries.append({"field_name": "interface_ip", "old_value": existing_ip,
+                        "new_value": zbx_record.get("HOST_IP", ""), "action": "updated"})
+    if iface_locked:
+        entries.append({"field_name": "interface_type", "old_value": str(existing_iface.get("type", "")),
+                        "new_value": str((iface_spec or {}).get("type", "")), "action": "BLOCKED",
+                        "merge_result": "INTERFACE_TYPE_LOCKED",
+                        "reason": "Interface type change skipped: linked Zabbix items prevent interface replace"})
+    if str(zbx_existing.get("monitored_by", "")) != str(monitored_by):
+        entries.append({"field_name": "monitored_by", "old_value": str(zbx_existing.get("monitored_by", "")),
+                        "new_value": str(monitored_by), "action": "updated"})
+    existing_proxy = str(zbx_existing.get("proxy_groupid", "") or "")
+    if proxy_decision.get("proxy_manual_change_detected"):
+        entries.append({"field_name": "proxy_group", "old_value": existing_proxy,
+                        "new_value": str(proxy_group_id or ""), "action": "skipped",
+                        "merge_result": "preserved_manual", "reason": "Proxy manually changed in Zabbix"})
+    elif proxy_apply:
+        entries.append({"field_name": "proxy_group", "old_value": existing_proxy,
+                        "new_value": str(proxy_group_id or ""), "action": "updated", "merge_result": "updated"})
+    if groups_needs_update:
+        old_names = sorted(g.get("name", "") for g in (zbx_existing.get("groups") or []) if g.get("name"))
+        entries.append({"field_name": "host_groups", "old_value": ",".join(old_names),
+                        "new_value": ",".join(sorted(required_groups)), "action": "updated"})
+    return entries
+
+
 class ZabbixPayloadBuilder:
-    """Resolve templates, groups, proxy, interfaces; build create/update API params."""
+    """
+    Resolve templates, groups, proxy, interfaces; build create/update API params.
+
+    Everything that depends only on DEVICE_TYPE (templates, interface spec,
+    template groups / macros, proxy_group_by_dc) and the proxy choice per
+    (DEVICE_TYPE, DC code) is resolved once per builder and memoised, so
+    enrich_plan only does the host-specific merge work. Reuse one builder for
+    many plans (compare engine, apply engine duplicate recovery).
+
+    proxy_group_config is indexed by DC code and by name once, and the managed
+    tag keys are frozen per device role, so no per-plan linear scans remain.
+
+    ctx["minimal_update_payload"] switches host.update payloads to minimal-delta
+    mode (see prune_update_payload).
+    """
 
     def __init__(self, ctx: Dict[str, Any]) -> None:
         self.ctx = ctx
@@ -116,7 +225,17 @@ class ZabbixPayloadBuilder:
             str(k): str(v) for k, v in (ctx.get("group_id_cache") or {}).items()
         }
         self.proxy_group_config: List[Dict[str, str]] = ctx.get("proxy_group_config") or []
+        # First entry wins, as with the former linear scans.
+        self._proxy_by_dc: Dict[str, Dict[str, str]] = {}
+        self._proxy_by_name: Dict[str, Dict[str, str]] = {}
+        for entry in self.proxy_group_config:
+            self._proxy_by_dc.setdefault(str(entry.get("dc_pattern", "") or "").upper(), entry)
+            self._proxy_by_name.setdefault(entry.get("name"), entry)
+        self._managed_keys: Dict[str, frozenset] = {}
+        self.minimal_update_payload = bool(ctx.get("minimal_update_payload"))
         self.hmdl_baseline_map: Dict[str, Any] = ctx.get("hmdl_baseline_map") or {}
+        self._device_type_cache: Dict[str, Dict[str, Any]] = {}
+        self._proxy_cache: Dict[Tuple[str, str], Tuple[str, str, str]] = {}
 
     def _template_rows(self, device_type: str) -> List[Dict]:
         rows = self.templates_map.get(device_type, [])
@@ -226,6 +345,17 @@ class ZabbixPayloadBuilder:
             return [], False
         return [{"interfaceid": str(iface_id), "ip": new_ip}], False
 
+    @staticmethod
+    def _merged_proxy_group_by_dc(template_rows: List[Dict]) -> Dict[str, str]:
+        merged_pg_by_dc: Dict[str, str] = {}
+        for row in template_rows:
+            pg_map = row.get("proxy_group_by_dc")
+            if isinstance(pg_map, dict):
+                for k, v in pg_map.items():
+                    if k and v:
+                        merged_pg_by_dc[str(k).strip().upper()] = str(v)
+        return merged_pg_by_dc
+
     def resolve_proxy(
         self,
         zbx_record: Dict,
@@ -237,52 +367,50 @@ class ZabbixPayloadBuilder:
         """
         dc_id = zbx_record.get("DC_ID", "") or ""
         dc_code = _extract_dc_code(dc_id)
+        return self._resolve_proxy_for_dc(dc_code, self._merged_proxy_group_by_dc(template_rows))
 
-        merged_pg_by_dc: Dict[str, str] = {}
-        for row in template_rows:
-            pg_map = row.get("proxy_group_by_dc")
-            if isinstance(pg_map, dict):
-                for k, v in pg_map.items():
-                    if k and v:
-                        merged_pg_by_dc[str(k).strip().upper()] = str(v)
-
+    def _resolve_proxy_for_dc(self, dc_code: str, merged_pg_by_dc: Dict[str, str]) -> Tuple[str, str, str]:
         proxy_group_id = ""
         matched_name = ""
         monitored_by = "0"
 
-        if dc_code:
-            for entry in self.proxy_group_config:
-                if entry.get("dc_pattern", "").upper() == dc_code:
-                    proxy_group_id = str(entry.get("proxy_groupid", ""))
-                    matched_name = str(entry.get("name", ""))
-                    if proxy_group_id:
-                        monitored_by = "2"
-                    break
+        entry = self._proxy_by_dc.get(dc_code) if dc_code else None
+        if entry is not None:
+            proxy_group_id = str(entry.get("proxy_groupid", ""))
+            matched_name = str(entry.get("name", ""))
+            if proxy_group_id:
+                monitored_by = "2"
 
         static_name = merged_pg_by_dc.get(dc_code.upper(), "") if dc_code else ""
-        if static_name:
-            for entry in self.proxy_group_config:
-                if entry.get("name") == static_name:
-                    proxy_group_id = str(entry.get("proxy_groupid", ""))
-                    matched_name = static_name
-                    if proxy_group_id:
-                        monitored_by = "2"
-                    break
+        entry = self._proxy_by_name.get(static_name) if static_name else None
+        if entry is not None:
+            proxy_group_id = str(entry.get("proxy_groupid", ""))
+            matched_name = static_name
+            if proxy_group_id:
+                monitored_by = "2"
 
         return monitored_by, proxy_group_id, matched_name
 
+    @staticmethod
+    def _template_group_names(template_rows: List[Dict]) -> List[str]:
+        template_groups: List[str] = []
+        for row in template_rows:
+            for g in row.get("host_groups") or []:
+                if g:
+                    template_groups.append(str(g))
+        return template_groups
+
     def resolve_required_group_names(
         self,
         zbx_record: Dict,
         template_rows: List[Dict],
     ) -> List[str]:
+        return self._required_group_names(zbx_record, self._template_group_names(template_rows))
+
+    @staticmethod
+    def _required_group_names(zbx_record: Dict, template_groups: List[str]) -> List[str]:
         csv = zbx_record.get("HOST_GROUPS", "") or ""
         csv_groups = [g.strip() for g in csv.split(",") if g.strip()]
-        template_groups: List[str] = []
-        for row in template_rows:
-            for g in row.get("host_groups") or []:
-                if g:
-                    template_groups.append(str(g))
         device_type = zbx_record.get("DEVICE_TYPE", "")
         all_names = csv_groups + template_groups
         if device_type:
@@ -304,15 +432,107 @@ class ZabbixPayloadBuilder:
                 out.append({"groupid": str(gid)})
         return out
 
-    def collect_template_macros(self, template_rows: List[Dict], host_ip: str) -> Tuple[Dict[str, str], List[Dict]]:
-        macros: Dict[str, str] = {}
+    @staticmethod
+    def _template_macro_values(template_rows: List[Dict]) -> Dict[str, str]:
+        """Merged template macros before {HOST.IP} substitution (later rows win)."""
+        raw: Dict[str, str] = {}
         for row in template_rows:
             for key, val in (row.get("macros") or {}).items():
-                processed = str(val).replace("{HOST.IP}", host_ip)
-                macros[str(key)] = processed
+                raw[str(key)] = str(val)
+        return raw
+
+    @staticmethod
+    def _format_template_macros(raw: Dict[str, str], host_ip: str) -> Tuple[Dict[str, str], List[Dict]]:
+        macros = {key: val.replace("{HOST.IP}", host_ip) for key, val in raw.items()}
         formatted = [{"macro": k, "value": v} for k, v in macros.items()]
         return macros, formatted
 
+    def collect_template_macros(self, template_rows: List[Dict], host_ip: str) -> Tuple[Dict[str, str], List[Dict]]:
+        return self._format_template_macros(self._template_macro_values(template_rows), host_ip)
+
+    # -- per device type / DC resolution (memoised) ---------------------------
+
+    def resolve_device_type(self, device_type: str) -> Dict[str, Any]:
+        """
+        Everything enrich_plan derives from DEVICE_TYPE alone, resolved once per type.
+
+        The returned dict is shared by every plan of that device type: read it,
+        copy before handing pieces to a payload.
+        """
+        cached = self._device_type_cache.get(device_type)
+        if cached is not None:
+            return cached
+        names, types, rows = self.resolve_template_names_and_types(device_type)
+        template_ids, missing_templates = self.resolve_template_ids(names)
+        iface_type = self.resolve_interface_type(types)
+        resolved = {
+            "template_rows": rows,
+            "template_ids": template_ids,
+            "missing_templates": missing_templates,
+            "iface_spec": self.resolve_interface_spec(iface_type),
+            "create_iface_spec": self.resolve_interface_spec_with_override(iface_type, rows),
+            "proxy_group_by_dc": self._merged_proxy_group_by_dc(rows),
+            "template_groups": self._template_group_names(rows),
+            "template_macros": self._template_macro_values(rows),
+        }
+        return self._device_type_cache.setdefault(device_type, resolved)
+
+    def resolve_device_type_proxy(self, device_type: str, dc_code: str) -> Tuple[str, str, str]:
+        """resolve_proxy() for a (DEVICE_TYPE, DC code) pair, memoised."""
+        key = (device_type, dc_code)
+        cached = self._proxy_cache.get(key)
+        if cached is None:
+            merged = self.resolve_device_type(device_type)["proxy_group_by_dc"]
+            cached = self._proxy_cache.setdefault(key, self._resolve_proxy_for_dc(dc_code, merged))
+        return cached
+
+    def managed_tag_keys(self, device_role: str) -> frozenset:
+        """Managed tag keys for a device role (tags_config plus platform / VFW keys), frozen once per role."""
+        role = (device_role or "").upper()
+        keys = self._managed_keys.get(role)
+        if keys is None:
+            keys = self._managed_keys.setdefault(role, managed_key_set(_effective_managed_keys(self.ctx, role)))
+        return keys
+
+    def _existing_group_ids(self, zbx_existing: Dict) -> List[str]:
+        ids = []
+        for g in zbx_existing.get("groups") or []:
+            gid = g.get("groupid") or self.group_id_cache.get(g.get("name", ""))
+            if gid:
+                ids.append(str(gid))
+        return ids
+
+    def prune_update_payload(self, payload: Dict[str, Any], zbx_existing: Dict) -> List[str]:
+        """
+        Minimal-delta host.update: drop every component that already matches the host.
+
+        host / name are compared as strings, monitored_by + proxy_groupid as one
+        pair (Zabbix needs both when either changes), groups and tags as sets, so
+        a pure reordering never causes a write. Tags and groups are replaced as a
+        whole by host.update, so when they do change the full merged list is the
+        smallest correct value and is kept. Returns the omitted keys; a payload
+        left with only hostid means no update is needed.
+        """
+        omitted: List[str] = []
+        if "host" in payload and payload["host"] == zbx_existing.get("host", ""):
+            omitted.append("host")
+        if "name" in payload and payload["name"] == str(zbx_existing.get("name") or ""):
+            omitted.append("name")
+        if "monitored_by" in payload or "proxy_groupid" in payload:
+            wanted = (_int_or_zero(payload.get("monitored_by")), _int_or_zero(payload.get("proxy_groupid")))
+            current = (_int_or_zero(zbx_existing.get("monitored_by")), _int_or_zero(zbx_existing.get("proxy_groupid")))
+            if wanted == current:
+                omitted.extend(k for k in ("monitored_by", "proxy_groupid") if k in payload)
+        if "groups" in payload:
+            wanted_ids = {str(g.get("groupid")) for g in payload["groups"] if g.get("groupid")}
+            if wanted_ids == set(self._existing_group_ids(zbx_existing)):
+                omitted.append("groups")
+        if "tags" in payload and _tag_multiset(payload["tags"]) == _tag_multiset(zbx_existing.get("tags")):
+            omitted.append("tags")
+        for key in omitted:
+            payload.pop(key, None)
+        return omitted
+
     def _hmdl_row_for_record(self, zbx_record: Dict) -> Dict[str, Any]:
         device_id = str(
             zbx_record.get("LOKI_DEVICE_ID")
@@ -338,20 +558,17 @@ class ZabbixPayloadBuilder:
         device_type = zbx_record.get("DEVICE_TYPE", "")
         device_role = zbx_record.get("DEVICE_ROLE", "")
 
-        template_names, template_types, template_rows = self.resolve_template_names_and_types(device_type)
-        template_ids, missing_templates = self.resolve_template_ids(template_names)
-        iface_type = self.resolve_interface_type(template_types)
-        iface_spec = self.resolve_interface_spec(iface_type)
-        create_iface_spec = (
-            self.resolve_interface_spec_with_override(iface_type, template_rows)
-            if action == "create"
-            else iface_spec
-        )
-        monitored_by, proxy_group_id, _ = self.resolve_proxy(zbx_record, template_rows)
-        required_groups = self.resolve_required_group_names(zbx_record, template_rows)
+        resolved = self.resolve_device_type(device_type)
+        template_ids = [dict(t) for t in resolved["template_ids"]]
+        missing_templates = resolved["missing_templates"]
+        iface_spec = resolved["iface_spec"]
+        create_iface_spec = resolved["create_iface_spec"] if action == "create" else iface_spec
+        dc_code = _extract_dc_code(zbx_record.get("DC_ID", "") or "")
+        monitored_by, proxy_group_id, _ = self.resolve_device_type_proxy(device_type, dc_code)
+        required_groups = self._required_group_names(zbx_record, resolved["template_groups"])
         missing_groups = self.detect_missing_groups(required_groups)
-        macros_dict, macros_formatted = self.collect_template_macros(
-            template_rows, zbx_record.get("HOST_IP", "") or ""
+        macros_dict, macros_formatted = self._format_template_macros(
+            resolved["template_macros"], zbx_record.get("HOST_IP", "") or ""
         )
         tags = _macros_to_tags(_parse_macros_field(zbx_record.get("MACROS", {})))
         device_role_upper = (device_role or "").upper()
@@ -373,7 +590,6 @@ class ZabbixPayloadBuilder:
             )
         elif not template_ids:
             validation_errors.append("Template bulunamadı (Zabbix'te eşleşen şablon yok)")
-        dc_code = _extract_dc_code(zbx_record.get("DC_ID", "") or "")
         if dc_code and not proxy_group_id and action == "create":
             validation_errors.append(f"Proxy group bulunamadı (DC_ID: {zbx_record.get('DC_ID', 'N/A')})")
 
@@ -441,7 +657,7 @@ class ZabbixPayloadBuilder:
             zbx_record, iface_spec, zbx_existing, interface_type_changed
         )
 
-        managed_keys = _effective_managed_keys(self.ctx, device_role)
+        managed_keys = self.managed_tag_keys(device_role)
         existing_tags = zbx_existing.get("tags") or []
         merged_tags, tag_change_log = merge_tags(existing_tags, tags, managed_keys)
         tags_needs_update = any(
@@ -530,8 +746,48 @@ class ZabbixPayloadBuilder:
         if iface_locked:
             update_reasons.append("interface_type_locked")
 
+        update_payload: Optional[Dict[str, Any]] = None
+        if needs_update:
+            update_payload = {
+                "hostid": str(zbx_existing["hostid"]),
+                "host": zbx_record["HOSTNAME"],
+                "monitored_by": int(monitored_by),
+                "proxy_groupid": int(effective_proxy_id or 0),
+            }
+            if iface_update and not iface_locked:
+                update_payload["interfaces"] = iface_update
+            if groups_needs_update:
+                update_payload["groups"] = self.format_groups(
+                    [g for g in merged_group_names if g in self.group_id_cache]
+                )
+            if tags_needs_update:
+                update_payload["tags"] = merged_tags
+            if visible_needs_update:
+                update_payload["name"] = visible_name
+            if self.minimal_update_payload:
+                # HMDL logging reads the expected proxy group from the payload; keep it on the plan.
+                plan["expected_proxy_group_id"] = str(effective_proxy_id or "")
+                plan["update_payload_omitted"] = self.prune_update_payload(update_payload, zbx_existing)
+                if len(update_payload) == 1:
+                    needs_update = False
+                    update_payload = None
+                    plan["update_skipped"] = "no_effective_delta"
+
         plan["update_reasons"] = update_reasons
         plan["field_merge_actions"] = field_merge_actions
+        # HMDL update-log rows, written in bulk after Phase B by hmdl_bulk_writer.py.
+        plan["host_field_changes"] = (
+            _host_field_changes(
+                zbx_record, zbx_existing, existing_iface, monitored_by, proxy_group_id,
+                proxy_decision, proxy_apply, groups_needs_update, required_groups,
+                field_merge_actions, iface_locked, iface_spec,
+            )
+            if needs_update
+            else []
+        )
+        plan["tag_changes"] = [
+            {**e, "object_type": "tag"} for e in tag_change_log if e.get("action") != "unchanged"
+        ]
         plan["visible_name_preserved_manual"] = visible_preserve_manual
 
         plan["needs_update"] = needs_update
@@ -562,23 +818,6 @@ class ZabbixPayloadBuilder:
             }
             return plan
 
-        update_payload: Dict[str, Any] = {
-            "hostid": str(zbx_existing["hostid"]),
-            "host": zbx_record["HOSTNAME"],
-            "monitored_by": int(monitored_by),
-            "proxy_groupid": int(effective_proxy_id or 0),
-        }
-        if iface_update and not iface_locked:
-            update_payload["interfaces"] = iface_update
-        if groups_needs_update:
-            update_payload["groups"] = self.format_groups(
-                [g for g in merged_group_names if g in self.group_id_cache]
-            )
-        if tags_needs_update:
-            update_payload["tags"] = merged_tags
-        if visible_needs_update:
-            update_payload["name"] = visible_name
-
         plan["update_payload"] = update_payload
         plan["create_payload"] = None
         result_key = (
@@ -601,16 +840,134 @@ class ZabbixPayloadBuilder:
         return plan
 
 
-def re_enrich_plan(plan: Dict[str, Any], ctx: Dict[str, Any], existing_host: Dict[str, Any]) -> Dict[str, Any]:
-    """Switch a create plan to update after duplicate host.create recovery."""
+def re_enrich_plan(
+    plan: Dict[str, Any],
+    ctx: Dict[str, Any],
+    existing_host: Dict[str, Any],
+    builder: Optional[ZabbixPayloadBuilder] = None,
+) -> Dict[str, Any]:
+    """
+    Switch a create plan to update after duplicate host.create recovery.
+
+    Pass a long-lived builder (built from the same ctx) to reuse its per device
+    type resolution across plans; otherwise a fresh one is built for this plan.
+    """
     updated = deepcopy(plan)
     updated["action"] = "update"
     updated["zbx_scenario"] = "update"
     updated["zbx_existing_host"] = existing_host
-    builder = ZabbixPayloadBuilder(ctx)
+    if builder is None:
+        builder = ZabbixPayloadBuilder(ctx)
     return builder.enrich_plan(updated)
 
 
+# <entity>_dup_host_<id>.json written next to <entity>_plan_<id>.json for --batch-dir.
+_DUP_HOST_FILE = re.compile(r"^(device|platform|vfw)_dup_host_(.+)\.json$")
+
+
+def discover_re_enrich_pairs(directory: str) -> List[Dict[str, str]]:
+    """(plan, existing host) pairs of a directory, sorted by host file name."""
+    pairs = []
+    for name in sorted(os.listdir(directory)):
+        match = _DUP_HOST_FILE.match(name)
+        if match:
+            entity_type, item_id = match.groups()
+            pairs.append({
+                "plan": os.path.join(directory, f"{entity_type}_plan_{item_id}.json"),
+                "existing_host": os.path.join(directory, name),
+            })
+    return pairs
+
+
+def load_re_enrich_manifest(path: str) -> List[Dict[str, str]]:
+    """Manifest JSON: [{"plan": PATH, "existing_host": PATH, "output": PATH?}, ...]."""
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError(f"{path}: manifest must be a JSON array")
+    pairs = []
+    for n, entry in enumerate(entries):
+        if not isinstance(entry, dict) or not entry.get("plan") or not entry.get("existing_host"):
+            raise ValueError(f"{path}: entry {n} needs \"plan\" and \"existing_host\"")
+        pairs.append({k: str(entry[k]) for k in ("plan", "existing_host", "output") if entry.get(k)})
+    return pairs
+
+
+def _re_enrich_file_pair(pair: Dict[str, str], ctx: Dict[str, Any], builder: "ZabbixPayloadBuilder") -> Dict[str, Any]:
+    out_path = pair.get("output") or pair["plan"]
+    record: Dict[str, Any] = {"type": "re_enrich", "plan": pair["plan"], "output": out_path}
+    try:
+        with open(pair["plan"], encoding="utf-8") as f:
+            plan = json.load(f)
+        with open(pair["existing_host"], encoding="utf-8") as f:
+            existing_host = json.load(f)
+        enriched = re_enrich_plan(plan, ctx, existing_host, builder)
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(enriched, f, ensure_ascii=False)
+    except (OSError, ValueError) as exc:
+        record["error"] = f"{exc.__class__.__name__}: {exc}"
+        return record
+    record["hostid"] = str(existing_host.get("hostid") or "")
+    record["needs_update"] = bool(enriched.get("needs_update"))
+    return record
+
+
+_WORKER_CTX: Optional[Dict[str, Any]] = None
+_WORKER_BUILDER: Optional["ZabbixPayloadBuilder"] = None
+
+
+def _init_re_enrich_worker(ctx: Optional[Dict[str, Any]] = None) -> None:
+    """Process-pool initializer: one payload builder per worker process."""
+    global _WORKER_CTX, _WORKER_BUILDER
+    if ctx is not None:
+        _WORKER_CTX = ctx
+    _WORKER_BUILDER = ZabbixPayloadBuilder(_WORKER_CTX or {})
+
+
+def _re_enrich_in_worker(pair: Dict[str, str]) -> Dict[str, Any]:
+    return _re_enrich_file_pair(pair, _WORKER_CTX or {}, _WORKER_BUILDER)
+
+
+def re_enrich_batch(
+    pairs: List[Dict[str, str]],
+    ctx: Dict[str, Any],
+    workers: int = 8,
+) -> List[Dict[str, Any]]:
+    """
+    Re-enrich many (plan, existing host) file pairs with one ctx.
+
+    Each pair is {"plan", "existing_host", "output"?}; the enriched plan goes to
+    output (default: back to plan). Returns one record per pair, in input
+    order, with "error" set for pairs that could not be read or written.
+
+    Enrichment is CPU-bound, so more than one worker means a process pool
+    (capped at the CPU count); ctx is inherited via fork where available.
+    """
+    global _WORKER_CTX
+    workers = min(workers, len(pairs), os.cpu_count() or 1)
+    if workers <= 1:
+        builder = ZabbixPayloadBuilder(ctx)
+        return [_re_enrich_file_pair(pair, ctx, builder) for pair in pairs]
+    if "fork" in multiprocessing.get_all_start_methods():
+        _WORKER_CTX = ctx
+        mp_ctx = multiprocessing.get_context("fork")
+        initargs: Tuple = (None,)
+    else:
+        mp_ctx = multiprocessing.get_context()
+        initargs = (ctx,)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp_ctx,
+            initializer=_init_re_enrich_worker,
+            initargs=initargs,
+        ) as executor:
+            chunksize = max(1, len(pairs) // (workers * 4))
+            return list(executor.map(_re_enrich_in_worker, pairs, chunksize=chunksize))
+    finally:
+        _WORKER_CTX = None
+
+
 def _load_builder_ctx_from_args(args: Any) -> Dict[str, Any]:
     import yaml
 
@@ -672,6 +1029,7 @@ def _load_builder_ctx_from_args(args: Any) -> Dict[str, Any]:
             else []
         ),
         "platform_managed_tag_keys": [],
+        "minimal_update_payload": bool(getattr(args, "minimal_update_payload", False)),
     }
 
 
@@ -679,22 +1037,48 @@ def main() -> None:
     import argparse
 
     parser = argparse.ArgumentParser(description="Zabbix payload builder utilities")
-    parser.add_argument("--re-enrich-plan", help="Path to compare plan JSON to re-enrich as update")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--re-enrich-plan", help="Path to compare plan JSON to re-enrich as update")
+    mode.add_argument("--batch-manifest", help="JSON array of {plan, existing_host, output?} to re-enrich")
+    mode.add_argument("--batch-dir", help="Re-enrich every <entity>_dup_host_<id>.json / <entity>_plan_<id>.json pair")
     parser.add_argument("--existing-host-json", help="Path to resolved Zabbix host JSON")
     parser.add_argument("--output-plan", help="Path to write re-enriched plan JSON")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="Batch mode worker processes, capped at the CPU count (default: 8)")
     parser.add_argument("--mappings-dir", help="Path to mappings/ directory")
     parser.add_argument("--zbx-templates-cache")
     parser.add_argument("--zbx-groups-cache")
     parser.add_argument("--zbx-proxy-groups-cache")
     parser.add_argument("--hmdl-baseline-map")
+    parser.add_argument(
+        "--minimal-update-payload",
+        action="store_true",
+        help="Leave unchanged components out of host.update payloads",
+    )
     args = parser.parse_args()
 
+    if not args.mappings_dir:
+        parser.error("--mappings-dir is required")
+    if args.batch_manifest or args.batch_dir:
+        try:
+            pairs = (
+                load_re_enrich_manifest(args.batch_manifest) if args.batch_manifest
+                else discover_re_enrich_pairs(args.batch_dir)
+            )
+        except (OSError, ValueError) as exc:
+            parser.error(str(exc))
+        ctx = _load_builder_ctx_from_args(args)
+        records = re_enrich_batch(pairs, ctx, workers=args.workers)
+        for record in records:
+            print(json.dumps(record, ensure_ascii=False), flush=True)
+        failed = sum(1 for record in records if record.get("error"))
+        print(json.dumps({"type": "summary", "total": len(records), "failed": failed}), flush=True)
+        sys.exit(1 if failed else 0)
+
     if not args.re_enrich_plan:
-        parser.error("--re-enrich-plan is required")
+        parser.error("--re-enrich-plan, --batch-manifest or --batch-dir is required")
     if not args.existing_host_json:
         parser.error("--existing-host-json is required")
-    if not args.mappings_dir:
-        parser.error("--mappings-dir is required")
 
     with open(args.re_enrich_plan, encoding="utf-8") as f:
         plan = json.load(f)
@@ -1,95 +1,28 @@
 # -*- coding: utf-8 -*-
-"""Ansible filters: Zabbix technical host name (ASCII-safe, Turkish transliteration)."""
+"""
+Ansible filters: Zabbix technical host name (ASCII-safe, Turkish transliteration).
+
+The host name logic lives in module_utils/zabbix_hostname_core.py (shared with the
+compare engine); zabbix_technical_hostnames converts whole lists in one call.
+"""
 
 from __future__ import annotations
 
-import re
-import unicodedata
+import os
+import sys
 
-# Zabbix host name max length (API / UI constraint)
-_MAX_HOST_LEN = 128
+_MODULE_UTILS = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "module_utils"))
+if _MODULE_UTILS not in sys.path:
+    sys.path.insert(0, _MODULE_UTILS)
 
-# Turkish-specific letters before generic NFKD pass
-_TR_MAP = str.maketrans(
-    {
-        "ı": "i",
-        "İ": "I",
-        "ş": "s",
-        "Ş": "S",
-        "ğ": "g",
-        "Ğ": "G",
-        "ü": "u",
-        "Ü": "U",
-        "ö": "o",
-        "Ö": "O",
-        "ç": "c",
-        "Ç": "C",
-    }
+from zabbix_hostname_core import (  # noqa: E402
+    technical_hostnames,
+    zabbix_platform_technical_hostname,
+    zabbix_technical_hostname,
+    zabbix_vfw_technical_hostname,
 )
 
 
-def zabbix_technical_hostname(text, fallback_id=""):
-    """
-    Build a Zabbix-safe technical host string: ASCII [A-Za-z0-9._-], max length.
-
-    :param text: Human-readable host label (may contain Turkish / Unicode).
-    :param fallback_id: If slug is empty after normalization, use host-<id> or p<id>.
-    """
-    if text is None:
-        raw = ""
-    else:
-        raw = str(text).strip()
-    if not raw:
-        fb = str(fallback_id).strip() if fallback_id else ""
-        if fb:
-            low = fb.lower()
-            if low.startswith("host-") or low.startswith("p"):
-                return _truncate_and_sanitize(fb)
-            return _truncate_and_sanitize(f"host-{fb}")
-        return "host"
-
-    step1 = raw.translate(_TR_MAP)
-    # Decompose and drop combining marks (accents on Latin letters)
-    nfkd = unicodedata.normalize("NFKD", step1)
-    ascii_buf = []
-    for ch in nfkd:
-        if unicodedata.category(ch) == "Mn":
-            continue
-        ascii_buf.append(ch)
-    merged = "".join(ascii_buf)
-    # Keep only Zabbix-typical safe set; map others to underscore
-    safe = []
-    for ch in merged:
-        if ch.isalnum() or ch in "._-":
-            safe.append(ch)
-        elif ch.isspace():
-            safe.append("_")
-        else:
-            safe.append("_")
-    slug = "".join(safe)
-    slug = re.sub(r"_+", "_", slug).strip("._-")
-    slug = _truncate_and_sanitize(slug)
-    if not slug:
-        fb = str(fallback_id).strip() if fallback_id else ""
-        if fb:
-            low = fb.lower()
-            if low.startswith("host-") or low.startswith("p"):
-                slug = _truncate_and_sanitize(fb)
-            else:
-                slug = _truncate_and_sanitize(f"host-{fb}")
-        else:
-            slug = "host"
-    return slug
-
-
-def _truncate_and_sanitize(s: str) -> str:
-    if not s:
-        return ""
-    s = s[:_MAX_HOST_LEN]
-    s = re.sub(r"_+", "_", s).strip("._-")
-    return s
-
-
 def parse_virtual_fw_ip_port(value):
     """
     Split NetBox virtual_fw ip_port string into IP and port.
@@ -174,63 +107,13 @@ def vfw_hostname_prefix_hostgroup(hostname_raw):
     return first.title()
 
 
-def zabbix_vfw_technical_hostname(text, vfw_id=""):
-    """
-    Zabbix technical host for NetBox virtual firewalls: ASCII slug plus _VFW_<id> suffix.
-    """
-    sid = str(vfw_id).strip() if vfw_id is not None else ""
-    suffix = f"_VFW_{sid}" if sid else ""
-    base_slug = zabbix_technical_hostname(text, "")
-    if not suffix:
-        return base_slug or "host"
-    if not base_slug:
-        return zabbix_technical_hostname("", f"VFW_{sid}")
-    suf_low = suffix.lower()
-    if base_slug.lower().endswith(suf_low):
-        out = _truncate_and_sanitize(base_slug)
-        return out[:_MAX_HOST_LEN]
-    max_base = _MAX_HOST_LEN - len(suffix)
-    if max_base < 1:
-        return _truncate_and_sanitize(suffix)[:_MAX_HOST_LEN]
-    truncated = base_slug[:max_base].rstrip("._-")
-    if not truncated:
-        return zabbix_technical_hostname("", f"VFW_{sid}")
-    merged = truncated + suffix
-    return _truncate_and_sanitize(merged)[:_MAX_HOST_LEN]
-
-
-def zabbix_platform_technical_hostname(text, platform_id=""):
-    """
-    Zabbix technical host for NetBox platforms: ASCII slug from name plus _P_<id> suffix
-    within max length so each platform id maps to a unique host key.
-    """
-    sid = str(platform_id).strip() if platform_id is not None else ""
-    suffix = f"_P_{sid}" if sid else ""
-    base_slug = zabbix_technical_hostname(text, "")
-    if not suffix:
-        return base_slug or "host"
-    if not base_slug:
-        return zabbix_technical_hostname("", f"P_{sid}")
-    suf_low = suffix.lower()
-    if base_slug.lower().endswith(suf_low):
-        out = _truncate_and_sanitize(base_slug)
-        return out[:_MAX_HOST_LEN]
-    max_base = _MAX_HOST_LEN - len(suffix)
-    if max_base < 1:
-        return _truncate_and_sanitize(suffix)[:_MAX_HOST_LEN]
-    truncated = base_slug[:max_base].rstrip("._-")
-    if not truncated:
-        return zabbix_technical_hostname("", f"P_{sid}")
-    merged = truncated + suffix
-    return _truncate_and_sanitize(merged)[:_MAX_HOST_LEN]
-
-
 class FilterModule:
     """Ansible filter plugin registration."""
 
     def filters(self):
         return {
             "zabbix_technical_hostname": self._filter_zabbix_technical_hostname,
+            "zabbix_technical_hostnames": self._filter_zabbix_technical_hostnames,
             "zabbix_platform_technical_hostname": self._filter_zabbix_platform_technical_hostname,
             "zabbix_vfw_technical_hostname": self._filter_zabbix_vfw_technical_hostname,
             "zabbix_vfw_display_name": self._filter_zabbix_vfw_display_name,
@@ -242,6 +125,9 @@ class FilterModule:
     def _filter_zabbix_technical_hostname(self, value, fallback_id=""):
         return zabbix_technical_hostname(value, fallback_id)
 
+    def _filter_zabbix_technical_hostnames(self, values, ids=None, kind="host"):
+        return technical_hostnames(values, ids, kind)
+
     def _filter_zabbix_platform_technical_hostname(self, value, platform_id=""):
         return zabbix_platform_technical_hostname(value, platform_id)
 
@@ -20,6 +20,7 @@ assert _spec.loader is not None
 _spec.loader.exec_module(_impl)
 
 load_managed_tag_keys = _impl.load_managed_tag_keys
+managed_key_set = _impl.managed_key_set
 is_managed_tag = _impl.is_managed_tag
 merge_tags = _impl.merge_tags
 merge_host_groups = _impl.merge_host_groups
@@ -29,6 +30,7 @@ resolve_proxy_group_update = _impl.resolve_proxy_group_update
 
 __all__ = [
     "load_managed_tag_keys",
+    "managed_key_set",
     "is_managed_tag",
     "merge_tags",
     "merge_host_groups",
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Zabbix technical host names (ASCII-safe, Turkish transliteration).
+
+Single implementation shared by filter_plugins/zabbix_hostname.py and the
+Phase A compare engine. Each code point is transliterated once into a
+per-code-point table (Turkish map -> NFKD -> drop combining marks -> keep
+[A-Za-z0-9._-] / alnum, else "_"), and results are memoised in a bounded LRU
+keyed by (text, fallback_id, kind).
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Any, List, Optional, Sequence
+
+# Zabbix host name max length (API / UI constraint)
+_MAX_HOST_LEN = 128
+
+# LRU size for memoised host names; a full inventory run stays well below it.
+HOSTNAME_CACHE_SIZE = 65536
+
+KINDS = ("host", "platform", "vfw")
+
+# Turkish-specific letters before generic NFKD pass
+_TR_MAP = {
+    "ı": "i",
+    "İ": "I",
+    "ş": "s",
+    "Ş": "S",
+    "ğ": "g",
+    "Ğ": "G",
+    "ü": "u",
+    "Ü": "U",
+    "ö": "o",
+    "Ö": "O",
+    "ç": "c",
+    "Ç": "C",
+}
+
+_UNDERSCORE_RUN = re.compile(r"_+")
+
+
+def _transliterate_char(ch: str) -> str:
+    """Slug fragment for one code point (may be empty when it is a combining mark)."""
+    step1 = _TR_MAP.get(ch, ch)
+    out = []
+    for part in unicodedata.normalize("NFKD", step1):
+        if unicodedata.category(part) == "Mn":
+            continue
+        out.append(part if part.isalnum() or part in "._-" else "_")
+    return "".join(out)
+
+
+class _TransliterationTable(dict):
+    """str.translate table: code point -> slug fragment, filled on first sight."""
+
+    def __missing__(self, codepoint: int) -> str:
+        value = _transliterate_char(chr(codepoint))
+        self[codepoint] = value
+        return value
+
+
+# Precompute ASCII, Latin-1 and Latin Extended-A/B (covers Turkish); others fill lazily.
+_SLUG_TABLE = _TransliterationTable((cp, _transliterate_char(chr(cp))) for cp in range(0x250))
+
+
+def _truncate_and_sanitize(s: str) -> str:
+    if not s:
+        return ""
+    s = s[:_MAX_HOST_LEN]
+    s = _UNDERSCORE_RUN.sub("_", s).strip("._-")
+    return s
+
+
+def _fallback_slug(fb: str) -> str:
+    if fb:
+        low = fb.lower()
+        if low.startswith("host-") or low.startswith("p"):
+            return _truncate_and_sanitize(fb)
+        return _truncate_and_sanitize(f"host-{fb}")
+    return "host"
+
+
+def _host_slug(raw: str, fb: str) -> str:
+    if not raw:
+        return _fallback_slug(fb)
+    slug = _UNDERSCORE_RUN.sub("_", raw.translate(_SLUG_TABLE)).strip("._-")
+    slug = _truncate_and_sanitize(slug)
+    return slug or _fallback_slug(fb)
+
+
+def _suffixed_slug(raw: str, sid: str, tag: str) -> str:
+    """Slug plus _<tag>_<id> within max length (platform: P, virtual firewall: VFW)."""
+    suffix = f"_{tag}_{sid}" if sid else ""
+    base_slug = _host_slug(raw, "")
+    if not suffix:
+        return base_slug or "host"
+    if not base_slug:
+        return _host_slug("", f"{tag}_{sid}")
+    if base_slug.lower().endswith(suffix.lower()):
+        out = _truncate_and_sanitize(base_slug)
+        return out[:_MAX_HOST_LEN]
+    max_base = _MAX_HOST_LEN - len(suffix)
+    if max_base < 1:
+        return _truncate_and_sanitize(suffix)[:_MAX_HOST_LEN]
+    truncated = base_slug[:max_base].rstrip("._-")
+    if not truncated:
+        return _host_slug("", f"{tag}_{sid}")
+    merged = truncated + suffix
+    return _truncate_and_sanitize(merged)[:_MAX_HOST_LEN]
+
+
+@lru_cache(maxsize=HOSTNAME_CACHE_SIZE)
+def _technical_hostname(raw: str, fallback_id: str, kind: str) -> str:
+    if kind == "platform":
+        return _suffixed_slug(raw, fallback_id, "P")
+    if kind == "vfw":
+        return _suffixed_slug(raw, fallback_id, "VFW")
+    return _host_slug(raw, fallback_id)
+
+
+def _raw_text(text: Any) -> str:
+    return "" if text is None else str(text).strip()
+
+
+def zabbix_technical_hostname(text: Any, fallback_id: Any = "") -> str:
+    """
+    Build a Zabbix-safe technical host string: ASCII [A-Za-z0-9._-], max length.
+
+    :param text: Human-readable host label (may contain Turkish / Unicode).
+    :param fallback_id: If slug is empty after normalization, use host-<id> or p<id>.
+    """
+    fb = str(fallback_id).strip() if fallback_id else ""
+    return _technical_hostname(_raw_text(text), fb, "host")
+
+
+def zabbix_platform_technical_hostname(text: Any, platform_id: Any = "") -> str:
+    """
+    Zabbix technical host for NetBox platforms: ASCII slug from name plus _P_<id> suffix
+    within max length so each platform id maps to a unique host key.
+    """
+    sid = str(platform_id).strip() if platform_id is not None else ""
+    return _technical_hostname(_raw_text(text), sid, "platform")
+
+
+def zabbix_vfw_technical_hostname(text: Any, vfw_id: Any = "") -> str:
+    """
+    Zabbix technical host for NetBox virtual firewalls: ASCII slug plus _VFW_<id> suffix.
+    """
+    sid = str(vfw_id).strip() if vfw_id is not None else ""
+    return _technical_hostname(_raw_text(text), sid, "vfw")
+
+
+_BY_KIND = {
+    "host": zabbix_technical_hostname,
+    "platform": zabbix_platform_technical_hostname,
+    "vfw": zabbix_vfw_technical_hostname,
+}
+
+
+def technical_hostnames(values: Sequence[Any], ids: Optional[Sequence[Any]] = None, kind: str = "host") -> List[str]:
+    """
+    Batch form: one technical host name per value.
+
+    ``ids`` is the per-item fallback id (host) / platform id / virtual_fw id and must be
+    as long as ``values`` when given.
+    """
+    if kind not in _BY_KIND:
+        raise ValueError(f"kind must be one of {KINDS}, got {kind!r}")
+    values = list(values or [])
+    if ids is None:
+        ids = [""] * len(values)
+    ids = list(ids)
+    if len(ids) != len(values):
+        raise ValueError(f"ids has {len(ids)} items, values has {len(values)}")
+    fn = _BY_KIND[kind]
+    return [fn(value, item_id) for value, item_id in zip(values, ids)]
+
+
+def technical_hostname_cache_info() -> Any:
+    return _technical_hostname.cache_info()
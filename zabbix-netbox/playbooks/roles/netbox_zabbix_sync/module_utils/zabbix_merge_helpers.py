@@ -8,7 +8,7 @@ Bundled by Ansible via role module_utils/ (import as ansible.module_utils.zabbix
 
 from __future__ import annotations
 
-from typing import Any
+from typing import AbstractSet, Any, Iterable
 
 
 def load_managed_tag_keys(tags_config: dict | None) -> list[str]:
@@ -26,7 +26,14 @@ def load_managed_tag_keys(tags_config: dict | None) -> list[str]:
     return keys
 
 
-def is_managed_tag(tag_name: str, managed_keys: list[str]) -> bool:
+def managed_key_set(managed_keys: Iterable[str] | None) -> frozenset[str]:
+    """Frozen lookup set for merge_tags / merge_macros; passed through when already frozen."""
+    if isinstance(managed_keys, frozenset):
+        return managed_keys
+    return frozenset(managed_keys or ())
+
+
+def is_managed_tag(tag_name: str, managed_keys: AbstractSet[str] | list[str]) -> bool:
     if tag_name in managed_keys:
         return True
     if tag_name.startswith("Loki_Tag_"):
@@ -37,14 +44,17 @@ def is_managed_tag(tag_name: str, managed_keys: list[str]) -> bool:
 def merge_tags(
     existing_tags: list[dict[str, Any]],
     new_managed_tags: list[dict[str, Any]],
-    managed_keys: list[str] | None = None,
+    managed_keys: Iterable[str] | None = None,
 ) -> tuple[list[dict[str, str]], list[dict[str, Any]]]:
     """
     Preserve manual tags; replace managed tags from source data.
 
+    managed_keys may be a list or a precomputed managed_key_set(); membership is
+    always checked against a set, so merging is linear in the number of tags.
+
     Returns (merged_tags, change_log).
     """
-    managed_keys = managed_keys or []
+    managed_keys = managed_key_set(managed_keys)
     existing_map = {
         str(t.get("tag", "")): str(t.get("value", ""))
         for t in (existing_tags or [])
@@ -121,10 +131,10 @@ def merge_host_groups(
 def merge_macros(
     existing_macros: list[dict[str, Any]],
     new_managed_macros: list[dict[str, Any]],
-    managed_macro_keys: list[str] | None = None,
+    managed_macro_keys: Iterable[str] | None = None,
 ) -> tuple[list[dict[str, str]], list[dict[str, Any]]]:
     """Preserve macros outside managed set; update managed macro keys from templates."""
-    managed_keys = set(managed_macro_keys or [])
+    managed_keys = managed_key_set(managed_macro_keys)
     existing_map: dict[str, str] = {}
     for m in existing_macros or []:
         key = m.get("macro")
@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+Synthetic-scale benchmark for the Phase A compare + payload pipeline.
+
+Generates a deterministic NetBox inventory (devices, platforms, virtual
+firewalls) from the real mappings/*.yml plus matching Zabbix hosts, caches and
+HMDL baseline rows, then runs run_parallel_compare (compare + enrich_plan +
+plan store writes) for every (size, executor) case in a fresh subprocess so
+each case gets its own peak RSS.
+
+Per case it reports:
+  items_per_sec       — Phase A throughput (run_parallel_compare wall time)
+  stages              — wall seconds for generate / ctx / compare_total
+  latency_ms          — p50 / p95 / p99 per item for compare, enrich and plan
+                        serialisation, measured sequentially on a sample
+  stage_timings       — the engine's own per-stage aggregates from compare_summary.json
+  peak_rss_mb         — max RSS of the case process (plus children for process mode)
+
+Inventory mix: 80% devices, 10% platforms, 10% virtual firewalls; 60% of them
+already exist in Zabbix and 15% of those drifted (IP / tag change), so the
+create, update and up-to-date paths are all exercised.
+
+Usage:
+  python3 scripts/benchmark_compare.py --sizes 1000,10000,50000 --executors thread,process
+  python3 scripts/benchmark_compare.py --sizes 1000 --write-baseline bench_baseline.json
+  python3 scripts/benchmark_compare.py --sizes 1000 --baseline bench_baseline.json --max-regression 0.25
+
+Runs offline: no NetBox, Zabbix or database access.
+
+Exit codes:
+  0 — benchmark finished (and no regression against --baseline)
+  1 — throughput or peak RSS regressed beyond the threshold
+  2 — invalid arguments
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+_ZABBIX_NETBOX_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_FILES_DIR = os.path.join(_ZABBIX_NETBOX_DIR, "playbooks", "roles", "netbox_zabbix_sync", "files")
+if _FILES_DIR not in sys.path:
+    sys.path.insert(0, _FILES_DIR)
+
+from parallel_compare_engine import (  # noqa: E402
+    _COMPARE_FUNCS,
+    EXECUTOR_MODES,
+    load_mapping_ctx,
+    run_parallel_compare,
+)
+from plan_store import PLAN_STORE_BACKENDS, open_plan_store  # noqa: E402
+from zabbix_host_index import build_host_index, host_maps_from_index  # noqa: E402
+from zabbix_payload_builder import ZabbixPayloadBuilder, build_proxy_group_config  # noqa: E402
+
+DEFAULT_MAPPINGS_DIR = os.path.join(_ZABBIX_NETBOX_DIR, "mappings")
+DEFAULT_SIZES = (1000, 10000, 50000)
+
+DC_CODES = ("DC11", "DC13", "DC14", "DC15", "DC16", "AZ11", "ICT11")
+PLATFORM_ID_BASE = 1_000_000
+VFW_ID_BASE = 2_000_000
+
+EXISTING_SHARE = 0.6
+DRIFT_SHARE = 0.15
+
+LATENCY_STAGES = ("compare", "enrich", "serialise")
+
+
+# ---------------------------------------------------------------------------
+# Deterministic inventory generator
+# ---------------------------------------------------------------------------
+
+def _first(value: Any) -> str:
+    if isinstance(value, list):
+        return str(value[0]) if value else ""
+    return "" if value is None else str(value)
+
+
+def _ip(index: int) -> str:
+    return f"10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}"
+
+
+def _device_profiles(mapping_ctx: Dict) -> List[Dict[str, str]]:
+    """One (role, manufacturer, model, tenant) profile per device_type mapping row."""
+    profiles = []
+    for row in (mapping_ctx.get("device_type_mapping") or {}).get("mappings") or []:
+        cond = row.get("conditions") or {}
+        role = _first(cond.get("device_role"))
+        manufacturer = _first(cond.get("manufacturer"))
+        if not role and not manufacturer:
+            continue
+        model_bits = [_first(cond.get("model_contains")), _first(cond.get("model_suffix"))]
+        model = " ".join(["Model"] + [b for b in dict.fromkeys(model_bits) if b])
+        tenants = row.get("tenants") or ([row["tenant"]] if row.get("tenant") else [])
+        profiles.append({
+            "role": role,
+            "manufacturer": manufacturer,
+            "model": model,
+            "tenant": str(tenants[0]) if tenants else "Bulutistan",
+        })
+    return profiles
+
+
+def _device(index: int, profile: Dict[str, str], dc: str) -> Dict[str, Any]:
+    return {
+        "id": index,
+        "name": f"bench-{profile['role'].lower().replace(' ', '-')}-{index:06d}.{dc.lower()}",
+        "device_role_name": profile["role"],
+        "manufacturer_name": profile["manufacturer"],
+        "device_model": profile["model"],
+        "primary_ip_address": f"{_ip(index)}/24",
+        "root_location_name": dc,
+        "site_name": dc,
+        "tenant_name": profile["tenant"],
+        "status": {"value": "active"},
+        "serial": f"SN{index:08d}",
+    }
+
+
+def _platform(index: int, entry: Dict[str, Any], dc: str) -> Dict[str, Any]:
+    pid = PLATFORM_ID_BASE + index
+    return {
+        "id": pid,
+        "name": f"bench-platform-{entry.get('name_contains') or entry['device_type']}-{index:06d}",
+        "manufacturer": {"name": entry["manufacturer"]},
+        "custom_fields": {"ip_addresses": _ip(pid), "Site": dc, "DC": dc, "Port": "443"},
+        "created": "2024-01-01",
+        "last_updated": "2024-06-01T00:00:00Z",
+    }
+
+
+def _vfw(index: int, entry: Dict[str, Any], dc: str) -> Dict[str, Any]:
+    vid = VFW_ID_BASE + index
+    model = f"{entry.get('model_prefix') or ''}Model{entry.get('model_suffix') or ''}"
+    return {
+        "id": vid,
+        "hostname": f"BENCH{index:05d}-FW - Firewall",
+        "ip_port": f"{_ip(vid)}:443",
+        "vendor": {"name": entry["vendor"]},
+        "manufacturer_model": {"model": model, "manufacturer": {"name": entry["vendor"]}},
+        "lokasyon": {"name": dc},
+        "proje": "bench",
+        "fw_status": "active",
+        "created": "2024-01-01",
+        "last_updated": "2024-06-01T00:00:00Z",
+    }
+
+
+def _zabbix_host(hostid: int, plan: Dict, drift: bool, group_ids: Dict[str, str], proxy_by_dc: Dict[str, str]) -> Dict:
+    record = plan["zbx_record"]
+    tags = [{"tag": k, "value": str(v)} for k, v in json.loads(record.get("MACROS") or "{}").items()]
+    ip = record["HOST_IP"]
+    if drift:
+        ip = ip.rsplit(".", 1)[0] + ".254"
+        tags = [t for t in tags if t["tag"] != "Loki_ID"][:1] + [t for t in tags if t["tag"] == "Loki_ID"]
+    groups = [g.strip() for g in str(record.get("HOST_GROUPS") or "").split(",") if g.strip()]
+    groups.append(record["DEVICE_TYPE"])
+    dc = next((code for code in DC_CODES if code in str(record.get("DC_ID") or "").upper()), "")
+    return {
+        "hostid": str(hostid),
+        "host": record["HOSTNAME"],
+        "name": record["HOST_VISIBLE_NAME"],
+        "status": "0",
+        "monitored_by": "2" if dc else "0",
+        "proxy_groupid": proxy_by_dc.get(dc, "0"),
+        "flags": "0",
+        "interfaces": [{"interfaceid": str(hostid), "ip": ip, "dns": "", "port": "161", "type": "2", "main": "1", "useip": "1"}],
+        "tags": tags,
+        "groups": [{"groupid": group_ids[g], "name": g} for g in dict.fromkeys(groups) if g in group_ids],
+    }
+
+
+def generate_inventory(size: int, mapping_ctx: Dict, seed: int = 1) -> Dict[str, Any]:
+    """
+    Deterministic inventory of `size` items plus matching Zabbix state.
+
+    Returns {"devices", "platforms", "vfws", "ctx"}; ctx is mapping_ctx plus
+    template / group / proxy caches, Zabbix host maps and HMDL baseline rows.
+    """
+    rng = random.Random(seed)
+    n_platforms = size // 10
+    n_vfws = size // 10
+    n_devices = size - n_platforms - n_vfws
+
+    profiles = _device_profiles(mapping_ctx)
+    platform_entries = [
+        m for m in (mapping_ctx.get("platform_mapping") or {}).get("mappings") or []
+        if isinstance(m, dict) and m.get("manufacturer") and m.get("device_type")
+    ]
+    vfw_entries = [
+        m for m in (mapping_ctx.get("vfw_mapping") or {}).get("mappings") or []
+        if isinstance(m, dict) and m.get("vendor") and m.get("device_type")
+    ]
+    devices = [_device(i + 1, rng.choice(profiles), rng.choice(DC_CODES)) for i in range(n_devices)]
+    platforms = [_platform(i + 1, rng.choice(platform_entries), rng.choice(DC_CODES)) for i in range(n_platforms)]
+    vfws = [_vfw(i + 1, rng.choice(vfw_entries), rng.choice(DC_CODES)) for i in range(n_vfws)]
+
+    templates_map = mapping_ctx.get("templates_map") or {}
+    template_id_cache = {
+        str(row["name"]): str(10000 + n)
+        for n, row in enumerate(r for rows in templates_map.values() for r in rows or [] if isinstance(r, dict) and r.get("name"))
+    }
+    proxy_names = {f"{dc}-Proxy Group": str(100 + n) for n, dc in enumerate(DC_CODES)}
+    proxy_by_dc = {dc: proxy_names[f"{dc}-Proxy Group"] for dc in DC_CODES}
+    ctx: Dict[str, Any] = {
+        **mapping_ctx,
+        "by_loki": {}, "by_hostname": {}, "by_visible": {}, "by_ip": {},
+        "create_devices_disabled": False,
+        "create_platforms_disabled": False,
+        "create_virtual_fws_disabled": False,
+        "template_id_cache": template_id_cache,
+        "group_id_cache": {},
+        "proxy_group_config": build_proxy_group_config(proxy_names),
+        "hmdl_baseline_map": {},
+        "payload_build_enabled": True,
+    }
+
+    # Compare once against an empty Zabbix to learn each item's Zabbix record.
+    compared = [
+        (entity_type, item, _COMPARE_FUNCS[entity_type](item, ctx))
+        for entity_type, items in (("device", devices), ("platform", platforms), ("vfw", vfws))
+        for item in items
+    ]
+    group_names = sorted({
+        g.strip()
+        for _, _, plan in compared if plan.get("zbx_record")
+        for g in str(plan["zbx_record"].get("HOST_GROUPS") or "").split(",") + [plan["zbx_record"].get("DEVICE_TYPE", "")]
+        if g and g.strip()
+    })
+    group_names = sorted(set(group_names) | {
+        str(g) for rows in templates_map.values() for r in rows or [] if isinstance(r, dict)
+        for g in r.get("host_groups") or []
+    })
+    group_ids = {name: str(20000 + n) for n, name in enumerate(group_names)}
+
+    hosts = []
+    hmdl: Dict[str, Dict[str, Any]] = {}
+    for n, (entity_type, item, plan) in enumerate(compared):
+        if plan.get("action") != "create" or rng.random() >= EXISTING_SHARE:
+            continue
+        host = _zabbix_host(50000 + n, plan, rng.random() < DRIFT_SHARE, group_ids, proxy_by_dc)
+        hosts.append(host)
+        hmdl[str(item["id"])] = {
+            "last_location": plan["zbx_record"].get("DC_ID", ""),
+            "last_proxy_group_id": host["proxy_groupid"],
+            "last_visible_name": host["name"],
+        }
+
+    ctx.update(host_maps_from_index(build_host_index(hosts)))
+    ctx["group_id_cache"] = group_ids
+    ctx["hmdl_baseline_map"] = hmdl
+    return {"devices": devices, "platforms": platforms, "vfws": vfws, "ctx": ctx}
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+def percentiles(samples: Sequence[float]) -> Dict[str, float]:
+    """p50 / p95 / p99 (nearest rank) in milliseconds of samples given in seconds."""
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    ordered = sorted(samples)
+    n = len(ordered)
+    return {
+        name: round(ordered[min(n, max(1, math.ceil(q * n - 1e-9))) - 1] * 1000.0, 4)
+        for name, q in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))
+    }
+
+
+def _stage_latencies(work: List[Tuple[str, Dict]], ctx: Dict, sample: int) -> Dict[str, Dict[str, float]]:
+    builder = ZabbixPayloadBuilder(ctx)
+    step = max(1, len(work) // max(sample, 1))
+    timings: Dict[str, List[float]] = {stage: [] for stage in LATENCY_STAGES}
+    for entity_type, item in work[::step][:sample]:
+        t0 = time.perf_counter()
+        plan = _COMPARE_FUNCS[entity_type](item, ctx)
+        t1 = time.perf_counter()
+        plan = builder.enrich_plan(plan)
+        t2 = time.perf_counter()
+        json.dumps(plan, ensure_ascii=False)
+        t3 = time.perf_counter()
+        timings["compare"].append(t1 - t0)
+        timings["enrich"].append(t2 - t1)
+        timings["serialise"].append(t3 - t2)
+    return {stage: percentiles(values) for stage, values in timings.items()}
+
+
+def _peak_rss_mb() -> Dict[str, float]:
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    scale = 1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0
+    return {
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "peak_rss_children_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+def run_case(
+    size: int,
+    executor: str,
+    workers: int = 8,
+    seed: int = 1,
+    mappings_dir: str = DEFAULT_MAPPINGS_DIR,
+    plan_store_backend: str = "jsonl",
+    sample: int = 1000,
+) -> Dict[str, Any]:
+    """Generate one inventory and time Phase A on it (in this process)."""
+    stages: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    mapping_ctx = load_mapping_ctx(mappings_dir)
+    stages["ctx"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    inventory = generate_inventory(size, mapping_ctx, seed)
+    stages["generate"] = time.perf_counter() - t0
+    ctx = inventory["ctx"]
+
+    with tempfile.TemporaryDirectory(prefix="pce_bench_") as out_dir:
+        location = out_dir if plan_store_backend == "files" else os.path.join(out_dir, "plan_store.jsonl")
+        with open(os.devnull, "w") as devnull:
+            stdout, sys.stdout = sys.stdout, devnull  # per-item progress lines
+            try:
+                t0 = time.perf_counter()
+                with open_plan_store(plan_store_backend, location, truncate=True) as store:
+                    summary = run_parallel_compare(
+                        inventory["devices"], inventory["platforms"], inventory["vfws"], ctx,
+                        output_dir=out_dir, workers=workers, executor=executor, plan_store=store,
+                    )
+                stages["compare_total"] = time.perf_counter() - t0
+            finally:
+                sys.stdout = stdout
+
+    work = (
+        [("device", d) for d in inventory["devices"]]
+        + [("platform", p) for p in inventory["platforms"]]
+        + [("vfw", v) for v in inventory["vfws"]]
+    )
+    latency = _stage_latencies(work, ctx, sample)
+    counts = {
+        action: sum(summary[key][action] for key in ("devices", "platforms", "vfws"))
+        for action in ("create", "update", "skip", "error")
+    }
+    return {
+        "type": "case",
+        "size": size,
+        "executor": executor,
+        "workers": workers,
+        "seed": seed,
+        "plan_store": plan_store_backend,
+        "items": len(work),
+        "actions": counts,
+        "items_per_sec": round(len(work) / stages["compare_total"], 1) if stages["compare_total"] else 0.0,
+        "stages": {k: round(v, 4) for k, v in stages.items()},
+        "latency_ms": latency,
+        "stage_timings": summary["stage_timings"],
+        **_peak_rss_mb(),
+    }
+
+
+def _run_case_subprocess(case: Dict[str, Any]) -> Dict[str, Any]:
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--case", json.dumps(case)],
+        stdout=subprocess.PIPE,
+        check=True,
+        text=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# ---------------------------------------------------------------------------
+# Regression check
+# ---------------------------------------------------------------------------
+
+def _case_key(case: Dict[str, Any]) -> str:
+    return f"{case['size']}/{case['executor']}"
+
+
+def check_regressions(
+    results: List[Dict[str, Any]],
+    baseline: Dict[str, Any],
+    max_regression: float,
+    max_rss_growth: float,
+) -> List[str]:
+    """Human-readable regressions of results against a baseline written by --write-baseline."""
+    problems = []
+    base_cases = {_case_key(c): c for c in baseline.get("cases") or []}
+    for case in results:
+        base = base_cases.get(_case_key(case))
+        if not base:
+            continue
+        floor = base["items_per_sec"] * (1.0 - max_regression)
+        if case["items_per_sec"] < floor:
+            problems.append(
+                f"{_case_key(case)}: {case['items_per_sec']} items/s < {floor:.1f} "
+                f"(baseline {base['items_per_sec']}, -{max_regression:.0%} allowed)"
+            )
+        ceiling = base["peak_rss_mb"] * (1.0 + max_rss_growth)
+        if case["peak_rss_mb"] > ceiling:
+            problems.append(
+                f"{_case_key(case)}: peak RSS {case['peak_rss_mb']} MB > {ceiling:.1f} MB "
+                f"(baseline {base['peak_rss_mb']}, +{max_rss_growth:.0%} allowed)"
+            )
+    return problems
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _csv(value: str) -> List[str]:
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Synthetic-scale benchmark for the Phase A compare pipeline")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES), help="Comma-separated item counts")
+    parser.add_argument("--executors", default=",".join(EXECUTOR_MODES), help="Comma-separated executor modes")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mappings-dir", default=DEFAULT_MAPPINGS_DIR)
+    parser.add_argument("--plan-store", choices=PLAN_STORE_BACKENDS, default="jsonl")
+    parser.add_argument("--sample", type=int, default=1000, help="Items timed per stage for latency percentiles")
+    parser.add_argument("--output", help="Write all case results as JSON")
+    parser.add_argument("--baseline", help="Baseline JSON (from --write-baseline) to check against")
+    parser.add_argument("--write-baseline", help="Write this run's results as the new baseline")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Allowed throughput drop (default: 0.25)")
+    parser.add_argument("--max-rss-growth", type=float, default=0.25, help="Allowed peak RSS growth (default: 0.25)")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        print(json.dumps(run_case(**json.loads(args.case))), flush=True)
+        return
+
+    try:
+        sizes = [int(s) for s in _csv(args.sizes)]
+    except ValueError:
+        parser.error("--sizes must be comma-separated integers")
+    executors = _csv(args.executors)
+    unknown = [e for e in executors if e not in EXECUTOR_MODES]
+    if unknown or not sizes or not executors:
+        parser.error(f"--executors must be a subset of {EXECUTOR_MODES}")
+
+    results = []
+    for size in sizes:
+        for executor in executors:
+            result = _run_case_subprocess({
+                "size": size,
+                "executor": executor,
+                "workers": args.workers,
+                "seed": args.seed,
+                "mappings_dir": args.mappings_dir,
+                "plan_store_backend": args.plan_store,
+                "sample": args.sample,
+            })
+            results.append(result)
+            print(json.dumps(result), flush=True)
+
+    report = {"format_version": 1, "cases": results}
+    for path in (args.output, args.write_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+
+    problems: List[str] = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = check_regressions(results, baseline, args.max_regression, args.max_rss_growth)
+    print(json.dumps({"type": "summary", "cases": len(results), "regressions": problems}), flush=True)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
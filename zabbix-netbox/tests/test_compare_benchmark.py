@@ -0,0 +1,77 @@
+"""Unit tests for scripts/benchmark_compare.py (synthetic-scale Phase A benchmark)."""
+import os
+import sys
+
+_SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), "..", "scripts")
+sys.path.insert(0, os.path.abspath(_SCRIPTS_DIR))
+
+from benchmark_compare import (  # noqa: E402
+    DEFAULT_MAPPINGS_DIR,
+    check_regressions,
+    generate_inventory,
+    load_mapping_ctx,
+    percentiles,
+    run_case,
+)
+
+
+def _mapping_ctx():
+    return load_mapping_ctx(DEFAULT_MAPPINGS_DIR)
+
+
+def test_generate_inventory_is_deterministic():
+    mapping_ctx = _mapping_ctx()
+    a = generate_inventory(200, mapping_ctx, seed=7)
+    b = generate_inventory(200, mapping_ctx, seed=7)
+    assert a["devices"] == b["devices"]
+    assert a["platforms"] == b["platforms"]
+    assert a["vfws"] == b["vfws"]
+    assert dict(a["ctx"]["by_loki"]) == dict(b["ctx"]["by_loki"])
+    assert a["ctx"]["hmdl_baseline_map"] == b["ctx"]["hmdl_baseline_map"]
+    assert generate_inventory(200, mapping_ctx, seed=8)["devices"] != a["devices"]
+
+
+def test_generate_inventory_mix():
+    inv = generate_inventory(100, _mapping_ctx(), seed=1)
+    assert (len(inv["devices"]), len(inv["platforms"]), len(inv["vfws"])) == (80, 10, 10)
+    ids = [d["id"] for d in inv["devices"] + inv["platforms"] + inv["vfws"]]
+    assert len(ids) == len(set(ids))
+    assert inv["ctx"]["by_hostname"]
+    assert inv["ctx"]["hmdl_baseline_map"]
+
+
+def test_run_case_reports_throughput_latency_and_rss():
+    report = run_case(200, "thread", workers=2, sample=50)
+    assert report["items"] == 200
+    assert report["actions"]["create"] > 0
+    assert report["actions"]["update"] > 0
+    assert report["actions"]["error"] == 0
+    assert report["items_per_sec"] > 0
+    assert set(report["stages"]) == {"ctx", "generate", "compare_total"}
+    assert set(report["latency_ms"]) == {"compare", "enrich", "serialise"}
+    assert set(report["latency_ms"]["enrich"]) == {"p50", "p95", "p99"}
+    assert report["peak_rss_mb"] > 0
+
+
+def test_percentiles_nearest_rank_in_ms():
+    assert percentiles([]) == {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    p = percentiles([i / 1000.0 for i in range(1, 101)])
+    assert p["p50"] == 50.0
+    assert p["p95"] == 95.0
+    assert p["p99"] == 99.0
+    assert percentiles([0.003, 0.001, 0.002]) == {"p50": 2.0, "p95": 3.0, "p99": 3.0}
+
+
+def test_check_regressions_threshold():
+    baseline = {"cases": [{"size": 1000, "executor": "thread", "items_per_sec": 1000.0, "peak_rss_mb": 100.0}]}
+    ok = [{"size": 1000, "executor": "thread", "items_per_sec": 800.0, "peak_rss_mb": 120.0}]
+    assert check_regressions(ok, baseline, 0.25, 0.25) == []
+
+    slow = [{"size": 1000, "executor": "thread", "items_per_sec": 700.0, "peak_rss_mb": 130.0}]
+    problems = check_regressions(slow, baseline, 0.25, 0.25)
+    assert len(problems) == 2
+    assert "items/s" in problems[0] and "peak RSS" in problems[1]
+
+    # Cases without a baseline entry are not judged.
+    other = [{"size": 50000, "executor": "process", "items_per_sec": 1.0, "peak_rss_mb": 1.0}]
+    assert check_regressions(other, baseline, 0.25, 0.25) == []
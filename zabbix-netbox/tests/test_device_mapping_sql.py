@@ -0,0 +1,256 @@
+"""Tests for device_mapping_sql.py (mapping conditions pushed into the datalake device query)."""
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+import yaml
+
+_ROOT = os.path.join(os.path.dirname(__file__), "..")
+_ROLE = os.path.join(_ROOT, "playbooks", "roles", "netbox_zabbix_sync")
+_FILES_DIR = os.path.abspath(os.path.join(_ROLE, "files"))
+sys.path.insert(0, _FILES_DIR)
+
+from device_mapping_sql import DATALAKE_DEVICE_COLUMNS, compile_where, rule_predicates  # noqa: E402
+from device_type_mapping_index import DeviceTypeMappingIndex  # noqa: E402
+
+MAPPING_PATH = Path(__file__).resolve().parents[1] / "mappings" / "netbox_device_type_mapping.yml"
+
+EXTRA_ROWS = [
+    {"device_type": "Wildcard Name", "conditions": {"name_contains": ["fw_1%", "a\\b"]}, "priority": 500},
+    {"device_type": "Two Tenants", "conditions": {"device_role": "Storage"}, "tenants": [" Acme ", "Beta"],
+     "priority": 501},
+    {"device_type": "Unknown Key", "conditions": {"device_role": "HOST", "rack_contains": "R1"}, "priority": 502},
+    {"device_type": "Empty List", "conditions": {"manufacturer": []}, "priority": 503},
+]
+
+
+def _mapping():
+    with open(MAPPING_PATH, encoding="utf-8") as f:
+        mapping = yaml.safe_load(f)
+    mapping["mappings"] = mapping["mappings"] + EXTRA_ROWS
+    return mapping
+
+
+def _devices(mapping, count=1500, seed=7):
+    """Datalake rows drawn from the mapping's own values plus case, wildcard, tenant and non-ASCII variants."""
+    rng = random.Random(seed)
+    roles, mfrs, models, names = {"", "Switch"}, {"", "NoSuchVendor"}, {"", "X1"}, {"", "srv-01"}
+    for row in mapping["mappings"]:
+        cond = row.get("conditions") or {}
+        for key, bucket in (("device_role", roles), ("manufacturer", mfrs)):
+            for v in cond.get(key) if isinstance(cond.get(key), list) else [cond.get(key)]:
+                if v:
+                    bucket.update({v, v.lower(), v.title()})
+        for key in ("model_contains", "model_suffix"):
+            for v in cond.get(key) if isinstance(cond.get(key), list) else [cond.get(key)]:
+                if v:
+                    models.update({f"ProLiant {v}", f"{v.lower()} rev2", f"x{v}"})
+        for v in cond.get("name_contains") if isinstance(cond.get("name_contains"), list) else [cond.get("name_contains")]:
+            if v:
+                names.update({f"dc-{v.lower()}-01", v.upper()})
+    models.update({"NF5280M6", "nf5280m6", "M6 chassis", "Gen10 ß", "ProLıant M5"})
+    names.update({"fwX1", "edge-fw_1%-a", "edge-fw_1x-a", "a\\b-host", "ıstanbul-fw_1%"})
+    roles.update({"Host", "hoşt", None})
+    tenants = [None, "", "  ", "Moneygram", " moneygram ", "MONEYGRAM\t", "acme", "Beta", "Other", "Moneygram İ"]
+    roles, mfrs, models, names = (sorted(s, key=str) for s in (roles, mfrs, models, names))
+    rows = []
+    for i in range(1, count + 1):
+        rows.append({
+            "id": i,
+            "device_role_name": rng.choice(roles),
+            "manufacturer_name": rng.choice(mfrs),
+            "device_model": rng.choice(models),
+            "name": rng.choice(names),
+            "tenant_name": rng.choice(tenants),
+        })
+    return rows
+
+
+def _python_ids(mapping, rows):
+    index = DeviceTypeMappingIndex(
+        mapping,
+        role_of=lambda d: str(d.get("device_role_name") or ""),
+        manufacturer_of=lambda d: str(d.get("manufacturer_name") or ""),
+        model_of=lambda d: str(d.get("device_model") or ""),
+        name_of=lambda d: str(d.get("name") or ""),
+        tenant_of=lambda d: str(d.get("tenant_name") or "").strip(),
+    )
+    return {row["id"] for row in rows if index.match(row) is not None}
+
+
+def _c_upper(value):
+    return "".join(chr(ord(c) - 32) if "a" <= c <= "z" else c for c in value)
+
+
+def _plain(value):
+    return all(" " <= c <= "~" for c in value)
+
+
+_ROW_KEY = {"role": "device_role_name", "manufacturer": "manufacturer_name", "model": "device_model",
+            "name": "name", "tenant": "tenant_name"}
+
+
+def _sql_semantics(predicate, row):
+    """What the rendered SQL predicate evaluates to: "C" collation UPPER, non-plain values pass through."""
+    key, op, values = predicate
+    raw = row[_ROW_KEY[key]]
+    if op == "tenant":
+        return raw is not None and (_c_upper(raw.strip(" ")) in values or not _plain(raw))
+    if raw is not None and not _plain(raw):
+        return True
+    value = _c_upper(raw or "")
+    if op == "eq":
+        return value in values
+    if op == "contains":
+        return any(v in value for v in values)
+    return any(value.endswith(v) for v in values)
+
+
+def test_where_clause_shape_and_parameters():
+    where, params = compile_where({"mappings": [
+        {"device_type": "A", "conditions": {"device_role": ["Host", "host"], "model_suffix": "m_6%"},
+         "tenant": " Moneygram ", "priority": 1},
+        {"device_type": "B", "conditions": {"device_role": "HOST"}, "priority": 2},
+        {"device_type": "C", "conditions": {"device_role": "Host", "bogus": 1}, "priority": 3},
+    ]})
+    assert params == {"m0_0": "HOST", "m1_0": "%M\\_6\\%", "m2_0": "MONEYGRAM"}
+    assert where.count("%(m0_0)s") == 2 and "d.device_role_name" in where
+    assert 'UPPER(BTRIM(d.tenant_name) COLLATE "C") IN (%(m2_0)s)' in where
+    assert "'%" not in where
+    assert compile_where({"mappings": [{"device_type": "Any", "conditions": {}}]}) == ("TRUE", {})
+    assert compile_where({"mappings": []}) == ("FALSE", {})
+    assert compile_where({"mappings": [{"device_type": "E", "conditions": {"manufacturer": []}}]}) == ("FALSE", {})
+    where, _ = compile_where({"mappings": [{"device_type": "N", "conditions": {"name_contains": "fw"}}]},
+                             columns={"name": "x.hostname"})
+    assert "x.hostname" in where and DATALAKE_DEVICE_COLUMNS["name"] == "d.name"
+
+
+def test_pushdown_never_drops_a_python_match():
+    mapping = _mapping()
+    rows = _devices(mapping)
+    index = DeviceTypeMappingIndex(mapping)
+    groups = [p for p in (rule_predicates(rule) for rule in index.rules) if p is not None]
+    sql_ids = {row["id"] for row in rows if any(all(_sql_semantics(p, row) for p in g) for g in groups)}
+    python_ids = _python_ids(mapping, rows)
+    assert python_ids and python_ids <= sql_ids
+    plain = {row["id"] for row in rows
+             if all(v is None or _plain(v) for k, v in row.items() if k != "id")}
+    assert sql_ids & plain == python_ids & plain
+
+
+def _inline_filter_script(tmp_path):
+    with open(os.path.join(_ROLE, "tasks", "fetch_all_devices_datalake.yml"), encoding="utf-8") as f:
+        tasks = yaml.safe_load(f)
+    content = next(t["copy"]["content"] for t in tasks if t.get("copy", {}).get("dest") == "/tmp/filter_db_devices.py")
+    path = tmp_path / "filter_db_devices.py"
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+
+def _run_filter(tmp_path, rows, mapping):
+    rows_file, mapping_file = tmp_path / "rows.json", tmp_path / "mapping.json"
+    rows_file.write_text(json.dumps(rows), encoding="utf-8")
+    mapping_file.write_text(json.dumps(mapping), encoding="utf-8")
+    env = {**os.environ, "PYTHONPATH": _FILES_DIR}
+    proc = subprocess.run([sys.executable, _inline_filter_script(tmp_path), str(rows_file), str(mapping_file), "monitor"],
+                          capture_output=True, text=True, check=False, env=env)
+    assert proc.returncode == 0, proc.stderr
+    return {d["id"] for d in json.loads(proc.stdout)["devices"]}
+
+
+def test_filter_script_applies_tenant_gate(tmp_path):
+    mapping = {"mappings": [
+        {"device_type": "HPE IPMI Moneygram", "conditions": {"device_role": "HOST", "manufacturer": "HPE"},
+         "tenant": "Moneygram", "priority": 1},
+        {"device_type": "Dell Storage", "conditions": {"device_role": "Storage", "manufacturer": "DELL"},
+         "priority": 2},
+    ]}
+    rows = [
+        {"id": 1, "device_role_name": "Host", "manufacturer_name": "hpe", "device_model": "DL380",
+         "name": "a", "tenant_name": " moneygram "},
+        {"id": 2, "device_role_name": "HOST", "manufacturer_name": "HPE", "device_model": "DL380",
+         "name": "b", "tenant_name": "Other"},
+        {"id": 3, "device_role_name": "HOST", "manufacturer_name": "HPE", "device_model": "DL380",
+         "name": "c", "tenant_name": None},
+        {"id": 4, "device_role_name": "STORAGE", "manufacturer_name": "Dell", "device_model": "Unity",
+         "name": "d", "tenant_name": None},
+    ]
+    assert _run_filter(tmp_path, rows, mapping) == {1, 4}
+
+    # Same rule as DeviceTypeMappingIndex everywhere else: a row with an unknown condition key never matches.
+    mapping["mappings"].append({"device_type": "Typo", "conditions": {"device_rol": "HOST"}, "priority": 3})
+    assert _run_filter(tmp_path, rows, mapping) == {1, 4}
+
+
+def _pg_bin(name):
+    found = shutil.which(name)
+    if found:
+        return found
+    try:
+        bindir = subprocess.run(["pg_config", "--bindir"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    path = os.path.join(bindir, name)
+    return path if os.path.exists(path) else None
+
+
+@pytest.fixture
+def datalake_db(tmp_path):
+    """Throwaway PostgreSQL cluster (initdb + pg_ctl on a unix socket) with the datalake device table."""
+    psycopg2 = pytest.importorskip("psycopg2")
+    initdb, pg_ctl = _pg_bin("initdb"), _pg_bin("pg_ctl")
+    if not initdb or not pg_ctl:
+        pytest.skip("PostgreSQL server binaries not installed")
+    if hasattr(os, "geteuid") and os.geteuid() == 0:
+        pytest.skip("initdb refuses to run as root")
+    data, sock = tmp_path / "pgdata", tmp_path / "sock"
+    sock.mkdir()
+    subprocess.run([initdb, "-D", str(data), "-U", "postgres", "-A", "trust", "-E", "UTF8", "--locale", "C.UTF-8"],
+                   check=True, capture_output=True)
+    subprocess.run([pg_ctl, "-D", str(data), "-w", "-l", str(tmp_path / "pg.log"),
+                    "-o", f"-k {sock} -c listen_addresses=''", "start"], check=True, capture_output=True)
+    try:
+        conn = psycopg2.connect(host=str(sock), dbname="postgres", user="postgres")
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(
+                "CREATE TABLE public.discovery_netbox_inventory_device ("
+                " id bigint PRIMARY KEY, name text, device_type_name text, manufacturer_name text,"
+                " device_role_name text, tenant_name text, status_value text)"
+            )
+        yield conn
+        conn.close()
+    finally:
+        subprocess.run([pg_ctl, "-D", str(data), "-m", "fast", "stop"], check=False, capture_output=True)
+
+
+def test_sql_and_python_paths_select_identical_devices(datalake_db, tmp_path):
+    mapping = _mapping()
+    rows = _devices(mapping)
+    with datalake_db.cursor() as cur:
+        cur.executemany(
+            "INSERT INTO public.discovery_netbox_inventory_device"
+            " (id, name, device_type_name, manufacturer_name, device_role_name, tenant_name, status_value)"
+            " VALUES (%s, %s, %s, %s, %s, %s, 'active')",
+            [(r["id"], r["name"], r["device_model"], r["manufacturer_name"], r["device_role_name"], r["tenant_name"])
+             for r in rows],
+        )
+        where, params = compile_where(mapping)
+        cur.execute(
+            "SELECT d.id, d.name, d.device_type_name AS device_model, d.manufacturer_name, d.device_role_name,"
+            " d.tenant_name FROM public.discovery_netbox_inventory_device d"
+            f" WHERE d.status_value = 'active' AND {where}",
+            params,
+        )
+        columns = [c[0] for c in cur.description]
+        candidates = [dict(zip(columns, r)) for r in cur.fetchall()]
+
+    python_ids = _python_ids(mapping, rows)
+    assert {r["id"] for r in candidates} >= python_ids
+    # SQL candidates + the verification pass == the Python filter over every row.
+    assert _run_filter(tmp_path, candidates, mapping) == python_ids == _run_filter(tmp_path, rows, mapping)
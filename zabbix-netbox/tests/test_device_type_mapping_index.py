@@ -0,0 +1,89 @@
+"""Compiled device_type mapping index must match the row-by-row matcher exactly."""
+import itertools
+import os
+import sys
+from pathlib import Path
+
+import yaml
+
+_FILES_DIR = os.path.join(
+    os.path.dirname(__file__),
+    "..", "playbooks", "roles", "netbox_zabbix_sync", "files"
+)
+sys.path.insert(0, os.path.abspath(_FILES_DIR))
+
+from device_type_mapping_index import DeviceTypeMappingIndex  # noqa: E402
+from parallel_compare_engine import (  # noqa: E402
+    _find_matching_mapping,
+    _find_matching_mapping_safe,
+    compile_device_type_mapping,
+)
+
+MAPPING_PATH = Path(__file__).resolve().parents[1] / "mappings" / "netbox_device_type_mapping.yml"
+
+
+def _load_mapping():
+    with open(MAPPING_PATH, encoding="utf-8") as handle:
+        return yaml.safe_load(handle)
+
+
+def _as_list(value):
+    if value is None:
+        return [""]
+    return value if isinstance(value, list) else [value]
+
+
+def _device_grid(mapping):
+    """Devices built from each row's own condition values, plus misses and tenant variants."""
+    models = {"", "X1"}
+    combos = {("", ""), ("Unknown Role", "NoSuchVendor")}
+    for row in mapping["mappings"]:
+        cond = row.get("conditions") or {}
+        for key in ("model_contains", "model_suffix"):
+            for v in _as_list(cond.get(key)):
+                if v:
+                    models.update({f"Gen {v}", f"{v} Gen10"})
+        for role, mfr in itertools.product(_as_list(cond.get("device_role")), _as_list(cond.get("manufacturer"))):
+            combos.update({(role, mfr), (role.lower(), mfr), (role, "NoSuchVendor")})
+    tenants = [None, {"name": "Moneygram"}, {}, {"name": "Other"}]
+    for (role, mfr), model, tenant in itertools.product(sorted(combos), sorted(models), tenants):
+        device = {
+            "name": f"dev-{role}-{mfr}",
+            "role": {"name": role},
+            "device_type": {"model": model, "manufacturer": {"name": mfr}},
+        }
+        if tenant is not None:
+            device["tenant"] = tenant
+        yield device
+
+
+def test_compiled_index_matches_reference_on_shipped_mapping():
+    mapping = _load_mapping()
+    index = compile_device_type_mapping(mapping)
+    checked = 0
+    for device in _device_grid(mapping):
+        assert index.match(device) is _find_matching_mapping(device, mapping)
+        assert index.match_safe(device) is _find_matching_mapping_safe(device, mapping)
+        checked += 1
+    assert checked > 1000
+
+
+def test_candidates_are_limited_to_the_manufacturer_bucket():
+    mapping = _load_mapping()
+    index = DeviceTypeMappingIndex(mapping)
+    lenovo = index.candidates("LENOVO", "HOST")
+    assert lenovo and len(lenovo) < len(index)
+    assert all(r.manufacturers is None or "LENOVO" in r.manufacturers for r in lenovo)
+
+
+def test_flat_tenant_name_and_tenants_list():
+    mapping = {"mappings": [
+        {"device_type": "Scoped", "tenants": ["Acme", "Beta"], "priority": 1,
+         "conditions": {"device_role": "HOST", "manufacturer": "HPE"}},
+        {"device_type": "Generic", "priority": 2, "conditions": {"device_role": "HOST"}},
+        {"device_type": "Never", "priority": 0, "conditions": {"unknown_key": "x"}},
+    ]}
+    index = DeviceTypeMappingIndex(mapping)
+    base = {"role": {"name": "host"}, "device_type": {"manufacturer": {"name": "hpe"}}}
+    assert index.match_safe({**base, "tenant": {}, "tenant_name": "beta"})["device_type"] == "Scoped"
+    assert index.match_safe(base)["device_type"] == "Generic"
@@ -0,0 +1,261 @@
+"""Compiled host_groups / tags extraction plans must equal per-device YAML interpretation."""
+import copy
+import os
+import pickle
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+_FILES_DIR = os.path.join(
+    os.path.dirname(__file__),
+    "..", "playbooks", "roles", "netbox_zabbix_sync", "files"
+)
+sys.path.insert(0, os.path.abspath(_FILES_DIR))
+
+from parallel_compare_engine import (  # noqa: E402
+    HostGroupsPlan,
+    TagsPlan,
+    _extract_by_path,
+    _extract_by_path_with_fallback,
+    _extract_tags_original,
+    _get_location_name,
+)
+
+MAPPINGS = Path(__file__).resolve().parents[1] / "mappings"
+
+
+# ---------------------------------------------------------------------------
+# Reference: the interpretive implementation the plans were compiled from
+# ---------------------------------------------------------------------------
+
+def reference_host_groups(
+    device: Dict, config: Optional[Dict], device_type: Optional[str], templates: List[Dict]
+) -> str:
+    groups: List[str] = []
+    if config is None:
+        if device_type:
+            groups.append(device_type)
+        loc = _get_location_name(device)
+        if loc:
+            groups.append(loc)
+        sahiplik = device.get("sahiplik") or (device.get("custom_fields") or {}).get("Sahiplik", "")
+        if sahiplik:
+            groups.append(str(sahiplik).strip())
+        return ",".join(g for g in groups if g)
+
+    sources = config.get("host_groups", {}).get("sources", [])
+    settings = config.get("host_groups", {}).get("settings", {})
+    for source in sorted(sources, key=lambda x: x.get("priority", 999)):
+        if not source.get("enabled", True):
+            continue
+        stype = source.get("type")
+        value = None
+        if stype == "mapping_result":
+            value = device_type
+        elif stype == "netbox_attribute":
+            value = _extract_by_path_with_fallback(device, source.get("path", ""), source.get("fallback"))
+        elif stype == "custom_field":
+            value = (device.get("custom_fields") or {}).get(source.get("field_name"))
+        elif stype == "computed" and source.get("compute_function") == "get_location_name":
+            value = _get_location_name(device)
+        elif stype == "template_mapping":
+            attr = source.get("attribute", "host_groups")
+            tg = []
+            for t in templates:
+                if attr in t:
+                    tg.extend(t.get(attr, []))
+            if tg:
+                groups.extend(tg)
+                continue
+        if value and str(value) != "":
+            if settings.get("trim", True) and isinstance(value, str):
+                value = value.strip()
+            groups.append(str(value))
+
+    if settings.get("unique", True):
+        seen: set = set()
+        unique_groups: List[str] = []
+        for g in groups:
+            if g not in seen:
+                seen.add(g)
+                unique_groups.append(g)
+        groups = unique_groups
+    if settings.get("skip_empty", True):
+        groups = [g for g in groups if g]
+    return settings.get("separator", ",").join(groups)
+
+
+
+def reference_tags(
+    device: Dict, config: Optional[Dict], device_type: Optional[str] = None, templates: Optional[List] = None
+) -> Tuple[Dict, List]:
+    if config is None:
+        return _extract_tags_original(device)
+    tags: Dict = {}
+    loki_tags: List = []
+    definitions = config.get("tags", {}).get("definitions", [])
+    settings = config.get("tags", {}).get("settings", {})
+    for tag_def in definitions:
+        if not tag_def.get("enabled", True):
+            continue
+        tag_name = tag_def.get("tag_name")
+        stype = tag_def.get("source_type")
+        value = None
+        if stype == "netbox_attribute":
+            value = _extract_by_path_with_fallback(device, tag_def.get("path", ""), tag_def.get("fallback"))
+            if tag_def.get("transform") == "to_string" and value is not None:
+                value = str(value)
+        elif stype == "custom_field":
+            value = (device.get("custom_fields") or {}).get(tag_def.get("field_name"))
+        elif stype == "computed":
+            compute_func = tag_def.get("compute_function")
+            if compute_func == "extract_hall":
+                value = device.get("location_description") or device.get("location_name") or None
+            elif compute_func == "get_location_name":
+                value = _get_location_name(device)
+        elif stype == "mapping_result":
+            value = device_type
+        elif stype == "template_mapping" and templates:
+            attr = tag_def.get("attribute", "host_groups")
+            tg = []
+            for t in templates:
+                if attr in t:
+                    tg.extend(t.get(attr, []))
+            if tg:
+                sep = tag_def.get("separator", ",")
+                value = sep.join(str(x) for x in tg)
+        elif stype == "array_expansion":
+            path = tag_def.get("path")
+            prefix = tag_def.get("prefix", "")
+            if path == "tags":
+                tag_values = [device.get(f"tags{i}_name") for i in range(1, 6) if device.get(f"tags{i}_name")]
+            else:
+                raw = _extract_by_path(device, path or "")
+                tag_values = []
+                if raw and isinstance(raw, list):
+                    for item in raw:
+                        n = item.get("name") if isinstance(item, dict) else (item if isinstance(item, str) else None)
+                        if n:
+                            tag_values.append(n)
+            for item_name in tag_values:
+                item_name = str(item_name)
+                loki_tags.append(item_name)
+                tags[f"{prefix}{item_name}"] = item_name
+            continue
+        if value is not None and value != "":
+            if settings.get("trim", True) and isinstance(value, str):
+                value = value.strip()
+            if settings.get("treat_empty_as_none", True) and value == "":
+                continue
+            tags[tag_name] = value
+    if settings.get("skip_none", True):
+        tags = {k: v for k, v in tags.items() if v is not None}
+    if settings.get("skip_empty", True):
+        tags = {k: v for k, v in tags.items() if v != ""}
+    return tags, loki_tags
+
+
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+def _load(name):
+    with open(MAPPINGS / name, encoding="utf-8") as handle:
+        return yaml.safe_load(handle)
+
+
+TEMPLATES = [{"name": "BLT - Lenovo", "host_groups": ["Servers", "Lenovo"]}, {"name": "ICMP"}]
+
+DEVICES = [
+    {
+        "id": 456,
+        "name": " test-lenovo-01 ",
+        "device_type": {"manufacturer": {"name": "LENOVO"}, "model": "ThinkSystem SR650"},
+        "role": {"name": "HOST"},
+        "site": {"name": "DC11"},
+        "location": {"id": 10, "name": "ICT11", "description": "DATA HALL 1", "parent": {"name": "DC11"}},
+        "rack": {"name": "R-101"},
+        "tenant": {"name": "Infrastructure"},
+        "custom_fields": {"Sahiplik": " TEAM VIRTUALIZATION ", "Sorumlu_Ekip": "", "Kurulum_Tarihi": "2024-01-15"},
+        "tags": [{"name": "production"}, "critical", {"slug": "no-name"}],
+    },
+    {
+        "id": 7,
+        "name": "flat-01",
+        "manufacturer_name": "HPE",
+        "device_model": "DL380",
+        "location_name": "AZ11",
+        "site_name": "DC13",
+        "tenant_name": "Moneygram",
+        "tags1_name": "gold",
+        "tags3_name": "edge",
+        "location_description": "",
+        "custom_fields": {},
+    },
+    {"id": None, "name": "", "custom_fields": None},
+]
+
+SYNTHETIC_TAGS = {"tags": {
+    "settings": {"trim": False, "treat_empty_as_none": False, "skip_empty": True},
+    "definitions": [
+        {"tag_name": "Model", "source_type": "netbox_attribute", "path": "device_type.model",
+         "fallback": ["device_model", "name"], "transform": "to_string"},
+        {"tag_name": "Id", "source_type": "netbox_attribute", "path": "id", "transform": "to_string"},
+        {"tag_name": "Hall", "source_type": "computed", "compute_function": "extract_hall"},
+        {"tag_name": "Unknown", "source_type": "computed", "compute_function": "nope"},
+        {"tag_name": "Groups", "source_type": "template_mapping", "separator": "|"},
+        {"tag_name": "Type", "source_type": "mapping_result"},
+        {"tag_name": "Owner", "source_type": "custom_field", "field_name": "Sahiplik"},
+        {"tag_name": "Off", "source_type": "mapping_result", "enabled": False},
+        {"source_type": "array_expansion", "path": "tags", "prefix": "T_"},
+        {"source_type": "array_expansion", "path": "tags", "prefix": ""},
+        {"tag_name": "Model", "source_type": "custom_field", "field_name": "Kurulum_Tarihi"},
+    ],
+}}
+
+SYNTHETIC_HOST_GROUPS = {"host_groups": {
+    "settings": {"unique": False, "skip_empty": False, "trim": False, "separator": ";"},
+    "sources": [
+        {"type": "template_mapping", "priority": 5},
+        {"type": "custom_field", "field_name": "Sahiplik", "priority": 2},
+        {"type": "netbox_attribute", "path": "location.parent.name", "fallback": "site_name", "priority": 1},
+        {"type": "computed", "compute_function": "get_location_name", "priority": 3},
+        {"type": "mapping_result", "priority": 3},
+        {"type": "mapping_result", "enabled": False},
+        {"type": "other"},
+    ],
+}}
+
+
+def _cases(configs, device_types=("Lenovo IPMI", None)):
+    for config in configs:
+        for device in DEVICES:
+            for device_type in device_types:
+                for templates in (TEMPLATES, []):
+                    yield config, device, device_type, templates
+
+
+def test_tags_plan_equals_reference():
+    configs = [_load("tags_config.yml"), SYNTHETIC_TAGS, None]
+    for config, device, device_type, templates in _cases(configs):
+        plan = TagsPlan(copy.deepcopy(config))
+        expected = reference_tags(copy.deepcopy(device), config, device_type, templates)
+        assert plan(copy.deepcopy(device), device_type, templates) == expected
+        assert list(plan(device, device_type, templates)[0]) == list(expected[0])
+
+
+def test_host_groups_plan_equals_reference():
+    configs = [_load("host_groups_config.yml"), SYNTHETIC_HOST_GROUPS, None]
+    for config, device, device_type, templates in _cases(configs):
+        plan = HostGroupsPlan(copy.deepcopy(config))
+        assert plan(device, device_type, templates) == reference_host_groups(device, config, device_type, templates)
+
+
+def test_plans_pickle_for_spawned_workers():
+    tags_plan = pickle.loads(pickle.dumps(TagsPlan(SYNTHETIC_TAGS)))
+    hg_plan = pickle.loads(pickle.dumps(HostGroupsPlan(SYNTHETIC_HOST_GROUPS)))
+    assert tags_plan(DEVICES[1], "X", TEMPLATES) == TagsPlan(SYNTHETIC_TAGS)(DEVICES[1], "X", TEMPLATES)
+    assert hg_plan(DEVICES[0], "X", TEMPLATES) == HostGroupsPlan(SYNTHETIC_HOST_GROUPS)(DEVICES[0], "X", TEMPLATES)
@@ -0,0 +1,239 @@
+"""Unit tests for hmdl_bulk_writer.py (bulk HMDL audit rows, COPY loading)."""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+_FILES_DIR = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "playbooks",
+    "roles",
+    "netbox_zabbix_sync",
+    "files",
+)
+_MODULE_UTILS = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "playbooks",
+    "roles",
+    "netbox_zabbix_sync",
+    "module_utils",
+)
+sys.path.insert(0, os.path.abspath(_FILES_DIR))
+sys.path.insert(0, os.path.abspath(_MODULE_UTILS))
+
+from hmdl_bulk_writer import (  # noqa: E402
+    HOST_UPDATE_LOG_COLUMNS,
+    SYNC_LOG_COLUMNS,
+    collect_rows,
+    copy_text,
+    write_rows,
+)
+from plan_store import open_plan_store  # noqa: E402
+from zabbix_payload_builder import ZabbixPayloadBuilder  # noqa: E402
+
+BUILDER_CTX = {
+    "templates_map": {"Generic SNMP": [{"name": "BLT - SNMP Template", "snmpv2": True, "host_groups": ["Network"]}]},
+    "template_type_map": {"snmpv2": {"interface": {"type": 2, "port": 161, "useip": 1, "dns": ""}}},
+    "template_id_cache": {"BLT - SNMP Template": "10001"},
+    "group_id_cache": {"Network": "20001", "Generic SNMP": "20002"},
+    "proxy_group_config": [{"name": "Dc14-proxy Group", "proxy_groupid": "45", "dc_pattern": "DC14"}],
+    "tags_config": {"tags": {"definitions": [{"tag_name": "Location", "enabled": True}]}},
+    "platform_managed_tag_keys": [],
+    "vfw_managed_tag_keys": [],
+    "hmdl_baseline_map": {},
+}
+
+META = {"run_id": "20250101120000", "awx_job_id": "", "playbook_name": "db_to_zabbix_sync",
+        "inventory_source": "datalake", "dry_run": False}
+
+
+def _record(hostname, ip, location):
+    return {
+        "DEVICE_TYPE": "Generic SNMP",
+        "DEVICE_ROLE": "Switch",
+        "HOST_IP": ip,
+        "HOSTNAME": hostname,
+        "HOST_VISIBLE_NAME": hostname,
+        "DC_ID": "DC14",
+        "HOST_GROUPS": "Network,Generic SNMP",
+        "MACROS": json.dumps({"Location": location}),
+        "REPORT_LOCATION": "DC14",
+        "REPORT_SITE": "DC14",
+        "REPORT_TENANT": "",
+        "REPORT_OWNERSHIP": "",
+    }
+
+
+def _update_plan():
+    plan = {
+        "action": "update",
+        "zbx_scenario": "update",
+        "device_id": "1",
+        "zbx_record": _record("switch-01", "10.0.0.2", "DC15"),
+        "zbx_existing_host": {
+            "hostid": "50001",
+            "host": "switch-01",
+            "name": "switch-01",
+            "monitored_by": "2",
+            "proxy_groupid": "45",
+            "interfaces": [{"interfaceid": "60001", "type": "2", "ip": "10.0.0.1", "port": "161"}],
+            "groups": [{"name": "Network"}, {"name": "Generic SNMP"}],
+            "tags": [{"tag": "Location", "value": "DC14"}],
+        },
+    }
+    return ZabbixPayloadBuilder(BUILDER_CTX).enrich_plan(plan)
+
+
+def _populate(store):
+    store.put_plan("device", 1, _update_plan())
+    store.put_result("device", 1, {"hostname": "switch-01", "device_role": "Switch", "status": "güncellendi",
+                                   "reason": "ip_changed", "ip": "10.0.0.2", "site": "DC14", "tenant": "N/A"})
+    create = ZabbixPayloadBuilder(BUILDER_CTX).enrich_plan(
+        {"action": "create", "zbx_scenario": "create", "device_id": "2", "zbx_record": _record("switch-02", "10.0.0.3", "DC14")}
+    )
+    store.put_plan("device", 2, create)
+    store.put_result("device", 2, {"hostname": "switch-02", "device_role": "Switch", "status": "eklendi",
+                                   "reason": "", "ip": "10.0.0.3", "site": "DC14", "tenant": "N/A"})
+    store.put_plan("device", 3, {"action": "skip", "zbx_scenario": "skip",
+                                 "current_device_result": {"hostname": "switch-03", "status": "atlandı"}})
+
+
+ITEMS = [
+    {"id": 1, "name": "switch-01", "manufacturer_name": "Cisco", "location_name": "Room 1", "root_location_name": "DC14"},
+    {"id": 2, "name": "switch-02", "manufacturer_name": "N/A", "root_location_name": "DC14"},
+    {"id": 3, "name": "switch-03"},
+]
+
+
+def test_update_plan_carries_field_and_tag_changes():
+    plan = _update_plan()
+    fields = {c["field_name"]: c for c in plan["host_field_changes"]}
+    assert fields["interface_ip"]["old_value"] == "10.0.0.1"
+    assert fields["interface_ip"]["new_value"] == "10.0.0.2"
+    assert set(fields) == {"interface_ip"}
+    assert [(c["key_name"], c["action"], c["object_type"]) for c in plan["tag_changes"]] == [
+        ("Location", "updated", "tag")
+    ]
+
+
+def test_collect_rows_from_plan_store(tmp_path):
+    store = open_plan_store("files", str(tmp_path))
+    _populate(store)
+    apply_log = {("device", "2"): {"type": "device", "id": "2", "zabbix_hostid": "70002",
+                                   "request_payload": {"host": "switch-02"},
+                                   "response_payload": {"jsonrpc": "2.0", "result": {"hostids": ["70002"]}}}}
+    skipped = [{"id": 9, "name": "ignored-01", "primary_ip_address": "10.9.9.9"}]
+    rows = collect_rows("device", ITEMS, store, META, apply_log=apply_log, skipped_devices=skipped)
+
+    sync = {r["source_device_id"]: r for r in rows["sync"]}
+    # Device 3 ('atlandı' plan result) is not logged by the apply tasks; the izlenmeli=Hayır one is.
+    assert set(sync) == {1, 2, 9}
+    assert all(set(r) == set(SYNC_LOG_COLUMNS) for r in rows["sync"])
+    assert sync[1]["status"] == "güncellendi"
+    assert sync[1]["zabbix_hostid"] == "50001"
+    assert sync[1]["tenant_name"] is None
+    assert json.loads(sync[1]["field_merge_actions"])["update_reasons"]
+    assert json.loads(sync[1]["last_managed_groups"]) == ["Network", "Generic SNMP"]
+    assert sync[1]["source_table"] == "discovery_netbox_inventory_device"
+    assert sync[2]["zabbix_hostid"] == "70002"
+    assert sync[2]["manufacturer_name"] is None
+    assert json.loads(sync[2]["response_payload"])["result"] == {"hostids": ["70002"]}
+    assert sync[2]["error_payload"] is None
+    assert sync[9]["status"] == "atlandı" and sync[9]["operation"] == "skip"
+
+    host_rows = {r["field_name"]: r for r in rows["host_update"]}
+    assert host_rows["interface_ip"]["status"] == "updated"
+    assert host_rows["interface_ip"]["source_device_id"] == 1
+    assert host_rows["interface_ip"]["dry_run"] is False
+    assert [(r["key_name"], r["old_value"], r["new_value"]) for r in rows["tag_update"]] == [
+        ("Location", "DC14", "DC15")
+    ]
+
+
+def test_copy_text_escapes_and_marks_nulls():
+    rows = [{"a": None, "b": "x\ty\nz\\", "c": True, "d": 5}]
+    assert copy_text(rows, ("a", "b", "c", "d")) == "\\N\tx\\ty\\nz\\\\\tt\t5\n"
+
+
+class _FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def copy_expert(self, sql, buf):
+        if "broken" in sql:
+            raise RuntimeError("copy failed")
+        self.conn.copies.append((sql, buf.read()))
+
+
+class _FakeConn:
+    def __init__(self):
+        self.copies = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def test_write_rows_one_copy_and_transaction_per_table():
+    conn = _FakeConn()
+    row = {c: None for c in HOST_UPDATE_LOG_COLUMNS}
+    row.update({"field_name": "interface_ip", "action": "updated", "status": "updated", "dry_run": False})
+    written = write_rows(conn, [
+        ("hmdl.zabbix_sync_log", SYNC_LOG_COLUMNS, []),
+        ("hmdl.zabbix_host_update_log", HOST_UPDATE_LOG_COLUMNS, [row, row]),
+    ])
+    assert written == {"hmdl.zabbix_sync_log": 0, "hmdl.zabbix_host_update_log": 2}
+    assert conn.commits == 1
+    sql, data = conn.copies[0]
+    assert sql.startswith("COPY hmdl.zabbix_host_update_log (run_id, awx_job_id,")
+    assert data.count("\n") == 2
+
+    with pytest.raises(RuntimeError):
+        write_rows(conn, [("hmdl.broken", HOST_UPDATE_LOG_COLUMNS, [row])])
+    assert conn.rollbacks == 1
+
+
+def test_cli_no_db_with_jsonl_store(tmp_path):
+    store_path = tmp_path / "plan_store.jsonl"
+    store = open_plan_store("jsonl", str(store_path), truncate=True)
+    _populate(store)
+    store.close()
+    items = tmp_path / "pce_devices.json"
+    items.write_text(json.dumps(ITEMS), encoding="utf-8")
+    rows_out = tmp_path / "rows.json"
+    proc = subprocess.run(
+        [sys.executable, os.path.join(_FILES_DIR, "hmdl_bulk_writer.py"),
+         "--entity-type", "device", "--items-json", str(items),
+         "--plans-dir", str(tmp_path), "--plan-store", "jsonl",
+         "--run-id", "r1", "--no-db", "--rows-output", str(rows_out)],
+        capture_output=True, text=True, check=False,
+    )
+    assert proc.returncode == 0, proc.stderr
+    summary = json.loads(proc.stdout.strip().splitlines()[-1])
+    assert summary["rows"] == {"hmdl.zabbix_sync_log": 2, "hmdl.zabbix_host_update_log": 1,
+                               "hmdl.zabbix_tag_update_log": 1}
+    assert len(json.loads(rows_out.read_text(encoding="utf-8"))["sync"]) == 2
+
+    bad = subprocess.run(
+        [sys.executable, os.path.join(_FILES_DIR, "hmdl_bulk_writer.py"),
+         "--entity-type", "device", "--items-json", str(items), "--schema", "hmdl; drop", "--no-db"],
+        capture_output=True, text=True, check=False,
+    )
+    assert bad.returncode == 2
@@ -0,0 +1,119 @@
+"""Incremental compare: unchanged up-to-date entities reuse last run's enrich output."""
+import json
+import os
+import sys
+from unittest import mock
+
+_FILES_DIR = os.path.join(
+    os.path.dirname(__file__),
+    "..", "playbooks", "roles", "netbox_zabbix_sync", "files"
+)
+sys.path.insert(0, os.path.abspath(_FILES_DIR))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from parallel_compare_engine import (  # noqa: E402
+    FINGERPRINT_VERSION,
+    load_fingerprints,
+    run_parallel_compare,
+    save_fingerprints,
+)
+from test_parallel_compare_engine import _make_ctx, _make_device  # noqa: E402
+from zabbix_payload_builder import ZabbixPayloadBuilder, build_proxy_group_config  # noqa: E402
+
+TAGS = [
+    {"tag": "Manufacturer", "value": "HPE"},
+    {"tag": "Device_Type", "value": "ProLiant DL380 Gen10"},
+    {"tag": "Location_Detail", "value": "DC14"},
+    {"tag": "City", "value": "DC14"},
+    {"tag": "Tenant", "value": "Bulutistan"},
+    {"tag": "Loki_ID", "value": "1001"},
+]
+
+
+def _zabbix_host(ip="10.0.0.1"):
+    return {
+        "hostid": "900",
+        "host": "srv01dc14.blt.vc - BMC",
+        "name": "srv01dc14.blt.vc - BMC",
+        "monitored_by": "2",
+        "proxy_groupid": "45",
+        "interfaces": [{"interfaceid": "1", "ip": ip, "type": "2"}],
+        "tags": TAGS,
+        "groups": [
+            {"groupid": "6", "name": "HPE iLO BMC"},
+            {"groupid": "7", "name": "DC14"},
+            {"groupid": "5", "name": "Physical Hosts"},
+        ],
+    }
+
+
+def _ctx(host=None, **overrides):
+    settings = {
+        "template_id_cache": {"BLT - HPE iLO": "1"},
+        "group_id_cache": {"Physical Hosts": "5", "HPE iLO BMC": "6", "DC14": "7"},
+        "proxy_group_config": build_proxy_group_config({"Dc14-proxy Group": "45"}),
+        "by_loki": {"1001": host or _zabbix_host()},
+    }
+    settings.update(overrides)
+    return _make_ctx(**settings)
+
+
+def _run(tmp_path, ctx, name, fingerprints):
+    out = tmp_path / name
+    summary = run_parallel_compare(
+        devices=[_make_device()], platforms=[], vfws=[], ctx=ctx,
+        output_dir=str(out), workers=1, fingerprints_path=str(fingerprints),
+    )
+    plan = json.loads((out / "device_plan_1001.json").read_text(encoding="utf-8"))
+    return summary, plan
+
+
+def test_unchanged_entity_skips_enrich_and_keeps_plan(tmp_path):
+    fingerprints = tmp_path / "fp.json"
+    summary, first = _run(tmp_path, _ctx(), "run1", fingerprints)
+    assert first["action"] == "update" and first["needs_update"] is False
+    assert first["current_device_result"]["status"] == "güncel"
+    assert summary["fingerprints"] == {"reused": 0, "stored": 1}
+    stored = json.loads(fingerprints.read_text(encoding="utf-8"))
+    assert stored["fingerprint_version"] == FINGERPRINT_VERSION
+
+    with mock.patch.object(ZabbixPayloadBuilder, "enrich_plan", side_effect=AssertionError("enrich called")):
+        summary, second = _run(tmp_path, _ctx(), "run2", fingerprints)
+    assert summary["fingerprints"] == {"reused": 1, "stored": 1}
+    assert second.pop("fingerprint_reused") is True
+    assert second == first
+
+
+def test_zabbix_or_config_change_recompares(tmp_path):
+    fingerprints = tmp_path / "fp.json"
+    _run(tmp_path, _ctx(), "run1", fingerprints)
+
+    summary, plan = _run(tmp_path, _ctx(host=_zabbix_host(ip="10.9.9.9")), "run2", fingerprints)
+    assert summary["fingerprints"]["reused"] == 0
+    assert plan["needs_update"] is True
+    # An entity that now needs an update is dropped from the fingerprint file.
+    assert summary["fingerprints"]["stored"] == 0
+
+    _run(tmp_path, _ctx(), "run3", fingerprints)
+    summary, _ = _run(tmp_path, _ctx(group_id_cache={"Physical Hosts": "5", "HPE iLO BMC": "6", "DC14": "8"}),
+                      "run4", fingerprints)
+    assert summary["fingerprints"]["reused"] == 0
+
+
+def test_unreadable_fingerprint_file_falls_back_to_full_compare(tmp_path):
+    fingerprints = tmp_path / "fp.json"
+    fingerprints.write_text("{not json", encoding="utf-8")
+    summary, plan = _run(tmp_path, _ctx(), "run1", fingerprints)
+    assert summary["fingerprints"] == {"reused": 0, "stored": 1}
+    assert "fingerprint_reused" not in plan
+
+
+def test_save_fingerprints_streams_pairs_like_a_dict(tmp_path):
+    entities = {"device:1": {"fingerprint": "a", "enriched": {"name": "Şişli"}}, "vfw:2": {"fingerprint": "b"}}
+    assert save_fingerprints(str(tmp_path / "dict.json"), entities) == 2
+    assert save_fingerprints(str(tmp_path / "pairs.json"), iter(entities.items())) == 2
+    assert (tmp_path / "dict.json").read_text(encoding="utf-8") == (tmp_path / "pairs.json").read_text(encoding="utf-8")
+    assert load_fingerprints(str(tmp_path / "pairs.json")) == entities
+    assert save_fingerprints(str(tmp_path / "empty.json"), iter(())) == 0
+    assert load_fingerprints(str(tmp_path / "empty.json")) == {}
+
@@ -0,0 +1,311 @@
+"""Tests for netbox_device_snapshot.py against a local NetBox stand-in (byte-compatible with the full fetch)."""
+import json
+import os
+import subprocess
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import pytest
+import yaml
+
+_ROOT = os.path.join(os.path.dirname(__file__), "..")
+_FILES_DIR = os.path.abspath(os.path.join(_ROOT, "playbooks", "roles", "netbox_zabbix_sync", "files"))
+_FETCH_TASKS = os.path.join(_ROOT, "playbooks", "roles", "netbox_zabbix_sync", "tasks", "fetch_all_devices_loki.yml")
+sys.path.insert(0, _FILES_DIR)
+
+from netbox_device_snapshot import load_snapshot, refresh_snapshot  # noqa: E402
+from netbox_paginator import DEVICE_FIELDS, NetBoxPaginator  # noqa: E402
+
+_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+MAPPING = {
+    "mappings": [
+        {"device_type": "Lenovo IPMI", "conditions": {"device_role": "HOST", "manufacturer": "LENOVO"}, "priority": 1},
+        {"device_type": "Cisco Switch", "conditions": {"device_role": ["SWITCH"], "manufacturer": "Cisco"}, "priority": 2},
+    ]
+}
+
+
+class FakeNetBox:
+    """Devices, locations and a change log; list endpoints page by limit/offset with absolute next links."""
+
+    def __init__(self):
+        self.tick = 0
+        self.locations = {
+            1: {"id": 1, "name": "DC14", "parent": None},
+            2: {"id": 2, "name": "Hall-A", "parent": {"id": 1, "name": "DC14"}},
+            3: {"id": 3, "name": "Rack-Row-1", "parent": {"id": 2, "name": "Hall-A"}},
+            4: {"id": 4, "name": "DC15", "parent": None},
+        }
+        self.tenants = {7: "TEAM NETWORK", 8: "TEAM VIRTUALIZATION"}
+        self.devices = {}
+        self.changes = []
+        self.requests = []
+        self.changelog_status = 200
+        self.core_changelog = True
+        for i in range(1, 9):
+            role, manufacturer = ("HOST", "LENOVO") if i % 2 else ("SWITCH", "Cisco")
+            if i == 8:
+                manufacturer = "Unknown Vendor"
+            self.add_device(i, f"dev-{i:02d}", role, manufacturer, location=1 + i % 4, tenant=7 + i % 2,
+                            izlenmeli={3: "Hayır", 5: "Evet"}.get(i))
+
+    def now(self):
+        self.tick += 10
+        return (_EPOCH + timedelta(seconds=self.tick)).isoformat().replace("+00:00", "Z")
+
+    def log(self, object_type, object_id, action):
+        self.changes.append({"id": len(self.changes) + 1, "time": self.now(), "action": {"value": action},
+                             "changed_object_type": object_type, "changed_object_id": object_id})
+
+    def add_device(self, i, name, role, manufacturer, location, tenant, izlenmeli=None):
+        loc = self.locations[location]
+        self.devices[i] = {
+            "id": i,
+            "name": name,
+            "status": {"value": "active", "label": "Active"},
+            "role": {"id": 10 if role == "HOST" else 11, "name": role},
+            "device_type": {"id": 20 + i, "model": f"Model {i}", "manufacturer": {"id": 30, "name": manufacturer}},
+            "primary_ip4": {"id": 100 + i, "address": f"10.0.0.{i}/24"},
+            "location": {"id": loc["id"], "name": loc["name"]},
+            "site": {"id": 50, "name": "Site\tOne"},
+            "tenant": {"id": tenant, "name": self.tenants[tenant]},
+            "custom_fields": {"izlenmeli": izlenmeli, "Sahiplik": "NOC"},
+            "last_updated": self.now(),
+        }
+
+    def touch(self, i, **fields):
+        self.devices[i].update(fields)
+        self.devices[i]["last_updated"] = self.now()
+        self.log("dcim.device", i, "update")
+
+    def rename_tenant(self, tenant_id, name):
+        self.tenants[tenant_id] = name
+        for device in self.devices.values():
+            if device["tenant"]["id"] == tenant_id:
+                device["tenant"] = {"id": tenant_id, "name": name}
+        self.log("tenancy.tenant", tenant_id, "update")
+
+    def delete(self, i):
+        del self.devices[i]
+        self.log("dcim.device", i, "delete")
+
+    def subtree(self, root):
+        ids, changed = {root}, True
+        while changed:
+            changed = False
+            for loc in self.locations.values():
+                if loc["parent"] and loc["parent"]["id"] in ids and loc["id"] not in ids:
+                    ids.add(loc["id"])
+                    changed = True
+        return ids
+
+    def query(self, path, q):
+        if path == "/api/dcim/locations/":
+            rows = list(self.locations.values())
+            if "name" in q:
+                rows = [r for r in rows if r["name"] in q["name"]]
+            if "parent_id" in q:
+                rows = [r for r in rows if r["parent"] and str(r["parent"]["id"]) in q["parent_id"]]
+            return 200, rows
+        if path == "/api/dcim/devices/":
+            rows = [self.devices[i] for i in sorted(self.devices)]
+            if "status" in q:
+                rows = [r for r in rows if r["status"]["value"] in q["status"]]
+            if "cf_izlenmeli" in q:
+                wanted = q["cf_izlenmeli"]
+                rows = [r for r in rows if (r["custom_fields"].get("izlenmeli") or "null") in wanted]
+            if "location_id" in q:
+                allowed = set().union(*(self.subtree(int(x)) for x in q["location_id"]))
+                rows = [r for r in rows if r["location"]["id"] in allowed]
+            if "id" in q:
+                rows = [r for r in rows if str(r["id"]) in q["id"]]
+            if "last_updated__gte" in q:
+                since = datetime.fromisoformat(q["last_updated__gte"][0])
+                rows = [r for r in rows if datetime.fromisoformat(r["last_updated"].replace("Z", "+00:00")) >= since]
+            return 200, rows
+        if path in ("/api/core/object-changes/", "/api/extras/object-changes/"):
+            if (path == "/api/core/object-changes/") != self.core_changelog:
+                return 404, None
+            if self.changelog_status != 200:
+                return self.changelog_status, None
+            rows = list(self.changes)
+            if "changed_object_type" in q:
+                rows = [r for r in rows if r["changed_object_type"] in q["changed_object_type"]]
+            if "time_after" in q:
+                since = datetime.fromisoformat(q["time_after"][0])
+                rows = [r for r in rows if datetime.fromisoformat(r["time"].replace("Z", "+00:00")) >= since]
+            if q.get("ordering") == ["-time"]:
+                rows = rows[::-1]
+            return 200, rows
+        return 404, None
+
+
+@pytest.fixture
+def netbox():
+    fake = FakeNetBox()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            q = parse_qs(url.query)
+            fake.requests.append((url.path, q))
+            status, rows = fake.query(url.path, q)
+            body = {"detail": "Not found."}
+            if rows is not None:
+                limit, offset = int(q.get("limit", ["50"])[0]), int(q.get("offset", ["0"])[0])
+                nxt = None
+                if offset + limit < len(rows):
+                    params = [(k, v) for k, vs in q.items() if k != "offset" for v in vs] + [("offset", offset + limit)]
+                    nxt = f"{fake.url}{url.path}?{urlencode(params)}"
+                body = {"count": len(rows), "next": nxt, "previous": None, "results": rows[offset:offset + limit]}
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    fake.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield fake
+    server.shutdown()
+
+
+@pytest.fixture
+def mapping_file(tmp_path):
+    path = tmp_path / "netbox_device_type_mapping.json"
+    path.write_text(json.dumps(MAPPING), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def full_fetch_script(tmp_path_factory):
+    """The inline fetch script of fetch_all_devices_loki.yml, written out as-is."""
+    with open(_FETCH_TASKS, encoding="utf-8") as f:
+        tasks = yaml.safe_load(f)
+    content = next(t["copy"]["content"] for t in tasks
+                   if t.get("copy", {}).get("dest") == "/tmp/fetch_all_netbox_devices.py")
+    path = tmp_path_factory.mktemp("full") / "fetch_all_netbox_devices.py"
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+
+def _env():
+    return {**os.environ, "PYTHONPATH": _FILES_DIR, "NETBOX_TOKEN": "token"}
+
+
+def _full(script, netbox, mapping_file, mode, location=""):
+    proc = subprocess.run([sys.executable, script, netbox.url, "token", "false", mapping_file, location, mode],
+                          capture_output=True, text=True, env=_env(), check=True)
+    return proc.stdout
+
+
+def _snapshot(netbox, mapping_file, snapshot, mode, location="", *extra):
+    proc = subprocess.run(
+        [sys.executable, os.path.join(_FILES_DIR, "netbox_device_snapshot.py"), "--netbox-url", netbox.url,
+         "--mapping-file", mapping_file, "--snapshot", snapshot, "--mode", mode, "--location-filter", location,
+         "--page-size", "3", *extra],
+        capture_output=True, text=True, env=_env(), check=False,
+    )
+    assert proc.returncode == 0, proc.stderr
+    return proc.stdout, proc.stderr
+
+
+def _stats(stderr):
+    line = next(l for l in stderr.splitlines() if l.startswith("DEBUG: Device snapshot: "))
+    return json.loads(line.split(": ", 2)[2])
+
+
+@pytest.mark.parametrize("location", ["", "Hall-A"])
+def test_output_is_byte_identical_to_full_fetch_across_incremental_runs(
+    netbox, mapping_file, full_fetch_script, tmp_path, location
+):
+    snapshot = str(tmp_path / "snapshot.json")
+    for mode, extra in (("monitor", ()), ("skip", ("--no-refresh",))):
+        out, err = _snapshot(netbox, mapping_file, snapshot, mode, location, *extra)
+        assert out == _full(full_fetch_script, netbox, mapping_file, mode, location)
+    assert json.loads(out)["count"] == (0 if location else 1)
+    # The location subtree comes from one listing, not a parent_id= query per parent.
+    assert not any("parent_id" in q or "name" in q for p, q in netbox.requests if p == "/api/dcim/locations/")
+
+    netbox.touch(2, primary_ip4={"id": 200, "address": "10.9.9.2/24"})
+    netbox.touch(4, status={"value": "offline", "label": "Offline"})
+    netbox.touch(3, custom_fields={"izlenmeli": None, "Sahiplik": "NOC"})
+    netbox.delete(6)
+    netbox.add_device(9, "dev-09", "HOST", "LENOVO", location=3, tenant=7)
+    netbox.log("dcim.device", 9, "create")
+    netbox.rename_tenant(8, "TEAM DATACENTER")
+    netbox.locations[1]["name"] = "DC14-NEW"
+    netbox.requests.clear()
+
+    # No overlap window: the tenant rename must be picked up through the change log alone.
+    out, err = _snapshot(netbox, mapping_file, snapshot, "monitor", location, "--overlap-seconds", "0")
+    stats = _stats(err)
+    assert stats["mode"] == "incremental"
+    assert stats["deleted"] == 1 and stats["related"] >= 1
+    assert not any(q.get("status") == ["active"] for p, q in netbox.requests if p == "/api/dcim/devices/")
+    assert out == _full(full_fetch_script, netbox, mapping_file, "monitor", location)
+    out, _ = _snapshot(netbox, mapping_file, snapshot, "skip", location, "--no-refresh")
+    assert out == _full(full_fetch_script, netbox, mapping_file, "skip", location)
+
+    devices = {d["id"]: d for d in json.loads(_snapshot(netbox, mapping_file, snapshot, "monitor")[0])["devices"]}
+    assert 6 not in devices and 4 not in devices and 3 in devices
+    assert devices[2]["primary_ip_address"] == "10.9.9.2"
+    assert devices[9]["root_location_name"] == "DC14-NEW"
+    assert all(d["tenant_name"] != "TEAM VIRTUALIZATION" for d in devices.values())
+
+
+def test_refresh_fallbacks(netbox):
+    client = NetBoxPaginator(netbox.url, "token", page_size=3)
+    try:
+        snapshot, stats = refresh_snapshot(client, None, now=1000)
+        assert (stats["mode"], stats["reason"], stats["devices"]) == ("full", "no_snapshot", 8)
+        assert snapshot["changelog"] is True
+
+        netbox.core_changelog = False  # NetBox < 4.1: /api/extras/object-changes/
+        netbox.delete(1)
+        snapshot, stats = refresh_snapshot(client, snapshot, now=1100)
+        assert stats["mode"] == "incremental" and "1" not in snapshot["devices"]
+
+        _, stats = refresh_snapshot(client, snapshot, now=1000 + 86401)
+        assert stats["reason"] == "max_age"
+        _, stats = refresh_snapshot(client, dict(snapshot, netbox_url="https://other"), now=1100)
+        assert stats["reason"] == "netbox_url_changed"
+
+        netbox.changelog_status = 403
+        _, stats = refresh_snapshot(client, snapshot, now=1100)
+        assert stats["reason"] == "changelog_unavailable"
+        fresh, _ = refresh_snapshot(client, None, now=1100)
+        assert fresh["changelog"] is False
+        _, stats = refresh_snapshot(client, fresh, now=1200)
+        assert stats["reason"] == "changelog_unavailable"
+    finally:
+        client.close()
+
+
+def test_no_refresh_resyncs_when_the_field_projection_differs(netbox, mapping_file, tmp_path):
+    snapshot = str(tmp_path / "snapshot.json")
+    _snapshot(netbox, mapping_file, snapshot, "monitor")
+    _, err = _snapshot(netbox, mapping_file, snapshot, "skip", "", "--no-refresh")
+    assert _stats(err)["mode"] == "reused"
+
+    _, err = _snapshot(netbox, mapping_file, snapshot, "skip", "", "--no-refresh", "--fields")
+    assert (_stats(err)["mode"], _stats(err)["reason"]) == ("full", "fields_changed")
+    assert load_snapshot(snapshot)["fields"] == list(DEVICE_FIELDS)
+    _, err = _snapshot(netbox, mapping_file, snapshot, "monitor", "", "--no-refresh", "--fields")
+    assert _stats(err)["mode"] == "reused"
+
+
+def test_load_snapshot_rejects_other_versions(tmp_path):
+    path = tmp_path / "snapshot.json"
+    assert load_snapshot(str(path)) is None
+    path.write_text(json.dumps({"format_version": 0, "devices": {}}), encoding="utf-8")
+    assert load_snapshot(str(path)) is None
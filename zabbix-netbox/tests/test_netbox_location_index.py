@@ -0,0 +1,92 @@
+"""Unit tests for netbox_location_index.py (location tree index and its on-disk cache)."""
+import json
+import os
+import sys
+
+_FILES_DIR = os.path.join(
+    os.path.dirname(__file__),
+    "..", "playbooks", "roles", "netbox_zabbix_sync", "files"
+)
+sys.path.insert(0, os.path.abspath(_FILES_DIR))
+
+from netbox_device_normalize import build_location_root_map  # noqa: E402
+from netbox_location_index import LocationTreeIndex, load_location_index  # noqa: E402
+
+# Children listed before their parents; 40 <-> 41 is a parent cycle.
+LOCATIONS = [
+    {"id": 30, "name": "Rack-A1", "parent": {"id": 20, "name": "DH3"}, "last_updated": "2025-01-01T00:00:03Z"},
+    {"id": 31, "name": "Rack-A2", "parent": {"id": 20, "name": "DH3"}, "last_updated": "2025-01-01T00:00:04Z"},
+    {"id": 20, "name": "DH3", "parent": {"id": 10, "name": "DC18"}, "last_updated": "2025-01-01T00:00:02Z"},
+    {"id": 21, "name": "DH4", "parent": 10, "last_updated": "2025-01-01T00:00:05Z"},
+    {"id": 10, "name": "DC18", "parent": None, "last_updated": "2025-01-01T00:00:01Z"},
+    {"id": 11, "name": " DC19 ", "parent": None, "last_updated": "2025-01-01T00:00:01Z"},
+    {"id": 50, "name": "Orphan", "parent": {"id": 999, "name": "gone"}, "last_updated": "2025-01-01T00:00:01Z"},
+    {"id": 40, "name": "Loop-A", "parent": 41, "last_updated": "2025-01-01T00:00:01Z"},
+    {"id": 41, "name": "Loop-B", "parent": 40, "last_updated": "2025-01-01T00:00:01Z"},
+]
+
+
+def test_descendants_roots_and_containment():
+    index = LocationTreeIndex(LOCATIONS)
+    assert index.find("DC18") == 10
+    assert index.find("dc18") is None
+    assert sorted(index.descendants(10)) == [10, 20, 21, 30, 31]
+    assert index.descendants(10)[0] == 10
+    assert sorted(index.descendants(20)) == [20, 30, 31]
+    assert index.descendants(31) == [31]
+    assert index.descendants(999) == []
+    assert sorted(index.descendants(40)) == [40, 41]
+    assert index.contains(10, 31) and index.contains(20, 20)
+    assert not index.contains(20, 21) and not index.contains(11, 30)
+    assert index.root_name(30) == "DC18"
+    assert index.root_name(50) == "Orphan"
+    assert index.root_map() == build_location_root_map(LOCATIONS)
+
+
+class FakePaginator:
+    url = "https://netbox.example.com"
+
+    def __init__(self, locations):
+        self.locations = locations
+        self.list_calls = 0
+
+    def get(self, path, params):
+        newest = max(self.locations, key=lambda loc: loc["last_updated"])
+        return {"count": len(self.locations), "results": [{"id": newest["id"], "last_updated": newest["last_updated"]}]}
+
+    def list(self, path, params=None, fields=None):
+        self.list_calls += 1
+        return [{k: v for k, v in loc.items() if k in fields} for loc in self.locations]
+
+
+def test_cache_reused_until_locations_change(tmp_path):
+    cache = str(tmp_path / "state" / "netbox_location_index.json")
+    paginator = FakePaginator([dict(loc) for loc in LOCATIONS])
+    index, source = load_location_index(paginator, cache)
+    assert source == "api" and os.path.exists(cache)
+
+    index, source = load_location_index(paginator, cache)
+    assert source == "cache" and paginator.list_calls == 1
+    assert index.root_map() == build_location_root_map(LOCATIONS)
+
+    # Re-parent DH4 under DC19: newer last_updated invalidates the cache.
+    paginator.locations[3].update({"parent": {"id": 11}, "last_updated": "2025-02-01T00:00:00Z"})
+    index, source = load_location_index(paginator, cache)
+    assert source == "api" and index.root_name(21) == "DC19"
+
+    # Deleting a location leaves the newest last_updated alone but changes the count.
+    del paginator.locations[1]
+    index, source = load_location_index(paginator, cache)
+    assert source == "api" and 31 not in index.descendants(10)
+
+    with open(cache, encoding="utf-8") as f:
+        assert json.load(f)["netbox_url"] == FakePaginator.url
+
+
+def test_without_or_with_unwritable_cache_lists_every_time(tmp_path):
+    paginator = FakePaginator(LOCATIONS)
+    assert load_location_index(paginator, None)[1] == "api"
+    blocker = tmp_path / "file"
+    blocker.write_text("", encoding="utf-8")
+    index, source = load_location_index(paginator, str(blocker / "cache.json"))
+    assert source == "api" and len(index) == len(LOCATIONS)
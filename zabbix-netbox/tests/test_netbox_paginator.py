@@ -0,0 +1,188 @@
+"""Tests for netbox_paginator.py (count + offset fan-out, pooled session, field projection) and the Loki fetch scripts using it."""
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import pytest
+import yaml
+
+_ROOT = os.path.join(os.path.dirname(__file__), "..")
+_ROLE = os.path.join(_ROOT, "playbooks", "roles", "netbox_zabbix_sync")
+_FILES_DIR = os.path.abspath(os.path.join(_ROLE, "files"))
+sys.path.insert(0, _FILES_DIR)
+
+from netbox_paginator import DEVICE_FIELDS, NetBoxApiError, NetBoxPaginator, dedupe_pages  # noqa: E402
+
+
+class FakeNetBox:
+    def __init__(self):
+        self.items = [{"id": i, "name": f"item-{i:03d}", "custom_fields": {"izlenmeli": None}, "extra": "x" * 50}
+                      for i in range(1, 48)]
+        self.max_limit = 1000
+        self.with_count = True
+        self.shift = 0
+        self.requests = []
+        self.ports = set()
+        self.lock = threading.Lock()
+
+    def rows(self, path, q):
+        if path in ("/api/items/", "/api/dcim/platforms/"):
+            rows = list(self.items)
+            if "cf_izlenmeli" in q:
+                rows = [r for r in rows if (r["custom_fields"]["izlenmeli"] or "null") in q["cf_izlenmeli"]]
+            return rows
+        if path == "/api/plugins/custom-objects/virtual_fws/":
+            return [{"id": i, "hostname": f"fw-{i % 5}", "ip_port": f"10.0.0.{i % 5}:443",
+                     "lokasyon": {"name": "DC14"}, "fw_status": "active"} for i in range(1, 24)]
+        return None
+
+
+@pytest.fixture
+def netbox():
+    fake = FakeNetBox()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            q = parse_qs(url.query)
+            with fake.lock:
+                fake.requests.append((url.path, q))
+                fake.ports.add(self.client_address[1])
+            rows = fake.rows(url.path, q)
+            if rows is None:
+                status, body = 404, {"detail": "Not found."}
+            else:
+                status = 200
+                limit = min(int(q.get("limit", ["50"])[0]), fake.max_limit)
+                offset = int(q.get("offset", ["0"])[0])
+                if offset:
+                    # A row deleted before this page was read: the page starts `shift` rows early.
+                    offset = max(0, offset - fake.shift)
+                if "fields" in q:
+                    keep = q["fields"][0].split(",")
+                    rows = [{k: v for k, v in r.items() if k in keep} for r in rows]
+                nxt = None
+                if offset + limit < len(rows):
+                    params = [(k, v) for k, vs in q.items() if k not in ("offset", "limit") for v in vs]
+                    nxt = f"{fake.url}{url.path}?{urlencode(params + [('limit', limit), ('offset', offset + limit)])}"
+                body = {"next": nxt, "previous": None, "results": rows[offset:offset + limit]}
+                if fake.with_count:
+                    body["count"] = len(rows)
+                # Later pages finish first: reassembly must not depend on completion order.
+                time.sleep(random.uniform(0, 0.02) if offset else 0.03)
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    fake.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield fake
+    server.shutdown()
+
+
+def test_fan_out_by_offset_keeps_order_and_pools_connections(netbox):
+    paginator = NetBoxPaginator(netbox.url, "token", page_size=5, concurrency=3)
+    try:
+        items = paginator.list("/api/items/", {"ordering": "id"})
+    finally:
+        paginator.close()
+    assert items == netbox.items
+    offsets = sorted(int(q["offset"][0]) for _, q in netbox.requests)
+    assert offsets == list(range(0, 47, 5))
+    assert all(q["ordering"] == ["id"] for _, q in netbox.requests)
+    assert len(netbox.ports) <= 3
+
+
+def test_server_page_cap_and_missing_count(netbox):
+    netbox.max_limit = 10
+    paginator = NetBoxPaginator(netbox.url, "token", page_size=1000, concurrency=4)
+    try:
+        assert paginator.list(f"{netbox.url}/api/items/?limit=100") == netbox.items
+        assert sorted(int(q["offset"][0]) for _, q in netbox.requests) == [0, 10, 20, 30, 40]
+        assert all(q["limit"] == [("1000" if q["offset"] == ["0"] else "10")] for _, q in netbox.requests)
+
+        netbox.with_count = False
+        netbox.requests.clear()
+        assert paginator.list("/api/items/") == netbox.items
+        assert len(netbox.requests) == 5
+    finally:
+        paginator.close()
+
+
+def test_fields_projection_brief_and_errors(netbox):
+    paginator = NetBoxPaginator(netbox.url, "token", page_size=20)
+    try:
+        items = paginator.list("/api/items/", fields=("id", "name"), brief=True)
+        assert items == [{"id": i["id"], "name": i["name"]} for i in netbox.items]
+        assert all(q["fields"] == ["id,name"] and q["brief"] == ["true"] for _, q in netbox.requests)
+        with pytest.raises(NetBoxApiError) as exc:
+            paginator.list("/api/missing/")
+        assert exc.value.status == 404
+    finally:
+        paginator.close()
+    assert {"custom_fields", "location", "primary_ip4", "tenant", "last_updated"} <= set(DEVICE_FIELDS)
+
+
+def _inline_script(tasks_file, dest, tmp_path):
+    with open(os.path.join(_ROLE, "tasks", tasks_file), encoding="utf-8") as f:
+        tasks = yaml.safe_load(f)
+    content = next(t["copy"]["content"] for t in tasks if t.get("copy", {}).get("dest") == dest)
+    path = tmp_path / os.path.basename(dest)
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+
+def _run(script, *args):
+    proc = subprocess.run([sys.executable, script, *args], capture_output=True, text=True, check=False,
+                          env={**os.environ, "PYTHONPATH": _FILES_DIR})
+    assert proc.returncode == 0, proc.stderr
+    return json.loads(proc.stdout)
+
+
+def test_platform_and_virtual_fw_scripts_use_paginator(netbox, tmp_path):
+    netbox.max_limit = 10
+    netbox.items[3]["custom_fields"]["izlenmeli"] = "Hayır"
+    platforms = _inline_script("fetch_all_platforms_loki.yml", "/tmp/fetch_all_netbox_platforms.py", tmp_path)
+    result = _run(platforms, netbox.url, "token", "false", "monitor", "", "3")
+    assert [p["id"] for p in result["platforms"]] == [i["id"] for i in netbox.items if i["id"] != 4]
+    result = _run(platforms, netbox.url, "token", "false", "skip", "", "3")
+    assert [p["id"] for p in result["platforms"]] == [4]
+    assert any(q.get("cf_izlenmeli") == ["Hayır"] for _, q in netbox.requests)
+
+    vfws = _inline_script("fetch_all_virtual_fws_loki.yml", "/tmp/fetch_all_netbox_virtual_fws.py", tmp_path)
+    result = _run(vfws, netbox.url, "token", "false", "", "3")
+    assert sorted(fw["id"] for fw in result["virtual_fws"]) == [1, 2, 3, 4, 5]
+    assert len(result["skipped_duplicate_vfws"]) == 18
+
+
+def test_shifted_offsets_never_yield_an_object_twice(netbox, tmp_path):
+    netbox.max_limit = 10
+    netbox.shift = 1
+    paginator = NetBoxPaginator(netbox.url, "token", page_size=10, concurrency=3)
+    try:
+        pages = paginator.pages("/api/items/")
+        assert sum(len(page) for page in pages) > len(netbox.items)
+        deduped = dedupe_pages(pages)
+        assert [i["id"] for page in deduped for i in page] == [i["id"] for i in netbox.items]
+        assert paginator.list("/api/items/") == netbox.items
+    finally:
+        paginator.close()
+
+    platforms = _inline_script("fetch_all_platforms_loki.yml", "/tmp/fetch_all_netbox_platforms.py", tmp_path)
+    result = _run(platforms, netbox.url, "token", "false", "monitor", "", "3")
+    assert [p["id"] for p in result["platforms"]] == [i["id"] for i in netbox.items]
@@ -29,8 +29,12 @@ from parallel_compare_engine import (
     compare_one_platform,
     compare_one_vfw,
     process_device_info,
+    iter_json_array,
+    resolve_plan_collisions,
     run_parallel_compare,
+    summarize_stage_timings,
     _find_matching_mapping_safe,
+    _plan_claim,
     _resolve_vfw_existing_host,
     zabbix_platform_technical_hostname,
     zabbix_vfw_technical_hostname,
@@ -502,6 +506,23 @@ class TestParallelErrorIsolation:
         assert "platforms" in data
         assert "vfws" in data
 
+    def test_jsonl_plan_store_holds_same_plans_as_files(self, tmp_path):
+        from plan_store import JsonlPlanStore
+
+        devices = [_make_device(device_id=i, name=f"srv{i}") for i in range(3)]
+        files_dir = tmp_path / "files"
+        run_parallel_compare(devices=devices, platforms=[], vfws=[], ctx=_make_ctx(),
+                             output_dir=str(files_dir), workers=3)
+        store_path = tmp_path / "plan_store.jsonl"
+        with JsonlPlanStore(str(store_path)) as store:
+            run_parallel_compare(devices=devices, platforms=[], vfws=[], ctx=_make_ctx(),
+                                 output_dir=str(tmp_path / "store"), workers=3, plan_store=store)
+        assert not list((tmp_path / "store").glob("device_plan_*.json"))
+        with JsonlPlanStore(str(store_path)) as store:
+            for i in range(3):
+                expected = json.loads((files_dir / f"device_plan_{i}.json").read_text(encoding="utf-8"))
+                assert store.get_plan("device", i) == expected
+
     def test_parallel_determinism(self, tmp_path):
         """Running 20 times on same input must yield identical plans."""
         device = _make_device(device_id=42)
@@ -514,6 +535,236 @@ class TestParallelErrorIsolation:
         assert len(set(results)) == 1, "All parallel results must be identical"
 
 
+class TestProcessExecutor:
+    def _run(self, out_dir, executor, **kwargs):
+        devices = [_make_device(device_id=i, name=f"srv{i}") for i in range(6)]
+        devices.append({"id": 77, "name": "switch77", "device_role_name": "Switch", "primary_ip_address": "10.0.9.9"})
+        return run_parallel_compare(
+            devices=devices,
+            platforms=[_make_platform(platform_id=2001), _make_platform(platform_id=2002, ip="")],
+            vfws=[_make_vfw(vfw_id=3001)],
+            ctx=_make_ctx(by_hostname={"srv2 - BMC": {"hostid": "42", "host": "srv2 - BMC"}}),
+            output_dir=str(out_dir),
+            workers=2,
+            executor=executor,
+            **kwargs,
+        )
+
+    @staticmethod
+    def _without_timings(summary):
+        """Summary minus wall-clock values; stage sample counts must still match."""
+        counts = {
+            entity_type: {stage: agg["count"] for stage, agg in stages.items()}
+            for entity_type, stages in summary["stage_timings"].items()
+        }
+        rest = {k: v for k, v in summary.items() if k not in ("stage_timings", "elapsed_seconds")}
+        return rest, counts
+
+    def test_process_mode_matches_thread_mode(self, tmp_path):
+        thread_summary = self._run(tmp_path / "thread", "thread")
+        process_summary = self._run(tmp_path / "process", "process", chunk_size=3)
+        assert self._without_timings(thread_summary) == self._without_timings(process_summary)
+        thread_files = sorted(p.name for p in (tmp_path / "thread").iterdir())
+        assert thread_files == sorted(p.name for p in (tmp_path / "process").iterdir())
+        for name in thread_files:
+            thread_path, process_path = tmp_path / "thread" / name, tmp_path / "process" / name
+            if name == "compare_summary.json":
+                assert self._without_timings(json.loads(thread_path.read_text())) == self._without_timings(
+                    json.loads(process_path.read_text())
+                )
+                continue
+            assert thread_path.read_bytes() == process_path.read_bytes()
+
+    def test_stage_timings_in_summary_and_jsonl(self, tmp_path):
+        timings_path = tmp_path / "timings.jsonl"
+        summary = self._run(tmp_path / "out", "thread", stage_timings_path=str(timings_path))
+        device = summary["stage_timings"]["device"]
+        assert device["item"]["count"] == 7
+        assert device["serialise"]["count"] == 7
+        assert device["mapping"]["count"] == 7
+        assert device["resolution"]["count"] == 7
+        # Platform 2002 has no IP and is skipped before the mapping lookup.
+        assert summary["stage_timings"]["platform"]["mapping"]["count"] == 1
+        for stage in ("mapping", "extraction", "resolution", "enrich", "serialise", "item"):
+            agg = device[stage]
+            assert set(agg) == {"count", "total_ms", "p50_ms", "p95_ms", "p99_ms"}
+            assert 0 <= agg["p50_ms"] <= agg["p95_ms"] <= agg["p99_ms"]
+        assert summary["stage_timings"]["platform"]["item"]["count"] == 2
+        assert summary["stage_timings"]["vfw"]["resolution"]["count"] == 1
+        assert summary["elapsed_seconds"] >= 0
+
+        lines = [json.loads(line) for line in timings_path.read_text().splitlines()]
+        assert len(lines) == 10
+        assert {line["type"] for line in lines} == {"device", "platform", "vfw"}
+        assert all("item_ms" in line and "serialise_ms" in line for line in lines)
+        # Private transport key never reaches the plan files.
+        assert "_stage_timings" not in json.loads((tmp_path / "out" / "device_plan_1.json").read_text())
+
+    def test_stage_timing_percentiles_are_nearest_rank(self):
+        samples = [i / 1000.0 for i in range(1, 21)]
+        agg = summarize_stage_timings({"device": {"item": samples[::-1]}})["device"]["item"]
+        assert (agg["count"], agg["p50_ms"], agg["p95_ms"], agg["p99_ms"]) == (20, 10.0, 19.0, 20.0)
+        single = summarize_stage_timings({"vfw": {"item": [0.005]}})["vfw"]["item"]
+        assert single["p50_ms"] == single["p99_ms"] == 5.0
+
+    def test_process_mode_isolates_item_errors(self, tmp_path):
+        bad_device = {"id": None, "name": None, "device_role_name": "Server", "manufacturer_name": "HPE"}
+        summary = run_parallel_compare(
+            devices=[_make_device(name="good_device", device_id=1), bad_device],
+            platforms=[],
+            vfws=[],
+            ctx=_make_ctx(),
+            output_dir=str(tmp_path),
+            workers=2,
+            executor="process",
+            chunk_size=2,
+        )
+        assert (tmp_path / "device_plan_1.json").exists()
+        assert summary["devices"]["create"] + summary["devices"]["skip"] + summary["devices"]["error"] == 2
+
+    def test_unknown_executor_rejected(self, tmp_path):
+        with pytest.raises(ValueError):
+            run_parallel_compare([], [], [], _make_ctx(), str(tmp_path), executor="gevent")
+
+
+class TestStreamingInput:
+    @pytest.mark.parametrize("block_size", [1, 3, 7, 64, 1 << 16])
+    def test_iter_json_array_matches_json_load(self, tmp_path, block_size):
+        data = [
+            _make_device(device_id=i, name=f"sürücü-{i}") for i in range(5)
+        ] + [12345, -1.5e3, "x, ]", None, True, [], {}, [1, [2, {"a": "]"}]]]
+        path = tmp_path / "items.json"
+        path.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding="utf-8")
+        assert list(iter_json_array(str(path), block_size=block_size)) == data
+
+    def test_iter_json_array_empty_inputs(self, tmp_path):
+        assert list(iter_json_array(None)) == []
+        assert list(iter_json_array(str(tmp_path / "missing.json"))) == []
+        for text in ("", "  \n", "null", "[]", " [ ] "):
+            path = tmp_path / "e.json"
+            path.write_text(text)
+            assert list(iter_json_array(str(path))) == []
+
+    def test_iter_json_array_rejects_non_arrays(self, tmp_path):
+        path = tmp_path / "bad.json"
+        for text in ('{"a": 1}', "[1, 2", "[1 2]"):
+            path.write_text(text)
+            with pytest.raises(ValueError):
+                list(iter_json_array(str(path), block_size=2))
+
+    @pytest.mark.parametrize("executor,window", [("thread", 3), ("process", 2)])
+    def test_in_flight_window_is_bounded(self, tmp_path, executor, window):
+        from plan_store import FilePlanStore
+
+        pulled = []
+        lag = []
+
+        def devices():
+            for i in range(40):
+                pulled.append(i)
+                yield _make_device(device_id=i, name=f"srv{i}")
+
+        class CountingStore(FilePlanStore):
+            written = 0
+
+            def put_plan(self, entity_type, item_id, plan):
+                CountingStore.written += 1
+                lag.append(len(pulled) - CountingStore.written)
+                super().put_plan(entity_type, item_id, plan)
+
+        summary = run_parallel_compare(
+            devices(), iter(()), None, _make_ctx(), str(tmp_path),
+            workers=2, executor=executor, chunk_size=2, max_in_flight=window,
+            plan_store=CountingStore(str(tmp_path)), collision_check=False,
+        )
+        assert summary["devices"]["total"] == 40
+        assert summary["platforms"]["total"] == 0
+        assert CountingStore.written == 40
+        # Thread: window items; process: window chunks of chunk_size items.
+        assert max(lag) <= window * (2 if executor == "process" else 1)
+
+
+class TestCollisionAnalysis:
+    def _run(self, tmp_path, devices, **ctx_overrides):
+        return run_parallel_compare(
+            devices=devices,
+            platforms=[],
+            vfws=[],
+            ctx=_make_ctx(payload_build_enabled=False, **ctx_overrides),
+            output_dir=str(tmp_path),
+            workers=4,
+        )
+
+    def _plan(self, tmp_path, device_id):
+        return json.loads((tmp_path / f"device_plan_{device_id}.json").read_text())
+
+    def test_same_name_in_one_run_keeps_lowest_id(self, tmp_path):
+        devices = [_make_device(device_id=i, name="dup-srv", ip=f"10.0.0.{i}") for i in (12, 3, 7)]
+        summary = self._run(tmp_path, devices)
+        assert summary["devices"]["create"] == 1
+        assert summary["devices"]["skip"] == 2
+        assert summary["collisions"]["skipped"] == 2
+        assert self._plan(tmp_path, 3)["action"] == "create"
+        for loser in (7, 12):
+            plan = self._plan(tmp_path, loser)
+            assert plan["action"] == "skip"
+            assert "create_payload" not in plan
+            result = plan["current_device_result"]
+            assert result["status"] == "eklenemedi"
+            assert "device:3" in result["reason"]
+
+    def test_create_loses_to_update_targeting_same_name(self, tmp_path):
+        existing = {"hostid": "900", "host": "old-name", "name": "old-name"}
+        devices = [
+            _make_device(device_id=1, name="srv-a"),
+            _make_device(device_id=50, name="srv-a", ip="10.0.0.50"),
+        ]
+        # Device 50 already exists in Zabbix (by Loki_ID) and will be renamed to srv-a - BMC.
+        summary = self._run(tmp_path, devices, by_loki={"50": existing})
+        assert summary["devices"]["update"] == 1
+        assert summary["devices"]["skip"] == 1
+        assert self._plan(tmp_path, 1)["action"] == "skip"
+        assert self._plan(tmp_path, 50)["action"] == "update"
+
+    def test_collision_check_can_be_disabled(self, tmp_path):
+        devices = [_make_device(device_id=i, name="dup-srv") for i in (1, 2)]
+        summary = run_parallel_compare(
+            devices, [], [], _make_ctx(payload_build_enabled=False), str(tmp_path), collision_check=False
+        )
+        assert summary["devices"]["create"] == 2
+        assert "collisions" not in summary
+
+    def test_existing_host_adopted_or_skipped(self, tmp_path):
+        from plan_store import FilePlanStore
+
+        store = FilePlanStore(str(tmp_path))
+        free = {"hostid": "501", "host": "a - BMC", "name": "a - BMC", "tags": []}
+        foreign = {"hostid": "502", "host": "b - BMC", "name": "b - BMC", "tags": [{"tag": "Loki_ID", "value": "999"}]}
+        discovered = {"hostid": "503", "host": "c - BMC", "name": "c - BMC", "flags": "4"}
+        ctx = _make_ctx(
+            payload_build_enabled=False,
+            by_hostname={"a - BMC": free, "b - BMC": foreign, "c - BMC": discovered},
+        )
+        claims = []
+        for device_id, name in ((1, "a"), (2, "b"), (3, "c"), (4, "a")):
+            plan = compare_one_device(_make_device(device_id=device_id, name=name), _make_ctx())
+            store.put_plan("device", device_id, plan)
+            claims.append(_plan_claim("device", device_id, name, plan))
+
+        changes = resolve_plan_collisions(claims, ctx, store, None)
+        by_id = {c["id"]: c for c in changes}
+        assert by_id["1"]["resolution"] == "update" and by_id["1"]["hostid"] == "501"
+        adopted = store.get_plan("device", 1)
+        assert adopted["action"] == "update"
+        assert adopted["zbx_existing_host"]["hostid"] == "501"
+        assert adopted["collision_resolved"] == "existing_host"
+        assert "Loki_ID 999" in by_id["2"]["reason"]
+        assert "network-discovered" in by_id["3"]["reason"]
+        # Device 4 wants the same host device 1 already adopted.
+        assert "already planned for device:1" in by_id["4"]["reason"]
+        assert [store.get_plan("device", i)["action"] for i in (2, 3, 4)] == ["skip"] * 3
+
+
 # ---------------------------------------------------------------------------
 # Filter / hostname helper tests
 # ---------------------------------------------------------------------------
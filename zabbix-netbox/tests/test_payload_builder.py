@@ -24,11 +24,16 @@ _MODULE_UTILS = os.path.join(
 sys.path.insert(0, os.path.abspath(_FILES_DIR))
 sys.path.insert(0, os.path.abspath(_MODULE_UTILS))
 
+import zabbix_payload_builder  # noqa: E402
 from zabbix_payload_builder import (  # noqa: E402
     ZabbixPayloadBuilder,
     build_proxy_group_config,
     _extract_dc_code,
     _is_discovered_host,
+    discover_re_enrich_pairs,
+    load_re_enrich_manifest,
+    re_enrich_batch,
+    re_enrich_plan,
 )
 
 TEMPLATE_TYPE_MAP = {
@@ -760,3 +765,199 @@ def test_vfw_update_preserves_manual_visible_name():
     assert enriched["field_merge_actions"].get("visible_name") == "preserved_manual"
 
 
+
+
+def _create_plan(ip: str, dc_id: str, hostname: str) -> dict:
+    return {
+        "action": "create",
+        "zbx_record": {
+            "DEVICE_TYPE": "Generic SNMP",
+            "DEVICE_ROLE": "Switch",
+            "HOST_IP": ip,
+            "HOSTNAME": hostname,
+            "HOST_VISIBLE_NAME": hostname,
+            "DC_ID": dc_id,
+            "HOST_GROUPS": "Network",
+            "MACROS": json.dumps({"Location": dc_id}),
+        },
+        "zbx_existing_host": {},
+    }
+
+
+def test_device_type_resolution_is_memoised_and_matches_fresh_builders():
+    shared = ZabbixPayloadBuilder(BASE_CTX)
+    plans = [
+        _create_plan("10.0.0.1", "DC14", "sw-01"),
+        _create_plan("10.0.0.2", "DC14-Rack2", "sw-02"),
+        _create_plan("10.0.0.3", "DC99", "sw-03"),
+    ]
+    for plan in plans:
+        fresh = ZabbixPayloadBuilder(BASE_CTX).enrich_plan(json.loads(json.dumps(plan)))
+        assert shared.enrich_plan(json.loads(json.dumps(plan))) == fresh
+
+    assert list(shared._device_type_cache) == ["Generic SNMP"]
+    assert sorted(shared._proxy_cache) == [("Generic SNMP", "DC14"), ("Generic SNMP", "DC99")]
+    payloads = [shared.enrich_plan(json.loads(json.dumps(p)))["create_payload"] for p in plans[:2]]
+    assert payloads[0]["macros"] == [{"macro": "{$SNMP_COMMUNITY}", "value": "10.0.0.1"}]
+    payloads[0]["templates"][0]["templateid"] = "mutated"
+    assert shared.resolve_device_type("Generic SNMP")["template_ids"] == [{"templateid": "10001"}]
+    assert payloads[1]["templates"] == [{"templateid": "10001"}]
+
+
+def test_re_enrich_plan_reuses_builder():
+    builder = ZabbixPayloadBuilder(BASE_CTX)
+    existing = {
+        "hostid": "50001",
+        "host": "sw-01",
+        "monitored_by": "2",
+        "proxy_groupid": "45",
+        "interfaces": [{"interfaceid": "60001", "type": "2", "ip": "10.0.0.1"}],
+        "groups": [{"name": "Network"}, {"name": "Generic SNMP"}],
+        "tags": [{"tag": "Location", "value": "DC14"}],
+    }
+    plan = _create_plan("10.0.0.1", "DC14", "sw-01")
+    shared = re_enrich_plan(plan, BASE_CTX, existing, builder)
+    assert shared == re_enrich_plan(plan, BASE_CTX, existing)
+    assert shared["action"] == "update" and shared["needs_update"] is False
+    assert "Generic SNMP" in builder._device_type_cache
+
+
+def test_re_enrich_batch_dir_and_manifest(tmp_path):
+    existing = {
+        "hostid": "50001",
+        "host": "sw-01",
+        "monitored_by": "2",
+        "proxy_groupid": "45",
+        "interfaces": [{"interfaceid": "60001", "type": "2", "ip": "10.0.0.1"}],
+        "groups": [{"name": "Network"}, {"name": "Generic SNMP"}],
+        "tags": [{"tag": "Location", "value": "DC14"}],
+    }
+    plans = {n: _create_plan(f"10.0.0.{n}", "DC14", f"sw-0{n}") for n in (1, 2, 3)}
+    for n, plan in plans.items():
+        (tmp_path / f"vfw_plan_{n}.json").write_text(json.dumps(plan))
+        (tmp_path / f"vfw_dup_host_{n}.json").write_text(json.dumps(dict(existing, hostid=f"5000{n}")))
+    (tmp_path / "vfw_plan_9.json").write_text(json.dumps(plans[1]))  # no duplicate host: not picked up
+
+    pairs = discover_re_enrich_pairs(str(tmp_path))
+    assert [os.path.basename(p["plan"]) for p in pairs] == ["vfw_plan_1.json", "vfw_plan_2.json", "vfw_plan_3.json"]
+    records = re_enrich_batch(pairs, BASE_CTX, workers=3)
+    assert [r["hostid"] for r in records] == ["50001", "50002", "50003"]
+    assert not any(r.get("error") for r in records)
+    for n, plan in plans.items():
+        written = json.loads((tmp_path / f"vfw_plan_{n}.json").read_text())
+        assert written == re_enrich_plan(plan, BASE_CTX, dict(existing, hostid=f"5000{n}"))
+        assert written["action"] == "update"
+
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps([
+        {"plan": str(tmp_path / "vfw_plan_9.json"), "existing_host": str(tmp_path / "vfw_dup_host_1.json"),
+         "output": str(tmp_path / "out_9.json")},
+        {"plan": str(tmp_path / "missing.json"), "existing_host": str(tmp_path / "vfw_dup_host_1.json")},
+    ]))
+    records = re_enrich_batch(load_re_enrich_manifest(str(manifest)), BASE_CTX, workers=2)
+    assert json.loads((tmp_path / "out_9.json").read_text())["zbx_existing_host"]["hostid"] == "50001"
+    assert json.loads((tmp_path / "vfw_plan_9.json").read_text())["action"] == "create"
+    assert "error" not in records[0] and records[1]["error"].startswith("FileNotFoundError")
+
+    manifest.write_text(json.dumps([{"plan": "x.json"}]))
+    with pytest.raises(ValueError):
+        load_re_enrich_manifest(str(manifest))
+
+
+def test_re_enrich_batch_process_pool_matches_serial(tmp_path, monkeypatch):
+    existing = {"hostid": "50001", "host": "sw-01", "interfaces": [], "groups": [], "tags": []}
+    pairs = []
+    for n in range(1, 7):
+        (tmp_path / f"vfw_plan_{n}.json").write_text(json.dumps(_create_plan(f"10.0.0.{n}", "DC14", f"sw-0{n}")))
+        (tmp_path / f"vfw_dup_host_{n}.json").write_text(json.dumps(dict(existing, hostid=f"5000{n}")))
+        pairs.append({"plan": str(tmp_path / f"vfw_plan_{n}.json"),
+                      "existing_host": str(tmp_path / f"vfw_dup_host_{n}.json"),
+                      "output": str(tmp_path / f"serial_{n}.json")})
+    serial = re_enrich_batch(pairs, BASE_CTX, workers=1)
+
+    monkeypatch.setattr(zabbix_payload_builder.os, "cpu_count", lambda: 3)
+    pooled_pairs = [dict(p, output=p["output"].replace("serial_", "pooled_")) for p in pairs]
+    pooled = re_enrich_batch(pooled_pairs, BASE_CTX, workers=8)
+    assert [r["hostid"] for r in pooled] == [r["hostid"] for r in serial]
+    for n in range(1, 7):
+        assert (tmp_path / f"pooled_{n}.json").read_text() == (tmp_path / f"serial_{n}.json").read_text()
+
+
+def test_proxy_group_indexes_keep_first_match_semantics():
+    ctx = dict(BASE_CTX)
+    ctx["proxy_group_config"] = [
+        {"name": "DC14-Proxy A", "proxy_groupid": "45", "dc_pattern": "DC14"},
+        {"name": "DC14-Proxy B", "proxy_groupid": "46", "dc_pattern": "dc14"},
+        {"name": "Static Group", "proxy_groupid": "77", "dc_pattern": ""},
+    ]
+    builder = ZabbixPayloadBuilder(ctx)
+    assert builder.resolve_proxy({"DC_ID": "DC14"}, []) == ("2", "45", "DC14-Proxy A")
+    assert builder.resolve_proxy({"DC_ID": "DC15"}, []) == ("0", "", "")
+    rows = [{"proxy_group_by_dc": {"dc14": "Static Group"}}]
+    assert builder.resolve_proxy({"DC_ID": "DC14"}, rows) == ("2", "77", "Static Group")
+
+
+def test_managed_tag_keys_are_frozen_once_per_role():
+    ctx = dict(BASE_CTX, vfw_managed_tag_keys=["Firewall_Name"])
+    builder = ZabbixPayloadBuilder(ctx)
+    vfw = builder.managed_tag_keys("virtual_fw")
+    assert vfw == frozenset({"Location", "Firewall_Name"})
+    assert builder.managed_tag_keys("VIRTUAL_FW") is vfw
+    assert builder.managed_tag_keys("Switch") == frozenset({"Location"})
+
+
+def _minimal_update_plan(location: str, host_groups: str, existing_groups: list) -> dict:
+    return {
+        "action": "update",
+        "device_id": "1",
+        "zbx_record": {
+            "DEVICE_TYPE": "Generic SNMP",
+            "DEVICE_ROLE": "Switch",
+            "HOST_IP": "10.0.0.1",
+            "HOSTNAME": "switch-01",
+            "HOST_VISIBLE_NAME": "switch-01",
+            "DC_ID": "DC14",
+            "HOST_GROUPS": host_groups,
+            "MACROS": json.dumps({"Location": location}),
+        },
+        "zbx_existing_host": {
+            "hostid": "50001",
+            "host": "switch-01",
+            "monitored_by": "2",
+            "proxy_groupid": "45",
+            "interfaces": [{"interfaceid": "60001", "type": "2", "ip": "10.0.0.1"}],
+            "groups": existing_groups,
+            "tags": [{"tag": "Manual", "value": "keep"}, {"tag": "Location", "value": "DC14"}],
+        },
+    }
+
+
+def test_minimal_update_payload_sends_only_changed_components():
+    existing_groups = [{"groupid": "20002", "name": "Generic SNMP"}, {"groupid": "20001", "name": "Network"}]
+    plan = _minimal_update_plan("DC15", "Network", existing_groups)
+    full = ZabbixPayloadBuilder(BASE_CTX).enrich_plan(json.loads(json.dumps(plan)))
+    assert set(full["update_payload"]) == {"hostid", "host", "monitored_by", "proxy_groupid", "tags"}
+
+    minimal = ZabbixPayloadBuilder(dict(BASE_CTX, minimal_update_payload=True)).enrich_plan(plan)
+    assert minimal["needs_update"] is True
+    assert minimal["update_payload"] == {
+        "hostid": "50001",
+        "tags": [{"tag": "Manual", "value": "keep"}, {"tag": "Location", "value": "DC15"}],
+    }
+    assert minimal["update_payload_omitted"] == ["host", "monitored_by", "proxy_groupid"]
+    assert minimal["expected_proxy_group_id"] == "45"
+
+
+def test_minimal_update_payload_skips_update_without_effective_delta():
+    # "Unknown" is required but has no group id, so merge_host_groups flags a change
+    # that would resend the same group ids in a different order.
+    existing_groups = [{"groupid": "20002", "name": "Generic SNMP"}, {"groupid": "20001", "name": "Network"}]
+    plan = _minimal_update_plan("DC14", "Network,Unknown", existing_groups)
+    full = ZabbixPayloadBuilder(BASE_CTX).enrich_plan(json.loads(json.dumps(plan)))
+    assert full["needs_update"] is True and "groups" in full["update_payload"]
+
+    minimal = ZabbixPayloadBuilder(dict(BASE_CTX, minimal_update_payload=True)).enrich_plan(plan)
+    assert minimal["needs_update"] is False
+    assert minimal["update_payload"] is None
+    assert minimal["update_skipped"] == "no_effective_delta"
+    assert minimal["current_device_result"]["status"] == "güncel"
@@ -0,0 +1,101 @@
+"""Unit tests for plan_store.py (Phase A / Phase B plan and result hand-off)."""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+_FILES_DIR = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "playbooks",
+    "roles",
+    "netbox_zabbix_sync",
+    "files",
+)
+sys.path.insert(0, os.path.abspath(_FILES_DIR))
+
+from plan_store import FilePlanStore, JsonlPlanStore, open_plan_store  # noqa: E402
+
+
+def test_jsonl_random_access_by_entity_type_and_id(tmp_path):
+    with JsonlPlanStore(str(tmp_path / "s.jsonl")) as store:
+        for i in range(50):
+            store.put_plan("device", i, {"action": "create", "n": i})
+        store.put_plan("vfw", 7, {"action": "skip"})
+        store.put_result("device", 3, {"hostname": "h3", "status": "eklendi"})
+        assert store.get_plan("device", 42) == {"action": "create", "n": 42}
+        assert store.get_plan("device", "42") == {"action": "create", "n": 42}
+        assert store.get_plan("vfw", 7) == {"action": "skip"}
+        assert store.get_plan("platform", 7) is None
+        assert store.get_result("device", 3)["status"] == "eklendi"
+        assert store.get_result("device", 4) is None
+
+
+def test_jsonl_rewrite_returns_newest_copy(tmp_path):
+    path = tmp_path / "s.jsonl"
+    with JsonlPlanStore(str(path)) as store:
+        store.put_plan("vfw", 1, {"action": "create"})
+        store.put_plan("vfw", 1, {"action": "update", "zbx_scenario": "update"})
+        assert store.get_plan("vfw", 1)["action"] == "update"
+        assert store.plan_ids("vfw") == ["1"]
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 2
+
+
+def test_jsonl_reopen_uses_saved_index_and_rebuilds_stale_one(tmp_path):
+    path = tmp_path / "s.jsonl"
+    with JsonlPlanStore(str(path)) as store:
+        store.put_plan("device", 1, {"a": 1})
+    saved = json.loads((tmp_path / "s.jsonl.idx").read_text(encoding="utf-8"))
+    assert saved["size"] == path.stat().st_size
+
+    # A writer that died before saving its index leaves a stale .idx and a torn last line.
+    with open(path, "ab") as f:
+        f.write(b'{"kind": "plan", "type": "device", "id": "2", "data": {"a": 2}}\n{"kind": "pl')
+    with JsonlPlanStore(str(path)) as store:
+        assert store.get_plan("device", 1) == {"a": 1}
+        assert store.get_plan("device", 2) == {"a": 2}
+
+
+def test_truncate_starts_a_fresh_store(tmp_path):
+    path = str(tmp_path / "s.jsonl")
+    with JsonlPlanStore(path) as store:
+        store.put_plan("device", 1, {"a": 1})
+    with JsonlPlanStore(path, truncate=True) as store:
+        assert store.get_plan("device", 1) is None
+
+
+def test_files_backend_keeps_per_item_layout(tmp_path):
+    store = open_plan_store("files", str(tmp_path))
+    assert isinstance(store, FilePlanStore)
+    store.put_plan("platform", 9, {"action": "skip"})
+    store.put_result("platform", 9, {"hostname": "p9"})
+    assert json.loads((tmp_path / "platform_plan_9.json").read_text()) == {"action": "skip"}
+    assert (tmp_path / "zabbix_platform_operation_result_9.json").exists()
+    assert list(store.iter_results("platform")) == [("9", {"hostname": "p9"})]
+
+
+def test_unknown_backend_and_entity_type_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        open_plan_store("sqlite", str(tmp_path / "x"))
+    with JsonlPlanStore(str(tmp_path / "s.jsonl")) as store:
+        with pytest.raises(ValueError):
+            store.put_plan("router", 1, {})
+
+
+def test_results_cli_exports_one_entity_type(tmp_path):
+    path = str(tmp_path / "s.jsonl")
+    with JsonlPlanStore(path) as store:
+        store.put_result("device", 1, {"hostname": "a"})
+        store.put_result("device", 2, {"hostname": "b"})
+        store.put_result("device", 1, {"hostname": "a2"})
+        store.put_result("vfw", 5, {"hostname": "v"})
+    out = tmp_path / "device_results.json"
+    subprocess.run(
+        [sys.executable, os.path.join(_FILES_DIR, "plan_store.py"), "--backend", "jsonl", "--location", path,
+         "results", "--entity-type", "device", "--output", str(out)],
+        check=True,
+        capture_output=True,
+    )
+    assert json.loads(out.read_text(encoding="utf-8")) == [{"hostname": "b"}, {"hostname": "a2"}]
@@ -12,6 +12,8 @@ sys.path.insert(0, str(ROLE_LIB))
 from zabbix_merge_helpers import (  # noqa: E402
     is_managed_tag,
     load_managed_tag_keys,
+    managed_key_set,
+    merge_macros,
     merge_tags,
 )
 
@@ -198,3 +200,18 @@ def test_merge_tags_filters_unmanaged_from_new_tags():
     assert tags["Vendor"] == "Fortinet"
     assert tags["Custom_Manual"] == "keep"
     assert tags["Loki_ID"] == "VFW_1"
+
+
+def test_frozen_managed_key_set_matches_list_semantics():
+    keys = ["Manufacturer", "Loki_ID"]
+    frozen = managed_key_set(keys)
+    assert managed_key_set(frozen) is frozen
+    assert managed_key_set(None) == frozenset()
+    existing = [{"tag": f"Manual_{i}", "value": str(i)} for i in range(50)]
+    existing.append({"tag": "Manufacturer", "value": "OLD"})
+    new_managed = [{"tag": "Manufacturer", "value": "CISCO"}, {"tag": "Loki_Tag_x", "value": "1"}]
+    assert merge_tags(existing, new_managed, frozen) == merge_tags(existing, new_managed, keys)
+    macros = [{"macro": "{$A}", "value": "1"}, {"macro": "{$MANUAL}", "value": "m"}]
+    assert merge_macros(macros, [{"macro": "{$A}", "value": "2"}], frozenset({"{$A}"})) == merge_macros(
+        macros, [{"macro": "{$A}", "value": "2"}], ["{$A}"]
+    )
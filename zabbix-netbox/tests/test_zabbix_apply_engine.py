@@ -0,0 +1,356 @@
+"""Unit tests for zabbix_apply_engine.py (Python Phase B apply)."""
+import json
+import os
+import sys
+import threading
+
+_FILES_DIR = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "playbooks",
+    "roles",
+    "netbox_zabbix_sync",
+    "files",
+)
+_MODULE_UTILS = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "playbooks",
+    "roles",
+    "netbox_zabbix_sync",
+    "module_utils",
+)
+sys.path.insert(0, os.path.abspath(_FILES_DIR))
+sys.path.insert(0, os.path.abspath(_MODULE_UTILS))
+
+from zabbix_apply_engine import ApplyEngine, coalesce_updates  # noqa: E402
+from zabbix_jsonrpc import ZabbixJsonRpcClient  # noqa: E402
+
+TEMPLATE_TYPE_MAP = {"snmpv2": {"interface": {"type": 2, "port": 161, "useip": 1, "dns": ""}}}
+TEMPLATES_MAP = {"Fortinet VFW": [{"name": "BLT - Fortinet FW", "snmpv2": True, "host_groups": ["Virtual Firewalls"]}]}
+BUILDER_CTX = {
+    "templates_map": TEMPLATES_MAP,
+    "template_type_map": TEMPLATE_TYPE_MAP,
+    "template_id_cache": {"BLT - Fortinet FW": "10001"},
+    "group_id_cache": {"Virtual Firewalls": "20001", "Fortinet VFW": "20002"},
+    "proxy_group_config": [],
+    "tags_config": {},
+    "platform_managed_tag_keys": [],
+    "vfw_managed_tag_keys": ["Loki_ID"],
+    "hmdl_baseline_map": {},
+}
+
+
+class FakeClient:
+    """Records calls; answers from a {(method, host_or_hostid): response} table."""
+
+    def __init__(self, responses=None):
+        self.responses = responses or {}
+        self.calls = []
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def call(self, method, params, request_id=None):
+        with self._lock:
+            self.calls.append((method, params))
+        key = (method, params.get("host") or params.get("hostid"))
+        return self.responses.get(key, {"jsonrpc": "2.0", "result": {"hostids": ["1"]}, "id": request_id})
+
+    def call_batch(self, calls):
+        with self._lock:
+            self.batches.append([method for method, _ in calls])
+        return [self.call(method, params) for method, params in calls]
+
+
+def _record(hostname, ip="10.0.0.1", role="Switch"):
+    return {
+        "DEVICE_TYPE": "Fortinet VFW",
+        "DEVICE_ROLE": role,
+        "HOST_IP": ip,
+        "HOSTNAME": hostname,
+        "HOST_VISIBLE_NAME": hostname,
+        "DC_ID": "",
+        "HOST_GROUPS": "",
+        "MACROS": json.dumps({"Loki_ID": "VFW_5"}),
+        "REPORT_LOCATION": "",
+        "REPORT_SITE": "DC14",
+        "REPORT_TENANT": "",
+        "REPORT_OWNERSHIP": "",
+    }
+
+
+def _write_plan(tmp_path, name, plan):
+    (tmp_path / name).write_text(json.dumps(plan), encoding="utf-8")
+
+
+def _engine(tmp_path, client, host_maps=None, dry_run=False):
+    return ApplyEngine(
+        client,
+        BUILDER_CTX,
+        host_maps or {},
+        plans_dir=str(tmp_path),
+        results_dir=str(tmp_path),
+        dry_run=dry_run,
+    )
+
+
+def test_device_create_success_writes_result_file(tmp_path):
+    _write_plan(tmp_path, "device_plan_1.json", {
+        "action": "create",
+        "zbx_scenario": "create",
+        "zbx_record": _record("sw-01"),
+        "create_payload": {"host": "sw-01"},
+    })
+    client = FakeClient()
+    summary = _engine(tmp_path, client).run([("device", {"id": 1, "name": "sw-01"})], concurrency=2)
+    result = json.loads((tmp_path / "zabbix_host_operation_result_1.json").read_text(encoding="utf-8"))
+    assert client.calls == [("host.create", {"host": "sw-01"})]
+    assert result["status"] == "eklendi"
+    assert result["location"] == "N/A"  # default('N/A', true) on empty REPORT_LOCATION
+    assert summary["devices"]["eklendi"] == 1
+
+
+def test_device_update_failure_uses_error_data_as_reason(tmp_path):
+    _write_plan(tmp_path, "device_plan_2.json", {
+        "action": "update",
+        "zbx_scenario": "update",
+        "needs_update": True,
+        "update_reasons": ["groups_changed"],
+        "zbx_record": _record("sw-02"),
+        "update_payload": {"hostid": "77"},
+    })
+    client = FakeClient({
+        ("host.update", "77"): {"error": {"code": -32602, "message": "Invalid params.", "data": "No permissions."}},
+    })
+    _engine(tmp_path, client).run([("device", {"id": 2})])
+    result = json.loads((tmp_path / "zabbix_host_operation_result_2.json").read_text(encoding="utf-8"))
+    assert result["status"] == "eklenemedi"
+    assert result["reason"] == "No permissions."
+    assert result["update_reasons"] == ["groups_changed"]
+
+
+def test_skip_and_up_to_date_plans_make_no_api_calls(tmp_path):
+    _write_plan(tmp_path, "platform_plan_3.json", {
+        "action": "skip",
+        "current_platform_result": {"hostname": "p3", "status": "eklenemedi", "reason": "x"},
+    })
+    _write_plan(tmp_path, "vfw_plan_4.json", {
+        "action": "update",
+        "needs_update": False,
+        "zbx_record": _record("fw4"),
+        "current_vfw_result": {"hostname": "fw4", "status": "güncel"},
+    })
+    client = FakeClient()
+    _engine(tmp_path, client).run([("platform", {"id": 3}), ("vfw", {"id": 4})])
+    assert client.calls == []
+    assert json.loads((tmp_path / "zabbix_platform_operation_result_3.json").read_text())["reason"] == "x"
+    assert json.loads((tmp_path / "zabbix_vfw_operation_result_4.json").read_text())["status"] == "güncel"
+
+
+def test_missing_plan_records_non_fatal_result(tmp_path):
+    client = FakeClient()
+    _engine(tmp_path, client).run([("platform", {"id": 9, "name": "Lost"})])
+    result = json.loads((tmp_path / "zabbix_platform_operation_result_9.json").read_text(encoding="utf-8"))
+    assert result["status"] == "eklenemedi"
+    assert "Phase A plan missing" in result["reason"]
+
+
+def test_dry_run_records_planned_operation_without_calls(tmp_path):
+    _write_plan(tmp_path, "vfw_plan_5.json", {
+        "action": "create",
+        "zbx_record": _record("fw5", role="VIRTUAL_FW"),
+        "create_payload": {"host": "fw5"},
+    })
+    client = FakeClient()
+    _engine(tmp_path, client, dry_run=True).run([("vfw", {"id": 5})])
+    result = json.loads((tmp_path / "zabbix_vfw_operation_result_5.json").read_text(encoding="utf-8"))
+    assert client.calls == []
+    assert result["status"] == "dry_run"
+    assert result["device_role"] == "VIRTUAL_FW"
+
+
+def test_vfw_duplicate_create_recovers_in_process(tmp_path):
+    plan = {
+        "action": "create",
+        "vfw_id": "5",
+        "zbx_scenario": "create",
+        "zbx_record": _record("fw5_VFW_5", role="VIRTUAL_FW"),
+        "zbx_existing_host": {},
+        "create_payload": {"host": "fw5_VFW_5", "tags": [{"tag": "Loki_ID", "value": "VFW_5"}]},
+    }
+    _write_plan(tmp_path, "vfw_plan_5.json", plan)
+    existing = {
+        "hostid": "901",
+        "host": "fw5_VFW_5",
+        "name": "fw5_VFW_5",
+        "interfaces": [{"interfaceid": "1", "ip": "10.9.9.9", "type": "2"}],
+        "tags": [],
+        "groups": [],
+        "monitored_by": "0",
+    }
+    client = FakeClient({
+        ("host.create", "fw5_VFW_5"): {"error": {"code": -32602, "message": "Invalid params.",
+                                                 "data": 'Host with the same name "fw5_VFW_5" already exists.'}},
+    })
+    summary = _engine(tmp_path, client, host_maps={"by_loki": {"VFW_5": existing}}).run([("vfw", {"id": 5})])
+    assert [c[0] for c in client.calls] == ["host.create", "host.update"]
+    assert client.calls[1][1]["hostid"] == "901"
+    result = json.loads((tmp_path / "zabbix_vfw_operation_result_5.json").read_text(encoding="utf-8"))
+    assert result["status"] == "güncellendi"
+    assert result["reason"] == "Duplicate create recovered via host.update"
+    rewritten = json.loads((tmp_path / "vfw_plan_5.json").read_text(encoding="utf-8"))
+    assert rewritten["action"] == "update"
+    assert summary["vfws"]["güncellendi"] == 1
+
+
+def test_apply_log_has_one_line_per_item(tmp_path):
+    for i in range(5):
+        _write_plan(tmp_path, f"device_plan_{i}.json", {
+            "action": "create",
+            "zbx_record": _record(f"sw-{i}"),
+            "create_payload": {"host": f"sw-{i}"},
+        })
+    log_path = tmp_path / "apply_results.jsonl"
+    _engine(tmp_path, FakeClient()).run(
+        [("device", {"id": i}) for i in range(5)], concurrency=3, log_path=str(log_path)
+    )
+    lines = [json.loads(line) for line in log_path.read_text(encoding="utf-8").splitlines()]
+    assert sorted(line["id"] for line in lines) == ["0", "1", "2", "3", "4"]
+    assert all(line["response_payload"]["result"]["hostids"] == ["1"] for line in lines)
+
+
+def test_batch_mode_packs_writes_and_isolates_element_errors(tmp_path):
+    for i in range(5):
+        _write_plan(tmp_path, f"device_plan_{i}.json", {
+            "action": "create",
+            "zbx_record": _record(f"sw-{i}"),
+            "create_payload": {"host": f"sw-{i}"},
+        })
+    _write_plan(tmp_path, "device_plan_9.json", {"action": "skip", "current_device_result": {"hostname": "sw-9"}})
+    client = FakeClient({
+        ("host.create", "sw-3"): {"error": {"code": -32602, "message": "Invalid params.", "data": "Bad group."}},
+    })
+    summary = _engine(tmp_path, client).run(
+        [("device", {"id": i}) for i in (0, 1, 2, 3, 4, 9)], concurrency=2, batch_size=2
+    )
+    assert sorted(len(b) for b in client.batches) == [1, 2, 2]
+    assert summary["devices"] == {"total": 6, "eklendi": 4, "eklenemedi": 1, "none": 1}
+    failed = json.loads((tmp_path / "zabbix_host_operation_result_3.json").read_text(encoding="utf-8"))
+    assert failed["reason"] == "Bad group."
+
+
+def _update_plan(hostid, new_groups, proxy_groupid=5, tags=None):
+    existing = {
+        "hostid": hostid,
+        "host": f"sw-{hostid}",
+        "monitored_by": "2",
+        "proxy_groupid": "5",
+        "groups": [{"groupid": "10", "name": "Manual"}],
+    }
+    payload = {
+        "hostid": hostid,
+        "host": f"sw-{hostid}",
+        "monitored_by": 2,
+        "proxy_groupid": proxy_groupid,
+        "groups": [{"groupid": g} for g in ["10"] + new_groups],
+    }
+    if tags is not None:
+        payload["tags"] = tags
+    return {
+        "action": "update",
+        "needs_update": True,
+        "zbx_record": _record(f"sw-{hostid}"),
+        "zbx_existing_host": existing,
+        "update_payload": payload,
+    }
+
+
+def test_coalesce_updates_groups_shared_deltas():
+    plans = [
+        _update_plan("1", ["20"], proxy_groupid=7),
+        _update_plan("2", ["20"], proxy_groupid=7, tags=[{"tag": "Loki_ID", "value": "2"}]),
+        _update_plan("3", ["30"]),
+    ]
+    calls, residuals = coalesce_updates(plans)
+    assert sorted((method, members) for method, _, members in calls) == [
+        ("host.massadd", [0, 1]),
+        ("host.massupdate", [0, 1]),
+    ]
+    massadd = next(params for method, params, _ in calls if method == "host.massadd")
+    assert massadd["groups"] == [{"groupid": "20"}]
+    assert residuals[0] is None
+    assert residuals[1] == {"hostid": "2", "tags": [{"tag": "Loki_ID", "value": "2"}]}
+    # Below min_group_size the delta stays on the host's own host.update.
+    assert residuals[2]["groups"] == plans[2]["update_payload"]["groups"]
+
+
+def test_coalesced_run_skips_host_update_when_mass_calls_cover_delta(tmp_path):
+    for hostid in ("1", "2"):
+        _write_plan(tmp_path, f"device_plan_{hostid}.json", _update_plan(hostid, ["20"]))
+    _write_plan(tmp_path, "device_plan_3.json", _update_plan("3", ["20"], tags=[{"tag": "a", "value": "b"}]))
+    client = FakeClient()
+    summary = _engine(tmp_path, client).run(
+        [("device", {"id": i}) for i in (1, 2, 3)], coalesce=True
+    )
+    assert [c[0] for c in client.calls].count("host.massadd") == 1
+    assert [c for c in client.calls if c[0] == "host.update"] == [
+        ("host.update", {"hostid": "3", "tags": [{"tag": "a", "value": "b"}]})
+    ]
+    assert summary["devices"]["güncellendi"] == 3
+
+
+class _FakeResponse:
+    def __init__(self, payload):
+        self._payload = payload
+        self.status_code = 200
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return self._payload
+
+
+class _EchoBatchSession:
+    """Answers a batch array out of order and drops one element."""
+
+    def __init__(self):
+        self.headers = {}
+
+    def post(self, url, json=None, timeout=None, verify=None):
+        replies = []
+        for body in reversed(json):
+            if body["params"].get("host") == "drop":
+                continue
+            replies.append({"jsonrpc": "2.0", "result": {"hostids": [body["params"]["host"]]}, "id": body["id"]})
+        return _FakeResponse(replies)
+
+
+def test_call_batch_maps_responses_by_id():
+    client = ZabbixJsonRpcClient("http://zabbix.invalid/api_jsonrpc.php", auth="t", session=_EchoBatchSession())
+    responses = client.call_batch([("host.create", {"host": "a"}), ("host.create", {"host": "drop"}),
+                                   ("host.create", {"host": "c"})])
+    assert responses[0]["result"]["hostids"] == ["a"]
+    assert "No response for batch element" in responses[1]["error"]["message"]
+    assert responses[2]["result"]["hostids"] == ["c"]
+
+
+def test_jsonl_plan_store_reads_plans_and_stores_results(tmp_path):
+    from plan_store import JsonlPlanStore
+
+    store = JsonlPlanStore(str(tmp_path / "plan_store.jsonl"))
+    store.put_plan("device", 1, {
+        "action": "create",
+        "zbx_scenario": "create",
+        "zbx_record": _record("sw-01"),
+        "create_payload": {"host": "sw-01"},
+    })
+    engine = ApplyEngine(FakeClient(), BUILDER_CTX, {}, plans_dir=str(tmp_path), results_dir=str(tmp_path),
+                         plan_store=store)
+    engine.run([("device", {"id": 1, "name": "sw-01"}), ("device", {"id": 2, "name": "sw-02"})])
+    store.close()
+
+    assert not list(tmp_path.glob("zabbix_host_operation_result_*.json"))
+    with JsonlPlanStore(str(tmp_path / "plan_store.jsonl")) as reopened:
+        assert reopened.get_result("device", 1)["status"] == "eklendi"
+        missing = reopened.get_result("device", 2)
+        assert missing["status"] == "eklenemedi"
+        assert "plan_store.jsonl#device/2" in missing["reason"]
@@ -0,0 +1,234 @@
+"""Tests for the auditlog.get driven incremental host cache in zabbix_host_index.py (mock JSON-RPC server)."""
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+_FILES_DIR = os.path.join(
+    os.path.dirname(__file__),
+    "..", "playbooks", "roles", "netbox_zabbix_sync", "files"
+)
+sys.path.insert(0, os.path.abspath(_FILES_DIR))
+
+from parallel_compare_engine import _resolve_existing_host  # noqa: E402
+from zabbix_host_index import (  # noqa: E402
+    AUDIT_ACTION_ADD,
+    AUDIT_ACTION_DELETE,
+    AUDIT_ACTION_UPDATE,
+    AUDIT_RESOURCE_HOST,
+    AUDIT_RESOURCE_HOST_GROUP,
+    ZabbixApiError,
+    build_host_index,
+    fetch_audit_changes,
+    index_without_cache_keys,
+    load_host_cache,
+    load_host_maps,
+    main,
+    refresh_host_cache,
+)
+from zabbix_jsonrpc import ZabbixJsonRpcClient  # noqa: E402
+
+
+def _host(hostid, host, ip, loki):
+    return {
+        "hostid": str(hostid),
+        "host": host,
+        "name": host,
+        "interfaces": [{"interfaceid": str(hostid), "ip": ip, "type": "2"}],
+        "tags": [{"tag": "Loki_ID", "value": loki}],
+        "groups": [{"groupid": "1", "name": "Network"}],
+    }
+
+
+class FakeZabbix:
+    """In-memory Zabbix: host.get (ids listing / hostids pages) and auditlog.get over a synthetic log."""
+
+    def __init__(self, hosts):
+        self.hosts = {h["hostid"]: h for h in hosts}
+        self.audit = []
+        self.clock = 1000
+        self.calls = []
+        self.audit_error = False
+        self.lock = threading.Lock()
+
+    def record(self, action, hostid, host=None):
+        self.clock += 10
+        if action == AUDIT_ACTION_DELETE:
+            self.hosts.pop(hostid, None)
+        else:
+            self.hosts[hostid] = host
+        self.audit.append({"auditid": str(len(self.audit) + 1), "clock": str(self.clock), "action": str(action),
+                           "resourcetype": str(AUDIT_RESOURCE_HOST), "resourceid": hostid})
+
+    def rename_group(self, groupid, name):
+        self.clock += 10
+        for host in self.hosts.values():
+            for group in host["groups"]:
+                if group["groupid"] == groupid:
+                    group["name"] = name
+        self.audit.append({"auditid": str(len(self.audit) + 1), "clock": str(self.clock), "action": "1",
+                           "resourcetype": str(AUDIT_RESOURCE_HOST_GROUP), "resourceid": groupid})
+
+    def handle(self, method, params):
+        with self.lock:
+            self.calls.append((method, params))
+        if method == "host.get":
+            if params.get("output") == ["hostid"]:
+                groupids = params.get("groupids")
+                return [{"hostid": hid} for hid, h in self.hosts.items()
+                        if groupids is None or any(g["groupid"] in groupids for g in h["groups"])]
+            return [self.hosts[hid] for hid in params["hostids"] if hid in self.hosts]
+        if method == "auditlog.get":
+            if self.audit_error:
+                raise PermissionError("No permissions to call \"auditlog.get\".")
+            types = params["filter"]["resourcetype"]
+            types = types if isinstance(types, list) else [types]
+            rows = [r for r in self.audit if int(r["resourcetype"]) in types]
+            rows = [r for r in rows if int(r["clock"]) >= int(params.get("time_from", 0))]
+            rows.sort(key=lambda r: (int(r["clock"]), int(r["auditid"])), reverse=params["sortorder"] == "DESC")
+            return [{k: r[k] for k in params["output"]} for r in rows[: params["limit"]]]
+        raise ValueError(method)
+
+    def host_get_pages(self):
+        return [p["hostids"] for m, p in self.calls if m == "host.get" and "hostids" in p]
+
+
+@pytest.fixture
+def zabbix():
+    fake = FakeZabbix([_host(i, f"sw-{i}", f"10.0.0.{i}", f"L{i}") for i in range(1, 5)])
+    fake.record(AUDIT_ACTION_ADD, "4", fake.hosts["4"])
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            try:
+                resp = {"jsonrpc": "2.0", "result": fake.handle(body["method"], body["params"]), "id": body["id"]}
+            except PermissionError as exc:
+                resp = {"jsonrpc": "2.0", "error": {"code": -32500, "message": "Application error.",
+                                                    "data": str(exc)}, "id": body["id"]}
+            data = json.dumps(resp).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    fake.url = f"http://127.0.0.1:{server.server_address[1]}/api_jsonrpc.php"
+    fake.client = ZabbixJsonRpcClient(fake.url, auth="token", timeout=5)
+    yield fake
+    fake.client.close()
+    server.shutdown()
+
+
+def _maps(index):
+    return {name: index_without_cache_keys(index)[name] for name in ("by_loki", "by_hostname", "by_visible", "by_ip")}
+
+
+def test_full_then_incremental_refresh_matches_full_fetch(zabbix):
+    cache, stats = refresh_host_cache(zabbix.client, None, zabbix_url=zabbix.url, now=2000)
+    assert stats["mode"] == "full" and stats["reason"] == "no_cache"
+    assert cache["audit_clock"] == 1010
+
+    zabbix.record(AUDIT_ACTION_UPDATE, "2", _host(2, "sw-2", "10.0.9.2", "L2"))
+    zabbix.record(AUDIT_ACTION_ADD, "5", _host(5, "sw-5", "10.0.0.5", "L5"))
+    zabbix.record(AUDIT_ACTION_DELETE, "3")
+    zabbix.calls.clear()
+
+    cache, stats = refresh_host_cache(zabbix.client, cache, zabbix_url=zabbix.url, now=2100)
+    # The 60 s overlap re-reads host 4's add record (clock 1010) as well.
+    assert stats == {"mode": "incremental", "reason": "", "changed": 3, "deleted": 1, "related": 0,
+                     "audit_records": 4}
+    # Only the changed hosts were re-fetched; no ids-only listing of all hosts.
+    assert sorted(sum(zabbix.host_get_pages(), []), key=int) == ["2", "4", "5"]
+    assert not any(m == "host.get" and p.get("output") == ["hostid"] for m, p in zabbix.calls)
+    assert cache["audit_clock"] == 1040
+    assert cache["full_fetch_at"] == 2000
+
+    expected = build_host_index(zabbix.hosts[h] for h in sorted(zabbix.hosts, key=int))
+    assert cache["hosts"] == expected["hosts"]
+    assert _maps(cache) == _maps(expected)
+    assert "10.0.0.2" not in cache["by_ip"] and cache["by_ip"]["10.0.9.2"] == "2"
+
+
+def test_host_group_rename_refetches_member_hosts(zabbix):
+    for hostid in ("1", "2"):
+        zabbix.hosts[hostid]["groups"] = [{"groupid": "9", "name": "Firewall"}]
+    cache, _ = refresh_host_cache(zabbix.client, None, zabbix_url=zabbix.url, now=2000)
+    zabbix.rename_group("9", "Firewall-DC14")
+    zabbix.calls.clear()
+
+    cache, stats = refresh_host_cache(zabbix.client, cache, zabbix_url=zabbix.url, now=2100)
+    assert (stats["mode"], stats["related"], stats["audit_records"]) == ("incremental", 2, 2)
+    assert sorted(sum(zabbix.host_get_pages(), []), key=int) == ["1", "2", "4"]
+    assert cache["hosts"]["1"]["groups"] == [{"groupid": "9", "name": "Firewall-DC14"}]
+    assert cache["audit_clock"] == 1020
+
+
+def test_truncated_audit_log_falls_back_to_full_fetch(zabbix):
+    cache, _ = refresh_host_cache(zabbix.client, None, zabbix_url=zabbix.url, now=2000)
+    zabbix.record(AUDIT_ACTION_ADD, "6", _host(6, "sw-6", "10.0.0.6", "L6"))
+    zabbix.audit = zabbix.audit[1:]  # housekeeper removed the watermark record
+    cache, stats = refresh_host_cache(zabbix.client, cache, zabbix_url=zabbix.url, now=2100)
+    assert (stats["mode"], stats["reason"]) == ("full", "audit_truncated")
+    assert "6" in cache["hosts"]
+    assert cache["full_fetch_at"] == 2100
+
+
+def test_audit_permission_error_and_max_age_fall_back(zabbix):
+    cache, _ = refresh_host_cache(zabbix.client, None, zabbix_url=zabbix.url, now=2000)
+    zabbix.audit_error = True
+    with pytest.raises(ZabbixApiError):
+        fetch_audit_changes(zabbix.client, 0)
+    _, stats = refresh_host_cache(zabbix.client, cache, zabbix_url=zabbix.url, now=2100)
+    assert stats["reason"] == "audit_unavailable"
+    zabbix.audit_error = False
+    _, stats = refresh_host_cache(zabbix.client, cache, zabbix_url=zabbix.url, now=2000 + 86401)
+    assert stats["reason"] == "max_age"
+    _, stats = refresh_host_cache(zabbix.client, cache, zabbix_url="https://other/api_jsonrpc.php", now=2100)
+    assert stats["reason"] == "zabbix_url_changed"
+
+
+def test_audit_paging_dedupes_boundary_second_and_detects_overflow(zabbix):
+    for hostid in ("1", "2", "3"):
+        zabbix.record(AUDIT_ACTION_UPDATE, hostid, zabbix.hosts[hostid])
+    zabbix.record(AUDIT_ACTION_DELETE, "2")
+    changed, deleted, newest, records = fetch_audit_changes(zabbix.client, 0, page_size=2)
+    assert (changed, deleted, newest, records) == ({"1", "3", "4"}, {"2"}, 1050, 5)
+
+    for _ in range(3):
+        zabbix.audit.append({"auditid": str(len(zabbix.audit) + 1), "clock": "1060", "action": "1",
+                             "resourcetype": str(AUDIT_RESOURCE_HOST), "resourceid": "1"})
+    with pytest.raises(ZabbixApiError):
+        fetch_audit_changes(zabbix.client, 1060, page_size=2)
+
+
+def test_cli_cache_feeds_compare_engine_resolution(zabbix, tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("ZABBIX_AUTH", "token")
+    cache_path = tmp_path / "state" / "zabbix_host_cache.json"
+    output = tmp_path / "pce_zbx_host_index.json"
+    argv = ["--zabbix-url", zabbix.url, "--output", str(output), "--cache", str(cache_path)]
+    main(argv)
+    first = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert first["cache"]["mode"] == "full" and first["hosts"] == 4
+
+    zabbix.record(AUDIT_ACTION_ADD, "7", _host(7, "sw-7", "10.0.0.7", "L7"))
+    main(argv)
+    second = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert second["cache"]["mode"] == "incremental" and second["hosts"] == 5
+    assert "audit_clock" not in json.loads(output.read_text(encoding="utf-8"))
+    assert load_host_cache(str(cache_path))["audit_clock"] == 1020
+
+    # The persistent cache itself is a valid --zbx-host-index for the engines.
+    for path in (str(cache_path), str(output)):
+        maps = load_host_maps(path)
+        resolved = _resolve_existing_host("L7", "", None, maps["by_loki"], maps["by_hostname"], maps["by_visible"])
+        assert resolved["hostid"] == "7"
@@ -0,0 +1,168 @@
+"""Unit tests for zabbix_host_index.py (paged Zabbix host prefetch + lookup index)."""
+import json
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import threading
+
+import pytest
+
+_FILES_DIR = os.path.join(
+    os.path.dirname(__file__),
+    "..", "playbooks", "roles", "netbox_zabbix_sync", "files"
+)
+sys.path.insert(0, os.path.abspath(_FILES_DIR))
+
+from zabbix_host_index import (  # noqa: E402
+    HOST_OUTPUT,
+    ZabbixApiError,
+    build_host_index,
+    fetch_hosts,
+    hostid_ranges,
+    load_host_maps,
+    write_host_index,
+    write_sqlite_host_index,
+)
+from parallel_compare_engine import _resolve_existing_host, _resolve_vfw_existing_host  # noqa: E402
+
+
+def _host(hostid, host, name="", ip="", loki=None, extra_tags=()):
+    tags = [{"tag": t, "value": v} for t, v in extra_tags]
+    if loki is not None:
+        tags.append({"tag": "Loki_ID", "value": loki})
+    return {
+        "hostid": str(hostid),
+        "host": host,
+        "name": name,
+        "interfaces": [{"interfaceid": str(hostid), "ip": ip, "type": "2"}] if ip is not None else [],
+        "tags": tags,
+        "groups": [{"groupid": "1", "name": "Network"}],
+    }
+
+
+class PagedZabbix:
+    """host.get stand-in: ids-only listing plus hostids-filtered pages."""
+
+    def __init__(self, hosts, fail_on=None):
+        self.hosts = {h["hostid"]: h for h in hosts}
+        self.pages = []
+        self.fail_on = fail_on
+        self._lock = threading.Lock()
+
+    def call(self, method, params, request_id=None):
+        assert method == "host.get"
+        if params.get("output") == ["hostid"]:
+            return {"result": [{"hostid": hid} for hid in reversed(list(self.hosts))]}
+        with self._lock:
+            self.pages.append(list(params["hostids"]))
+        if self.fail_on and self.fail_on in params["hostids"]:
+            return {"error": {"code": -32500, "message": "Application error.", "data": "boom"}}
+        assert params["output"] == HOST_OUTPUT and "selectMacros" not in params
+        return {"result": [self.hosts[hid] for hid in params["hostids"]]}
+
+
+def _jinja_reference(hosts):
+    """The four map-building loops of the former fetch_all_zabbix_hosts.yml."""
+    by_loki, by_hostname, by_visible, by_ip = {}, {}, {}, {}
+    for host in hosts:
+        loki_tags = [t for t in host.get("tags") or [] if "tag" in t and t["tag"] == "Loki_ID"]
+        if loki_tags:
+            by_loki[str(loki_tags[0]["value"])] = host
+        by_hostname[host["host"]] = host
+        if "name" in host and str(host["name"]).strip() != "":
+            by_visible[host["name"]] = host
+        ifaces = host.get("interfaces") or []
+        if ifaces:
+            ip = str(ifaces[0].get("ip", "")).strip()
+            if ip != "":
+                by_ip[ip] = host
+    return {"by_loki": by_loki, "by_hostname": by_hostname, "by_visible": by_visible, "by_ip": by_ip}
+
+
+HOSTS = [
+    _host(10, "sw-01", "Switch 01", "10.0.0.1", loki="1"),
+    _host(11, "sw-02", "  ", "10.0.0.2 ", loki="2", extra_tags=[("City", "IST")]),
+    _host(12, "fw_VFW_5", "FW - Firewall", "10.0.0.1", loki="VFW_5"),
+    _host(13, "plain", "Plain", None),
+    _host(105, "dup", "Dup", "10.0.0.9", loki="1"),
+]
+
+
+def test_hostid_ranges_are_sorted_numerically_and_contiguous():
+    assert hostid_ranges(["105", "10", "9", "11"], 2) == [["9", "10"], ["11", "105"]]
+
+
+def test_fetch_pages_by_hostid_range_and_matches_jinja_maps(tmp_path):
+    client = PagedZabbix(HOSTS)
+    hosts = fetch_hosts(client, page_size=2, concurrency=3)
+    assert sorted(client.pages) == [["10", "11"], ["105"], ["12", "13"]]
+    assert [h["hostid"] for h in hosts] == ["10", "11", "12", "13", "105"]
+
+    path = tmp_path / "index.json"
+    write_host_index(build_host_index(hosts), str(path))
+    maps = load_host_maps(str(path))
+    assert maps == _jinja_reference(HOSTS)
+    assert maps["by_loki"]["1"]["hostid"] == "105"  # later host wins, as in the Jinja loop
+    assert maps["by_hostname"]["sw-01"] is maps["by_visible"]["Switch 01"]
+
+    stored = json.loads(path.read_text(encoding="utf-8"))
+    assert len(stored["hosts"]) == len(HOSTS)
+    assert stored["by_ip"]["10.0.0.1"] == "12"
+
+
+def test_api_error_on_any_page_raises():
+    with pytest.raises(ZabbixApiError, match="boom"):
+        fetch_hosts(PagedZabbix(HOSTS, fail_on="12"), page_size=2)
+
+
+def test_sqlite_index_matches_json_index_with_lazy_lookups(tmp_path):
+    path = tmp_path / "index.sqlite"
+    write_sqlite_host_index(build_host_index(HOSTS), str(path))
+    maps = load_host_maps(str(path))
+    reference = _jinja_reference(HOSTS)
+    for name, ref in reference.items():
+        assert len(maps[name]) == len(ref)
+        assert dict(maps[name]) == ref
+    assert "10.0.0.1" in maps["by_ip"] and "10.0.0.3" not in maps["by_ip"]
+    assert maps["by_loki"].get(1) is None  # non-string keys miss, as with a JSON dict
+    assert maps["by_hostname"]["sw-01"] is maps["by_visible"]["Switch 01"]
+    with pytest.raises(KeyError):
+        maps["by_hostname"]["missing"]
+
+    restored = pickle.loads(pickle.dumps(maps))
+    assert restored["by_loki"]["VFW_5"]["host"] == "fw_VFW_5"
+
+
+def test_sqlite_index_drives_compare_engine_resolution(tmp_path):
+    path = tmp_path / "index.sqlite"
+    write_sqlite_host_index(build_host_index(HOSTS), str(path))
+    maps = load_host_maps(str(path))
+    reference = _jinja_reference(HOSTS)
+
+    for args in (("2", "sw-02", None), ("", "plain", None), ("", "none", "Switch 01"), ("9", "none", "none")):
+        expected = _resolve_existing_host(*args, reference["by_loki"], reference["by_hostname"], reference["by_visible"])
+        assert _resolve_existing_host(*args, maps["by_loki"], maps["by_hostname"], maps["by_visible"]) == expected
+
+    vfw = _resolve_vfw_existing_host("5", "other", "", "", "", maps)
+    assert vfw["hostid"] == "12"
+    by_ip = _resolve_vfw_existing_host("6", "none", "FW - Firewall", "", "10.0.0.1", maps)
+    assert by_ip["hostid"] == "12"
+    assert _resolve_vfw_existing_host("6", "none", "", "", "", maps) == {}
+
+
+@pytest.mark.parametrize("engine", ["parallel_compare_engine.py", "zabbix_apply_engine.py"])
+def test_engines_start_without_host_index_module(engine, tmp_path):
+    # zabbix_host_index.py reaches /tmp only with zabbix_host_prefetch_python; map-file runs must not need it.
+    for name in ("parallel_compare_engine.py", "zabbix_apply_engine.py", "zabbix_payload_builder.py",
+                 "device_type_mapping_index.py", "plan_store.py", "zabbix_jsonrpc.py"):
+        shutil.copy(os.path.join(_FILES_DIR, name), tmp_path / name)
+    module_utils = os.path.join(_FILES_DIR, "..", "module_utils")
+    proc = subprocess.run(
+        [sys.executable, str(tmp_path / engine), "--help"],
+        capture_output=True, text=True, check=False,
+        env={**os.environ, "PYTHONPATH": os.path.abspath(module_utils)},
+    )
+    assert proc.returncode == 0, proc.stderr
+
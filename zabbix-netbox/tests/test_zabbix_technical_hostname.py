@@ -3,6 +3,8 @@
 import importlib.util
 from pathlib import Path
 
+import pytest
+
 
 def _load_module():
     root = Path(__file__).resolve().parent.parent
@@ -82,3 +84,29 @@ def test_platform_technical_hostname_idempotent_when_suffix_present():
     base = fn("Short", "99")
     assert base.endswith("_P_99")
     assert fn(base, "99") == base
+
+
+def test_batch_filter_matches_scalar_filters():
+    mod = _load_module()
+    fm = mod.FilterModule().filters()
+    names = ["İstanbul-Şişli-01", "", "@@@", "Same-Name"]
+    ids = ["1", "42", "99", "2"]
+    assert fm["zabbix_technical_hostnames"](names) == [mod.zabbix_technical_hostname(n) for n in names]
+    assert fm["zabbix_technical_hostnames"](names, ids, "platform") == [
+        mod.zabbix_platform_technical_hostname(n, i) for n, i in zip(names, ids)
+    ]
+    assert fm["zabbix_technical_hostnames"](names, ids, "vfw")[0] == "Istanbul-Sisli-01_VFW_1"
+
+
+def test_batch_filter_rejects_mismatched_ids():
+    mod = _load_module()
+    with pytest.raises(ValueError):
+        mod.technical_hostnames(["a", "b"], ["1"])
+
+
+def test_non_latin_scripts_use_lazy_table_entries():
+    mod = _load_module()
+    fn = mod.zabbix_technical_hostname
+    assert fn("ﬁle①") == "file1"
+    assert fn("中文-sw") == "中文-sw"
+    assert fn("Ωmega​x") == "Ωmega_x"